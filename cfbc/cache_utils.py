@@ -94,6 +94,7 @@ class CacheVersion:
         "categorias": "cfbc:version:categorias",
         "comentarios": "cfbc:version:comentarios",
         "cursos": "cfbc:version:cursos",
+        "catalogo": "cfbc:version:catalogo",
         "documentos": "cfbc:version:documentos",
         "evaluaciones": "cfbc:version:evaluaciones",
         "usuarios": "cfbc:version:usuarios",
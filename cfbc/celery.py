@@ -36,4 +36,75 @@ def setup_periodic_tasks(sender, **kwargs):
     """
     from cfbc.cache_signals import register_warm_cache_task, register_health_check_task
     register_warm_cache_task(sender)
-    register_health_check_task(sender)
\ No newline at end of file
+    register_health_check_task(sender)
+
+    from celery.schedules import crontab
+    if not hasattr(sender.conf, 'beat_schedule') or sender.conf.beat_schedule is None:
+        sender.conf.beat_schedule = {}
+    sender.conf.beat_schedule.update({
+        'limpiar-reportes-cada-hora': {
+            'task': 'principal.tasks.limpiar_reportes_antiguos',
+            'schedule': crontab(minute=15),
+            'options': {
+                'queue': 'maintenance',
+                'expires': 1800,
+            },
+        },
+        'actualizar-estados-cursos': {
+            # Cada hora en el minuto 1 (a las 00:01 aplica los cambios de estado del día)
+            'task': 'principal.tasks.actualizar_estados_cursos',
+            'schedule': crontab(minute=1),
+            'options': {
+                'queue': 'maintenance',
+                'expires': 1800,
+            },
+        },
+        'volcar-contadores-waf': {
+            'task': 'security.tasks.flush_waf_hit_counters',
+            'schedule': 60.0,
+            'options': {
+                'queue': 'maintenance',
+                'expires': 55,
+            },
+        },
+        'volcar-auditoria': {
+            'task': 'security.tasks.flush_audit_sink',
+            'schedule': 5.0,
+            'options': {
+                'queue': 'maintenance',
+                'expires': 30,
+            },
+        },
+        'volcar-uso-claves-cifrado': {
+            'task': 'security.tasks.flush_encryption_usage',
+            'schedule': 60.0,
+            'options': {
+                'queue': 'maintenance',
+                'expires': 55,
+            },
+        },
+        'consolidar-metricas-seguridad': {
+            'task': 'security.tasks.update_security_rollups',
+            'schedule': 300.0,
+            'options': {
+                'queue': 'maintenance',
+                'expires': 240,
+            },
+        },
+        'barrer-sesiones-inactivas': {
+            'task': 'security.tasks.sweep_inactive_sessions',
+            'schedule': 300.0,
+            'options': {
+                'queue': 'maintenance',
+                'expires': 240,
+            },
+        },
+        'purgar-auditoria-vencida': {
+            'task': 'security.tasks.purge_security_audit_logs',
+            'schedule': crontab(hour=3, minute=30),
+            'options': {
+                'queue': 'maintenance',
+                'expires': 3600,
+            },
+        },
+    })
\ No newline at end of file
@@ -11,7 +11,7 @@ Provides utilities for:
 import time
 import logging
 import threading
-from contextlib import contextmanager
+from contextlib import ExitStack, contextmanager
 from collections import defaultdict
 from datetime import datetime, timedelta
 from django.conf import settings
@@ -324,8 +324,8 @@ class SlowQueryLogger:
     """
     Logs database queries that exceed a configurable threshold.
 
-    Integrates with Django's query logging to capture and report
-    slow queries for performance analysis.
+    Fed by QueryTimer (see query_timing() below), which times every
+    statement without relying on DEBUG query logging.
 
     Note: This is a best-effort monitoring utility. Under extreme
     concurrent load, some slow queries may not be captured due to
@@ -389,6 +389,90 @@ class SlowQueryLogger:
 slow_query_logger = SlowQueryLogger()
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Per-request query timing
+# ─────────────────────────────────────────────────────────────────────────────
+
+class QueryStats:
+    """
+    Query count, DB time and slowest statement of a block, per alias.
+
+    Attributes:
+        per_alias: Dict alias -> [query count, total seconds]
+        slowest: (seconds, alias, sql) of the slowest statement, or None
+    """
+
+    def __init__(self):
+        self.per_alias = {}
+        self.slowest = None
+
+    def add(self, alias, sql, duration):
+        totals = self.per_alias.get(alias)
+        if totals is None:
+            totals = self.per_alias[alias] = [0, 0.0]
+        totals[0] += 1
+        totals[1] += duration
+        if self.slowest is None or duration > self.slowest[0]:
+            self.slowest = (duration, alias, sql)
+
+    @property
+    def count(self):
+        return sum(totals[0] for totals in self.per_alias.values())
+
+    @property
+    def time(self):
+        return sum(totals[1] for totals in self.per_alias.values())
+
+
+class QueryTimer:
+    """
+    execute_wrapper that times each statement of one connection with
+    perf_counter, adds it to a QueryStats and hands statements over the
+    threshold to the SlowQueryLogger.
+
+    Unlike connection.queries it works with DEBUG = False and keeps nothing
+    but the counters and a reference to the slowest SQL string.
+    """
+
+    def __init__(self, alias, stats, slow_logger=None):
+        self.alias = alias
+        self.stats = stats
+        self.slow_logger = slow_logger or slow_query_logger
+        self.slow_threshold = self.slow_logger.threshold_ms / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.stats.add(self.alias, sql, duration)
+            if duration >= self.slow_threshold:
+                self.slow_logger.process_query({'sql': sql, 'time': duration, 'alias': self.alias})
+
+
+@contextmanager
+def query_timing(slow_logger=None):
+    """
+    Time every statement run inside the block on any database alias.
+
+    Usage:
+        with query_timing() as stats:
+            ...
+        stats.count, stats.time, stats.per_alias, stats.slowest
+
+    Yields:
+        QueryStats
+    """
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(
+                connections[alias].execute_wrapper(QueryTimer(alias, stats, slow_logger))
+            )
+        yield stats
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Middleware for query timeout and monitoring
 # ─────────────────────────────────────────────────────────────────────────────
@@ -18,9 +18,11 @@ import json
 from datetime import datetime
 
 from django.conf import settings
-from django.db import connection
 from django.core.cache import cache
 
+from cfbc.db_monitoring import query_timing
+from security.api_security.rate_limiter import RATE_LIMITS
+
 logger = logging.getLogger(__name__)
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -48,14 +50,14 @@ class CorrelationIdMiddleware:
 
         # Store on request for use throughout the app
         request.correlation_id = correlation_id
-        request._request_start_time = time.time()
+        request._request_start_time = time.perf_counter()
 
         # Process the request
         response = self.get_response(request)
 
         # Add correlation ID to response headers
         response['X-Request-ID'] = correlation_id
-        response['X-Response-Time'] = f"{(time.time() - request._request_start_time) * 1000:.0f}ms"
+        response['X-Response-Time'] = f"{(time.perf_counter() - request._request_start_time) * 1000:.0f}ms"
 
         return response
 
@@ -69,11 +71,16 @@ class RequestTimingMiddleware:
     Application Performance Monitoring (APM) middleware.
 
     Tracks per-request:
-    - Total request duration
-    - Database query count and total time
-    - Cache operations (if any)
+    - Total request duration (perf_counter)
+    - Database query count and total time, per database alias
+    - Slowest statement of the request
     - Response status code
 
+    Queries are timed with an execute_wrapper on every connection
+    (cfbc.db_monitoring.query_timing), so the DB metrics are real with
+    DEBUG = False; statements over the SlowQueryLogger threshold are handed
+    to it as they run.
+
     Stores metrics in Redis for aggregation and alerting.
     """
 
@@ -81,20 +88,18 @@ class RequestTimingMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # Store timing data on request for use by views
-        request._db_queries_before = len(connection.queries)
+        # CorrelationIdMiddleware sets the start time when it runs first
+        if getattr(request, '_request_start_time', None) is None:
+            request._request_start_time = time.perf_counter()
         request._cache_operations = 0
 
         # Process the request
-        response = self.get_response(request)
+        with query_timing() as stats:
+            response = self.get_response(request)
 
-        # Calculate metrics
-        db_queries = len(connection.queries) - request._db_queries_before
-        db_time = sum(
-            float(q['time']) for q in connection.queries[request._db_queries_before:]
-        ) if db_queries > 0 else 0.0
-
-        total_time = time.time() - getattr(request, '_request_start_time', time.time())
+        total_time = time.perf_counter() - request._request_start_time
+        db_queries = stats.count
+        db_time = stats.time
 
         # Store metrics for the metrics endpoint
         self._record_metrics(
@@ -105,17 +110,23 @@ class RequestTimingMiddleware:
             db_queries=db_queries,
             db_time=db_time,
             correlation_id=getattr(request, 'correlation_id', ''),
+            per_alias=stats.per_alias,
+            slowest=stats.slowest,
         )
 
         # Add debug headers (if DEBUG mode)
         if settings.DEBUG:
             response['X-DB-Queries'] = str(db_queries)
             response['X-DB-Time'] = f"{db_time:.3f}s"
+            if stats.slowest:
+                slowest_time, slowest_alias, _ = stats.slowest
+                response['X-DB-Slowest'] = f"{slowest_time * 1000:.1f}ms ({slowest_alias})"
 
         return response
 
     def _record_metrics(self, path, method, status_code, duration,
-                        db_queries, db_time, correlation_id=''):
+                        db_queries, db_time, correlation_id='',
+                        per_alias=None, slowest=None):
         """Record metrics to Redis for aggregation and monitoring dashboards."""
         try:
             # Normalize path for aggregation (replace IDs with {id})
@@ -143,20 +154,34 @@ class RequestTimingMiddleware:
                              f'{normalized_path}:count', db_queries)
                 pipe.hincrbyfloat(f'cfbc:metrics:db:{minute_key}',
                                   f'{normalized_path}:time', db_time)
+                # DB query tracking per database alias
+                for alias, (alias_queries, alias_time) in (per_alias or {}).items():
+                    pipe.hincrby(f'cfbc:metrics:db_alias:{minute_key}',
+                                 f'{alias}:count', alias_queries)
+                    pipe.hincrbyfloat(f'cfbc:metrics:db_alias:{minute_key}',
+                                      f'{alias}:time', alias_time)
                 # Expire after 1 hour
                 for key in [f'cfbc:metrics:requests:{minute_key}',
                            f'cfbc:metrics:duration:{minute_key}',
                            f'cfbc:metrics:status:{minute_key}',
-                           f'cfbc:metrics:db:{minute_key}']:
+                           f'cfbc:metrics:db:{minute_key}',
+                           f'cfbc:metrics:db_alias:{minute_key}']:
                     pipe.expire(key, 3600)
                 pipe.execute()
 
             # Log slow requests (> 2 seconds)
             if duration > 2.0:
+                slowest_info = ''
+                if slowest:
+                    slowest_time, slowest_alias, slowest_sql = slowest
+                    slowest_info = (
+                        f" | slowest {slowest_time * 1000:.0f}ms on {slowest_alias}: "
+                        f"{slowest_sql[:200]}"
+                    )
                 logger.warning(
                     f"SLOW REQUEST ({duration:.2f}s) {method} {normalized_path} "
                     f"→ {status_code} | {db_queries} queries ({db_time:.3f}s) | "
-                    f"correlation_id={correlation_id}"
+                    f"correlation_id={correlation_id}{slowest_info}"
                 )
 
             # Log high DB query count (> 30 queries)
@@ -219,7 +244,8 @@ class StructuredLoggingMiddleware:
         response = self.get_response(request)
 
         # Log request summary with structured context
-        duration = time.time() - getattr(request, '_request_start_time', time.time())
+        now = time.perf_counter()
+        duration = now - getattr(request, '_request_start_time', now)
         log_data = {
             **request.structured_log,
             'status_code': response.status_code,
@@ -636,8 +662,9 @@ class RateLimitMiddleware:
     - File uploads: 10 requests per minute per IP
     - General: 200 requests per minute per IP
 
-    Uses Django's cache (Redis) for tracking request counts, which
-    means rate limits are shared across all application instances.
+    Uses the shared GCRA limiter on Redis (one Lua script call per
+    request), which means rate limits are shared across all application
+    instances.
 
     This complements Nginx-level rate limiting by providing:
     - Application-aware rate limits (e.g., login failures vs attempts)
@@ -648,13 +675,9 @@ class RateLimitMiddleware:
     DISABLE_RATE_LIMITING setting.
     """
 
-    # Rate limit configurations: (requests, window_seconds, block_seconds)
-    RATE_LIMITS = {
-        'login': {'requests': 5, 'window': 60, 'block': 300},       # 5/min, block 5min
-        'api': {'requests': 30, 'window': 60, 'block': 120},        # 30/min, block 2min
-        'upload': {'requests': 10, 'window': 60, 'block': 300},     # 10/min, block 5min
-        'general': {'requests': 200, 'window': 60, 'block': 60},    # 200/min, block 1min
-    }
+    # Rate limit configurations: (requests, window_seconds, block_seconds),
+    # shared with PerUserRateLimitService (settings.RATE_LIMIT_CATEGORIES)
+    RATE_LIMITS = RATE_LIMITS
 
     # Paths that match each rate limit category
     PATH_MAP = {
@@ -753,62 +776,22 @@ class RateLimitMiddleware:
         """
         Check if the request is within rate limits.
 
+        One atomic round trip to Redis through the shared GCRA limiter
+        (security.api_security.rate_limiter), so concurrent requests from
+        the same client cannot race past the limit.
+
         Returns:
             Tuple of (is_allowed, remaining_requests, reset_timestamp)
         """
-        from django.core.cache import cache
-
-        window = config['window']
-        max_requests = config['requests']
-
-        # Cache key for this rate limit counter
-        cache_key = f"cfbc:ratelimit:{category}:{client_id}"
-
-        # Get current count and expiry
-        data = cache.get(cache_key)
-        now = int(time.time())
-
-        if data is None:
-            # First request in this window
-            remaining = max_requests - 1
-            cache.set(cache_key, {
-                'count': 1,
-                'window_start': now,
-                'blocked_until': 0,
-            }, window)
-            return True, remaining, now + window
-
-        # Check if blocked
-        if data.get('blocked_until', 0) > now:
-            return False, 0, data['blocked_until']
-
-        # Check if window has expired
-        window_start = data.get('window_start', 0)
-        if now - window_start > window:
-            # New window
-            data = {'count': 1, 'window_start': now, 'blocked_until': 0}
-            cache.set(cache_key, data, window)
-            return True, max_requests - 1, now + window
-
-        # Increment count
-        data['count'] += 1
-
-        if data['count'] > max_requests:
-            # Rate limit exceeded - block the client
-            block_seconds = config['block']
-            data['blocked_until'] = now + block_seconds
-            cache.set(cache_key, data, block_seconds)
+        from security.api_security import rate_limiter
 
+        decision = rate_limiter.check(category, client_id, config)
+        if decision.newly_blocked:
             logger.warning(
                 f"Rate limit exceeded: category={category}, "
-                f"client={client_id}, count={data['count']}"
+                f"client={client_id}, blocked for {decision.retry_after}s"
             )
-            return False, 0, now + block_seconds
-
-        remaining = max_requests - data['count']
-        cache.set(cache_key, data, window)
-
-        return True, remaining, window_start + window
+        return decision.allowed, decision.remaining, decision.reset_at
 
     def _rate_limit_response(self, request, category, config, reset_time):
         """Generate a 429 Too Many Requests response."""
@@ -62,11 +62,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'cfbc.middleware.RequestTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'security.middleware.AuthProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'axes.middleware.AxesMiddleware',
@@ -169,6 +171,16 @@ COURSE_DOCUMENTS_ALLOWED_EXTENSIONS = [
     'pdf', 'doc', 'docx', 'ppt', 'pptx', 'xls', 'xlsx', 
     'txt', 'zip', 'rar', '7z', 'jpg', 'jpeg', 'png', 'gif'
 ]
+# Descargas de documentos servidas por nginx (location internal /protected-media/
+# en deploy/nginx/nginx.conf). Vacío: Django las envía por streaming.
+COURSE_DOCUMENTS_X_ACCEL_REDIRECT_PREFIX = os.getenv('COURSE_DOCUMENTS_X_ACCEL_REDIRECT_PREFIX', '')
+
+# Reportes generados (principal.reportes_service): almacenamiento privado fuera
+# de MEDIA_ROOT, solo accesible desde la vista de descarga autorizada. Con
+# REPORTES_X_ACCEL_REDIRECT_PREFIX la vista delega el envío en la location
+# internal /protected-reportes/ de deploy/nginx/nginx.conf.
+REPORTES_ROOT = os.getenv('REPORTES_ROOT', os.path.join(BASE_DIR, 'private', 'reportes'))
+REPORTES_X_ACCEL_REDIRECT_PREFIX = os.getenv('REPORTES_X_ACCEL_REDIRECT_PREFIX', '')
 
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
@@ -317,7 +329,14 @@ SECURITY_CONTACT_EMAIL = 'security@cfbc.edu.ni'
 # Session Security
 SESSION_COOKIE_AGE = 900  # 15 minutos de inactividad
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_SAVE_EVERY_REQUEST = True
+# La caducidad por inactividad la renueva SessionSecurityMiddleware al
+# escribir la marca de actividad (como mucho una vez por granularidad), en
+# lugar de reescribir la sesión completa en cada petición.
+SESSION_SAVE_EVERY_REQUEST = False
+# 'session': marca en la sesión | 'redis': solo registro de sesiones + TTL
+SESSION_ACTIVITY_TRACKING = os.getenv('SESSION_ACTIVITY_TRACKING', 'session')
+SESSION_ACTIVITY_GRANULARITY = int(os.getenv('SESSION_ACTIVITY_GRANULARITY', '60'))  # segundos
+SESSION_LOCKOUT_LOCAL_TTL = int(os.getenv('SESSION_LOCKOUT_LOCAL_TTL', '5'))  # segundos
 
 # ─── Production Security Settings (comentados para desarrollo) ─────────────
 # Activar estos settings cuando se despliegue a producción:
@@ -415,4 +434,13 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB (por defecto es 2.5MB)
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB (por defecto es 2.5MB)
 # WAF Configuration
 WAF_ENABLED = os.getenv('WAF_ENABLED', 'True').lower() == 'true'
-WAF_MODE = os.getenv('WAF_MODE', 'selective')  # 'blocking', 'logging', 'selective', 'disabled'
\ No newline at end of file
+WAF_MODE = os.getenv('WAF_MODE', 'selective')  # 'blocking', 'logging', 'selective', 'disabled'
+
+# Audit sink (security.audit_sink): 'buffer' encola la auditoría y la escribe
+# por lotes desde Celery; 'sync' hace el INSERT en la petición (lo fija
+# cfbc.test_runner para los tests)
+AUDIT_SINK_MODE = os.getenv('AUDIT_SINK_MODE', 'buffer')
+AUDIT_SINK_BATCH_SIZE = int(os.getenv('AUDIT_SINK_BATCH_SIZE', '100'))
+AUDIT_SINK_MAX_PENDING = int(os.getenv('AUDIT_SINK_MAX_PENDING', '50000'))
+
+TEST_RUNNER = 'cfbc.test_runner.CFBCTestRunner'
@@ -0,0 +1,22 @@
+"""
+Test runner for the project (settings.TEST_RUNNER).
+
+Applies the settings overrides every test run needs, so they do not depend
+on how the process was started.
+"""
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class CFBCTestRunner(DiscoverRunner):
+    """DiscoverRunner that writes audit rows synchronously (AUDIT_SINK_MODE='sync')."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(AUDIT_SINK_MODE='sync')
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -461,6 +461,70 @@ class MiddlewareTests(TestCase):
         )
 
 
+@tag('performance', 'middleware')
+class RequestTimingTests(TestCase):
+    """Tests for execute_wrapper based query timing (works with DEBUG=False)."""
+
+    def _get_response(self, queries):
+        from django.http import HttpResponse
+
+        def get_response(request):
+            for _ in range(queries):
+                User.objects.exists()
+            return HttpResponse('ok')
+        return get_response
+
+    @override_settings(DEBUG=False)
+    def test_query_timing_counts_without_debug(self):
+        from cfbc.db_monitoring import query_timing
+
+        with query_timing() as stats:
+            User.objects.exists()
+            User.objects.count()
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.per_alias['default'][0], 2)
+        self.assertGreater(stats.time, 0)
+        self.assertEqual(stats.slowest[1], 'default')
+        self.assertIn('auth_user', stats.slowest[2])
+
+        # Outside the block nothing is counted
+        User.objects.exists()
+        self.assertEqual(stats.count, 2)
+
+    def test_slow_statements_go_to_slow_query_logger(self):
+        from cfbc.db_monitoring import SlowQueryLogger, query_timing
+
+        slow_logger = SlowQueryLogger(threshold_ms=0)
+        with query_timing(slow_logger):
+            User.objects.exists()
+        queries = slow_logger.get_recent_slow_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(queries[0]['alias'], 'default')
+
+    @override_settings(DEBUG=True)
+    def test_request_timing_headers(self):
+        from django.test import RequestFactory
+        from cfbc.middleware import RequestTimingMiddleware
+
+        middleware = RequestTimingMiddleware(self._get_response(3))
+        request = RequestFactory().get('/cursos/5/')
+        response = middleware(request)
+        self.assertEqual(response['X-DB-Queries'], '3')
+        self.assertTrue(response['X-DB-Time'].endswith('s'))
+        self.assertIn('(default)', response['X-DB-Slowest'])
+        # The start time is set even without CorrelationIdMiddleware
+        self.assertIsNotNone(request._request_start_time)
+
+    def test_metrics_summary_without_redis(self):
+        import json
+        from django.test import RequestFactory
+        from cfbc.views import metrics_summary
+
+        response = metrics_summary(RequestFactory().get('/metrics/summary/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('database', json.loads(response.content))
+
+
 # ═════════════════════════════════════════════════════════════════════════════
 # Performance Metrics Tests
 # ═════════════════════════════════════════════════════════════════════════════
@@ -210,6 +210,36 @@ def _register_custom_metrics():
         pass
 
 
+def _read_metrics_hash(name, minute_key):
+    """
+    Read one of the per-minute metric hashes written by
+    RequestTimingMiddleware (cfbc:metrics:<name>:<minute>).
+
+    The hashes live in Redis outside Django's cache API, so they are read
+    with the raw client; without django_redis there are none.
+
+    Returns:
+        Dict field -> value (str)
+    """
+    if not hasattr(cache, 'client'):
+        return {}
+    client = cache.client.get_client(write=False)
+    return {
+        field.decode() if isinstance(field, bytes) else field:
+        value.decode() if isinstance(value, bytes) else value
+        for field, value in client.hgetall(f'cfbc:metrics:{name}:{minute_key}').items()
+    }
+
+
+def _split_metric_fields(data):
+    """Group '<name>:<metric>' hash fields as {name: {metric: float}}."""
+    grouped = {}
+    for key, value in data.items():
+        name, metric = key.rsplit(':', 1)
+        grouped.setdefault(name, {})[metric] = float(value)
+    return grouped
+
+
 def _generate_text_metrics():
     """Generate metrics in Prometheus text format without the client library."""
     lines = []
@@ -234,19 +264,45 @@ def _generate_text_metrics():
         minute_key = now.strftime('%Y-%m-%dT%H:%M')
 
         # Request counts
-        requests = cache.hgetall(f'cfbc:metrics:requests:{minute_key}') or {}
+        requests = _read_metrics_hash('requests', minute_key)
         lines.append("# HELP cfbc_requests_total Total requests per endpoint")
         lines.append("# TYPE cfbc_requests_total counter")
         for path, count in requests.items():
             lines.append(f'cfbc_requests_total{{path="{path}"}} {count}')
 
         # Status codes
-        statuses = cache.hgetall(f'cfbc:metrics:status:{minute_key}') or {}
+        statuses = _read_metrics_hash('status', minute_key)
         lines.append("# HELP cfbc_http_requests_total HTTP status codes")
         lines.append("# TYPE cfbc_http_requests_total counter")
         for status_group, count in statuses.items():
             lines.append(f'cfbc_http_requests_total{{status="{status_group}"}} {count}')
 
+        # Database queries and time per alias
+        db_aliases = _split_metric_fields(_read_metrics_hash('db_alias', minute_key))
+        lines.append("# HELP cfbc_db_queries_total Database queries per alias")
+        lines.append("# TYPE cfbc_db_queries_total counter")
+        for alias, data in db_aliases.items():
+            lines.append(f'cfbc_db_queries_total{{alias="{alias}"}} {int(data.get("count", 0))}')
+        lines.append("# HELP cfbc_db_time_seconds_total Database time per alias")
+        lines.append("# TYPE cfbc_db_time_seconds_total counter")
+        for alias, data in db_aliases.items():
+            lines.append(f'cfbc_db_time_seconds_total{{alias="{alias}"}} {data.get("time", 0):.6f}')
+
+    except Exception:
+        pass
+
+    # Session security middleware overhead (last 5 minutes)
+    try:
+        from security.auth import session_metrics
+        overhead = session_metrics.summary()
+        lines.append("# HELP cfbc_session_security_overhead_ms SessionSecurityMiddleware time per request")
+        lines.append("# TYPE cfbc_session_security_overhead_ms gauge")
+        lines.append(f'cfbc_session_security_overhead_ms{{stat="avg"}} {overhead["avg_ms"]}')
+        lines.append(f'cfbc_session_security_overhead_ms{{stat="max"}} {overhead["max_ms"]}')
+        lines.append("# HELP cfbc_session_security_events_total SessionSecurityMiddleware counters")
+        lines.append("# TYPE cfbc_session_security_events_total counter")
+        for name in session_metrics.COUNTERS:
+            lines.append(f'cfbc_session_security_events_total{{event="{name}"}} {overhead[name]}')
     except Exception:
         pass
 
@@ -285,28 +341,45 @@ def metrics_summary(request):
         minute_key = now.strftime('%Y-%m-%dT%H:%M')
 
         # Request metrics
-        requests = cache.hgetall(f'cfbc:metrics:requests:{minute_key}') or {}
+        requests = _read_metrics_hash('requests', minute_key)
         summary['requests']['per_endpoint'] = {k: int(v) for k, v in requests.items()}
         summary['requests']['total'] = sum(summary['requests']['per_endpoint'].values())
 
         # Duration metrics
-        duration_data = cache.hgetall(f'cfbc:metrics:duration:{minute_key}') or {}
-        durations = {}
-        for key, value in duration_data.items():
-            path, metric = key.rsplit(':', 1)
-            if path not in durations:
-                durations[path] = {}
-            durations[path][metric] = float(value)
-
+        durations = _split_metric_fields(_read_metrics_hash('duration', minute_key))
         summary['requests']['avg_duration'] = {
             path: round(data.get('sum', 0) / max(data.get('count', 1), 1), 3)
             for path, data in durations.items()
         }
 
         # Status codes
-        statuses = cache.hgetall(f'cfbc:metrics:status:{minute_key}') or {}
+        statuses = _read_metrics_hash('status', minute_key)
         summary['requests']['status_codes'] = {k: int(v) for k, v in statuses.items()}
 
+        # DB queries and time per request, by endpoint
+        db_paths = _split_metric_fields(_read_metrics_hash('db', minute_key))
+        summary['database']['avg_queries'] = {
+            path: round(data.get('count', 0) / max(durations.get(path, {}).get('count', 1), 1), 1)
+            for path, data in db_paths.items()
+        }
+        summary['database']['avg_time'] = {
+            path: round(data.get('time', 0) / max(durations.get(path, {}).get('count', 1), 1), 4)
+            for path, data in db_paths.items()
+        }
+
+        # DB totals per alias
+        summary['database']['per_alias'] = {
+            alias: {'queries': int(data.get('count', 0)), 'time': round(data.get('time', 0), 4)}
+            for alias, data in _split_metric_fields(_read_metrics_hash('db_alias', minute_key)).items()
+        }
+
+    except Exception:
+        pass
+
+    # Session security middleware overhead (last 5 minutes)
+    try:
+        from security.auth import session_metrics
+        summary['session_security'] = session_metrics.summary()
     except Exception:
         pass
 
@@ -0,0 +1,182 @@
+"""
+Entrega de documentos descargados sin cargarlos en memoria.
+
+  - Por defecto se responde con FileResponse sobre el archivo abierto: el
+    servidor WSGI lo envía por bloques (gunicorn usa os.sendfile), así que la
+    memoria del worker no depende del tamaño del archivo.
+  - Con COURSE_DOCUMENTS_X_ACCEL_REDIRECT_PREFIX (p. ej. '/protected-media/')
+    la respuesta solo lleva la cabecera X-Accel-Redirect y nginx sirve el
+    archivo desde una location `internal`; el worker queda libre al instante.
+  - Soporta peticiones Range (206 / 416) para reanudar descargas y saltar en
+    vídeos, y respuestas condicionales (ETag / Last-Modified → 304).
+
+La vista sigue haciendo el control de acceso y el registro de DocumentAccess;
+este módulo solo construye la respuesta.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from urllib.parse import quote
+
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .settings import COURSE_DOCUMENTS_X_ACCEL_REDIRECT_PREFIX
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE = 64 * 1024
+
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class ArchivoDescarga:
+    """Metadatos del archivo de un documento necesarios para la respuesta."""
+
+    def __init__(self, document):
+        self.name = document.file.name
+        self.filename = os.path.basename(self.name)
+        self.size = default_storage.size(self.name)
+        try:
+            modificado = default_storage.get_modified_time(self.name)
+        except (NotImplementedError, OSError):
+            modificado = document.uploaded_at
+        self.last_modified = int(modificado.timestamp())
+        firma = f'{self.name}:{self.size}:{self.last_modified}'
+        self.etag = quote_etag(hashlib.md5(firma.encode()).hexdigest())
+
+
+def rango_solicitado(request, archivo):
+    """
+    Rango de bytes pedido como (inicio, fin) inclusivo, None si se debe enviar
+    el archivo completo, o 'invalido' si el rango no se puede satisfacer.
+
+    Solo se atiende un rango simple; los multirango y los rangos condicionados
+    por un If-Range que ya no coincide se responden con el archivo completo.
+    """
+    cabecera = request.META.get('HTTP_RANGE', '').strip()
+    if not cabecera:
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range and if_range != archivo.etag:
+        fecha = parse_http_date_safe(if_range)
+        if fecha is None or fecha < archivo.last_modified:
+            return None
+
+    coincidencia = _RANGO.match(cabecera)
+    if not coincidencia or coincidencia.groups() == ('', ''):
+        return None
+    inicio, fin = coincidencia.groups()
+    if inicio == '':
+        # bytes=-N: los últimos N bytes
+        longitud = int(fin)
+        if longitud == 0:
+            return 'invalido'
+        return max(0, archivo.size - longitud), archivo.size - 1
+    inicio = int(inicio)
+    fin = min(int(fin), archivo.size - 1) if fin else archivo.size - 1
+    if inicio >= archivo.size or fin < inicio:
+        return 'invalido'
+    return inicio, fin
+
+
+def es_descarga_inicial(rango):
+    """Las peticiones que continúan una descarga o un vídeo no cuentan como acceso."""
+    return rango is None or rango == 'invalido' or rango[0] == 0
+
+
+def respuesta_descarga(request, document, content_type, archivo=None, rango=None):
+    """
+    Construye la respuesta para descargar `document`.
+
+    Args:
+        request: HttpRequest
+        document: CourseDocument con archivo existente
+        content_type: Tipo MIME
+        archivo: ArchivoDescarga ya calculado (opcional)
+        rango: Resultado de rango_solicitado (opcional)
+
+    Returns:
+        HttpResponse: 200, 206, 304, 412 o 416
+    """
+    archivo = archivo or ArchivoDescarga(document)
+
+    condicional = get_conditional_response(
+        request, etag=archivo.etag, last_modified=archivo.last_modified
+    )
+    if condicional is not None:
+        return _cabeceras_comunes(condicional, archivo)
+
+    if COURSE_DOCUMENTS_X_ACCEL_REDIRECT_PREFIX:
+        # nginx resuelve Range y condicionales sobre el archivo interno
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            COURSE_DOCUMENTS_X_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(archivo.name)
+        )
+        response['Content-Disposition'] = _content_disposition(archivo.filename)
+        return _cabeceras_comunes(response, archivo)
+
+    if rango == 'invalido':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{archivo.size}'
+        return _cabeceras_comunes(response, archivo)
+
+    fichero = default_storage.open(archivo.name, 'rb')
+    if rango is None:
+        response = FileResponse(
+            fichero, content_type=content_type, as_attachment=True, filename=archivo.filename
+        )
+    else:
+        inicio, fin = rango
+        fichero.seek(inicio)
+        if fin == archivo.size - 1:
+            # Hasta el final: el archivo posicionado sigue pudiendo usar sendfile
+            response = FileResponse(
+                fichero, content_type=content_type, as_attachment=True, filename=archivo.filename
+            )
+        else:
+            response = StreamingHttpResponse(
+                _leer_tramo(fichero, fin - inicio + 1), content_type=content_type
+            )
+            response['Content-Disposition'] = _content_disposition(archivo.filename)
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{archivo.size}'
+        response['Content-Length'] = str(fin - inicio + 1)
+    return _cabeceras_comunes(response, archivo)
+
+
+def _leer_tramo(fichero, longitud):
+    """Lee `longitud` bytes desde la posición actual por bloques y cierra el archivo."""
+    try:
+        while longitud > 0:
+            bloque = fichero.read(min(TAMANO_BLOQUE, longitud))
+            if not bloque:
+                break
+            longitud -= len(bloque)
+            yield bloque
+    finally:
+        fichero.close()
+
+
+def _content_disposition(filename):
+    try:
+        filename.encode('ascii')
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+def _cabeceras_comunes(response, archivo):
+    response['ETag'] = archivo.etag
+    response['Last-Modified'] = http_date(archivo.last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    # private + no-cache: el navegador puede guardar el archivo pero debe
+    # revalidarlo (304) en cada descarga; no-store impediría la revalidación.
+    response['Cache-Control'] = 'private, no-cache, must-revalidate'
+    response['X-Robots-Tag'] = 'noindex'
+    return response
@@ -1,3 +1,24 @@
+"""
+Indicadores de contenido nuevo por curso y estudiante.
+
+NewContentNotification es la fuente de verdad; la activación y los resets
+son operaciones por conjunto (un INSERT ... ON CONFLICT DO UPDATE o un
+UPDATE por curso) con una sola entrada de auditoría resumen.
+
+Para que el dashboard y el perfil del estudiante no consulten la tabla, los
+cursos con contenido nuevo de cada estudiante se guardan en un set de Redis
+(`indicadores:nuevo:<student_id>`). El set se construye desde la base de
+datos en el primer acceso y después se mantiene al activar y desactivar
+indicadores: solo se añaden cursos a sets ya construidos, así que un set
+nunca queda incompleto. Con cachés que no son Redis (locmem en desarrollo y
+tests) se guarda un set de Python con la misma API.
+
+Configuración (settings, opcional):
+  - CONTENT_INDICATORS_CACHE_TTL: segundos de vida de cada set (3600)
+"""
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.utils import timezone
 import logging
@@ -7,6 +28,21 @@ from .models import NewContentNotification, AuditLog
 
 logger = logging.getLogger(__name__)
 
+CLAVE_CURSOS_NUEVOS = 'indicadores:nuevo:{}'
+INDICADORES_CACHE_TTL = getattr(settings, 'CONTENT_INDICATORS_CACHE_TTL', 3600)
+
+# Miembro que marca un set construido aunque no tenga cursos (Redis no guarda sets vacíos)
+_CONSTRUIDO = 0
+
+# Añade el curso solo si el set del estudiante ya está construido
+_SADD_SI_EXISTE = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('SADD', KEYS[1], ARGV[1])
+end
+return 0
+"""
+_scripts = {}
+
 
 class ContentIndicatorService:
     """
@@ -23,46 +59,47 @@ class ContentIndicatorService:
             exclude_user: Usuario a excluir (típicamente el profesor que subió el contenido)
         """
         try:
-            # Obtener estudiantes inscritos en el curso
-            enrolled_students = Matriculas.objects.filter(
+            student_ids = Matriculas.objects.filter(
                 course=curso,
                 activo=True
-            ).select_related('student')
-            
-            activated_count = 0
+            ).values_list('student_id', flat=True).distinct()
+            if exclude_user:
+                student_ids = student_ids.exclude(student_id=exclude_user.id)
+            student_ids = list(student_ids)
+            if not student_ids:
+                return 0
             
             with transaction.atomic():
-                for matricula in enrolled_students:
-                    student = matricula.student
-                    
-                    # Excluir usuario si se especifica (ej: el profesor)
-                    if exclude_user and student == exclude_user:
-                        continue
-                    
-                    # Crear o actualizar notificación de contenido nuevo
-                    notification, created = NewContentNotification.objects.get_or_create(
-                        curso=curso,
-                        student=student,
-                        defaults={
-                            'has_new_content': True
-                        }
-                    )
-                    
-                    # Si ya existía pero no tenía contenido nuevo, activarlo
-                    if not created and not notification.has_new_content:
-                        notification.has_new_content = True
-                        notification.save()
-                        activated_count += 1
-                    elif created:
-                        activated_count += 1
-                    
-                    # Registrar activación de indicador
-                    AuditLog.log_action(
-                        user=student,
-                        action='indicator_activated',
-                        curso=curso,
-                        details=f'Indicador de contenido nuevo activado para estudiante'
+                ya_activos = set(NewContentNotification.objects.filter(
+                    curso=curso,
+                    student_id__in=student_ids,
+                    has_new_content=True
+                ).values_list('student_id', flat=True))
+                
+                # Un solo INSERT ... ON CONFLICT DO UPDATE para todo el curso
+                NewContentNotification.objects.bulk_create(
+                    [
+                        NewContentNotification(curso=curso, student_id=student_id, has_new_content=True)
+                        for student_id in student_ids
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['curso', 'student'],
+                    update_fields=['has_new_content', 'last_checked'],
+                )
+                activated_count = len(student_ids) - len(ya_activos)
+                
+                AuditLog.log_action(
+                    user=exclude_user,
+                    action='indicator_activated',
+                    curso=curso,
+                    details=(
+                        f'Indicador de contenido nuevo activado para {activated_count} estudiantes '
+                        f'({len(student_ids)} matriculados)'
                     )
+                )
+            
+            # Si el llamador revierte su transacción el set no debe quedar con el curso
+            transaction.on_commit(lambda: _agregar_curso(curso.id, student_ids))
             
             logger.info(f"Indicadores activados para {activated_count} estudiantes en curso '{curso.name}'")
             return activated_count
@@ -80,15 +117,19 @@ class ContentIndicatorService:
             curso: El curso
             student: El estudiante
         """
+        if curso.id not in ContentIndicatorService.get_course_ids_with_new_content(student):
+            # Sin indicador activo no hay nada que desactivar (ni que consultar)
+            return False
+        
         try:
-            notification = NewContentNotification.objects.get(
+            desactivados = NewContentNotification.objects.filter(
                 curso=curso,
-                student=student
-            )
+                student=student,
+                has_new_content=True
+            ).update(has_new_content=False, last_checked=timezone.now())
+            _quitar_curso(curso.id, [student.id])
             
-            if notification.has_new_content:
-                notification.mark_as_seen()
-                
+            if desactivados:
                 # Registrar desactivación de indicador
                 AuditLog.log_action(
                     user=student,
@@ -102,13 +143,52 @@ class ContentIndicatorService:
             
             return False
             
-        except NewContentNotification.DoesNotExist:
-            # Si no existe la notificación, no hay nada que desactivar
-            return False
         except Exception as e:
             logger.error(f"Error desactivando indicador para estudiante {student.username}: {str(e)}")
             return False
     
+    @staticmethod
+    def get_course_ids_with_new_content(student):
+        """
+        IDs de los cursos con contenido nuevo para un estudiante, desde su set
+        en caché (se construye desde la base de datos si no existe)
+        
+        Args:
+            student: El estudiante
+            
+        Returns:
+            set de IDs de curso
+        """
+        clave = CLAVE_CURSOS_NUEVOS.format(student.id)
+        try:
+            client = _redis_client()
+            if client is not None:
+                clave = cache.make_key(clave)
+                miembros = client.smembers(clave)
+                if miembros:
+                    return {int(m) for m in miembros} - {_CONSTRUIDO}
+            else:
+                miembros = cache.get(clave)
+                if miembros is not None:
+                    return set(miembros)
+        except Exception as e:
+            logger.warning(f"Caché de indicadores no disponible para {student.username}: {e}")
+            return _cursos_nuevos_desde_bd(student.id)
+        
+        course_ids = _cursos_nuevos_desde_bd(student.id)
+        try:
+            if client is not None:
+                pipe = client.pipeline()
+                pipe.delete(clave)
+                pipe.sadd(clave, _CONSTRUIDO, *course_ids)
+                pipe.expire(clave, INDICADORES_CACHE_TTL)
+                pipe.execute()
+            else:
+                cache.set(clave, course_ids, INDICADORES_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el set de indicadores de {student.username}: {e}")
+        return course_ids
+    
     @staticmethod
     def get_courses_with_new_content_for_student(student):
         """
@@ -120,27 +200,20 @@ class ContentIndicatorService:
         Returns:
             QuerySet de cursos con contenido nuevo
         """
+        from principal.models import Curso
+        
+        course_ids = ContentIndicatorService.get_course_ids_with_new_content(student)
+        if not course_ids:
+            return Curso.objects.none()
+        return Curso.objects.filter(id__in=course_ids)
+    
+    @staticmethod
+    def invalidate_student_cache(student_id):
+        """Descarta el set de un estudiante; se reconstruye en el siguiente acceso"""
         try:
-            notifications = NewContentNotification.objects.filter(
-                student=student,
-                has_new_content=True
-            ).select_related('curso')
-            
-            course_ids = [notification.curso.id for notification in notifications]
-            
-            # Obtener cursos donde el estudiante está inscrito y tiene contenido nuevo
-            from principal.models import Curso
-            courses_with_new_content = Curso.objects.filter(
-                id__in=course_ids,
-                matriculas__student=student,
-                matriculas__activo=True
-            ).distinct()
-            
-            return courses_with_new_content
-            
+            cache.delete(CLAVE_CURSOS_NUEVOS.format(student_id))
         except Exception as e:
-            logger.error(f"Error obteniendo cursos con contenido nuevo para {student.username}: {str(e)}")
-            return Curso.objects.none()
+            logger.warning(f"No se pudo invalidar el set de indicadores del estudiante {student_id}: {e}")
     
     @staticmethod
     def has_new_content(curso, student):
@@ -154,18 +227,7 @@ class ContentIndicatorService:
         Returns:
             Boolean indicando si hay contenido nuevo
         """
-        try:
-            notification = NewContentNotification.objects.get(
-                curso=curso,
-                student=student
-            )
-            return notification.has_new_content
-            
-        except NewContentNotification.DoesNotExist:
-            return False
-        except Exception as e:
-            logger.error(f"Error verificando contenido nuevo: {str(e)}")
-            return False
+        return curso.id in ContentIndicatorService.get_course_ids_with_new_content(student)
     
     @staticmethod
     def get_indicator_stats_for_course(curso):
@@ -233,13 +295,11 @@ class ContentIndicatorService:
             
             cutoff_date = timezone.now() - timedelta(days=days_old)
             
-            old_indicators = NewContentNotification.objects.filter(
+            # Un único DELETE; los indicadores vistos no están en los sets de caché
+            count, _ = NewContentNotification.objects.filter(
                 last_checked__lt=cutoff_date,
                 has_new_content=False
-            )
-            
-            count = old_indicators.count()
-            old_indicators.delete()
+            ).delete()
             
             logger.info(f"Limpiados {count} indicadores antiguos")
             return count
@@ -261,11 +321,9 @@ class ContentIndicatorService:
         """
         try:
             indicators = NewContentNotification.objects.filter(curso=curso)
-            count = indicators.count()
-            
-            for indicator in indicators:
-                indicator.has_new_content = False
-                indicator.save()
+            student_ids = list(indicators.filter(has_new_content=True).values_list('student_id', flat=True))
+            count = indicators.update(has_new_content=False, last_checked=timezone.now())
+            _quitar_curso(curso.id, student_ids)
             
             # Registrar reset masivo
             AuditLog.log_action(
@@ -301,11 +359,8 @@ class IndicatorTemplateContext:
             Contexto actualizado con información de indicadores
         """
         try:
-            # Obtener cursos con contenido nuevo
-            courses_with_new_content = ContentIndicatorService.get_courses_with_new_content_for_student(student)
-            
-            # Crear diccionario de cursos con contenido nuevo para fácil lookup
-            new_content_course_ids = set(course.id for course in courses_with_new_content)
+            # IDs de cursos con contenido nuevo (set en caché, sin consultas)
+            new_content_course_ids = ContentIndicatorService.get_course_ids_with_new_content(student)
             
             # Agregar información de indicadores a cursos existentes en el contexto
             if 'enrolled_courses' in context:
@@ -351,3 +406,71 @@ class IndicatorTemplateContext:
         except Exception as e:
             logger.error(f"Error agregando contexto de indicadores para profesor: {str(e)}")
             return context
+
+
+def _cursos_nuevos_desde_bd(student_id):
+    """Cursos con indicador activo en los que el estudiante sigue matriculado"""
+    return set(NewContentNotification.objects.filter(
+        student_id=student_id,
+        has_new_content=True,
+        curso__matriculas__student_id=student_id,
+        curso__matriculas__activo=True,
+    ).values_list('curso_id', flat=True))
+
+
+def _agregar_curso(curso_id, student_ids):
+    """Añade el curso a los sets ya construidos de los estudiantes"""
+    claves = [CLAVE_CURSOS_NUEVOS.format(student_id) for student_id in student_ids]
+    try:
+        client = _redis_client()
+        if client is not None:
+            script = _script(client)
+            pipe = client.pipeline(transaction=False)
+            for clave in claves:
+                script(keys=[cache.make_key(clave)], args=[curso_id], client=pipe)
+            pipe.execute()
+        else:
+            sets = cache.get_many(claves)
+            for miembros in sets.values():
+                miembros.add(curso_id)
+            cache.set_many(sets, INDICADORES_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"No se pudieron actualizar los sets de indicadores del curso {curso_id}: {e}")
+        cache.delete_many(claves)
+
+
+def _quitar_curso(curso_id, student_ids):
+    """Quita el curso de los sets de los estudiantes"""
+    if not student_ids:
+        return
+    claves = [CLAVE_CURSOS_NUEVOS.format(student_id) for student_id in student_ids]
+    try:
+        client = _redis_client()
+        if client is not None:
+            pipe = client.pipeline(transaction=False)
+            for clave in claves:
+                pipe.srem(cache.make_key(clave), curso_id)
+            pipe.execute()
+        else:
+            sets = cache.get_many(claves)
+            for miembros in sets.values():
+                miembros.discard(curso_id)
+            cache.set_many(sets, INDICADORES_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"No se pudieron actualizar los sets de indicadores del curso {curso_id}: {e}")
+        cache.delete_many(claves)
+
+
+def _redis_client():
+    """Cliente Redis crudo si la caché por defecto es django_redis; si no, None."""
+    if not type(cache).__module__.startswith('django_redis'):
+        return None
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _script(client):
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(_SADD_SI_EXISTE)
+    return script
@@ -86,6 +86,8 @@ class DocumentsProfileMixin:
         # Agregar indicadores de contenido nuevo usando el servicio
         context = IndicatorTemplateContext.add_indicator_context_for_student(context, student)
         
+        new_content_course_ids = ContentIndicatorService.get_course_ids_with_new_content(student)
+        
         # Agregar URLs del dashboard del estudiante y verificar documentos disponibles
         if 'enrolled_courses' in context:
             for course in context['enrolled_courses']:
@@ -99,7 +101,7 @@ class DocumentsProfileMixin:
                 ).exists()
                 
                 # Agregar información del indicador de contenido nuevo
-                course.has_new_content_indicator = ContentIndicatorService.has_new_content(course, student)
+                course.has_new_content_indicator = course.id in new_content_course_ids
         
         # También agregar para cursos pendientes si existen
         if 'pending_courses' in context:
@@ -108,7 +110,7 @@ class DocumentsProfileMixin:
                 course.has_available_documents = CourseDocument.objects.filter(
                     folder__curso=course
                 ).exists()
-                course.has_new_content_indicator = ContentIndicatorService.has_new_content(course, student)
+                course.has_new_content_indicator = course.id in new_content_course_ids
         
         # Agregar estadísticas generales del estudiante
         enrolled_courses = context.get('enrolled_courses', [])
@@ -215,9 +217,10 @@ class DocumentsContextProcessor:
         # Agregar información global según el rol
         if group_name == 'Estudiantes':
             # Obtener cursos con contenido nuevo para mostrar en navegación global
-            courses_with_new_content = ContentIndicatorService.get_courses_with_new_content_for_student(request.user)
-            context['global_new_content_count'] = courses_with_new_content.count()
-            context['has_global_new_content'] = courses_with_new_content.exists()
+            # Set en caché: sin consultas a la base de datos
+            course_ids = ContentIndicatorService.get_course_ids_with_new_content(request.user)
+            context['global_new_content_count'] = len(course_ids)
+            context['has_global_new_content'] = bool(course_ids)
         
         elif group_name == 'Profesores':
             # Obtener estadísticas globales para profesores
@@ -126,20 +126,8 @@ class CourseDocument(models.Model):
 
     def _activate_notifications(self):
         """Activa las notificaciones de contenido nuevo para estudiantes del curso"""
-        from principal.models import Matriculas
-        
-        # Obtener todos los estudiantes inscritos en el curso
-        matriculas = Matriculas.objects.filter(course=self.folder.curso, activo=True)
-        
-        for matricula in matriculas:
-            notification, created = NewContentNotification.objects.get_or_create(
-                curso=self.folder.curso,
-                student=matricula.student,
-                defaults={'has_new_content': True}
-            )
-            if not created:
-                notification.has_new_content = True
-                notification.save()
+        from .indicator_service import ContentIndicatorService
+        ContentIndicatorService.activate_indicators_for_course(self.folder.curso)
 
     def get_file_extension(self):
         """Obtiene la extensión del archivo"""
@@ -210,7 +198,7 @@ class AuditLog(models.Model):
     curso = models.ForeignKey('principal.Curso', on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Curso')
     folder = models.ForeignKey(DocumentFolder, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Carpeta')
     document = models.ForeignKey(CourseDocument, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Documento')
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name='Fecha y hora')
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Fecha y hora')
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name='Dirección IP')
     details = models.TextField(blank=True, null=True, verbose_name='Detalles adicionales')
 
@@ -236,12 +224,14 @@ class AuditLog(models.Model):
 
     @classmethod
     def log_action(cls, user, action, curso=None, folder=None, document=None, ip_address=None, details=None):
-        """Método de conveniencia para crear logs de auditoría"""
+        """Método de conveniencia para crear logs de auditoría (vía security.audit_sink)"""
         # Truncar detalles si son demasiado largos
         if details and len(details) > 1000:
             details = details[:997] + "..."
         
-        return cls.objects.create(
+        from security import audit_sink
+        return audit_sink.record(
+            cls,
             user=user,
             action=action,
             curso=curso,
@@ -1,5 +1,5 @@
-from django.core.mail import send_mail, EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.core.mail import send_mail
+from django.contrib.auth.models import User
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
@@ -7,6 +7,9 @@ from django.db import transaction
 import logging
 
 from principal.models import Matriculas
+from principal.notificaciones_service import (
+    PlantillaCorreo, destinatarios_de, encolar, enviar_personalizados, repartir_en_lotes,
+)
 from .models import CourseDocument, NewContentNotification, AuditLog
 from .indicator_service import ContentIndicatorService
 
@@ -21,134 +24,91 @@ class NotificationService:
     @staticmethod
     def notify_new_document(document: CourseDocument):
         """
-        Envía notificación a estudiantes inscritos cuando se sube un documento
-        
+        Programa la notificación a los estudiantes inscritos cuando se sube un
+        documento. El envío se hace en segundo plano (tarea
+        notificar_nuevo_documento), repartido en lotes, al confirmarse la
+        transacción, así que la subida no espera a los correos. Sin broker se
+        envía en línea.
+
         Args:
             document: El documento que fue subido
         """
-        try:
-            curso = document.folder.curso
-            
-            # Obtener estudiantes inscritos en el curso
-            enrolled_students = Matriculas.objects.filter(
-                course=curso,
-                activo=True
-            ).select_related('student')
-            
-            if not enrolled_students.exists():
-                logger.info(f"No hay estudiantes inscritos en el curso {curso.name}")
-                return
-            
-            # Preparar datos para el email
-            email_context = {
-                'curso': curso,
-                'folder': document.folder,
-                'document': document,
-                'teacher': document.uploaded_by,
-                'upload_date': document.uploaded_at,
-                'dashboard_url': NotificationService._get_dashboard_url(curso.id),
-                'site_name': getattr(settings, 'SITE_NAME', 'Sistema de Cursos'),
-            }
-            
-            # Renderizar templates de email
-            subject = f"Nuevo documento disponible en {curso.name}"
-            text_content = render_to_string(
-                'course_documents/emails/new_document.txt', 
-                email_context
-            )
-            html_content = render_to_string(
-                'course_documents/emails/new_document.html', 
-                email_context
-            )
-            
-            # Enviar emails individuales
-            successful_sends = 0
-            failed_sends = 0
-            
-            for matricula in enrolled_students:
-                student = matricula.student
-                
-                try:
-                    # Personalizar contexto para cada estudiante
-                    personal_context = email_context.copy()
-                    personal_context['student'] = student
-                    personal_context['student_name'] = student.get_full_name() or student.username
-                    
-                    # Renderizar contenido personalizado
-                    personal_text = render_to_string(
-                        'course_documents/emails/new_document.txt', 
-                        personal_context
-                    )
-                    personal_html = render_to_string(
-                        'course_documents/emails/new_document.html', 
-                        personal_context
-                    )
-                    
-                    # Crear y enviar email
-                    email = EmailMultiAlternatives(
-                        subject=subject,
-                        body=personal_text,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to=[student.email]
-                    )
-                    email.attach_alternative(personal_html, "text/html")
-                    email.send()
-                    
-                    successful_sends += 1
-                    
-                    # Registrar envío exitoso
-                    AuditLog.log_action(
-                        user=student,
-                        action='email_sent',
-                        curso=curso,
-                        folder=document.folder,
-                        document=document,
-                        details=f'Email de notificación enviado a {student.email}'
-                    )
-                    
-                except Exception as e:
-                    failed_sends += 1
-                    logger.error(f"Error enviando email a {student.email}: {str(e)}")
-                    
-                    # Registrar error de envío
-                    AuditLog.log_action(
-                        user=student,
-                        action='email_error',
-                        curso=curso,
-                        folder=document.folder,
-                        document=document,
-                        details=f'Error enviando email a {student.email}: {str(e)}'
-                    )
-            
-            # Log resumen
-            logger.info(
-                f"Notificaciones enviadas para documento '{document.name}' en curso '{curso.name}': "
-                f"{successful_sends} exitosos, {failed_sends} fallidos"
-            )
-            
-            # Registrar resumen en audit log
-            AuditLog.log_action(
-                user=document.uploaded_by,
-                action='notification_batch_sent',
-                curso=curso,
-                folder=document.folder,
-                document=document,
-                details=f'Lote de notificaciones enviado: {successful_sends} exitosos, {failed_sends} fallidos'
-            )
-            
-        except Exception as e:
-            logger.error(f"Error en notify_new_document: {str(e)}")
-            
-            # Registrar error general
-            AuditLog.log_action(
-                user=document.uploaded_by,
-                action='notification_error',
-                curso=document.folder.curso,
-                folder=document.folder,
-                document=document,
-                details=f'Error general en notificaciones: {str(e)}'
+        from .tasks import notificar_nuevo_documento
+
+        transaction.on_commit(lambda: encolar(notificar_nuevo_documento, document.id))
+
+    @staticmethod
+    def get_recipient_ids(curso):
+        """IDs de los estudiantes con matrícula activa y email en el curso."""
+        return list(
+            Matriculas.objects.filter(course=curso, activo=True)
+            .exclude(student__email='')
+            .order_by('student_id')
+            .values_list('student_id', flat=True)
+            .distinct()
+        )
+
+    @staticmethod
+    def send_new_document_emails(document: CourseDocument, student_ids, attempt=1):
+        """
+        Envía el correo de nuevo documento a un lote de estudiantes: plantilla
+        renderizada una vez, una sola conexión SMTP y los registros de
+        auditoría del lote en un único bulk_create.
+
+        Args:
+            document: Documento subido
+            student_ids: IDs de los estudiantes del lote
+            attempt: Número de intento para estos destinatarios
+
+        Returns:
+            tuple: (ids enviados, {id: error} de los fallidos)
+        """
+        curso = document.folder.curso
+        students = User.objects.filter(id__in=student_ids).only(
+            'id', 'email', 'username', 'first_name', 'last_name'
+        )
+        destinatarios = destinatarios_de(students)
+
+        plantilla = PlantillaCorreo(
+            f"Nuevo documento disponible en {curso.name}",
+            'course_documents/emails/new_document.txt',
+            'course_documents/emails/new_document.html',
+            EmailTemplateService.get_email_context(document),
+        )
+        enviados, fallidos = enviar_personalizados(plantilla, destinatarios)
+
+        emails = {id_: email for id_, email, _ in destinatarios}
+        registros = [
+            AuditLog(
+                user_id=student_id, action='email_sent', curso=curso,
+                folder=document.folder, document=document,
+                details=f'Email de notificación enviado a {emails[student_id]}',
             )
-    
+            for student_id in enviados
+        ]
+        for student_id, error in fallidos.items():
+            logger.error(f"Error enviando email a {emails[student_id]} (intento {attempt}): {error}")
+            registros.append(AuditLog(
+                user_id=student_id, action='email_error', curso=curso,
+                folder=document.folder, document=document,
+                details=f'Error enviando email a {emails[student_id]} (intento {attempt}): {error}'[:1000],
+            ))
+        registros.append(AuditLog(
+            user=document.uploaded_by, action='notification_batch_sent', curso=curso,
+            folder=document.folder, document=document,
+            details=(
+                f'Lote de notificaciones enviado (intento {attempt}): '
+                f'{len(enviados)} exitosos, {len(fallidos)} fallidos'
+            ),
+        ))
+        AuditLog.objects.bulk_create(registros)
+
+        logger.info(
+            f"Notificaciones enviadas para documento '{document.name}' en curso '{curso.name}' "
+            f"(intento {attempt}): {len(enviados)} exitosos, {len(fallidos)} fallidos"
+        )
+        return enviados, fallidos
+
     @staticmethod
     def update_content_indicators(curso):
         """
@@ -225,31 +185,38 @@ class NotificationService:
     def retry_failed_notifications():
         """
         Reintenta envío de notificaciones fallidas (para uso con tareas programadas)
+
+        Vuelve a encolar, por documento, solo a los estudiantes cuyo último
+        registro de las últimas 24 horas es un error de envío.
         """
         try:
-            # Buscar logs de errores de email recientes (últimas 24 horas)
             from datetime import timedelta
-            
-            recent_errors = AuditLog.objects.filter(
-                action='email_error',
-                timestamp__gte=timezone.now() - timedelta(hours=24)
-            ).select_related('document', 'curso', 'user')
-            
+            from .tasks import enviar_lote_nuevo_documento
+
+            recent = AuditLog.objects.filter(
+                action__in=['email_sent', 'email_error'],
+                timestamp__gte=timezone.now() - timedelta(hours=24),
+                document__isnull=False,
+                user__isnull=False,
+            ).order_by('timestamp', 'id').values_list('document_id', 'user_id', 'action')
+
+            pending = {}
+            for document_id, user_id, action in recent:
+                failed = pending.setdefault(document_id, set())
+                if action == 'email_error':
+                    failed.add(user_id)
+                else:
+                    failed.discard(user_id)
+
             retry_count = 0
-            
-            for error_log in recent_errors:
-                if error_log.document and error_log.user:
-                    try:
-                        # Reintentar notificación
-                        NotificationService.notify_new_document(error_log.document)
-                        retry_count += 1
-                        
-                    except Exception as e:
-                        logger.error(f"Error en reintento de notificación: {str(e)}")
-            
+            for document_id, user_ids in pending.items():
+                if user_ids:
+                    repartir_en_lotes(enviar_lote_nuevo_documento, document_id, sorted(user_ids))
+                    retry_count += len(user_ids)
+
             logger.info(f"Reintentadas {retry_count} notificaciones fallidas")
             return retry_count
-            
+
         except Exception as e:
             logger.error(f"Error en retry_failed_notifications: {str(e)}")
             return 0
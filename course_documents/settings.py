@@ -47,6 +47,11 @@ COURSE_DOCUMENTS_LOG_UPLOADS = getattr(settings, 'COURSE_DOCUMENTS_LOG_UPLOADS',
 COURSE_DOCUMENTS_CACHE_TIMEOUT = getattr(settings, 'COURSE_DOCUMENTS_CACHE_TIMEOUT', 3600)  # 1 hora
 COURSE_DOCUMENTS_THUMBNAIL_SIZE = getattr(settings, 'COURSE_DOCUMENTS_THUMBNAIL_SIZE', (200, 200))
 
+# Descargas servidas por nginx (X-Accel-Redirect). Prefijo de la location
+# `internal` que apunta a MEDIA_ROOT, p. ej. '/protected-media/'; vacío = las
+# sirve Django por streaming (FileResponse).
+COURSE_DOCUMENTS_X_ACCEL_REDIRECT_PREFIX = getattr(settings, 'COURSE_DOCUMENTS_X_ACCEL_REDIRECT_PREFIX', '')
+
 # Configuraciones de acceso - ELIMINADAS las restricciones de velocidad
 # COURSE_DOCUMENTS_DOWNLOAD_RATE_LIMIT eliminado - sin límites de velocidad
 
@@ -5,14 +5,10 @@ Celery tasks for the course documents application.
 import logging
 import os
 from celery import shared_task
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from .models import CourseDocument, DocumentFolder, DocumentAccess
-from .file_service import process_document_file, generate_document_thumbnail
-from .indicator_service import generate_folder_indicators
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -26,6 +22,10 @@ def process_uploaded_document(self, document_id):
     Args:
         document_id: ID of the uploaded document
     """
+    # Importados aquí: el módulo de tareas debe poder cargarse aunque estas
+    # utilidades de procesamiento no estén disponibles.
+    from .file_service import process_document_file, generate_document_thumbnail
+
     try:
         document = CourseDocument.objects.select_related('folder').get(id=document_id)
         
@@ -49,9 +49,10 @@ def process_uploaded_document(self, document_id):
         if file_info.get('type') in ['image/jpeg', 'image/png', 'image/gif']:
             generate_document_thumbnail(document)
         
-        # Send notification to students in the folder
+        # Send notification to students in the folder (batched, after commit)
         if document.folder:
-            send_document_notification.delay(document_id)
+            from .services import NotificationService
+            NotificationService.notify_new_document(document)
         
         logger.info(f"Document processing completed: {document.name} (ID: {document_id})")
         return {
@@ -74,60 +75,79 @@ def process_uploaded_document(self, document_id):
 def send_document_notification(self, document_id):
     """
     Send notification to students when a new document is uploaded.
+
+    Kept only for messages queued before the batched path existed; new
+    uploads go through NotificationService.notify_new_document.
     
     Args:
         document_id: ID of the uploaded document
     """
+    return notificar_nuevo_documento(document_id)
+
+
+@shared_task(acks_late=True)
+def notificar_nuevo_documento(document_id):
+    """
+    Reparte la notificación de un documento nuevo entre tareas de
+    NOTIFICACIONES_TAMANO_LOTE estudiantes (enviar_lote_nuevo_documento).
+
+    Args:
+        document_id: ID del documento subido
+    """
+    from principal.notificaciones_service import repartir_en_lotes
+    from .services import NotificationService
+
+    try:
+        document = CourseDocument.objects.select_related('folder__curso').get(id=document_id)
+    except CourseDocument.DoesNotExist:
+        logger.error(f"Document with ID {document_id} not found")
+        return {'status': 'error', 'message': 'Document not found'}
+
+    student_ids = NotificationService.get_recipient_ids(document.folder.curso)
+    if not student_ids:
+        logger.info(f"No hay estudiantes inscritos en el curso {document.folder.curso.name}")
+        return {'status': 'skipped', 'document_id': document_id, 'recipients_count': 0}
+
+    lotes = repartir_en_lotes(enviar_lote_nuevo_documento, document_id, student_ids)
+    return {
+        'status': 'queued',
+        'document_id': document_id,
+        'recipients_count': len(student_ids),
+        'batches': lotes,
+    }
+
+
+@shared_task(acks_late=True)
+def enviar_lote_nuevo_documento(document_id, student_ids, intento=1):
+    """
+    Envía el correo de un documento nuevo a un lote de estudiantes y vuelve a
+    encolar solo a los que fallaron (hasta NOTIFICACIONES_MAX_INTENTOS).
+
+    Args:
+        document_id: ID del documento subido
+        student_ids: IDs de los estudiantes del lote
+        intento: Número de intento para estos estudiantes
+    """
+    from principal.notificaciones_service import programar_reintento
+    from .services import NotificationService
+
     try:
         document = CourseDocument.objects.select_related(
-            'folder', 'folder__curso', 'uploaded_by'
+            'folder__curso', 'uploaded_by'
         ).get(id=document_id)
-        
-        if not document.folder:
-            logger.info(f"Document {document_id} has no folder, skipping notification")
-            return {'status': 'skipped', 'message': 'No folder assigned'}
-        
-        # Get students with access to the folder
-        students = document.folder.students.all()
-        
-        if not students:
-            logger.info(f"No students found for folder {document.folder.id}")
-            return {'status': 'skipped', 'message': 'No students in folder'}
-        
-        emails = [student.email for student in students if student.email]
-        
-        subject = f'Nuevo documento disponible: {document.name}'
-        context = {
-            'document': document,
-            'folder': document.folder,
-            'curso': document.folder.curso,
-        }
-        
-        message = render_to_string('course_documents/emails/new_document.txt', context)
-        html_message = render_to_string('course_documents/emails/new_document.html', context)
-        
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=emails,
-            html_message=html_message,
-            fail_silently=False,
-        )
-        
-        logger.info(f"Document notification sent to {len(emails)} students for document {document_id}")
-        return {
-            'status': 'success', 
-            'document_id': document_id,
-            'recipients_count': len(emails),
-        }
-        
     except CourseDocument.DoesNotExist:
         logger.error(f"Document with ID {document_id} not found")
         return {'status': 'error', 'message': 'Document not found'}
-    except Exception as exc:
-        logger.error(f"Failed to send document notification for document {document_id}: {exc}")
-        self.retry(exc=exc)
+
+    enviados, fallidos = NotificationService.send_new_document_emails(document, student_ids, intento)
+    reintento = programar_reintento(enviar_lote_nuevo_documento, document_id, fallidos, intento)
+    return {
+        'status': 'success' if not fallidos else 'partial',
+        'document_id': document_id,
+        'sent': len(enviados),
+        'failed': len(fallidos),
+        'retry_scheduled': reintento,
+    }
 
 
 @shared_task(bind=True, max_retries=2, default_retry_delay=120)
@@ -339,6 +359,7 @@ def generate_folder_usage_report(folder):
     """Generate usage report for a folder."""
     from django.db.models import Count, Sum, Avg
     from django.utils import timezone
+    from .indicator_service import generate_folder_indicators
     
     now = timezone.now()
     last_30_days = now - timezone.timedelta(days=30)
@@ -8,6 +8,29 @@ from .models import DocumentFolder, CourseDocument, NewContentNotification, Audi
 import tempfile
 import os
 import re
+import shutil
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+
+
+# Los archivos subidos en los tests van a un MEDIA_ROOT temporal, no al del repositorio
+_media_root = None
+_media_settings = None
+
+
+def setUpModule():
+    global _media_root, _media_settings
+    _media_root = tempfile.mkdtemp()
+    _media_settings = override_settings(MEDIA_ROOT=_media_root)
+    _media_settings.enable()
+
+
+def tearDownModule():
+    _media_settings.disable()
+    shutil.rmtree(_media_root, ignore_errors=True)
 
 
 class CourseDocumentsPropertyTests(HypothesisTestCase):
@@ -1643,16 +1666,15 @@ class CourseDocumentsModelTests(TestCase):
         ).count()
         
         # Mock email sending to avoid actual email delivery in tests
-        with patch('course_documents.services.EmailMultiAlternatives') as mock_email:
-            mock_email_instance = mock_email.return_value
-            mock_email_instance.send.return_value = True
-            
-            # Trigger notification
-            NotificationService.notify_new_document(document)
+        with patch('principal.notificaciones_service.EmailMultiAlternatives') as mock_email:
+            # Trigger notification (the batch task runs on commit)
+            with self.captureOnCommitCallbacks(execute=True):
+                NotificationService.notify_new_document(document)
             
-            # Verify email was created for each student
+            # Verify email was created for each student, all over one connection
             self.assertEqual(mock_email.call_count, num_students)
-            self.assertEqual(mock_email_instance.send.call_count, num_students)
+            connections = {id(c.kwargs['connection']) for c in mock_email.call_args_list}
+            self.assertEqual(len(connections), 1)
         
         # Verify audit logs were created for each student
         final_email_logs = AuditLog.objects.filter(
@@ -1765,8 +1787,8 @@ class CourseDocumentsModelTests(TestCase):
             email_instance.send.return_value = True
             return email_instance
         
-        with patch('course_documents.services.EmailMultiAlternatives', side_effect=capture_email):
-            with patch('course_documents.services.render_to_string') as mock_render:
+        with patch('principal.notificaciones_service.EmailMultiAlternatives', side_effect=capture_email):
+            with patch('principal.notificaciones_service.render_to_string') as mock_render:
                 # Mock template rendering to return content with required elements
                 def mock_render_func(template_name, context):
                     if 'new_document.txt' in template_name:
@@ -1781,8 +1803,9 @@ class CourseDocumentsModelTests(TestCase):
                 
                 mock_render.side_effect = mock_render_func
                 
-                # Trigger notification
-                NotificationService.notify_new_document(document)
+                # Trigger notification (the batch task runs on commit)
+                with self.captureOnCommitCallbacks(execute=True):
+                    NotificationService.notify_new_document(document)
         
         # Verify email was sent
         self.assertEqual(len(captured_emails), 1)
@@ -1849,9 +1872,10 @@ class CourseDocumentsModelTests(TestCase):
         )
         
         # Mock email sending
-        with patch('course_documents.services.EmailMultiAlternatives') as mock_email:
-            # Trigger notification
-            NotificationService.notify_new_document(document)
+        with patch('principal.notificaciones_service.EmailMultiAlternatives') as mock_email:
+            # Trigger notification (the batch task runs on commit)
+            with self.captureOnCommitCallbacks(execute=True):
+                NotificationService.notify_new_document(document)
             
             # Verify no emails were sent
             self.assertEqual(mock_email.call_count, 0)
@@ -1941,17 +1965,20 @@ class CourseDocumentsModelTests(TestCase):
         )
         
         # Mock email sending to simulate failure for invalid email
-        def mock_email_send(self):
-            if 'invalid-email' in self.to[0]:
+        from django.core import mail
+        backend = mail.get_connection()
+        send_messages = backend.send_messages
+
+        def mock_send_messages(messages):
+            if 'invalid-email' in messages[0].to[0]:
                 raise Exception("Invalid email address")
-            return True
+            return send_messages(messages)
         
-        with patch('course_documents.services.EmailMultiAlternatives') as mock_email_class:
-            mock_email_instance = mock_email_class.return_value
-            mock_email_instance.send.side_effect = mock_email_send
-            
+        with patch('principal.notificaciones_service.get_connection', return_value=backend), \
+                patch.object(backend, 'send_messages', side_effect=mock_send_messages):
             # Trigger notification (should handle errors gracefully)
-            NotificationService.notify_new_document(document)
+            with self.captureOnCommitCallbacks(execute=True):
+                NotificationService.notify_new_document(document)
         
         # Verify successful email log exists for valid student
         valid_email_log = AuditLog.objects.filter(
@@ -2050,14 +2077,12 @@ class CourseDocumentsModelTests(TestCase):
             has_new_content = ContentIndicatorService.has_new_content(course, student)
             self.assertTrue(has_new_content, f"Student {student.username} should have new content indicator after document upload")
         
-        # Verify indicator audit logs were created
-        for student in enrolled_students:
-            indicator_log_exists = AuditLog.objects.filter(
-                action='indicator_activated',
-                user=student,
-                curso=course
-            ).exists()
-            self.assertTrue(indicator_log_exists, f"Indicator activation log should exist for student {student.username}")
+        # Verify a single summary audit log was created for the activation
+        indicator_logs = AuditLog.objects.filter(
+            action='indicator_activated',
+            curso=course
+        )
+        self.assertEqual(indicator_logs.count(), 1, "Indicator activation should be logged once per course")
         
         # Verify indicator statistics
         stats = ContentIndicatorService.get_indicator_stats_for_course(course)
@@ -2312,7 +2337,8 @@ class CourseDocumentsModelTests(TestCase):
         )
         
         # Activate indicators
-        ContentIndicatorService.activate_indicators_for_course(course)
+        with self.captureOnCommitCallbacks(execute=True):
+            ContentIndicatorService.activate_indicators_for_course(course)
         
         # Verify indicator is active
         has_indicator_active = ContentIndicatorService.has_new_content(course, student)
@@ -2724,8 +2750,8 @@ class MissingPropertyTests(HypothesisTestCase):
             email_instance.send.return_value = True
             return email_instance
         
-        with patch('course_documents.services.EmailMultiAlternatives', side_effect=capture_email):
-            with patch('course_documents.services.render_to_string') as mock_render:
+        with patch('principal.notificaciones_service.EmailMultiAlternatives', side_effect=capture_email):
+            with patch('principal.notificaciones_service.render_to_string') as mock_render:
                 # Mock template rendering to return content with required elements
                 def mock_render_func(template_name, context):
                     if 'new_document.txt' in template_name:
@@ -2740,8 +2766,9 @@ class MissingPropertyTests(HypothesisTestCase):
                 
                 mock_render.side_effect = mock_render_func
                 
-                # Trigger notification
-                NotificationService.notify_new_document(document)
+                # Trigger notification (the batch task runs on commit)
+                with self.captureOnCommitCallbacks(execute=True):
+                    NotificationService.notify_new_document(document)
         
         # Verify email was sent
         self.assertEqual(len(captured_emails), 1)
@@ -2834,7 +2861,8 @@ class MissingPropertyTests(HypothesisTestCase):
         )
         
         # Trigger indicator activation
-        ContentIndicatorService.activate_indicators_for_course(course)
+        with self.captureOnCommitCallbacks(execute=True):
+            ContentIndicatorService.activate_indicators_for_course(course)
         
         # Property: All enrolled students should now have new content indicators
         for student in enrolled_students:
@@ -2992,3 +3020,189 @@ class MissingPropertyTests(HypothesisTestCase):
         for student in enrolled_students:
             has_new_content = ContentIndicatorService.has_new_content(course, student)
             self.assertFalse(has_new_content, f"Student {student.username} should not have indicator for course with empty folders")
+
+
+class DescargaDocumentoTests(TestCase):
+    """Descarga por streaming con Range, ETag y X-Accel-Redirect"""
+
+    CONTENIDO = bytes(range(256)) * 8
+
+    def setUp(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, True)
+        ajustes = override_settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        curso_academico = CursoAcademico.objects.create(nombre='2031-2032', activo=True)
+        profesor = User.objects.create_user(username='profesor_descarga', password='testpass123')
+        profesor.groups.add(Group.objects.get_or_create(name='Profesores')[0])
+        self.estudiante = User.objects.create_user(username='estudiante_descarga', password='testpass123')
+        self.curso = Curso.objects.create(name='Vídeo', teacher=profesor, curso_academico=curso_academico)
+        Matriculas.objects.create(
+            course=self.curso, student=self.estudiante, curso_academico=curso_academico, activo=True
+        )
+        folder = DocumentFolder.objects.create(curso=self.curso, name='Clases', created_by=profesor)
+        self.document = CourseDocument.objects.create(
+            folder=folder, name='Clase 1', uploaded_by=profesor,
+            file=SimpleUploadedFile('clase.pdf', self.CONTENIDO, content_type='application/pdf'),
+        )
+        self.url = reverse('course_documents:download_document', kwargs={
+            'curso_id': self.curso.id, 'document_id': self.document.id,
+        })
+        self.client.force_login(self.estudiante)
+
+    def _accesos(self):
+        return DocumentAccess.objects.filter(document=self.document, student=self.estudiante).count()
+
+    def test_descarga_completa_por_streaming(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENIDO)
+        self.assertEqual(response['Content-Length'], str(len(self.CONTENIDO)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertTrue(response['ETag'])
+        self.assertEqual(self._accesos(), 1)
+        self.assertTrue(AuditLog.objects.filter(action='document_downloaded', document=self.document).exists())
+
+    def test_rangos(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENIDO[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.CONTENIDO)}')
+        self.assertEqual(response['Content-Length'], '10')
+        # Un salto a mitad del archivo no cuenta como nueva descarga
+        self.assertEqual(self._accesos(), 0)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-6')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENIDO[-6:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.CONTENIDO)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.CONTENIDO)}')
+
+        # If-Range con otra versión: se envía el archivo completo
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"otra"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_respuesta_condicional(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self._accesos(), 1)
+
+    def test_x_accel_redirect(self):
+        with mock.patch('course_documents.download_service.COURSE_DOCUMENTS_X_ACCEL_REDIRECT_PREFIX', '/protected-media/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.document.file.name)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self._accesos(), 1)
+
+    def test_sin_matricula_no_descarga(self):
+        otro = User.objects.create_user(username='otro_descarga', password='testpass123')
+        self.client.force_login(otro)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self._accesos(), 0)
+
+
+class IndicadoresContenidoNuevoTests(TestCase):
+    """Activación por conjunto de indicadores y set de cursos por estudiante en caché"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.ca = CursoAcademico.objects.create(nombre='2033-2034', activo=True)
+        self.profesor = User.objects.create_user(username='profesor_indicadores')
+        self.curso = Curso.objects.create(name='Ruso', teacher=self.profesor, curso_academico=self.ca)
+        self.otro_curso = Curso.objects.create(name='Chino', teacher=self.profesor, curso_academico=self.ca)
+        self.alumnos = [User.objects.create_user(username=f'alumno_indicadores{i}') for i in range(3)]
+        for alumno in self.alumnos:
+            Matriculas.objects.create(course=self.curso, student=alumno, curso_academico=self.ca, activo=True)
+        Matriculas.objects.create(
+            course=self.otro_curso, student=self.alumnos[0], curso_academico=self.ca, activo=True
+        )
+
+    def test_activacion_por_conjunto_con_auditoria_resumen(self):
+        from .indicator_service import ContentIndicatorService
+        NewContentNotification.objects.create(curso=self.curso, student=self.alumnos[0], has_new_content=True)
+        NewContentNotification.objects.create(curso=self.curso, student=self.alumnos[1], has_new_content=False)
+
+        # Lectura de matrículas, lectura de activos y un único upsert (+ auditoría)
+        with self.assertNumQueries(6):
+            activados = ContentIndicatorService.activate_indicators_for_course(self.curso)
+
+        self.assertEqual(activados, 2)
+        self.assertEqual(
+            NewContentNotification.objects.filter(curso=self.curso, has_new_content=True).count(), 3
+        )
+        logs = AuditLog.objects.filter(action='indicator_activated', curso=self.curso)
+        self.assertEqual(logs.count(), 1)
+        self.assertIn('2 estudiantes', logs.get().details)
+
+        self.assertEqual(ContentIndicatorService.activate_indicators_for_course(self.curso), 0)
+
+    def test_set_en_cache_sin_consultas(self):
+        from .indicator_service import ContentIndicatorService
+        alumno = self.alumnos[0]
+        # Primer acceso: el set se construye desde la BD (una consulta)
+        with self.assertNumQueries(1):
+            self.assertFalse(ContentIndicatorService.has_new_content(self.curso, alumno))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ContentIndicatorService.activate_indicators_for_course(self.otro_curso)
+        # El set ya construido se actualiza al activar: las lecturas no consultan la BD
+        with self.assertNumQueries(0):
+            self.assertTrue(ContentIndicatorService.has_new_content(self.otro_curso, alumno))
+            self.assertFalse(ContentIndicatorService.has_new_content(self.curso, alumno))
+            self.assertEqual(
+                ContentIndicatorService.get_course_ids_with_new_content(alumno), {self.otro_curso.id}
+            )
+
+        self.assertTrue(ContentIndicatorService.deactivate_indicator_for_student(self.otro_curso, alumno))
+        with self.assertNumQueries(0):
+            self.assertFalse(ContentIndicatorService.has_new_content(self.otro_curso, alumno))
+            self.assertFalse(ContentIndicatorService.deactivate_indicator_for_student(self.otro_curso, alumno))
+
+    def test_set_no_cambia_si_la_transaccion_se_revierte(self):
+        from django.db import transaction
+        from .indicator_service import ContentIndicatorService
+        alumno = self.alumnos[0]
+        self.assertEqual(ContentIndicatorService.get_course_ids_with_new_content(alumno), set())
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    ContentIndicatorService.activate_indicators_for_course(self.otro_curso)
+                    raise RuntimeError('subida revertida')
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(ContentIndicatorService.get_course_ids_with_new_content(alumno), set())
+
+    def test_reset_y_baja_de_matricula(self):
+        from .indicator_service import ContentIndicatorService
+        ContentIndicatorService.activate_indicators_for_course(self.curso)
+        ContentIndicatorService.activate_indicators_for_course(self.otro_curso)
+
+        self.assertEqual(ContentIndicatorService.reset_all_indicators_for_course(self.curso), 3)
+        self.assertEqual(
+            ContentIndicatorService.get_course_ids_with_new_content(self.alumnos[0]), {self.otro_curso.id}
+        )
+        self.assertEqual(AuditLog.objects.filter(action='indicators_reset', curso=self.curso).count(), 1)
+
+        # Al dar de baja la matrícula el curso deja de contar para el estudiante
+        Matriculas.objects.filter(course=self.otro_curso, student=self.alumnos[0]).get().delete()
+        self.assertEqual(ContentIndicatorService.get_course_ids_with_new_content(self.alumnos[0]), set())
+
+        NewContentNotification.objects.filter(curso=self.curso).update(
+            last_checked=timezone.now() - timedelta(days=40)
+        )
+        self.assertEqual(ContentIndicatorService.cleanup_old_indicators(days_old=30), 3)
@@ -9,7 +9,6 @@ from django.utils import timezone
 from django.db import transaction, models as db_models
 from django.core.files.storage import default_storage
 from django.conf import settings
-import os
 import mimetypes
 
 from principal.models import Curso, Matriculas
@@ -18,6 +17,7 @@ from .permissions import TeacherPermissionMixin, StudentPermissionMixin
 from .forms import DocumentFolderForm, CourseDocumentForm
 from .services import NotificationService
 from .indicator_service import ContentIndicatorService
+from .download_service import ArchivoDescarga, es_descarga_inicial, rango_solicitado, respuesta_descarga
 
 
 class TeacherDashboardView(LoginRequiredMixin, TeacherPermissionMixin, DetailView):
@@ -190,8 +190,8 @@ class UploadDocumentView(LoginRequiredMixin, TeacherPermissionMixin, CreateView)
                     details=f'Documento "{self.object.name}" subido a carpeta "{folder.name}"'
                 )
                 
-                # Enviar notificaciones a estudiantes
-                NotificationService.notify_new_document(self.object)
+                # Las notificaciones a estudiantes las programa la señal
+                # post_save de CourseDocument (envío en segundo plano)
                 
                 # Actualizar indicadores de contenido nuevo
                 NotificationService.update_content_indicators(curso)
@@ -449,17 +449,24 @@ class DownloadDocumentView(LoginRequiredMixin, StudentPermissionMixin, View):
             if not content_type:
                 content_type = 'application/octet-stream'
 
-            # Leer el archivo
-            with default_storage.open(document.file.name, 'rb') as file:
-                file_content = file.read()
+            # El archivo se envía por bloques (o lo sirve nginx), sin leerlo
+            # en memoria; admite Range y respuestas condicionales.
+            archivo = ArchivoDescarga(document)
+            rango = rango_solicitado(request, archivo)
+            response = respuesta_descarga(request, document, content_type, archivo, rango)
 
             # Usar token de sesión para evitar registros duplicados por antivirus/extensiones.
-            # Solo la primera request en un intervalo de 5 segundos registra la descarga.
+            # Solo la primera request en un intervalo de 5 segundos registra la descarga,
+            # y no cuentan las revalidaciones (304) ni los saltos dentro de un vídeo (Range).
             import time
             session_key = f'dl_token_{request.user.id}_{document_id}'
             last_registered = request.session.get(session_key, 0)
             now = time.time()
-            should_register = (now - last_registered) > 5
+            should_register = (
+                response.status_code in (200, 206)
+                and es_descarga_inicial(rango)
+                and (now - last_registered) > 5
+            )
 
             if should_register:
                 request.session[session_key] = now
@@ -476,13 +483,6 @@ class DownloadDocumentView(LoginRequiredMixin, StudentPermissionMixin, View):
                     details=f'Documento "{document.name}" descargado por estudiante'
                 )
 
-            response = HttpResponse(file_content, content_type=content_type)
-            filename = os.path.basename(document.file.name)
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            response['Content-Length'] = document.file_size or len(file_content)
-            response['Cache-Control'] = 'no-store, no-cache, must-revalidate'
-            response['X-Robots-Tag'] = 'noindex'
-
             return response
                 
         except Exception as e:
@@ -4,7 +4,7 @@ from django.urls import reverse
 from .models import (
     CursoAcademicoArchivado, UsuarioArchivado, CursoArchivado,
     MatriculaArchivada, CalificacionArchivada, NotaIndividualArchivada,
-    AsistenciaArchivada, MigracionLog, DatoArchivadoDinamico,
+    AsistenciaArchivada, MigracionLog, MigracionTabla, DatoArchivadoDinamico, EstructuraTablaArchivada,
     ReglamentoCursoArchivado, ArticuloReglamentoArchivado,
 )
 
@@ -502,8 +502,23 @@ class AsistenciaArchivadaAdmin(admin.ModelAdmin):
 # MigracionLog  (pertenece a la migración MariaDB — solo lectura)
 # ─────────────────────────────────────────────────────────────────────────────
 
+class MigracionTablaInline(admin.TabularInline):
+    model = MigracionTabla
+    extra = 0
+    fields = (
+        'nombre_tabla', 'estado', 'registros_origen', 'registros_procesados',
+        'registros_nuevos', 'filas_por_segundo', 'fecha_inicio', 'fecha_fin', 'error',
+    )
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(MigracionLog)
 class MigracionLogAdmin(admin.ModelAdmin):
+    inlines = [MigracionTablaInline]
     list_display = [
         'id', 'usuario', 'estado', 'fecha_inicio', 'fecha_fin',
         'total_migrados', 'host_origen', 'base_datos_origen',
@@ -585,6 +600,16 @@ class DatoArchivadoDinamicoAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(EstructuraTablaArchivada)
+class EstructuraTablaArchivadaAdmin(admin.ModelAdmin):
+    list_display = ['tabla_origen', 'fecha_actualizacion']
+    search_fields = ['tabla_origen']
+    readonly_fields = ['tabla_origen', 'estructura', 'fecha_actualizacion']
+
+    def has_add_permission(self, request):
+        return False
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # ReglamentoCursoArchivado / ArticuloReglamentoArchivado
 # ─────────────────────────────────────────────────────────────────────────────
@@ -14,6 +14,17 @@ NO toca:
   - CursoAcademico         (solo cambia estado, no se elimina)
   - User / Registro        (los usuarios del sistema no se eliminan)
 
+Rendimiento:
+  - Las filas de origen y los usuarios ya archivados se precargan en pocas
+    consultas; los registros archivados se construyen en memoria y se insertan
+    con bulk_create en lotes de ARCHIVADO_BATCH_SIZE (setting, 2000 por defecto).
+    Los mapas id_original → id archivado resuelven las FK de los hijos.
+  - Las asistencias y notas se leen con .iterator() y se insertan por lotes
+    sin retenerlas en memoria.
+  - La limpieza de principal usa DELETE por conjunto en lugar de recorrer
+    cada solicitud, formulario o carpeta.
+  - Los contadores devueltos incluyen 'tiempos_ms' con la duración de cada fase.
+
 Manejo de errores:
   - Si el archivado falla, se lanza ArchivadoError con un mensaje descriptivo.
   - La transacción atómica garantiza que NINGÚN dato de gestión académica
@@ -23,11 +34,21 @@ Manejo de errores:
 """
 
 import logging
-from django.db import transaction
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# Filas por INSERT/consulta IN en las operaciones por lotes
+ARCHIVADO_BATCH_SIZE = getattr(settings, 'ARCHIVADO_BATCH_SIZE', 2000)
+
 
 class ArchivadoError(Exception):
     """
@@ -38,7 +59,258 @@ class ArchivadoError(Exception):
     pass
 
 
-def archivar_datos_curso_academico(curso_academico):
+# ── Utilidades de procesamiento por lotes ────────────────────────────────────
+
+def en_lotes(iterable, tamano=None):
+    """Divide un iterable en listas de como máximo `tamano` elementos."""
+    tamano = tamano or ARCHIVADO_BATCH_SIZE
+    iterador = iter(iterable)
+    while True:
+        lote = list(islice(iterador, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def crear_en_lotes(modelo, objetos, batch_size=None, necesita_ids=True):
+    """
+    Inserta `objetos` (lista o generador) con bulk_create por lotes y devuelve
+    cuántos se crearon. En PostgreSQL cada instancia recibe su pk, que se usa
+    para enlazar los registros hijos.
+
+    Si el backend no devuelve ids en inserciones masivas y los ids se
+    necesitan (necesita_ids=True), cada lote se guarda fila a fila.
+    """
+    base_datos = router.db_for_write(modelo)
+    devuelve_ids = connections[base_datos].features.can_return_rows_from_bulk_insert
+    total = 0
+    for lote in en_lotes(objetos, batch_size):
+        if devuelve_ids or not necesita_ids:
+            modelo.objects.using(base_datos).bulk_create(lote)
+        else:
+            for obj in lote:
+                obj.save(force_insert=True, using=base_datos)
+        total += len(lote)
+    return total
+
+
+def ids_existentes(modelo, ids, campo='id_original', batch_size=None):
+    """Subconjunto de `ids` que ya existe en `modelo.<campo>` (consultas IN por lotes)."""
+    existentes = set()
+    for lote in en_lotes(ids, batch_size):
+        existentes.update(
+            modelo.objects.filter(**{f'{campo}__in': lote}).values_list(campo, flat=True)
+        )
+    return existentes
+
+
+def mapa_por_id_original(modelo, ids, orden=('-pk',), batch_size=None):
+    """
+    {id_original: pk} del registro archivado preferido para cada id de `ids`
+    (el primero según `orden`), equivalente a filter(id_original=x).first().
+    """
+    mapa = {}
+    for lote in en_lotes(ids, batch_size):
+        filas = modelo.objects.filter(id_original__in=lote).order_by(*orden).values_list('id_original', 'pk')
+        for id_original, pk in filas:
+            mapa.setdefault(id_original, pk)
+    return mapa
+
+
+def borrar_sin_senales(queryset):
+    """
+    DELETE directo por conjunto, sin cargar las filas ni emitir pre/post_delete.
+
+    Sólo para modelos hoja cuyos padres se eliminan en la misma transacción:
+    p. ej. NotaIndividual, cuyo post_delete recalcularía el promedio de una
+    Calificación que se borra a continuación (una consulta extra por nota).
+    """
+    queryset = queryset.order_by()
+    return queryset._raw_delete(queryset.db)
+
+
+@contextmanager
+def medir_fase(tiempos, fase):
+    """Acumula en tiempos[fase] los milisegundos transcurridos dentro del bloque."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[fase] = tiempos.get(fase, 0) + round((time.perf_counter() - inicio) * 1000)
+
+
+# ── Construcción de registros archivados ─────────────────────────────────────
+
+def _nuevo_usuario_archivado(user, grupos):
+    from datos_archivados.models import UsuarioArchivado
+
+    perfil = getattr(user, 'registro', None)
+    return UsuarioArchivado(
+        id_original=user.pk,
+        username=user.username,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        email=user.email,
+        date_joined=user.date_joined,
+        is_active=user.is_active,
+        nacionalidad=getattr(perfil, 'nacionalidad', None) if perfil else None,
+        carnet=getattr(perfil, 'carnet', None) if perfil else None,
+        sexo=getattr(perfil, 'sexo', 'M') if perfil else 'M',
+        address=getattr(perfil, 'address', None) if perfil else None,
+        location=getattr(perfil, 'location', None) if perfil else None,
+        provincia=getattr(perfil, 'provincia', None) if perfil else None,
+        telephone=getattr(perfil, 'telephone', None) if perfil else None,
+        movil=getattr(perfil, 'movil', None) if perfil else None,
+        grado=getattr(perfil, 'grado', 'grado1') if perfil else 'grado1',
+        ocupacion=getattr(perfil, 'ocupacion', 'ocupacion1') if perfil else 'ocupacion1',
+        titulo=getattr(perfil, 'titulo', None) if perfil else None,
+        grupo=', '.join(grupos),
+        usuario_actual=user,
+    )
+
+
+def usuarios_archivados_para(user_ids, usuarios_map, contadores=None, batch_size=None):
+    """
+    Completa usuarios_map {user.pk: UsuarioArchivado.pk} para los `user_ids` dados.
+
+    Reutiliza el UsuarioArchivado existente de cada usuario (id_original y
+    usuario_actual iguales al usuario) y crea los que faltan con bulk_create,
+    leyendo perfiles y grupos en una consulta por lote.
+    """
+    from django.contrib.auth.models import User
+    from datos_archivados.models import UsuarioArchivado
+
+    pendientes = sorted({uid for uid in user_ids if uid is not None and uid not in usuarios_map})
+    if not pendientes:
+        return usuarios_map
+
+    for lote in en_lotes(pendientes, batch_size):
+        existentes = UsuarioArchivado.objects.filter(
+            id_original__in=lote, usuario_actual_id=F('id_original')
+        ).order_by('-date_joined', 'pk').values_list('id_original', 'pk')
+        for id_original, pk in existentes:
+            usuarios_map.setdefault(id_original, pk)
+
+        faltantes = [uid for uid in lote if uid not in usuarios_map]
+        if not faltantes:
+            continue
+
+        grupos = defaultdict(list)
+        for user_id, nombre in User.groups.through.objects.filter(
+            user_id__in=faltantes
+        ).order_by('pk').values_list('user_id', 'group__name'):
+            grupos[user_id].append(nombre)
+
+        nuevos = [
+            _nuevo_usuario_archivado(user, grupos[user.pk])
+            for user in User.objects.filter(pk__in=faltantes).select_related('registro')
+        ]
+        crear_en_lotes(UsuarioArchivado, nuevos, batch_size)
+        for ua in nuevos:
+            usuarios_map[ua.id_original] = ua.pk
+        if contadores is not None:
+            contadores['usuarios'] = contadores.get('usuarios', 0) + len(nuevos)
+
+    return usuarios_map
+
+
+def nuevo_curso_archivado(curso, curso_academico_archivado, status=None):
+    """CursoArchivado (sin guardar) con los datos de un principal.Curso."""
+    from datos_archivados.models import CursoArchivado
+
+    return CursoArchivado(
+        id_original=curso.pk,
+        name=curso.name,
+        description=curso.description,
+        area=curso.area,
+        tipo=curso.tipo,
+        teacher_id_original=curso.teacher.pk,
+        teacher_name=curso.teacher.get_full_name() or curso.teacher.username,
+        image=curso.image.name if curso.image else None,
+        class_quantity=curso.class_quantity,
+        status=status if status is not None else curso.get_dynamic_status(),
+        curso_academico=curso_academico_archivado,
+        enrollment_deadline=curso.enrollment_deadline,
+        start_date=curso.start_date,
+        teacher_actual=curso.teacher,
+    )
+
+
+def _completar_semestres_archivados(semestre_ids, semestres_map, batch_size=None):
+    """Añade a semestres_map los SemestreCursoArchivado ya existentes que falten."""
+    from datos_archivados.models import SemestreCursoArchivado
+
+    faltantes = {sid for sid in semestre_ids if sid is not None and sid not in semestres_map}
+    if faltantes:
+        existentes = mapa_por_id_original(
+            SemestreCursoArchivado, sorted(faltantes), orden=('numero_semestre', 'pk'), batch_size=batch_size
+        )
+        semestres_map.update(existentes)
+    return semestres_map
+
+
+def _limpiar_principal(curso_academico, cursos_ids, filtro_academico):
+    """
+    Elimina de principal los datos ya archivados de `cursos_ids`, hijos primero.
+
+    filtro_academico: si True, matrículas/calificaciones/notas se filtran por
+    curso_academico (archivado completo); si False, por los cursos.
+    """
+    from principal.models import (
+        Curso, SemestreCurso,
+        Matriculas, Calificaciones, NotaIndividual, Asistencia,
+        SolicitudInscripcion, RespuestaEstudiante,
+        FormularioAplicacion, PreguntaFormulario, OpcionRespuesta,
+    )
+    from course_documents.models import DocumentFolder as DocFolder
+
+    if filtro_academico:
+        notas = NotaIndividual.objects.filter(calificacion__curso_academico=curso_academico)
+        calificaciones = Calificaciones.objects.filter(curso_academico=curso_academico)
+        matriculas = Matriculas.objects.filter(curso_academico=curso_academico)
+        semestres = SemestreCurso.objects.filter(curso__curso_academico=curso_academico)
+    else:
+        notas = NotaIndividual.objects.filter(calificacion__course__pk__in=cursos_ids)
+        calificaciones = Calificaciones.objects.filter(course__pk__in=cursos_ids)
+        matriculas = Matriculas.objects.filter(course__pk__in=cursos_ids)
+        semestres = SemestreCurso.objects.filter(curso__pk__in=cursos_ids)
+
+    # Notas: sin señales, sus calificaciones se eliminan a continuación
+    borrar_sin_senales(notas)
+    calificaciones.delete()
+    Asistencia.objects.filter(course__pk__in=cursos_ids).delete()
+
+    # Respuestas de estudiantes y solicitudes de inscripción
+    RespuestaEstudiante.objects.filter(solicitud__curso__pk__in=cursos_ids).delete()
+    SolicitudInscripcion.objects.filter(curso__pk__in=cursos_ids).delete()
+
+    matriculas.delete()
+    semestres.delete()
+
+    # Opciones, preguntas y formularios de aplicación
+    OpcionRespuesta.objects.filter(pregunta__formulario__curso__pk__in=cursos_ids).delete()
+    PreguntaFormulario.objects.filter(formulario__curso__pk__in=cursos_ids).delete()
+    FormularioAplicacion.objects.filter(curso__pk__in=cursos_ids).delete()
+
+    # Cursos (al final, después de eliminar todos sus dependientes).
+    # IMPORTANTE: antes de eliminar los Curso, desvinculamos las carpetas
+    # de documentos para que no se eliminen en cascada. Las carpetas
+    # conservan su curso_academico y sus archivos físicos intactos.
+    # Primero: aseguramos que TODAS las carpetas de estos cursos tengan
+    # curso_academico asignado (cubre cursos finalizados sin CA en carpeta).
+    DocFolder.objects.filter(
+        curso__pk__in=cursos_ids,
+        curso_academico__isnull=True
+    ).update(curso_academico=curso_academico)
+    # Segundo: desvincular el curso de TODAS las carpetas de estos cursos
+    DocFolder.objects.filter(curso__pk__in=cursos_ids).update(curso=None)
+
+    Curso.objects.filter(curso_academico=curso_academico).delete()
+
+
+# ── Archivado de un CursoAcademico ───────────────────────────────────────────
+
+def archivar_datos_curso_academico(curso_academico, batch_size=None):
     """
     Archiva todos los datos asociados a un CursoAcademico en los modelos
     de datos_archivados y luego los elimina de principal.
@@ -46,10 +318,11 @@ def archivar_datos_curso_academico(curso_academico):
     Parámetros:
         curso_academico: instancia de principal.CursoAcademico ya marcada
                          como archivado=True.
+        batch_size: filas por lote de bulk_create (por defecto ARCHIVADO_BATCH_SIZE).
 
     Retorna:
-        dict con contadores de registros archivados/eliminados,
-        o None si ya estaba archivado previamente en datos_archivados.
+        dict con contadores de registros archivados/eliminados y 'tiempos_ms'
+        con la duración de cada fase.
 
     Lanza:
         ArchivadoError si el proceso falla. La transacción atómica garantiza
@@ -58,21 +331,20 @@ def archivar_datos_curso_academico(curso_academico):
     from datos_archivados.models import (
         CursoAcademicoArchivado,
         CursoArchivado,
-        UsuarioArchivado,
         MatriculaArchivada,
         CalificacionArchivada,
         NotaIndividualArchivada,
         AsistenciaArchivada,
         ReglamentoCursoArchivado,
         ArticuloReglamentoArchivado,
+        SemestreCursoArchivado,
     )
     from principal.models import (
         Curso, Matriculas, Asistencia, Calificaciones, NotaIndividual,
-        SolicitudInscripcion, RespuestaEstudiante,
-        FormularioAplicacion, PreguntaFormulario, OpcionRespuesta,
-        ReglamentoCurso, ArticuloReglamento,
+        ReglamentoCurso, ArticuloReglamento, SemestreCurso,
     )
 
+    batch_size = batch_size or ARCHIVADO_BATCH_SIZE
     contadores = {
         'cursos': 0,
         'usuarios': 0,
@@ -97,314 +369,294 @@ def archivar_datos_curso_academico(curso_academico):
             f"ya existe en datos_archivados. Se procesarán solo los SemestreCurso pendientes."
         )
         # Delegar al helper que archiva solo los semestres y cursos pendientes
-        return _archivar_semestres_pendientes(curso_academico, contadores)
+        return _archivar_semestres_pendientes(curso_academico, contadores, batch_size)
 
+    tiempos = {}
     try:
         with transaction.atomic():
 
-            # ── 1. Crear CursoAcademicoArchivado ─────────────────────────────
-            curso_academico_archivado = CursoAcademicoArchivado.objects.create(
-                id_original=curso_academico.pk,
-                nombre=curso_academico.nombre,
-                activo=False,
-                archivado=True,
-                fecha_creacion=curso_academico.fecha_creacion,
-            )
-            logger.info(f"CursoAcademicoArchivado creado: {curso_academico_archivado}")
-
-            # ── 2. Archivar Cursos ────────────────────────────────────────────
-            cursos_qs = Curso.objects.filter(
-                curso_academico=curso_academico
-            ).select_related('teacher')
-
-            # Mapa user.pk → UsuarioArchivado para evitar duplicados en esta sesión
-            usuarios_archivados_map = {}
-
-            def obtener_o_crear_usuario_archivado(user):
-                """Devuelve el UsuarioArchivado para un User, creándolo si no existe."""
-                if user.pk in usuarios_archivados_map:
-                    return usuarios_archivados_map[user.pk]
-
-                existente = UsuarioArchivado.objects.filter(
-                    id_original=user.pk,
-                    usuario_actual=user
-                ).first()
-                if existente:
-                    usuarios_archivados_map[user.pk] = existente
-                    return existente
-
-                perfil = getattr(user, 'registro', None)
-
-                ua = UsuarioArchivado.objects.create(
-                    id_original=user.pk,
-                    username=user.username,
-                    first_name=user.first_name,
-                    last_name=user.last_name,
-                    email=user.email,
-                    date_joined=user.date_joined,
-                    is_active=user.is_active,
-                    nacionalidad=getattr(perfil, 'nacionalidad', None) if perfil else None,
-                    carnet=getattr(perfil, 'carnet', None) if perfil else None,
-                    sexo=getattr(perfil, 'sexo', 'M') if perfil else 'M',
-                    address=getattr(perfil, 'address', None) if perfil else None,
-                    location=getattr(perfil, 'location', None) if perfil else None,
-                    provincia=getattr(perfil, 'provincia', None) if perfil else None,
-                    telephone=getattr(perfil, 'telephone', None) if perfil else None,
-                    movil=getattr(perfil, 'movil', None) if perfil else None,
-                    grado=getattr(perfil, 'grado', 'grado1') if perfil else 'grado1',
-                    ocupacion=getattr(perfil, 'ocupacion', 'ocupacion1') if perfil else 'ocupacion1',
-                    titulo=getattr(perfil, 'titulo', None) if perfil else None,
-                    grupo=', '.join(user.groups.values_list('name', flat=True)),
-                    usuario_actual=user,
-                )
-                contadores['usuarios'] += 1
-                usuarios_archivados_map[user.pk] = ua
-                return ua
-
-            # Mapa curso.pk → CursoArchivado
-            cursos_archivados_map = {}
-
-            for curso in cursos_qs:
-                obtener_o_crear_usuario_archivado(curso.teacher)  # archivar profesor
-
-                ca = CursoArchivado.objects.create(
-                    id_original=curso.pk,
-                    name=curso.name,
-                    description=curso.description,
-                    area=curso.area,
-                    tipo=curso.tipo,
-                    teacher_id_original=curso.teacher.pk,
-                    teacher_name=curso.teacher.get_full_name() or curso.teacher.username,
-                    image=curso.image.name if curso.image else None,
-                    class_quantity=curso.class_quantity,
-                    status=curso.get_dynamic_status(),
-                    curso_academico=curso_academico_archivado,
-                    enrollment_deadline=curso.enrollment_deadline,
-                    start_date=curso.start_date,
-                    teacher_actual=curso.teacher,
-                )
-                cursos_archivados_map[curso.pk] = ca
-                contadores['cursos'] += 1
-
-            # ── 3. Archivar Reglamentos de Cursos ────────────────────────────
-            for curso_pk, curso_archivado in cursos_archivados_map.items():
-                try:
-                    reglamento = ReglamentoCurso.objects.get(curso__pk=curso_pk)
-                except ReglamentoCurso.DoesNotExist:
-                    continue  # el curso no tiene reglamento, se omite
-
-                reglamento_archivado = ReglamentoCursoArchivado.objects.create(
-                    id_original=reglamento.pk,
-                    curso=curso_archivado,
-                    introduccion=reglamento.introduccion,
-                    fecha_creacion=reglamento.fecha_creacion,
-                )
-                contadores['reglamentos'] += 1
-
-                for articulo in reglamento.articulos.all().order_by('orden'):
-                    ArticuloReglamentoArchivado.objects.create(
-                        id_original=articulo.pk,
-                        reglamento=reglamento_archivado,
-                        titulo=articulo.titulo,
-                        cuerpo=articulo.cuerpo,
-                        orden=articulo.orden,
-                        fecha_creacion=articulo.fecha_creacion,
-                    )
-                    contadores['articulos_reglamento'] += 1
+            # ── 1. Crear CursoAcademicoArchivado y archivar Cursos ────────────
+            with medir_fase(tiempos, 'cursos'):
+                curso_academico_archivado = CursoAcademicoArchivado.objects.create(
+                    id_original=curso_academico.pk,
+                    nombre=curso_academico.nombre,
+                    activo=False,
+                    archivado=True,
+                    fecha_creacion=curso_academico.fecha_creacion,
+                )
+                logger.info(f"CursoAcademicoArchivado creado: {curso_academico_archivado}")
+
+                cursos = list(
+                    Curso.objects.filter(curso_academico=curso_academico).select_related('teacher')
+                )
 
-            # ── 3b. Archivar SemestreCurso ───────────────────────────────────
-            from principal.models import SemestreCurso
-            from datos_archivados.models import SemestreCursoArchivado
+                # Mapa user.pk → UsuarioArchivado.pk para evitar duplicados en esta sesión
+                usuarios_map = {}
+                usuarios_archivados_para(
+                    [c.teacher_id for c in cursos], usuarios_map, contadores, batch_size
+                )
 
-            # Fecha de cierre de facto para semestres que estaban abiertos al archivar
-            fecha_archivado = timezone.now().date()
+                # Mapa curso.pk → CursoArchivado.pk
+                cursos_archivados_map = {}
+                nuevos_cursos = [nuevo_curso_archivado(c, curso_academico_archivado) for c in cursos]
+                contadores['cursos'] += crear_en_lotes(CursoArchivado, nuevos_cursos, batch_size)
+                for curso, curso_archivado in zip(cursos, nuevos_cursos):
+                    cursos_archivados_map[curso.pk] = curso_archivado.pk
+
+            # ── 2. Archivar Reglamentos de Cursos ────────────────────────────
+            with medir_fase(tiempos, 'reglamentos'):
+                reglamentos = list(
+                    ReglamentoCurso.objects.filter(curso__pk__in=list(cursos_archivados_map))
+                )
+                reglamentos_archivados = [
+                    ReglamentoCursoArchivado(
+                        id_original=reglamento.pk,
+                        curso_id=cursos_archivados_map[reglamento.curso_id],
+                        introduccion=reglamento.introduccion,
+                        fecha_creacion=reglamento.fecha_creacion,
+                    )
+                    for reglamento in reglamentos
+                ]
+                contadores['reglamentos'] += crear_en_lotes(
+                    ReglamentoCursoArchivado, reglamentos_archivados, batch_size
+                )
+                reglamentos_map = {
+                    r.pk: ra.pk for r, ra in zip(reglamentos, reglamentos_archivados)
+                }
+                articulos = ArticuloReglamento.objects.filter(
+                    reglamento_id__in=list(reglamentos_map)
+                ).order_by('reglamento_id', 'orden')
+                contadores['articulos_reglamento'] += crear_en_lotes(
+                    ArticuloReglamentoArchivado,
+                    (
+                        ArticuloReglamentoArchivado(
+                            id_original=articulo.pk,
+                            reglamento_id=reglamentos_map[articulo.reglamento_id],
+                            titulo=articulo.titulo,
+                            cuerpo=articulo.cuerpo,
+                            orden=articulo.orden,
+                            fecha_creacion=articulo.fecha_creacion,
+                        )
+                        for articulo in articulos.iterator(chunk_size=batch_size)
+                    ),
+                    batch_size,
+                    necesita_ids=False,
+                )
 
-            # Mapa semestre.pk → SemestreCursoArchivado (para vincular matrículas/calificaciones/asistencias)
-            semestres_archivados_map = {}
+            # ── 3. Archivar SemestreCurso ─────────────────────────────────────
+            with medir_fase(tiempos, 'semestres'):
+                # Fecha de cierre de facto para semestres que estaban abiertos al archivar
+                fecha_archivado = timezone.now().date()
 
-            for curso_pk, curso_archivado in cursos_archivados_map.items():
-                semestres = SemestreCurso.objects.filter(curso__pk=curso_pk).order_by('numero_semestre', '-activo', '-pk')
-                numeros_vistos = set()
+                semestres = list(
+                    SemestreCurso.objects.filter(
+                        curso__pk__in=list(cursos_archivados_map)
+                    ).order_by('curso_id', 'numero_semestre', '-activo', '-pk')
+                )
+                # Mapa semestre.pk → SemestreCursoArchivado.pk (para vincular matrículas/calificaciones/asistencias)
+                semestres_archivados_map = mapa_por_id_original(
+                    SemestreCursoArchivado, [s.pk for s in semestres],
+                    orden=('numero_semestre', 'pk'), batch_size=batch_size,
+                )
+                numeros_vistos = defaultdict(set)
+                nuevos_semestres = []
                 for semestre in semestres:
                     # Evitar duplicados por id_original
-                    existente_arch = SemestreCursoArchivado.objects.filter(id_original=semestre.pk).first()
-                    if existente_arch:
+                    if semestre.pk in semestres_archivados_map:
                         logger.info(f"SemestreCurso id={semestre.pk} ya archivado. Se reutiliza.")
-                        semestres_archivados_map[semestre.pk] = existente_arch
-                        numeros_vistos.add(semestre.numero_semestre)
+                        numeros_vistos[semestre.curso_id].add(semestre.numero_semestre)
                         continue
                     # Evitar duplicados por (curso_archivado, numero_semestre)
-                    if semestre.numero_semestre in numeros_vistos:
+                    if semestre.numero_semestre in numeros_vistos[semestre.curso_id]:
                         logger.info(
                             f"SemestreCurso semestre={semestre.numero_semestre} del curso "
-                            f"'{curso_archivado.name}' ya procesado. Se omite duplicado id={semestre.pk}."
+                            f"id={semestre.curso_id} ya procesado. Se omite duplicado id={semestre.pk}."
                         )
                         continue
-                    numeros_vistos.add(semestre.numero_semestre)
+                    numeros_vistos[semestre.curso_id].add(semestre.numero_semestre)
                     # Si el semestre estaba abierto al momento del archivado, cerrarlo ahora
                     fecha_cierre = semestre.fecha_cierre or (fecha_archivado if semestre.activo else None)
-                    sa = SemestreCursoArchivado.objects.create(
+                    nuevos_semestres.append(SemestreCursoArchivado(
                         id_original=semestre.pk,
-                        curso_archivado=curso_archivado,
+                        curso_archivado_id=cursos_archivados_map[semestre.curso_id],
                         numero_semestre=semestre.numero_semestre,
                         activo=False,  # al archivar el CA todos los semestres quedan cerrados
                         curso_academico_archivado=curso_academico_archivado,
                         fecha_inicio=semestre.fecha_inicio,
                         fecha_cierre=fecha_cierre,
                         fecha_creacion=semestre.fecha_creacion,
-                    )
-                    semestres_archivados_map[semestre.pk] = sa
+                    ))
+                crear_en_lotes(SemestreCursoArchivado, nuevos_semestres, batch_size)
+                for semestre_archivado in nuevos_semestres:
+                    semestres_archivados_map[semestre_archivado.id_original] = semestre_archivado.pk
 
             # ── 4. Archivar Matrículas ────────────────────────────────────────
-            matriculas_qs = Matriculas.objects.filter(
-                curso_academico=curso_academico
-            ).select_related('student', 'course', 'semestre')
-
-            matriculas_archivadas_map = {}
-
-            for matricula in matriculas_qs:
-                curso_archivado = cursos_archivados_map.get(matricula.course.pk)
-                if not curso_archivado:
-                    existente = CursoArchivado.objects.filter(id_original=matricula.course.pk).first()
-                    if not existente:
-                        obtener_o_crear_usuario_archivado(matricula.course.teacher)
-                        existente = CursoArchivado.objects.create(
-                            id_original=matricula.course.pk,
-                            name=matricula.course.name,
-                            description=matricula.course.description,
-                            area=matricula.course.area,
-                            tipo=matricula.course.tipo,
-                            teacher_id_original=matricula.course.teacher.pk,
-                            teacher_name=matricula.course.teacher.get_full_name() or matricula.course.teacher.username,
-                            image=matricula.course.image.name if matricula.course.image else None,
-                            class_quantity=matricula.course.class_quantity,
-                            status=matricula.course.get_dynamic_status(),
-                            curso_academico=curso_academico_archivado,
-                            enrollment_deadline=matricula.course.enrollment_deadline,
-                            start_date=matricula.course.start_date,
-                            teacher_actual=matricula.course.teacher,
-                        )
-                        contadores['cursos'] += 1
-                    cursos_archivados_map[matricula.course.pk] = existente
-                    curso_archivado = existente
-
-                estudiante_archivado = obtener_o_crear_usuario_archivado(matricula.student)
+            with medir_fase(tiempos, 'matriculas'):
+                matriculas = list(
+                    Matriculas.objects.filter(curso_academico=curso_academico).values_list(
+                        'pk', 'course_id', 'student_id', 'semestre_id',
+                        'activo', 'fecha_matricula', 'estado',
+                    )
+                )
 
-                # Resolver semestre archivado
-                semestre_arch = None
-                if matricula.semestre_id:
-                    semestre_arch = semestres_archivados_map.get(matricula.semestre_id)
+                # Matrículas de este CA en cursos de otro CA: reutilizar su
+                # CursoArchivado o crearlo (archivando también al profesor).
+                cursos_faltantes = {m[1] for m in matriculas} - set(cursos_archivados_map)
+                if cursos_faltantes:
+                    cursos_archivados_map.update(mapa_por_id_original(
+                        CursoArchivado, sorted(cursos_faltantes), batch_size=batch_size
+                    ))
+                    otros_cursos = list(
+                        Curso.objects.filter(
+                            pk__in=cursos_faltantes - set(cursos_archivados_map)
+                        ).select_related('teacher')
+                    )
+                    usuarios_archivados_para(
+                        [c.teacher_id for c in otros_cursos], usuarios_map, contadores, batch_size
+                    )
+                    nuevos_cursos = [nuevo_curso_archivado(c, curso_academico_archivado) for c in otros_cursos]
+                    contadores['cursos'] += crear_en_lotes(CursoArchivado, nuevos_cursos, batch_size)
+                    for curso, curso_archivado in zip(otros_cursos, nuevos_cursos):
+                        cursos_archivados_map[curso.pk] = curso_archivado.pk
+
+                usuarios_archivados_para([m[2] for m in matriculas], usuarios_map, contadores, batch_size)
+
+                matriculas_archivadas = [
+                    MatriculaArchivada(
+                        id_original=pk,
+                        course_id=cursos_archivados_map[course_id],
+                        student_id=usuarios_map[student_id],
+                        semestre_archivado_id=semestres_archivados_map.get(semestre_id) if semestre_id else None,
+                        activo=activo,
+                        fecha_matricula=fecha_matricula,
+                        estado=estado,
+                    )
+                    for pk, course_id, student_id, semestre_id, activo, fecha_matricula, estado in matriculas
+                ]
+                contadores['matriculas'] += crear_en_lotes(MatriculaArchivada, matriculas_archivadas, batch_size)
+                # Mapa matricula.pk → MatriculaArchivada.pk
+                matriculas_archivadas_map = {ma.id_original: ma.pk for ma in matriculas_archivadas}
+                del matriculas, matriculas_archivadas
 
-                ma = MatriculaArchivada.objects.create(
-                    id_original=matricula.pk,
-                    course=curso_archivado,
-                    student=estudiante_archivado,
-                    semestre_archivado=semestre_arch,
-                    activo=matricula.activo,
-                    fecha_matricula=matricula.fecha_matricula,
-                    estado=matricula.estado,
+            # ── 5. Archivar Calificaciones y Notas Individuales ───────────────
+            with medir_fase(tiempos, 'calificaciones'):
+                calificaciones = list(
+                    Calificaciones.objects.filter(curso_academico=curso_academico).values_list(
+                        'pk', 'course_id', 'student_id', 'matricula_id', 'semestre_id',
+                        'average', 'course__start_date',
+                    )
                 )
-                matriculas_archivadas_map[matricula.pk] = ma
-                contadores['matriculas'] += 1
 
-            # ── 5. Archivar Calificaciones y Notas Individuales ───────────────
-            calificaciones_qs = Calificaciones.objects.filter(
-                curso_academico=curso_academico
-            ).select_related('student', 'course', 'matricula', 'semestre').prefetch_related('notas')
-
-            for calificacion in calificaciones_qs:
-                curso_archivado = cursos_archivados_map.get(calificacion.course.pk)
-                if not curso_archivado:
-                    curso_archivado = CursoArchivado.objects.filter(id_original=calificacion.course.pk).first()
-                    if not curso_archivado:
+                cursos_faltantes = {c[1] for c in calificaciones} - set(cursos_archivados_map)
+                if cursos_faltantes:
+                    cursos_archivados_map.update(mapa_por_id_original(
+                        CursoArchivado, sorted(cursos_faltantes), batch_size=batch_size
+                    ))
+                usuarios_archivados_para([c[2] for c in calificaciones], usuarios_map, contadores, batch_size)
+
+                matriculas_faltantes = {
+                    c[3] for c in calificaciones
+                    if c[3] is not None and c[3] not in matriculas_archivadas_map
+                }
+                if matriculas_faltantes:
+                    matriculas_archivadas_map.update(mapa_por_id_original(
+                        MatriculaArchivada, sorted(matriculas_faltantes), orden=('pk',), batch_size=batch_size
+                    ))
+
+                hoy = timezone.now().date()
+                validas = []
+                matriculas_provisionales = []
+                for pk, course_id, student_id, matricula_id, semestre_id, average, start_date in calificaciones:
+                    if course_id not in cursos_archivados_map:
                         logger.warning(
                             f"No se encontró CursoArchivado para course.pk="
-                            f"{calificacion.course.pk}. Se omite esta calificación."
+                            f"{course_id}. Se omite esta calificación."
                         )
                         continue
-
-                estudiante_archivado = obtener_o_crear_usuario_archivado(calificacion.student)
-
-                # Buscar la matrícula archivada correspondiente
-                matricula_archivada = None
-                if calificacion.matricula:
-                    matricula_archivada = matriculas_archivadas_map.get(calificacion.matricula.pk)
-                    if not matricula_archivada:
-                        matricula_archivada = MatriculaArchivada.objects.filter(
-                            id_original=calificacion.matricula.pk
-                        ).first()
-
-                if not matricula_archivada:
-                    matricula_archivada = MatriculaArchivada.objects.create(
-                        id_original=calificacion.pk * -1,
-                        course=curso_archivado,
-                        student=estudiante_archivado,
-                        activo=True,
-                        fecha_matricula=calificacion.course.start_date or timezone.now().date(),
-                        estado='P',
-                    )
-                    contadores['matriculas'] += 1
-
-                # Resolver semestre archivado
-                semestre_arch = None
-                if calificacion.semestre_id:
-                    semestre_arch = semestres_archivados_map.get(calificacion.semestre_id)
-
-                calificacion_archivada = CalificacionArchivada.objects.create(
-                    id_original=calificacion.pk,
-                    matricula=matricula_archivada,
-                    course=curso_archivado,
-                    student=estudiante_archivado,
-                    semestre_archivado=semestre_arch,
-                    average=calificacion.average,
-                )
-                contadores['calificaciones'] += 1
-
-                for nota in calificacion.notas.all():
-                    NotaIndividualArchivada.objects.create(
-                        id_original=nota.pk,
-                        calificacion=calificacion_archivada,
-                        valor=nota.valor if nota.valor is not None else 0,
-                        fecha_creacion=nota.fecha_creacion,
+                    validas.append((pk, course_id, student_id, matricula_id, semestre_id, average))
+                    if matricula_id not in matriculas_archivadas_map:
+                        matriculas_provisionales.append(MatriculaArchivada(
+                            id_original=pk * -1,
+                            course_id=cursos_archivados_map[course_id],
+                            student_id=usuarios_map[student_id],
+                            activo=True,
+                            fecha_matricula=start_date or hoy,
+                            estado='P',
+                        ))
+                contadores['matriculas'] += crear_en_lotes(
+                    MatriculaArchivada, matriculas_provisionales, batch_size
+                )
+                provisionales_map = {ma.id_original * -1: ma.pk for ma in matriculas_provisionales}
+
+                calificaciones_archivadas = [
+                    CalificacionArchivada(
+                        id_original=pk,
+                        matricula_id=matriculas_archivadas_map.get(matricula_id) or provisionales_map[pk],
+                        course_id=cursos_archivados_map[course_id],
+                        student_id=usuarios_map[student_id],
+                        semestre_archivado_id=semestres_archivados_map.get(semestre_id) if semestre_id else None,
+                        average=average,
                     )
-                    contadores['notas'] += 1
+                    for pk, course_id, student_id, matricula_id, semestre_id, average in validas
+                ]
+                contadores['calificaciones'] += crear_en_lotes(
+                    CalificacionArchivada, calificaciones_archivadas, batch_size
+                )
+                calificaciones_map = {ca.id_original: ca.pk for ca in calificaciones_archivadas}
+                del calificaciones, validas, calificaciones_archivadas
+
+                notas = NotaIndividual.objects.filter(
+                    calificacion__curso_academico=curso_academico
+                ).values_list('pk', 'calificacion_id', 'valor', 'fecha_creacion')
+                contadores['notas'] += crear_en_lotes(
+                    NotaIndividualArchivada,
+                    (
+                        NotaIndividualArchivada(
+                            id_original=pk,
+                            calificacion_id=calificaciones_map[calificacion_id],
+                            valor=valor if valor is not None else 0,
+                            fecha_creacion=fecha_creacion,
+                        )
+                        for pk, calificacion_id, valor, fecha_creacion in notas.iterator(chunk_size=batch_size)
+                        if calificacion_id in calificaciones_map
+                    ),
+                    batch_size,
+                    necesita_ids=False,
+                )
 
             # ── 6. Archivar Asistencias ───────────────────────────────────────
-            cursos_ids = list(cursos_archivados_map.keys())
-
-            # Incluir cursos del CA sin matrículas (finalizados, etc.)
-            todos_cursos_del_ca = list(
-                Curso.objects.filter(curso_academico=curso_academico).values_list('pk', flat=True)
-            )
-            for cid in todos_cursos_del_ca:
-                if cid not in cursos_ids:
-                    cursos_ids.append(cid)
-
-            asistencias_qs = Asistencia.objects.filter(
-                course__pk__in=cursos_ids
-            ).select_related('student', 'course', 'semestre')
-
-            for asistencia in asistencias_qs:
-                curso_archivado = cursos_archivados_map.get(asistencia.course.pk)
-                if not curso_archivado:
-                    continue
-
-                estudiante_archivado = obtener_o_crear_usuario_archivado(asistencia.student)
-
-                # Resolver semestre archivado
-                semestre_arch = None
-                if asistencia.semestre_id:
-                    semestre_arch = semestres_archivados_map.get(asistencia.semestre_id)
-
-                AsistenciaArchivada.objects.create(
-                    id_original=asistencia.pk,
-                    course=curso_archivado,
-                    student=estudiante_archivado,
-                    semestre_archivado=semestre_arch,
-                    presente=asistencia.presente,
-                    date=asistencia.date,
+            with medir_fase(tiempos, 'asistencias'):
+                cursos_ids = list(cursos_archivados_map.keys())
+
+                # Incluir cursos del CA sin matrículas (finalizados, etc.)
+                for cid in Curso.objects.filter(curso_academico=curso_academico).values_list('pk', flat=True):
+                    if cid not in cursos_archivados_map:
+                        cursos_ids.append(cid)
+
+                asistencias = Asistencia.objects.filter(course__pk__in=cursos_ids)
+                usuarios_archivados_para(
+                    asistencias.values_list('student_id', flat=True).distinct(),
+                    usuarios_map, contadores, batch_size,
+                )
+                contadores['asistencias'] += crear_en_lotes(
+                    AsistenciaArchivada,
+                    (
+                        AsistenciaArchivada(
+                            id_original=pk,
+                            course_id=cursos_archivados_map[course_id],
+                            student_id=usuarios_map[student_id],
+                            semestre_archivado_id=semestres_archivados_map.get(semestre_id) if semestre_id else None,
+                            presente=presente,
+                            date=fecha,
+                        )
+                        for pk, course_id, student_id, semestre_id, presente, fecha in asistencias.values_list(
+                            'pk', 'course_id', 'student_id', 'semestre_id', 'presente', 'date'
+                        ).iterator(chunk_size=batch_size)
+                        if course_id in cursos_archivados_map
+                    ),
+                    batch_size,
+                    necesita_ids=False,
                 )
-                contadores['asistencias'] += 1
 
             logger.info(
                 f"Archivado completado para '{curso_academico.nombre}': "
@@ -418,78 +670,13 @@ def archivar_datos_curso_academico(curso_academico):
             )
 
             # ── 7. Limpiar datos de principal (dentro de la misma transacción) ─
-            # El orden importa: primero los hijos, luego los padres.
             # Esta fase SOLO se ejecuta si todo el archivado anterior fue exitoso.
-
-            # 7a. Notas individuales
-            NotaIndividual.objects.filter(
-                calificacion__curso_academico=curso_academico
-            ).delete()
-
-            # 7b. Calificaciones
-            Calificaciones.objects.filter(
-                curso_academico=curso_academico
-            ).delete()
-
-            # 7c. Asistencias
-            Asistencia.objects.filter(
-                course__pk__in=cursos_ids
-            ).delete()
-
-            # 7d. Respuestas de estudiantes y solicitudes de inscripción
-            solicitudes_qs = SolicitudInscripcion.objects.filter(
-                curso__pk__in=cursos_ids
-            )
-            for solicitud in solicitudes_qs:
-                RespuestaEstudiante.objects.filter(solicitud=solicitud).delete()
-            solicitudes_qs.delete()
-
-            # 7e. Matrículas
-            Matriculas.objects.filter(
-                curso_academico=curso_academico
-            ).delete()
-
-            # 7e-bis. SemestreCurso
-            SemestreCurso.objects.filter(curso__curso_academico=curso_academico).delete()
-
-            # 7f. Opciones, preguntas y formularios de aplicación
-            formularios_qs = FormularioAplicacion.objects.filter(
-                curso__pk__in=cursos_ids
-            )
-            for formulario in formularios_qs:
-                for pregunta in formulario.preguntas.all():
-                    OpcionRespuesta.objects.filter(pregunta=pregunta).delete()
-                PreguntaFormulario.objects.filter(formulario=formulario).delete()
-            formularios_qs.delete()
-
-            # ── 7g. Cursos (al final, después de eliminar todos sus dependientes)
-            # IMPORTANTE: antes de eliminar los Curso, desvinculamos las carpetas
-            # de documentos para que no se eliminen en cascada. Las carpetas
-            # conservan su curso_academico y sus archivos físicos intactos.
-            from course_documents.models import DocumentFolder as DocFolder
-
-            # Primero: aseguramos que TODAS las carpetas de estos cursos tengan
-            # curso_academico asignado (cubre cursos finalizados sin CA en carpeta)
-            carpetas_sin_ca = DocFolder.objects.filter(
-                curso__pk__in=cursos_ids,
-                curso_academico__isnull=True
-            )
-            for carpeta in carpetas_sin_ca:
-                carpeta.curso_academico = curso_academico
-                carpeta.save(update_fields=['curso_academico'])
-
-            # Segundo: desvincular el curso de TODAS las carpetas de estos cursos
-            # (usando cursos_ids que incluye todos los cursos del CA, incluso finalizados)
-            DocFolder.objects.filter(
-                curso__pk__in=cursos_ids
-            ).update(curso=None)
-
-            Curso.objects.filter(
-                curso_academico=curso_academico
-            ).delete()
+            with medir_fase(tiempos, 'limpieza'):
+                _limpiar_principal(curso_academico, cursos_ids, filtro_academico=True)
 
             logger.info(
-                f"Limpieza de principal completada para '{curso_academico.nombre}'."
+                f"Limpieza de principal completada para '{curso_academico.nombre}'. "
+                f"Tiempos (ms): {tiempos}"
             )
 
     except Exception as exc:
@@ -509,10 +696,11 @@ def archivar_datos_curso_academico(curso_academico):
             f"Causa: {exc}"
         ) from exc
 
+    contadores['tiempos_ms'] = tiempos
     return contadores
 
 
-def _archivar_semestres_pendientes(curso_academico, contadores):
+def _archivar_semestres_pendientes(curso_academico, contadores, batch_size=None):
     """
     Se llama cuando el CursoAcademicoArchivado ya existe (creado previamente
     por terminar_semestre). Archiva los SemestreCurso que aún no tienen
@@ -527,7 +715,6 @@ def _archivar_semestres_pendientes(curso_academico, contadores):
         CursoAcademicoArchivado,
         CursoArchivado,
         SemestreCursoArchivado,
-        UsuarioArchivado,
         MatriculaArchivada,
         CalificacionArchivada,
         NotaIndividualArchivada,
@@ -536,10 +723,9 @@ def _archivar_semestres_pendientes(curso_academico, contadores):
     from principal.models import (
         Curso, SemestreCurso,
         Matriculas, Calificaciones, NotaIndividual, Asistencia,
-        SolicitudInscripcion, RespuestaEstudiante,
-        FormularioAplicacion, PreguntaFormulario, OpcionRespuesta,
     )
 
+    batch_size = batch_size or ARCHIVADO_BATCH_SIZE
     ca_archivado = CursoAcademicoArchivado.objects.filter(
         id_original=curso_academico.pk
     ).first()
@@ -551,297 +737,236 @@ def _archivar_semestres_pendientes(curso_academico, contadores):
         return contadores
 
     fecha_archivado = timezone.now().date()
-
-    # Helper de usuario archivado (reutilizable dentro de la transacción)
-    usuarios_archivados_map = {}
-
-    def obtener_o_crear_usuario_archivado(user):
-        if user.pk in usuarios_archivados_map:
-            return usuarios_archivados_map[user.pk]
-        existente = UsuarioArchivado.objects.filter(
-            id_original=user.pk,
-            usuario_actual=user
-        ).first()
-        if existente:
-            usuarios_archivados_map[user.pk] = existente
-            return existente
-        perfil = getattr(user, 'registro', None)
-        ua = UsuarioArchivado.objects.create(
-            id_original=user.pk,
-            username=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            email=user.email,
-            date_joined=user.date_joined,
-            is_active=user.is_active,
-            nacionalidad=getattr(perfil, 'nacionalidad', None) if perfil else None,
-            carnet=getattr(perfil, 'carnet', None) if perfil else None,
-            sexo=getattr(perfil, 'sexo', 'M') if perfil else 'M',
-            address=getattr(perfil, 'address', None) if perfil else None,
-            location=getattr(perfil, 'location', None) if perfil else None,
-            provincia=getattr(perfil, 'provincia', None) if perfil else None,
-            telephone=getattr(perfil, 'telephone', None) if perfil else None,
-            movil=getattr(perfil, 'movil', None) if perfil else None,
-            grado=getattr(perfil, 'grado', 'grado1') if perfil else 'grado1',
-            ocupacion=getattr(perfil, 'ocupacion', 'ocupacion1') if perfil else 'ocupacion1',
-            titulo=getattr(perfil, 'titulo', None) if perfil else None,
-            grupo=', '.join(user.groups.values_list('name', flat=True)),
-            usuario_actual=user,
-        )
-        contadores['usuarios'] += 1
-        usuarios_archivados_map[user.pk] = ua
-        return ua
+    tiempos = {}
+    # Mapa user.pk → UsuarioArchivado.pk (reutilizable dentro de la transacción)
+    usuarios_map = {}
 
     try:
         with transaction.atomic():
 
-            # Obtener todos los cursos del CA que siguen en principal
-            cursos_pendientes = list(
-                Curso.objects.filter(curso_academico=curso_academico).select_related('teacher')
-            )
-            cursos_ids = [c.pk for c in cursos_pendientes]
-
-            # Mapa curso.pk → CursoArchivado (para vincular matrículas/calificaciones/asistencias)
-            cursos_archivados_map = {}
-            # Mapa semestre.pk → SemestreCursoArchivado (para semestres que se crean en este paso)
-            semestres_archivados_nuevos_map = {}
-
-            for curso in cursos_pendientes:
-                # Buscar el CursoArchivado ya existente para este curso
-                curso_archivado = CursoArchivado.objects.filter(
-                    id_original=curso.pk
-                ).order_by('-pk').first()
-
-                if curso_archivado is None:
-                    # Caso inesperado: crear el CursoArchivado si falta
-                    curso_archivado = CursoArchivado.objects.create(
-                        id_original=curso.pk,
-                        name=curso.name,
-                        description=curso.description,
-                        area=curso.area,
-                        tipo=curso.tipo,
-                        teacher_id_original=curso.teacher.pk,
-                        teacher_name=curso.teacher.get_full_name() or curso.teacher.username,
-                        image=curso.image.name if curso.image else None,
-                        class_quantity=curso.class_quantity,
-                        status=curso.get_dynamic_status(),
-                        curso_academico=ca_archivado,
-                        enrollment_deadline=curso.enrollment_deadline,
-                        start_date=curso.start_date,
-                        teacher_actual=curso.teacher,
-                    )
+            with medir_fase(tiempos, 'cursos'):
+                # Obtener todos los cursos del CA que siguen en principal
+                cursos_pendientes = list(
+                    Curso.objects.filter(curso_academico=curso_academico).select_related('teacher')
+                )
+                cursos_ids = [c.pk for c in cursos_pendientes]
+
+                # Mapa curso.pk → CursoArchivado.pk ya existente (el más reciente)
+                cursos_archivados_map = mapa_por_id_original(
+                    CursoArchivado, cursos_ids, batch_size=batch_size
+                )
+                # Caso inesperado: crear el CursoArchivado si falta
+                faltantes = [c for c in cursos_pendientes if c.pk not in cursos_archivados_map]
+                nuevos_cursos = [nuevo_curso_archivado(c, ca_archivado) for c in faltantes]
+                contadores['cursos'] += crear_en_lotes(CursoArchivado, nuevos_cursos, batch_size)
+                for curso, curso_archivado in zip(faltantes, nuevos_cursos):
+                    cursos_archivados_map[curso.pk] = curso_archivado.pk
                     logger.info(
                         f"CursoArchivado creado para curso '{curso.name}' "
                         f"(id_original={curso.pk}) en _archivar_semestres_pendientes."
                     )
-                    contadores['cursos'] += 1
-
-                cursos_archivados_map[curso.pk] = curso_archivado
 
-                # ── Archivar SemestreCurso pendientes ─────────────────────────
-                # Incluye el semestre activo (último semestre, ej. semestre 3)
-                # que nunca pasó por terminar_semestre.
-                semestres = SemestreCurso.objects.filter(
-                    curso=curso
-                ).order_by('numero_semestre')
-
-                numeros_ya_archivados = set(
-                    SemestreCursoArchivado.objects.filter(
-                        curso_archivado=curso_archivado
-                    ).values_list('numero_semestre', flat=True)
+            # ── Archivar SemestreCurso pendientes ─────────────────────────────
+            # Incluye el semestre activo (último semestre, ej. semestre 3)
+            # que nunca pasó por terminar_semestre.
+            with medir_fase(tiempos, 'semestres'):
+                semestres = list(
+                    SemestreCurso.objects.filter(curso__pk__in=cursos_ids).order_by('curso_id', 'numero_semestre')
+                )
+                # Mapa semestre.pk → SemestreCursoArchivado.pk
+                semestres_archivados_map = mapa_por_id_original(
+                    SemestreCursoArchivado, [s.pk for s in semestres],
+                    orden=('numero_semestre', 'pk'), batch_size=batch_size,
                 )
+                numeros_ya_archivados = defaultdict(set)
+                for curso_archivado_id, numero in SemestreCursoArchivado.objects.filter(
+                    curso_archivado_id__in=set(cursos_archivados_map.values())
+                ).values_list('curso_archivado_id', 'numero_semestre'):
+                    numeros_ya_archivados[curso_archivado_id].add(numero)
 
+                nuevos_semestres = []
                 for semestre in semestres:
-                    # Saltar si ya existe un SemestreCursoArchivado para este id_original
-                    existente_arch = SemestreCursoArchivado.objects.filter(
-                        id_original=semestre.pk
-                    ).first()
-                    if existente_arch:
-                        # Ya archivado (por terminar_semestre previo), registrar en el mapa
-                        semestres_archivados_nuevos_map[semestre.pk] = existente_arch
-                        numeros_ya_archivados.add(semestre.numero_semestre)
+                    curso_archivado_id = cursos_archivados_map[semestre.curso_id]
+                    numeros = numeros_ya_archivados[curso_archivado_id]
+                    # Ya archivado (por terminar_semestre previo)
+                    if semestre.pk in semestres_archivados_map:
+                        numeros.add(semestre.numero_semestre)
                         continue
                     # Saltar si ya existe uno con el mismo número de semestre para ese curso
-                    if semestre.numero_semestre in numeros_ya_archivados:
+                    if semestre.numero_semestre in numeros:
                         logger.info(
-                            f"Semestre {semestre.numero_semestre} de '{curso.name}' "
+                            f"Semestre {semestre.numero_semestre} del curso id={semestre.curso_id} "
                             f"ya archivado por número. Se omite id={semestre.pk}."
                         )
                         continue
-
-                    fecha_cierre = semestre.fecha_cierre or fecha_archivado
-                    nuevo_sa = SemestreCursoArchivado.objects.create(
+                    numeros.add(semestre.numero_semestre)
+                    nuevos_semestres.append(SemestreCursoArchivado(
                         id_original=semestre.pk,
-                        curso_archivado=curso_archivado,
+                        curso_archivado_id=curso_archivado_id,
                         numero_semestre=semestre.numero_semestre,
                         activo=False,
                         curso_academico_archivado=ca_archivado,
                         fecha_inicio=semestre.fecha_inicio,
-                        fecha_cierre=fecha_cierre,
+                        fecha_cierre=semestre.fecha_cierre or fecha_archivado,
                         fecha_creacion=semestre.fecha_creacion,
-                    )
-                    semestres_archivados_nuevos_map[semestre.pk] = nuevo_sa
-                    numeros_ya_archivados.add(semestre.numero_semestre)
-                    logger.info(
-                        f"SemestreCursoArchivado creado: semestre {semestre.numero_semestre} "
-                        f"de '{curso.name}' (id_original={semestre.pk})."
-                    )
+                    ))
+                crear_en_lotes(SemestreCursoArchivado, nuevos_semestres, batch_size)
+                for semestre_archivado in nuevos_semestres:
+                    semestres_archivados_map[semestre_archivado.id_original] = semestre_archivado.pk
+                logger.info(
+                    f"{len(nuevos_semestres)} SemestreCursoArchivado creados para "
+                    f"'{curso_academico.nombre}'."
+                )
 
             # ── Archivar Matrículas pendientes (semestre activo) ──────────────
             # Las matrículas que quedaron en principal sin archivar pertenecen
             # al semestre activo (último semestre). Se archivan ahora antes de
             # eliminarlas.
-            matriculas_pendientes = Matriculas.objects.filter(
-                course__pk__in=cursos_ids
-            ).select_related('student', 'course', 'semestre')
-
-            matriculas_archivadas_map = {}
-
-            for matricula in matriculas_pendientes:
+            with medir_fase(tiempos, 'matriculas'):
+                matriculas = list(
+                    Matriculas.objects.filter(course__pk__in=cursos_ids).values_list(
+                        'pk', 'course_id', 'student_id', 'semestre_id',
+                        'activo', 'fecha_matricula', 'estado',
+                    )
+                )
                 # Evitar duplicado si ya fue archivada (no debería, pero por seguridad)
-                if MatriculaArchivada.objects.filter(id_original=matricula.pk).exists():
-                    continue
-
-                curso_archivado = cursos_archivados_map.get(matricula.course.pk)
-                if not curso_archivado:
-                    curso_archivado = CursoArchivado.objects.filter(
-                        id_original=matricula.course.pk
-                    ).first()
-                if not curso_archivado:
-                    logger.warning(
-                        f"No se encontró CursoArchivado para course.pk={matricula.course.pk}. "
-                        f"Se omite matrícula id={matricula.pk}."
+                ya_archivadas = ids_existentes(MatriculaArchivada, [m[0] for m in matriculas], batch_size=batch_size)
+                matriculas = [m for m in matriculas if m[0] not in ya_archivadas]
+
+                usuarios_archivados_para([m[2] for m in matriculas], usuarios_map, contadores, batch_size)
+                _completar_semestres_archivados([m[3] for m in matriculas], semestres_archivados_map, batch_size)
+
+                matriculas_archivadas = [
+                    MatriculaArchivada(
+                        id_original=pk,
+                        course_id=cursos_archivados_map[course_id],
+                        student_id=usuarios_map[student_id],
+                        semestre_archivado_id=semestres_archivados_map.get(semestre_id) if semestre_id else None,
+                        activo=activo,
+                        fecha_matricula=fecha_matricula,
+                        estado=estado,
                     )
-                    continue
-
-                estudiante_archivado = obtener_o_crear_usuario_archivado(matricula.student)
-
-                semestre_arch = None
-                if matricula.semestre_id:
-                    semestre_arch = semestres_archivados_nuevos_map.get(matricula.semestre_id)
-                    if semestre_arch is None:
-                        semestre_arch = SemestreCursoArchivado.objects.filter(
-                            id_original=matricula.semestre_id
-                        ).first()
-
-                ma = MatriculaArchivada.objects.create(
-                    id_original=matricula.pk,
-                    course=curso_archivado,
-                    student=estudiante_archivado,
-                    semestre_archivado=semestre_arch,
-                    activo=matricula.activo,
-                    fecha_matricula=matricula.fecha_matricula,
-                    estado=matricula.estado,
-                )
-                matriculas_archivadas_map[matricula.pk] = ma
-                contadores['matriculas'] += 1
+                    for pk, course_id, student_id, semestre_id, activo, fecha_matricula, estado in matriculas
+                ]
+                contadores['matriculas'] += crear_en_lotes(MatriculaArchivada, matriculas_archivadas, batch_size)
+                matriculas_archivadas_map = {ma.id_original: ma.pk for ma in matriculas_archivadas}
 
             # ── Archivar Calificaciones y Notas pendientes ────────────────────
-            calificaciones_pendientes = Calificaciones.objects.filter(
-                course__pk__in=cursos_ids
-            ).select_related('student', 'course', 'matricula', 'semestre').prefetch_related('notas')
-
-            for calificacion in calificaciones_pendientes:
-                if CalificacionArchivada.objects.filter(id_original=calificacion.pk).exists():
-                    continue
-
-                curso_archivado = cursos_archivados_map.get(calificacion.course.pk)
-                if not curso_archivado:
-                    curso_archivado = CursoArchivado.objects.filter(
-                        id_original=calificacion.course.pk
-                    ).first()
-                if not curso_archivado:
-                    logger.warning(
-                        f"No se encontró CursoArchivado para course.pk={calificacion.course.pk}. "
-                        f"Se omite calificación id={calificacion.pk}."
+            with medir_fase(tiempos, 'calificaciones'):
+                calificaciones = list(
+                    Calificaciones.objects.filter(course__pk__in=cursos_ids).values_list(
+                        'pk', 'course_id', 'student_id', 'matricula_id', 'semestre_id',
+                        'average', 'course__start_date',
                     )
-                    continue
-
-                estudiante_archivado = obtener_o_crear_usuario_archivado(calificacion.student)
-
-                matricula_archivada = None
-                if calificacion.matricula_id:
-                    matricula_archivada = matriculas_archivadas_map.get(calificacion.matricula_id)
-                    if not matricula_archivada:
-                        matricula_archivada = MatriculaArchivada.objects.filter(
-                            id_original=calificacion.matricula_id
-                        ).first()
-
-                if not matricula_archivada:
-                    matricula_archivada = MatriculaArchivada.objects.create(
-                        id_original=calificacion.pk * -1,
-                        course=curso_archivado,
-                        student=estudiante_archivado,
+                )
+                ya_archivadas = ids_existentes(
+                    CalificacionArchivada, [c[0] for c in calificaciones], batch_size=batch_size
+                )
+                calificaciones = [c for c in calificaciones if c[0] not in ya_archivadas]
+
+                usuarios_archivados_para([c[2] for c in calificaciones], usuarios_map, contadores, batch_size)
+                _completar_semestres_archivados([c[4] for c in calificaciones], semestres_archivados_map, batch_size)
+                matriculas_faltantes = {
+                    c[3] for c in calificaciones
+                    if c[3] is not None and c[3] not in matriculas_archivadas_map
+                }
+                if matriculas_faltantes:
+                    matriculas_archivadas_map.update(mapa_por_id_original(
+                        MatriculaArchivada, sorted(matriculas_faltantes), orden=('pk',), batch_size=batch_size
+                    ))
+
+                matriculas_provisionales = [
+                    MatriculaArchivada(
+                        id_original=pk * -1,
+                        course_id=cursos_archivados_map[course_id],
+                        student_id=usuarios_map[student_id],
                         activo=True,
-                        fecha_matricula=calificacion.course.start_date or fecha_archivado,
+                        fecha_matricula=start_date or fecha_archivado,
                         estado='P',
                     )
-                    contadores['matriculas'] += 1
-
-                semestre_arch = None
-                if calificacion.semestre_id:
-                    semestre_arch = semestres_archivados_nuevos_map.get(calificacion.semestre_id)
-                    if semestre_arch is None:
-                        semestre_arch = SemestreCursoArchivado.objects.filter(
-                            id_original=calificacion.semestre_id
-                        ).first()
-
-                calificacion_archivada = CalificacionArchivada.objects.create(
-                    id_original=calificacion.pk,
-                    matricula=matricula_archivada,
-                    course=curso_archivado,
-                    student=estudiante_archivado,
-                    semestre_archivado=semestre_arch,
-                    average=calificacion.average,
-                )
-                contadores['calificaciones'] += 1
-
-                for nota in calificacion.notas.all():
-                    if not NotaIndividualArchivada.objects.filter(id_original=nota.pk).exists():
-                        NotaIndividualArchivada.objects.create(
-                            id_original=nota.pk,
-                            calificacion=calificacion_archivada,
-                            valor=nota.valor if nota.valor is not None else 0,
-                            fecha_creacion=nota.fecha_creacion,
+                    for pk, course_id, student_id, matricula_id, _, _, start_date in calificaciones
+                    if matricula_id not in matriculas_archivadas_map
+                ]
+                contadores['matriculas'] += crear_en_lotes(
+                    MatriculaArchivada, matriculas_provisionales, batch_size
+                )
+                provisionales_map = {ma.id_original * -1: ma.pk for ma in matriculas_provisionales}
+
+                calificaciones_archivadas = [
+                    CalificacionArchivada(
+                        id_original=pk,
+                        matricula_id=matriculas_archivadas_map.get(matricula_id) or provisionales_map[pk],
+                        course_id=cursos_archivados_map[course_id],
+                        student_id=usuarios_map[student_id],
+                        semestre_archivado_id=semestres_archivados_map.get(semestre_id) if semestre_id else None,
+                        average=average,
+                    )
+                    for pk, course_id, student_id, matricula_id, semestre_id, average, _ in calificaciones
+                ]
+                contadores['calificaciones'] += crear_en_lotes(
+                    CalificacionArchivada, calificaciones_archivadas, batch_size
+                )
+                calificaciones_map = {ca.id_original: ca.pk for ca in calificaciones_archivadas}
+
+                notas = list(
+                    NotaIndividual.objects.filter(
+                        calificacion_id__in=list(calificaciones_map)
+                    ).values_list('pk', 'calificacion_id', 'valor', 'fecha_creacion')
+                ) if calificaciones_map else []
+                notas_archivadas = ids_existentes(
+                    NotaIndividualArchivada, [n[0] for n in notas], batch_size=batch_size
+                )
+                contadores['notas'] += crear_en_lotes(
+                    NotaIndividualArchivada,
+                    (
+                        NotaIndividualArchivada(
+                            id_original=pk,
+                            calificacion_id=calificaciones_map[calificacion_id],
+                            valor=valor if valor is not None else 0,
+                            fecha_creacion=fecha_creacion,
                         )
-                        contadores['notas'] += 1
+                        for pk, calificacion_id, valor, fecha_creacion in notas
+                        if pk not in notas_archivadas
+                    ),
+                    batch_size,
+                    necesita_ids=False,
+                )
 
             # ── Archivar Asistencias pendientes ───────────────────────────────
-            asistencias_pendientes = Asistencia.objects.filter(
-                course__pk__in=cursos_ids
-            ).select_related('student', 'course', 'semestre')
-
-            for asistencia in asistencias_pendientes:
-                if AsistenciaArchivada.objects.filter(id_original=asistencia.pk).exists():
-                    continue
-
-                curso_archivado = cursos_archivados_map.get(asistencia.course.pk)
-                if not curso_archivado:
-                    curso_archivado = CursoArchivado.objects.filter(
-                        id_original=asistencia.course.pk
-                    ).first()
-                if not curso_archivado:
-                    continue
-
-                estudiante_archivado = obtener_o_crear_usuario_archivado(asistencia.student)
-
-                semestre_arch = None
-                if asistencia.semestre_id:
-                    semestre_arch = semestres_archivados_nuevos_map.get(asistencia.semestre_id)
-                    if semestre_arch is None:
-                        semestre_arch = SemestreCursoArchivado.objects.filter(
-                            id_original=asistencia.semestre_id
-                        ).first()
-
-                AsistenciaArchivada.objects.create(
-                    id_original=asistencia.pk,
-                    course=curso_archivado,
-                    student=estudiante_archivado,
-                    semestre_archivado=semestre_arch,
-                    presente=asistencia.presente,
-                    date=asistencia.date,
-                )
-                contadores['asistencias'] += 1
+            with medir_fase(tiempos, 'asistencias'):
+                asistencias = list(
+                    Asistencia.objects.filter(course__pk__in=cursos_ids).values_list(
+                        'pk', 'course_id', 'student_id', 'semestre_id', 'presente', 'date'
+                    )
+                )
+                ya_archivadas = ids_existentes(
+                    AsistenciaArchivada, [a[0] for a in asistencias], batch_size=batch_size
+                )
+                usuarios_archivados_para(
+                    {a[2] for a in asistencias if a[0] not in ya_archivadas},
+                    usuarios_map, contadores, batch_size,
+                )
+                _completar_semestres_archivados(
+                    {a[3] for a in asistencias if a[0] not in ya_archivadas},
+                    semestres_archivados_map, batch_size,
+                )
+                contadores['asistencias'] += crear_en_lotes(
+                    AsistenciaArchivada,
+                    (
+                        AsistenciaArchivada(
+                            id_original=pk,
+                            course_id=cursos_archivados_map[course_id],
+                            student_id=usuarios_map[student_id],
+                            semestre_archivado_id=semestres_archivados_map.get(semestre_id) if semestre_id else None,
+                            presente=presente,
+                            date=fecha,
+                        )
+                        for pk, course_id, student_id, semestre_id, presente, fecha in asistencias
+                        if pk not in ya_archivadas
+                    ),
+                    batch_size,
+                    necesita_ids=False,
+                )
 
             logger.info(
                 f"_archivar_semestres_pendientes: datos del semestre activo archivados para "
@@ -852,47 +977,13 @@ def _archivar_semestres_pendientes(curso_academico, contadores):
             )
 
             # ── Limpiar datos de principal para estos cursos ──────────────────
-
-            # Solicitudes de inscripción
-            solicitudes_qs = SolicitudInscripcion.objects.filter(curso__pk__in=cursos_ids)
-            for solicitud in solicitudes_qs:
-                RespuestaEstudiante.objects.filter(solicitud=solicitud).delete()
-            solicitudes_qs.delete()
-
-            # Formularios de aplicación
-            formularios_qs = FormularioAplicacion.objects.filter(curso__pk__in=cursos_ids)
-            for formulario in formularios_qs:
-                for pregunta in formulario.preguntas.all():
-                    OpcionRespuesta.objects.filter(pregunta=pregunta).delete()
-                PreguntaFormulario.objects.filter(formulario=formulario).delete()
-            formularios_qs.delete()
-
-            # Notas, calificaciones, asistencias, matrículas residuales
-            NotaIndividual.objects.filter(calificacion__course__pk__in=cursos_ids).delete()
-            Calificaciones.objects.filter(course__pk__in=cursos_ids).delete()
-            Asistencia.objects.filter(course__pk__in=cursos_ids).delete()
-            Matriculas.objects.filter(course__pk__in=cursos_ids).delete()
-
-            # SemestreCurso
-            SemestreCurso.objects.filter(curso__pk__in=cursos_ids).delete()
-
-            # Carpetas de documentos: desvincular curso antes de eliminar
-            from course_documents.models import DocumentFolder as DocFolder
-            carpetas_sin_ca = DocFolder.objects.filter(
-                curso__pk__in=cursos_ids,
-                curso_academico__isnull=True
-            )
-            for carpeta in carpetas_sin_ca:
-                carpeta.curso_academico = curso_academico
-                carpeta.save(update_fields=['curso_academico'])
-            DocFolder.objects.filter(curso__pk__in=cursos_ids).update(curso=None)
-
-            # Eliminar Cursos
-            Curso.objects.filter(curso_academico=curso_academico).delete()
+            with medir_fase(tiempos, 'limpieza'):
+                _limpiar_principal(curso_academico, cursos_ids, filtro_academico=False)
 
             logger.info(
                 f"_archivar_semestres_pendientes completado para "
-                f"'{curso_academico.nombre}': {len(cursos_pendientes)} cursos procesados."
+                f"'{curso_academico.nombre}': {len(cursos_pendientes)} cursos procesados. "
+                f"Tiempos (ms): {tiempos}"
             )
 
     except Exception as exc:
@@ -906,4 +997,5 @@ def _archivar_semestres_pendientes(curso_academico, contadores):
             f"Causa: {exc}"
         ) from exc
 
+    contadores['tiempos_ms'] = tiempos
     return contadores
@@ -0,0 +1,205 @@
+"""
+Búsqueda indexada sobre DatoArchivadoDinamico.
+
+La búsqueda por contenido ya no hace datos_originales__icontains (convertir
+cada documento JSON a texto y recorrer la tabla completa): filtra por
+texto_busqueda, una columna con los valores aplanados en minúsculas que en
+PostgreSQL tiene un índice GIN de trigramas, de modo que el LIKE '%término%'
+se resuelve por índice. Las búsquedas por clave (username, email, user_id,
+student_id) usan el operador @> sobre el índice GIN jsonb_path_ops.
+
+Funciones principales:
+  - filtrar_por_texto(queryset, termino, tipo): filtro de las búsquedas
+    'tabla', 'contenido' y 'global'.
+  - filtro_claves_json(campo, valores): Q por clave de datos_originales.
+  - buscar_agrupado(termino, tipo, limite): resultados por tabla con sus
+    ejemplos en una única consulta (funciones de ventana).
+  - rellenar_texto_busqueda(): completa texto_busqueda en registros que no
+    lo tengan (p. ej. insertados con SQL directo).
+
+Configuración (settings, opcional):
+  - BUSQUEDA_ARCHIVADOS_CACHE_TABLAS: segundos que se cachea la lista de
+    tablas archivadas usada por la búsqueda por nombre de tabla (300).
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+logger = logging.getLogger(__name__)
+
+CACHE_TABLAS_TTL = getattr(settings, 'BUSQUEDA_ARCHIVADOS_CACHE_TABLAS', 300)
+CLAVE_CACHE_TABLAS = 'datos_archivados:tablas_origen'
+
+# Por encima de este número de valores se usa la comparación por clave
+# (IN) en lugar de un @> por valor.
+MAX_VALORES_CONTENCION = 100
+
+
+def _es_postgresql():
+    from .models import DatoArchivadoDinamico
+
+    return connections[router.db_for_read(DatoArchivadoDinamico)].vendor == 'postgresql'
+
+
+def tablas_archivadas():
+    """Nombres de las tablas con datos archivados (cacheados CACHE_TABLAS_TTL segundos)."""
+    from .models import DatoArchivadoDinamico
+
+    tablas = cache.get(CLAVE_CACHE_TABLAS)
+    if tablas is None:
+        tablas = sorted(
+            DatoArchivadoDinamico.objects.order_by().values_list('tabla_origen', flat=True).distinct()
+        )
+        cache.set(CLAVE_CACHE_TABLAS, tablas, CACHE_TABLAS_TTL)
+    return tablas
+
+
+def invalidar_tablas_archivadas():
+    cache.delete(CLAVE_CACHE_TABLAS)
+
+
+def tablas_coincidentes(termino):
+    """Tablas archivadas cuyo nombre contiene `termino` (sin distinguir mayúsculas)."""
+    termino = termino.lower()
+    return [tabla for tabla in tablas_archivadas() if termino in tabla.lower()]
+
+
+def filtrar_por_texto(queryset, termino, tipo='global'):
+    """
+    Aplica a `queryset` la búsqueda de `termino` según `tipo`:
+      - 'tabla': nombre de la tabla de origen
+      - 'contenido': valores de datos_originales y nombre del registro
+      - 'global': cualquiera de los anteriores
+    """
+    termino = (termino or '').strip()
+    if not termino:
+        return queryset
+
+    por_tabla = Q(tabla_origen__in=tablas_coincidentes(termino))
+    if tipo == 'tabla':
+        return queryset.filter(por_tabla)
+
+    # texto_busqueda ya está en minúsculas: contains (LIKE) aprovecha el
+    # índice de trigramas, cosa que icontains (UPPER(...) LIKE) no haría.
+    por_contenido = Q(texto_busqueda__contains=termino.lower())
+    if tipo == 'contenido':
+        return queryset.filter(por_contenido)
+    return queryset.filter(por_contenido | por_tabla)
+
+
+def filtro_claves_json(campo, valores):
+    """
+    Q que selecciona los registros cuyo datos_originales[campo] es alguno de
+    `valores`. En PostgreSQL se expresa como datos_originales @> {campo: valor}
+    para usar el índice GIN jsonb_path_ops; en otros motores se compara la clave.
+    Como el lookup por clave, distingue tipos: 5 no coincide con "5".
+    """
+    valores = [valor for valor in valores if valor not in (None, '')]
+    if not valores:
+        return Q(pk__in=[])
+    if _es_postgresql() and len(valores) <= MAX_VALORES_CONTENCION:
+        filtro = Q()
+        for valor in valores:
+            filtro |= Q(datos_originales__contains={campo: valor})
+        return filtro
+    if len(valores) == 1:
+        return Q(**{f'datos_originales__{campo}': valores[0]})
+    return Q(**{f'datos_originales__{campo}__in': valores})
+
+
+def campos_coincidentes(datos, termino, maximo=3):
+    """Campos de `datos` cuyo valor contiene `termino`, con el valor recortado a 100 caracteres."""
+    termino = termino.lower()
+    coincidencias = []
+    for campo, valor in (datos or {}).items():
+        valor_str = str(valor)
+        if termino in valor_str.lower():
+            if len(valor_str) > 100:
+                valor_str = valor_str[:100] + '...'
+            coincidencias.append({'campo': campo, 'valor': valor_str})
+            if len(coincidencias) >= maximo:
+                break
+    return coincidencias
+
+
+def buscar_agrupado(termino, tipo='global', limite=10, ejemplos_por_tabla=3):
+    """
+    Resultados de la búsqueda agrupados por tabla, ordenados por número de
+    coincidencias, con hasta `ejemplos_por_tabla` registros de ejemplo cada
+    una (los migrados más recientemente).
+
+    Una sola consulta: el total por tabla y la posición de cada registro se
+    calculan con funciones de ventana y se filtran en la base de datos, en
+    lugar de un GROUP BY más una consulta de ejemplos por tabla.
+
+    Returns:
+        dict: {'results': [...], 'total': int}
+    """
+    from .models import DatoArchivadoDinamico
+
+    queryset = filtrar_por_texto(DatoArchivadoDinamico.objects.all(), termino, tipo)
+    filas = queryset.annotate(
+        total_tabla=Window(Count('pk'), partition_by=[F('tabla_origen')]),
+        posicion=Window(
+            RowNumber(),
+            partition_by=[F('tabla_origen')],
+            order_by=[F('fecha_migracion').desc(), F('pk').desc()],
+        ),
+    ).filter(posicion__lte=ejemplos_por_tabla).only(
+        'pk', 'tabla_origen', 'id_original', 'datos_originales', 'nombre_registro'
+    ).order_by('-total_tabla', 'tabla_origen', 'posicion')
+
+    grupos = {}
+    for dato in filas:
+        grupo = grupos.setdefault(dato.tabla_origen, {
+            'tabla': dato.tabla_origen,
+            'total_registros': dato.total_tabla,
+            'ejemplos': [],
+        })
+        grupo['ejemplos'].append({
+            'id': dato.pk,
+            'nombre': dato.obtener_nombre_legible(),
+            'campos_coincidentes': (
+                campos_coincidentes(dato.datos_originales, termino) if tipo in ('contenido', 'global') else []
+            ),
+        })
+
+    resultados = list(grupos.values())
+    return {
+        'results': resultados[:limite],
+        'total': sum(grupo['total_registros'] for grupo in resultados),
+    }
+
+
+def rellenar_texto_busqueda(batch_size=2000, solo_vacios=True):
+    """
+    Calcula texto_busqueda por lotes. Los registros guardados con save() o
+    con MigracionService ya lo traen; esto cubre los cargados por otras vías.
+    Devuelve el número de registros actualizados.
+    """
+    from .models import DatoArchivadoDinamico, construir_texto_busqueda
+
+    queryset = DatoArchivadoDinamico.objects.all()
+    if solo_vacios:
+        queryset = queryset.filter(texto_busqueda='')
+
+    actualizados = 0
+    ultimo_pk = 0
+    while True:
+        lote = list(
+            queryset.filter(pk__gt=ultimo_pk).order_by('pk')
+            .only('pk', 'datos_originales', 'nombre_registro')[:batch_size]
+        )
+        if not lote:
+            break
+        for dato in lote:
+            dato.texto_busqueda = construir_texto_busqueda(dato.datos_originales, dato.nombre_registro)
+        DatoArchivadoDinamico.objects.bulk_update(lote, ['texto_busqueda'])
+        actualizados += len(lote)
+        ultimo_pk = lote[-1].pk
+    return actualizados
@@ -7,7 +7,8 @@ LOTE_CONTEO_REGISTROS = 5  # Contar registros migrados cada 5 tablas (era cada t
 
 # Configuración de timeouts
 TIMEOUT_MIGRACION_MINUTOS = 45  # Aumentar timeout de 30 a 45 minutos
-TIMEOUT_TABLA_MINUTOS = 10  # Timeout por tabla individual
+TIMEOUT_TABLA_MINUTOS = 10  # Timeout por tabla individual: sin avances en este tiempo, otra entrega de la tarea puede retomarla
+TTL_CONEXION_MIGRACION_MINUTOS = 15  # Vida de las credenciales de MariaDB en caché (se renueva con cada avance)
 
 # Configuración de cache
 CACHE_TIMEOUT_SEGUNDOS = 1800  # 30 minutos
@@ -18,7 +19,13 @@ LOG_CADA_N_REGISTROS = 500  # Log cada 500 registros en lugar de cada 50
 
 # Configuración de memoria
 USAR_TRANSACCIONES_ATOMICAS = True  # Usar transacciones para mejor rendimiento
-BATCH_SIZE_INSERCION = 100  # Insertar registros en lotes de 100
+BATCH_SIZE_INSERCION = 1000  # Filas leídas de MariaDB e insertadas (bulk_create) por lote
+
+# Configuración de la migración paralela (una tarea Celery por tabla)
+COLA_CELERY_MIGRACION = 'migration'  # Cola atendida por los workers de migración
+
+# Configuración del guardado en historial de las tablas de docencia
+HILOS_GUARDADO_HISTORIAL = 4  # Tablas independientes importadas a la vez
 
 # Configuración específica para el modal de resumen
 MOSTRAR_MODAL_AUTOMATICO = True  # Mostrar modal automáticamente al completar
@@ -6,12 +6,21 @@ de docencia en sus correspondientes modelos históricos en la app historial.
 """
 
 import logging
-from django.db import transaction
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.utils import timezone
 from mapeos_campos_docencia import aplicar_mapeo_campos
 
+from .archivado_service import crear_en_lotes, en_lotes
+from .config_migracion import BATCH_SIZE_INSERCION, HILOS_GUARDADO_HISTORIAL
+
+# Protege las estadísticas compartidas cuando varias tablas se importan en paralelo
+_lock_estadisticas = threading.RLock()
+
 
 # Mapeo de tablas de docencia a modelos históricos
 DOCENCIA_TABLES_MAPPING = {
@@ -30,6 +39,39 @@ DOCENCIA_TABLES_MAPPING = {
     'Docencia_class_studentView': 'HistoricalClassStudentView',
 }
 
+# Orden fijo de procesamiento; planificar_niveles lo usa para desempatar
+ORDEN_PROCESAMIENTO = [
+    'Docencia_area',
+    'Docencia_coursecategory',
+    'Docencia_courseinformation',
+    'Docencia_courseinformation_adminteachers',
+    'Docencia_subjectinformation',
+    'Docencia_edition',
+    'Docencia_enrollmentapplication',
+    'Docencia_accountnumber',
+    'Docencia_enrollmentpay',
+    'Docencia_enrollment',
+    'Docencia_application',
+    'Docencia_class',
+    'Docencia_class_studentView',
+]
+
+# Tablas históricas cuyos mapeos {id_original: pk} necesita cada _procesar_*
+# para asignar sus FK. Se combinan con las relaciones detectadas por
+# analizar_vinculos_tablas al planificar los niveles de importación.
+DEPENDENCIAS_PROCESAMIENTO = {
+    'Docencia_courseinformation': ('Docencia_area', 'Docencia_coursecategory'),
+    'Docencia_courseinformation_adminteachers': ('Docencia_courseinformation',),
+    'Docencia_subjectinformation': ('Docencia_courseinformation',),
+    'Docencia_edition': ('Docencia_courseinformation',),
+    'Docencia_enrollmentapplication': ('Docencia_courseinformation',),
+    'Docencia_enrollmentpay': ('Docencia_enrollmentapplication', 'Docencia_accountnumber'),
+    'Docencia_enrollment': ('Docencia_subjectinformation', 'Docencia_edition'),
+    'Docencia_application': ('Docencia_courseinformation', 'Docencia_edition'),
+    'Docencia_class': ('Docencia_subjectinformation',),
+    'Docencia_class_studentView': ('Docencia_class', 'Docencia_application'),
+}
+
 # Definición estática de las relaciones FK conocidas entre tablas.
 # Formato: { tabla: { campo_fk: (tabla_destino, campo_destino) } }
 # Esto sirve como base y se enriquece con el análisis dinámico.
@@ -230,14 +272,14 @@ def resolver_fk(campo_fk, valor_id, tabla_origen, analisis, mapeos_historicos):
 
     - FK a auth_user -> devuelve User
     - FK a studentpersonalinformation -> devuelve User (via cadena)
-    - FK a otra tabla Docencia -> devuelve objeto histórico ya guardado
+    - FK a otra tabla Docencia -> devuelve el pk del registro histórico ya guardado
 
     Args:
         campo_fk: nombre del campo (ej: 'student_id')
         valor_id: valor del campo en los datos originales
         tabla_origen: tabla que contiene el campo FK
         analisis: resultado de analizar_vinculos_tablas()
-        mapeos_historicos: { tabla: { id_original: objeto_historico } }
+        mapeos_historicos: { tabla: { id_original: pk_historico } }
 
     Returns:
         Objeto resuelto o None
@@ -396,91 +438,83 @@ def completar_campos_obligatorios(objeto_destino, logger=None):
     return campos_completados
 
 
+def planificar_niveles(tablas_seleccionadas, relaciones=None):
+    """
+    Agrupa las tablas seleccionadas en niveles de dependencia.
+
+    Una tabla entra en un nivel cuando todas las tablas de las que depende
+    (DEPENDENCIAS_PROCESAMIENTO más las relaciones detectadas por
+    analizar_vinculos_tablas) ya están en niveles anteriores, de modo que las
+    tablas de un mismo nivel pueden importarse en paralelo. Si las relaciones
+    detectadas forman un ciclo, las tablas restantes se procesan de una en una
+    siguiendo ORDEN_PROCESAMIENTO.
+
+    Args:
+        tablas_seleccionadas: Lista de nombres de tablas de docencia
+        relaciones: Resultado['relaciones'] de analizar_vinculos_tablas (opcional)
 
-def guardar_datos_docencia_en_historial(tablas_seleccionadas, logger=None):
+    Returns:
+        list: Lista de niveles, cada uno una lista de tablas
+    """
+    relaciones = relaciones or {}
+    pendientes = [tabla for tabla in ORDEN_PROCESAMIENTO if tabla in tablas_seleccionadas]
+
+    dependencias = {}
+    for tabla in pendientes:
+        destinos = set(DEPENDENCIAS_PROCESAMIENTO.get(tabla, ()))
+        destinos.update(destino for destino, _ in relaciones.get(tabla, {}).values())
+        dependencias[tabla] = {d for d in destinos if d in pendientes and d != tabla}
+
+    niveles = []
+    completadas = set()
+    while pendientes:
+        nivel = [tabla for tabla in pendientes if dependencias[tabla] <= completadas]
+        if not nivel:
+            nivel = pendientes[:1]
+        niveles.append(nivel)
+        completadas.update(nivel)
+        pendientes = [tabla for tabla in pendientes if tabla not in completadas]
+    return niveles
+
+
+def guardar_datos_docencia_en_historial(tablas_seleccionadas, logger=None, batch_size=None, max_hilos=None):
     """
     Guarda los datos de las tablas de docencia seleccionadas en los modelos históricos.
-    
+
+    Las tablas se importan por niveles de dependencia (planificar_niveles):
+    las de un mismo nivel se procesan en paralelo, hasta `max_hilos` a la vez,
+    y cada tabla se inserta por lotes de `batch_size` filas. Si la llamada se
+    hace dentro de una transacción abierta, las tablas se procesan en el hilo
+    actual, porque otros hilos no verían los datos sin confirmar.
+
     Args:
         tablas_seleccionadas: Lista de nombres de tablas de docencia
         logger: Logger para registrar operaciones
-        
+        batch_size: Filas por bulk_create (BATCH_SIZE_INSERCION por defecto)
+        max_hilos: Tablas importadas a la vez (HILOS_GUARDADO_HISTORIAL por defecto)
+
     Returns:
         dict: Estadísticas de la operación con contadores por tabla
     """
     if logger is None:
         logger = logging.getLogger(__name__)
-    
+
     from .models import DatoArchivadoDinamico
-    from historial.models import (
-        HistoricalArea,
-        HistoricalCourseCategory,
-        HistoricalCourseInformation,
-        HistoricalCourseInformationAdminTeachers,
-        HistoricalEnrollmentApplication,
-        HistoricalEnrollmentPay,
-        HistoricalAccountNumber,
-        HistoricalEnrollment,
-        HistoricalSubjectInformation,
-        HistoricalEdition,
-        HistoricalApplication,
-        HistoricalClass,
-        HistoricalClassStudentView,
-    )
-    
-    # Mapeo de modelos históricos
-    modelos_historicos = {
-        'Docencia_area': HistoricalArea,
-        'Docencia_coursecategory': HistoricalCourseCategory,
-        'Docencia_courseinformation': HistoricalCourseInformation,
-
-        'Docencia_courseinformation_adminteachers': HistoricalCourseInformationAdminTeachers,
-        'Docencia_enrollmentapplication': HistoricalEnrollmentApplication,
-        'Docencia_enrollmentpay': HistoricalEnrollmentPay,
-        'Docencia_accountnumber': HistoricalAccountNumber,
-        'Docencia_enrollment': HistoricalEnrollment,
-        'Docencia_subjectinformation': HistoricalSubjectInformation,
-        'Docencia_edition': HistoricalEdition,
-        'Docencia_application': HistoricalApplication,
-        'Docencia_class': HistoricalClass,
-        'Docencia_class_studentView': HistoricalClassStudentView,
-    }
-    
+
+    modelos_historicos = _modelos_historicos()
+    batch_size = batch_size or BATCH_SIZE_INSERCION
+    if max_hilos is None:
+        max_hilos = HILOS_GUARDADO_HISTORIAL
+    if transaction.get_connection().in_atomic_block:
+        max_hilos = 1
+
     # Estadísticas
     estadisticas = {
         'total_registros_guardados': 0,
         'tablas_procesadas': 0,
         'errores': 0,
     }
-    
-    # Mapeos para mantener relaciones FK
-    mapeo_areas = {}
-    mapeo_categorias = {}
-    mapeo_cursos = {}
-    mapeo_asignaturas = {}
-    mapeo_ediciones = {}
-    mapeo_solicitudes = {}
-    mapeo_cuentas = {}
-    mapeo_clases = {}
-    mapeo_aplicaciones = {}
-    
-    # Orden de procesamiento para respetar dependencias FK
-    orden_procesamiento = [
-        'Docencia_area',
-        'Docencia_coursecategory',
-        'Docencia_courseinformation',
-        'Docencia_courseinformation_adminteachers',
-        'Docencia_subjectinformation',
-        'Docencia_edition',
-        'Docencia_enrollmentapplication',
-        'Docencia_accountnumber',
-        'Docencia_enrollmentpay',
-        'Docencia_enrollment',
-        'Docencia_application',
-        'Docencia_class',
-        'Docencia_class_studentView',
-    ]
-    
+
     logger.info("=== INICIANDO GUARDADO DE DATOS DE DOCENCIA EN HISTORIAL ===")
     logger.info(f"Tablas a procesar: {tablas_seleccionadas}")
 
@@ -490,935 +524,652 @@ def guardar_datos_docencia_en_historial(tablas_seleccionadas, logger=None):
     total_fk = sum(len(v) for v in analisis['relaciones'].values())
     logger.info(f"Análisis completado. FK detectadas: {total_fk}")
 
-    # mapeos_historicos acumula { tabla: { id_original: objeto_historico } }
-    # para que resolver_fk pueda encontrar objetos ya guardados
-    mapeos_historicos = {
-        'Docencia_area': mapeo_areas,
-        'Docencia_coursecategory': mapeo_categorias,
-        'Docencia_courseinformation': mapeo_cursos,
-        'Docencia_subjectinformation': mapeo_asignaturas,
-        'Docencia_edition': mapeo_ediciones,
-        'Docencia_enrollmentapplication': mapeo_solicitudes,
-        'Docencia_accountnumber': mapeo_cuentas,
-        'Docencia_application': mapeo_aplicaciones,
-        'Docencia_class': mapeo_clases,
-    }
-    
-    try:
-        # Procesar tablas en orden
-        for tabla in orden_procesamiento:
-            if tabla not in tablas_seleccionadas:
-                continue
-            
-            logger.info(f"\n--- Procesando tabla: {tabla} ---")
-            
-            # Obtener datos de la tabla
-            datos_tabla = DatoArchivadoDinamico.objects.filter(tabla_origen=tabla)
-            total_registros = datos_tabla.count()
-            logger.info(f"Encontrados {total_registros} registros en {tabla}")
-            
-            if total_registros == 0:
-                logger.warning(f"No hay registros para procesar en {tabla}")
-                continue
-            
-            # Obtener modelo histórico correspondiente
-            ModeloHistorico = modelos_historicos.get(tabla)
-            if not ModeloHistorico:
-                logger.error(f"No se encontró modelo histórico para {tabla}")
-                continue
-            
-            registros_guardados = 0
-            
-            # Procesar según la tabla
-            if tabla == 'Docencia_area':
-                registros_guardados = _procesar_areas(
-                    datos_tabla, ModeloHistorico, mapeo_areas, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-
-            
-            elif tabla == 'Docencia_coursecategory':
-                registros_guardados = _procesar_categorias(
-                    datos_tabla, ModeloHistorico, mapeo_categorias, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-            
-            elif tabla == 'Docencia_courseinformation':
-                registros_guardados = _procesar_cursos(
-                    datos_tabla, ModeloHistorico, mapeo_cursos, 
-                    mapeo_areas, mapeo_categorias, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-            
-            elif tabla == 'Docencia_courseinformation_adminteachers':
-                registros_guardados = _procesar_admin_teachers(
-                    datos_tabla, ModeloHistorico, mapeo_cursos, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-            
-            elif tabla == 'Docencia_subjectinformation':
-                registros_guardados = _procesar_asignaturas(
-                    datos_tabla, ModeloHistorico, mapeo_asignaturas, mapeo_cursos, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-            
-            elif tabla == 'Docencia_edition':
-                registros_guardados = _procesar_ediciones(
-                    datos_tabla, ModeloHistorico, mapeo_ediciones, mapeo_cursos, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-            
-            elif tabla == 'Docencia_enrollmentapplication':
-                registros_guardados = _procesar_solicitudes(
-                    datos_tabla, ModeloHistorico, mapeo_solicitudes, mapeo_cursos, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-            
-            elif tabla == 'Docencia_accountnumber':
-                registros_guardados = _procesar_cuentas(
-                    datos_tabla, ModeloHistorico, mapeo_cuentas, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-            
-            elif tabla == 'Docencia_enrollmentpay':
-                registros_guardados = _procesar_pagos(
-                    datos_tabla, ModeloHistorico, mapeo_solicitudes, mapeo_cuentas, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-            
-            elif tabla == 'Docencia_enrollment':
-                registros_guardados = _procesar_inscripciones(
-                    datos_tabla, ModeloHistorico, mapeo_asignaturas, mapeo_ediciones, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-            
-            elif tabla == 'Docencia_application':
-                registros_guardados = _procesar_aplicaciones(
-                    datos_tabla, ModeloHistorico, mapeo_cursos, mapeo_ediciones, mapeo_aplicaciones, logger,
-                    estadisticas, tablas_seleccionadas, tabla,
-                    analisis=analisis, mapeos_historicos=mapeos_historicos
-                )
-            elif tabla == 'Docencia_class':
-                registros_guardados = _procesar_clases(
-                    datos_tabla, ModeloHistorico, mapeo_clases, mapeo_asignaturas, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-
-            elif tabla == 'Docencia_class_studentView':
-                registros_guardados = _procesar_clases_studentview(
-                    datos_tabla, ModeloHistorico, mapeo_clases, mapeo_aplicaciones, logger,
-                    estadisticas, tablas_seleccionadas, tabla
-                )
-
-            
-            # Actualizar estadísticas
+    # mapeos_historicos acumula { tabla: { id_original: pk_historico } } para
+    # que las tablas dependientes (y resolver_fk) encuentren los registros ya
+    # guardados. Las tablas referenciadas que no se importan en esta ejecución
+    # se cargan de lo guardado en importaciones anteriores (una consulta por tabla).
+    mapeos_historicos = {tabla: {} for tabla in ORDEN_PROCESAMIENTO}
+    for tabla in tablas_seleccionadas:
+        for dependencia in DEPENDENCIAS_PROCESAMIENTO.get(tabla, ()):
+            if dependencia not in tablas_seleccionadas and not mapeos_historicos[dependencia]:
+                mapeos_historicos[dependencia] = _precargar_mapeo(modelos_historicos[dependencia], dependencia)
+
+    def importar(tabla):
+        logger.info(f"\n--- Procesando tabla: {tabla} ---")
+
+        # Obtener datos de la tabla
+        datos_tabla = DatoArchivadoDinamico.objects.filter(tabla_origen=tabla)
+        total_registros = datos_tabla.count()
+        logger.info(f"Encontrados {total_registros} registros en {tabla}")
+
+        if total_registros == 0:
+            logger.warning(f"No hay registros para procesar en {tabla}")
+            return
+
+        registros_guardados = _procesar_tabla(
+            tabla, datos_tabla, modelos_historicos[tabla], mapeos_historicos, analisis,
+            logger, estadisticas, tablas_seleccionadas, batch_size
+        )
+
+        # Actualizar estadísticas
+        with _lock_estadisticas:
             estadisticas['total_registros_guardados'] += registros_guardados
             estadisticas['tablas_procesadas'] += 1
             estadisticas[f'{tabla}_guardados'] = registros_guardados
-            
-            logger.info(f"✅ {tabla}: {registros_guardados} registros guardados en historial")
-            
-            # Actualizar progreso en cache con información de la tabla completada
-            _actualizar_progreso_cache(
-                tabla, 
-                estadisticas, 
-                tablas_seleccionadas,
-                registros_procesados=total_registros,  # Tabla completada
-                total_registros=total_registros
-            )
-        
+
+        logger.info(f"✅ {tabla}: {registros_guardados} registros guardados en historial")
+
+        # Actualizar progreso en cache con información de la tabla completada
+        _actualizar_progreso_cache(
+            tabla,
+            estadisticas,
+            tablas_seleccionadas,
+            registros_procesados=total_registros,  # Tabla completada
+            total_registros=total_registros
+        )
+
+    try:
+        niveles = planificar_niveles(tablas_seleccionadas, analisis['relaciones'])
+        for numero, nivel in enumerate(niveles, 1):
+            logger.info(f"Nivel {numero}/{len(niveles)}: {nivel}")
+            if max_hilos <= 1 or len(nivel) == 1:
+                for tabla in nivel:
+                    importar(tabla)
+                continue
+            with ThreadPoolExecutor(max_workers=min(max_hilos, len(nivel))) as ejecutor:
+                futuros = [ejecutor.submit(_en_hilo, importar, tabla) for tabla in nivel]
+                for futuro in futuros:
+                    futuro.result()
+
         logger.info("\n=== GUARDADO EN HISTORIAL COMPLETADO EXITOSAMENTE ===")
         logger.info(f"Total de registros guardados: {estadisticas['total_registros_guardados']}")
         logger.info(f"Tablas procesadas: {estadisticas['tablas_procesadas']}")
-        
+
         return estadisticas
-        
+
     except Exception as e:
         logger.error(f"Error guardando datos en historial: {str(e)}", exc_info=True)
         estadisticas['error'] = str(e)
         raise
 
 
+def _modelos_historicos():
+    """Modelo histórico correspondiente a cada tabla de docencia."""
+    from historial import models as historial_models
 
+    return {
+        tabla: getattr(historial_models, nombre_modelo)
+        for tabla, nombre_modelo in DOCENCIA_TABLES_MAPPING.items()
+    }
 
-def _procesar_areas(datos_tabla, ModeloHistorico, mapeo_areas, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
-    """Procesa y guarda áreas en HistoricalArea."""
+
+def _en_hilo(funcion, *args):
+    """Ejecuta `funcion` en un hilo del pool y cierra sus conexiones al terminar."""
+    try:
+        return funcion(*args)
+    finally:
+        connections.close_all()
+
+
+def _procesar_tabla(tabla, datos_tabla, ModeloHistorico, mapeos, analisis, logger,
+                    estadisticas, tablas_seleccionadas, batch_size=None):
+    """Despacha la tabla a su función _procesar_* y devuelve los registros guardados."""
+    contexto = dict(
+        logger=logger,
+        estadisticas=estadisticas,
+        tablas_seleccionadas=tablas_seleccionadas,
+        tabla_actual=tabla,
+        batch_size=batch_size,
+    )
+
+    if tabla == 'Docencia_area':
+        return _procesar_areas(datos_tabla, ModeloHistorico, mapeos[tabla], **contexto)
+
+    if tabla == 'Docencia_coursecategory':
+        return _procesar_categorias(datos_tabla, ModeloHistorico, mapeos[tabla], **contexto)
+
+    if tabla == 'Docencia_courseinformation':
+        return _procesar_cursos(
+            datos_tabla, ModeloHistorico, mapeos[tabla],
+            mapeos['Docencia_area'], mapeos['Docencia_coursecategory'], **contexto
+        )
+
+    if tabla == 'Docencia_courseinformation_adminteachers':
+        return _procesar_admin_teachers(
+            datos_tabla, ModeloHistorico, mapeos['Docencia_courseinformation'], **contexto
+        )
+
+    if tabla == 'Docencia_subjectinformation':
+        return _procesar_asignaturas(
+            datos_tabla, ModeloHistorico, mapeos[tabla], mapeos['Docencia_courseinformation'], **contexto
+        )
+
+    if tabla == 'Docencia_edition':
+        return _procesar_ediciones(
+            datos_tabla, ModeloHistorico, mapeos[tabla], mapeos['Docencia_courseinformation'], **contexto
+        )
+
+    if tabla == 'Docencia_enrollmentapplication':
+        return _procesar_solicitudes(
+            datos_tabla, ModeloHistorico, mapeos[tabla], mapeos['Docencia_courseinformation'], **contexto
+        )
+
+    if tabla == 'Docencia_accountnumber':
+        return _procesar_cuentas(datos_tabla, ModeloHistorico, mapeos[tabla], **contexto)
+
+    if tabla == 'Docencia_enrollmentpay':
+        return _procesar_pagos(
+            datos_tabla, ModeloHistorico,
+            mapeos['Docencia_enrollmentapplication'], mapeos['Docencia_accountnumber'], **contexto
+        )
+
+    if tabla == 'Docencia_enrollment':
+        return _procesar_inscripciones(
+            datos_tabla, ModeloHistorico,
+            mapeos['Docencia_subjectinformation'], mapeos['Docencia_edition'], **contexto
+        )
+
+    if tabla == 'Docencia_application':
+        return _procesar_aplicaciones(
+            datos_tabla, ModeloHistorico, mapeos['Docencia_courseinformation'],
+            mapeos['Docencia_edition'], mapeos[tabla], **contexto,
+            analisis=analisis, mapeos_historicos=mapeos
+        )
+
+    if tabla == 'Docencia_class':
+        return _procesar_clases(
+            datos_tabla, ModeloHistorico, mapeos[tabla], mapeos['Docencia_subjectinformation'], **contexto
+        )
+
+    if tabla == 'Docencia_class_studentView':
+        return _procesar_clases_studentview(
+            datos_tabla, ModeloHistorico, mapeos['Docencia_class'], mapeos['Docencia_application'], **contexto
+        )
+
+    logger.error(f"No se encontró modelo histórico para {tabla}")
+    return 0
+
+
+# ── Importación por lotes ────────────────────────────────────────────────────
+
+def _entero(valor):
+    """Id archivado (int o texto) como int, o None si está vacío o no es numérico."""
+    if valor is None or valor in ('', 'NULL', 'null'):
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _primer_valor(datos, *campos):
+    """Valor del primer campo presente en `datos` (equivale a get() anidados)."""
+    for campo in campos:
+        if campo in datos:
+            return datos[campo]
+    return None
+
+
+def _precargar_usuarios(datos_tabla, campos, batch_size=None):
+    """
+    Conjunto de ids de auth_user referenciados por `campos` en los datos
+    archivados que existen en la base actual. Sustituye al
+    User.objects.get(id=...) por fila: una lectura de los campos JSON y una
+    consulta IN por lote de ids.
+    """
+    referenciados = set()
+    claves = [f'datos_originales__{campo}' for campo in campos]
+    for fila in datos_tabla.order_by().values_list(*claves):
+        for valor in fila:
+            valor = _entero(valor)
+            if valor is not None:
+                referenciados.add(valor)
+
+    existentes = set()
+    for lote in en_lotes(sorted(referenciados), batch_size):
+        existentes.update(User.objects.filter(id__in=lote).values_list('id', flat=True))
+    return existentes
+
+
+def _precargar_mapeo(ModeloHistorico, tabla):
+    """{id_original: pk} de los registros históricos ya guardados de `tabla` (gana el más reciente)."""
+    return dict(
+        ModeloHistorico.objects.filter(tabla_origen=tabla).order_by('pk').values_list('id_original', 'pk')
+    )
+
+
+def _nuevo_historico(ModeloHistorico, dato, tabla, campos_excluir, logger):
+    """Instancia sin guardar con los campos de auditoría y los datos mapeados copiados."""
+    datos = dato.datos_originales
+    objeto = ModeloHistorico(
+        id_original=_entero(datos.get('id')),
+        tabla_origen=tabla,
+        dato_archivado=dato
+    )
+    copiar_campos_a_modelo_historico(
+        objeto, aplicar_mapeo_campos(datos, tabla), campos_excluir=campos_excluir, logger=logger
+    )
+    return objeto
+
+
+def _sumar_error(estadisticas):
+    if estadisticas is not None:
+        with _lock_estadisticas:
+            estadisticas['errores'] = estadisticas.get('errores', 0) + 1
+
+
+def _guardar_lote(ModeloHistorico, objetos, logger, estadisticas=None):
+    """
+    Inserta un lote con un único bulk_create en su propia transacción. Si el
+    INSERT falla, sólo ese lote se reintenta fila a fila (un savepoint por
+    fila) para guardar las filas válidas y registrar las que fallan.
+
+    Returns:
+        list: Instancias guardadas (con pk asignado)
+    """
+    if not objetos:
+        return []
+    try:
+        with transaction.atomic():
+            crear_en_lotes(ModeloHistorico, objetos, batch_size=len(objetos))
+        return objetos
+    except Exception as e:
+        logger.warning(
+            f"Falló la inserción por lotes de {len(objetos)} registros en "
+            f"{ModeloHistorico.__name__}: {e}. Se reintenta fila a fila."
+        )
+
+    guardados = []
+    for objeto in objetos:
+        objeto.pk = None
+        objeto._state.adding = True
+        try:
+            with transaction.atomic():
+                objeto.save(force_insert=True)
+            guardados.append(objeto)
+        except Exception as e:
+            logger.error(
+                f"Error guardando {ModeloHistorico.__name__} (ID original: {objeto.id_original}): {e}"
+            )
+            _sumar_error(estadisticas)
+    return guardados
+
+
+def _importar_por_lotes(datos_tabla, ModeloHistorico, construir, logger, estadisticas=None,
+                        tablas_seleccionadas=None, tabla_actual=None, mapeo=None, batch_size=None):
+    """
+    Importa `datos_tabla` en ModeloHistorico por lotes de `batch_size` filas.
+
+    `construir(dato)` valida la fila en Python y devuelve la instancia sin
+    guardar, o None si la fila debe saltarse (el motivo lo registra la propia
+    función). Cada lote se guarda con _guardar_lote y el progreso en cache se
+    actualiza una vez por lote. Si se pasa `mapeo`, se completa con
+    {id_original: pk} para las tablas que referencian a ésta.
+
+    Returns:
+        int: Número de registros guardados
+    """
+    batch_size = batch_size or BATCH_SIZE_INSERCION
+    total_registros = datos_tabla.count()
     registros_guardados = 0
-    
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
-    
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
+    procesados = 0
+    ultimo_pk = 0
+
+    while True:
+        # Paginación por pk: cada lote es una consulta corta, sin cursores abiertos
+        lote = list(datos_tabla.filter(pk__gt=ultimo_pk).order_by('pk')[:batch_size])
+        if not lote:
+            break
+        ultimo_pk = lote[-1].pk
+
+        objetos = []
+        for dato in lote:
             try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_area')
-                
-                # Crear nueva área histórica
-                area = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen='Docencia_area',
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(area, datos_mapeados, campos_excluir=['id', 'pk'], logger=logger)
-                completar_campos_obligatorios(area, logger=logger)
-                area.save()
-                
-                # Guardar mapeo
-                mapeo_areas[id_original] = area
-                registros_guardados += 1
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                logger.debug(f"Área guardada: {area.nombre} (ID original: {id_original})")
-                
+                objeto = construir(dato)
             except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando área: {str(e)}")
+                logger.error(f"Error procesando registro {dato.id_original} de {tabla_actual}: {str(e)}")
+                _sumar_error(estadisticas)
                 continue
-    
+            if objeto is None:
+                continue
+            if objeto.id_original is None:
+                logger.warning(f"Registro {dato.pk} de {tabla_actual} sin id original válido")
+                continue
+            objetos.append(objeto)
+
+        guardados = _guardar_lote(ModeloHistorico, objetos, logger, estadisticas)
+        if mapeo is not None:
+            for objeto in guardados:
+                mapeo[objeto.id_original] = objeto.pk
+        registros_guardados += len(guardados)
+        procesados += len(lote)
+
+        if estadisticas is not None and tablas_seleccionadas and tabla_actual:
+            _actualizar_progreso_cache(
+                tabla_actual,
+                estadisticas,
+                tablas_seleccionadas,
+                registros_procesados=procesados,
+                total_registros=total_registros
+            )
+        logger.debug(f"{tabla_actual}: {procesados}/{total_registros} registros procesados")
+
     return registros_guardados
 
 
-def _procesar_categorias(datos_tabla, ModeloHistorico, mapeo_categorias, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+# ── Procesadores por tabla ───────────────────────────────────────────────────
+
+def _procesar_areas(datos_tabla, ModeloHistorico, mapeo_areas, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
+    """Procesa y guarda áreas en HistoricalArea."""
+    def construir(dato):
+        area = _nuevo_historico(ModeloHistorico, dato, 'Docencia_area', ['id', 'pk'], logger)
+        completar_campos_obligatorios(area, logger=logger)
+        return area
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, mapeo=mapeo_areas, batch_size=batch_size
+    )
+
+
+def _procesar_categorias(datos_tabla, ModeloHistorico, mapeo_categorias, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """Procesa y guarda categorías en HistoricalCourseCategory."""
-    registros_guardados = 0
-    
     # Primer paso: crear todas las categorías sin parent
     categorias_pendientes = []
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
 
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                parent_id = datos.get('parent_id')
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_coursecategory')
-                
-                # Crear categoría
-                categoria = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen='Docencia_coursecategory',
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(
-                    categoria, datos_mapeados, 
-                    campos_excluir=['id', 'pk', 'parent_id', 'parent'], 
-                    logger=logger
-                )
-                completar_campos_obligatorios(categoria, logger=logger)
-                categoria.save()
-                
-                # Guardar mapeo
-                mapeo_categorias[id_original] = categoria
-                registros_guardados += 1
-                
-                # Si tiene parent, guardar para procesar después
-                if parent_id:
-                    categorias_pendientes.append((categoria, parent_id))
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                logger.debug(f"Categoría guardada: {categoria.nombre} (ID original: {id_original})")
-                
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando categoría: {str(e)}")
-                continue
-    
-    # Segundo paso: asignar relaciones parent
-    with transaction.atomic():
-        for categoria, parent_id in categorias_pendientes:
-            try:
-                if parent_id in mapeo_categorias:
-                    categoria.parent = mapeo_categorias[parent_id]
-                    completar_campos_obligatorios(categoria, logger=logger)
-                    categoria.save()
-                    logger.debug(f"Parent asignado a categoría {categoria.nombre}")
-            except Exception as e:
-                logger.error(f"Error asignando parent a categoría: {str(e)}")
-    
-    return registros_guardados
+    def construir(dato):
+        categoria = _nuevo_historico(
+            ModeloHistorico, dato, 'Docencia_coursecategory',
+            ['id', 'pk', 'parent_id', 'parent'], logger
+        )
+        completar_campos_obligatorios(categoria, logger=logger)
+        parent_id = _entero(dato.datos_originales.get('parent_id'))
+        if parent_id:
+            categorias_pendientes.append((categoria, parent_id))
+        return categoria
+
+    registros_guardados = _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, mapeo=mapeo_categorias, batch_size=batch_size
+    )
 
+    # Segundo paso: asignar relaciones parent con un UPDATE por lote
+    actualizar = []
+    for categoria, parent_id in categorias_pendientes:
+        if categoria.pk and parent_id in mapeo_categorias:
+            categoria.parent_id = mapeo_categorias[parent_id]
+            actualizar.append(categoria)
+    try:
+        with transaction.atomic():
+            ModeloHistorico.objects.bulk_update(actualizar, ['parent'], batch_size=batch_size or BATCH_SIZE_INSERCION)
+    except Exception as e:
+        logger.error(f"Error asignando parent a categorías: {str(e)}")
 
+    return registros_guardados
 
 
-def _procesar_cursos(datos_tabla, ModeloHistorico, mapeo_cursos, mapeo_areas, mapeo_categorias, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_cursos(datos_tabla, ModeloHistorico, mapeo_cursos, mapeo_areas, mapeo_categorias, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """Procesa y guarda cursos en HistoricalCourseInformation."""
-    registros_guardados = 0
-    
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
-    
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                area_id = datos.get('area_id')
-                categoria_id = datos.get('categoria_id')
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_courseinformation')
-                
-                # Crear curso
-                curso = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen='Docencia_courseinformation',
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(
-                    curso, datos_mapeados, 
-                    campos_excluir=['id', 'pk', 'area_id', 'categoria_id', 'area', 'categoria'], 
-                    logger=logger
-                )
-                
-                # Asignar relaciones FK
-                if area_id and area_id in mapeo_areas:
-                    curso.area = mapeo_areas[area_id]
-                
-                if categoria_id and categoria_id in mapeo_categorias:
-                    curso.categoria = mapeo_categorias[categoria_id]
-                
-                completar_campos_obligatorios(curso, logger=logger)
-                curso.save()
-                
-                # Guardar mapeo
-                mapeo_cursos[id_original] = curso
-                registros_guardados += 1
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                logger.debug(f"Curso guardado: {curso.nombre} (ID original: {id_original})")
-                
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando curso: {str(e)}")
-                continue
-    
-    return registros_guardados
+    def construir(dato):
+        datos = dato.datos_originales
+        curso = _nuevo_historico(
+            ModeloHistorico, dato, 'Docencia_courseinformation',
+            ['id', 'pk', 'area_id', 'categoria_id', 'area', 'categoria'], logger
+        )
+        # Asignar relaciones FK
+        curso.area_id = mapeo_areas.get(_entero(datos.get('area_id')))
+        curso.categoria_id = mapeo_categorias.get(_entero(datos.get('categoria_id')))
+        completar_campos_obligatorios(curso, logger=logger)
+        return curso
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, mapeo=mapeo_cursos, batch_size=batch_size
+    )
 
 
-def _procesar_admin_teachers(datos_tabla, ModeloHistorico, mapeo_cursos, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_admin_teachers(datos_tabla, ModeloHistorico, mapeo_cursos, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """Procesa y guarda relaciones curso-profesor en HistoricalCourseInformationAdminTeachers."""
-    registros_guardados = 0
-    
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
-    
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                curso_id = datos.get('courseinformation_id')
-                profesor_id = datos.get('user_id')
-                
-                # Validar que existan las relaciones
-                if not curso_id or curso_id not in mapeo_cursos:
-                    logger.warning(f"Curso no encontrado: {curso_id}")
-                    transaction.savepoint_rollback(sid)
-                    continue
-                
-                if not profesor_id:
-                    logger.warning(f"Profesor ID no encontrado")
-                    transaction.savepoint_rollback(sid)
-                    continue
-                
-                try:
-                    profesor = User.objects.get(id=profesor_id)
-                except User.DoesNotExist:
-                    logger.warning(f"Usuario profesor no encontrado: {profesor_id}")
-                    transaction.savepoint_rollback(sid)
-                    continue
-                
-                curso = mapeo_cursos[curso_id]
-                id_original = datos.get('id')
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_courseinformation_adminteachers')
-                
-                # Crear relación (evitar duplicados)
-                relacion, created = ModeloHistorico.objects.get_or_create(
-                    id_original=id_original,
-                    tabla_origen='Docencia_courseinformation_adminteachers',
-                    dato_archivado=dato,
-                    defaults={
-                        'curso': curso,
-                        'profesor': profesor
-                    }
-                )
-                
-                if created:
-                    registros_guardados += 1
-                    logger.debug(f"Relación curso-profesor guardada: {curso.nombre} - {profesor.username}")
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando admin teacher: {str(e)}")
-                continue
-    
-    return registros_guardados
-
-
+    usuarios = _precargar_usuarios(datos_tabla, ['user_id'], batch_size)
+    # Pares (curso, profesor) ya guardados: la relación es única
+    existentes = set(ModeloHistorico.objects.values_list('curso_id', 'profesor_id'))
+
+    def construir(dato):
+        datos = dato.datos_originales
+        curso_id = mapeo_cursos.get(_entero(datos.get('courseinformation_id')))
+        profesor_id = _entero(datos.get('user_id'))
+
+        # Validar que existan las relaciones
+        if not curso_id:
+            logger.warning(f"Curso no encontrado: {datos.get('courseinformation_id')}")
+            return None
+        if profesor_id not in usuarios:
+            logger.warning(f"Usuario profesor no encontrado: {datos.get('user_id')}")
+            return None
+        if (curso_id, profesor_id) in existentes:
+            return None
+        existentes.add((curso_id, profesor_id))
+
+        return ModeloHistorico(
+            id_original=_entero(datos.get('id')),
+            tabla_origen='Docencia_courseinformation_adminteachers',
+            dato_archivado=dato,
+            curso_id=curso_id,
+            profesor_id=profesor_id
+        )
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, batch_size=batch_size
+    )
 
 
-def _procesar_asignaturas(datos_tabla, ModeloHistorico, mapeo_asignaturas, mapeo_cursos, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_asignaturas(datos_tabla, ModeloHistorico, mapeo_asignaturas, mapeo_cursos, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """Procesa y guarda asignaturas en HistoricalSubjectInformation."""
-    registros_guardados = 0
-    
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
-    
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                curso_id = datos.get('curso_id', datos.get('course_id'))
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_subjectinformation')
-                
-                # Crear asignatura
-                asignatura = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen='Docencia_subjectinformation',
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(
-                    asignatura, datos_mapeados, 
-                    campos_excluir=['id', 'pk', 'curso_id', 'course_id', 'curso', 'course'], 
-                    logger=logger
-                )
-                
-                # Asignar relación FK
-                if curso_id and curso_id in mapeo_cursos:
-                    asignatura.curso = mapeo_cursos[curso_id]
-                
-                completar_campos_obligatorios(asignatura, logger=logger)
-                asignatura.save()
-                
-                # Guardar mapeo
-                mapeo_asignaturas[id_original] = asignatura
-                registros_guardados += 1
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                logger.debug(f"Asignatura guardada: {asignatura.nombre} (ID original: {id_original})")
-                
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando asignatura: {str(e)}")
-                continue
-    
-    return registros_guardados
+    def construir(dato):
+        datos = dato.datos_originales
+        asignatura = _nuevo_historico(
+            ModeloHistorico, dato, 'Docencia_subjectinformation',
+            ['id', 'pk', 'curso_id', 'course_id', 'curso', 'course'], logger
+        )
+        # Asignar relación FK
+        asignatura.curso_id = mapeo_cursos.get(_entero(_primer_valor(datos, 'curso_id', 'course_id')))
+        completar_campos_obligatorios(asignatura, logger=logger)
+        return asignatura
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, mapeo=mapeo_asignaturas, batch_size=batch_size
+    )
 
 
-def _procesar_ediciones(datos_tabla, ModeloHistorico, mapeo_ediciones, mapeo_cursos, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_ediciones(datos_tabla, ModeloHistorico, mapeo_ediciones, mapeo_cursos, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """Procesa y guarda ediciones en HistoricalEdition."""
-    registros_guardados = 0
-    
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
-    
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                curso_id = datos.get('curso_id', datos.get('course_id'))
-                instructor_id = datos.get('instructor_id')
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_edition')
-                
-                # Crear edición
-                edicion = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen='Docencia_edition',
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(
-                    edicion, datos_mapeados, 
-                    campos_excluir=['id', 'pk', 'curso_id', 'course_id', 'instructor_id', 'curso', 'course', 'instructor'], 
-                    logger=logger
-                )
-                
-                # Asignar relaciones FK
-                if curso_id and curso_id in mapeo_cursos:
-                    edicion.curso = mapeo_cursos[curso_id]
-                
-                if instructor_id:
-                    try:
-                        instructor = User.objects.get(id=instructor_id)
-                        edicion.instructor = instructor
-                    except User.DoesNotExist:
-                        logger.warning(f"Instructor no encontrado: {instructor_id}")
-                
-                completar_campos_obligatorios(edicion, logger=logger)
-                edicion.save()
-                
-                # Guardar mapeo
-                mapeo_ediciones[id_original] = edicion
-                registros_guardados += 1
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                logger.debug(f"Edición guardada: {edicion.nombre} (ID original: {id_original})")
-                
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando edición: {str(e)}")
-                continue
-    
-    return registros_guardados
-
-
+    usuarios = _precargar_usuarios(datos_tabla, ['instructor_id'], batch_size)
+
+    def construir(dato):
+        datos = dato.datos_originales
+        edicion = _nuevo_historico(
+            ModeloHistorico, dato, 'Docencia_edition',
+            ['id', 'pk', 'curso_id', 'course_id', 'instructor_id', 'curso', 'course', 'instructor'], logger
+        )
+        # Asignar relaciones FK
+        edicion.curso_id = mapeo_cursos.get(_entero(_primer_valor(datos, 'curso_id', 'course_id')))
+        instructor_id = _entero(datos.get('instructor_id'))
+        if instructor_id in usuarios:
+            edicion.instructor_id = instructor_id
+        elif instructor_id:
+            logger.warning(f"Instructor no encontrado: {instructor_id}")
+        completar_campos_obligatorios(edicion, logger=logger)
+        return edicion
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, mapeo=mapeo_ediciones, batch_size=batch_size
+    )
 
 
-def _procesar_solicitudes(datos_tabla, ModeloHistorico, mapeo_solicitudes, mapeo_cursos, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_solicitudes(datos_tabla, ModeloHistorico, mapeo_solicitudes, mapeo_cursos, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """Procesa y guarda solicitudes de inscripción en HistoricalEnrollmentApplication."""
-    registros_guardados = 0
-    
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
-    
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                curso_id = datos.get('curso_id', datos.get('course_id'))
-                usuario_id = datos.get('usuario_id', datos.get('user_id', datos.get('student_id')))
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_enrollmentapplication')
-                
-                # Crear solicitud
-                solicitud = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen='Docencia_enrollmentapplication',
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(
-                    solicitud, datos_mapeados, 
-                    campos_excluir=['id', 'pk', 'curso_id', 'course_id', 'usuario_id', 'user_id', 'curso', 'course', 'usuario', 'user'], 
-                    logger=logger
-                )
-                
-                # Asignar relaciones FK
-                if curso_id and curso_id in mapeo_cursos:
-                    solicitud.curso = mapeo_cursos[curso_id]
-                
-                if usuario_id:
-                    try:
-                        usuario = User.objects.get(id=usuario_id)
-                        solicitud.usuario = usuario
-                    except User.DoesNotExist:
-                        logger.warning(f"Usuario no encontrado: {usuario_id}")
-                
-                completar_campos_obligatorios(solicitud, logger=logger)
-                solicitud.save()
-                
-                # Guardar mapeo
-                mapeo_solicitudes[id_original] = solicitud
-                registros_guardados += 1
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                logger.debug(f"Solicitud guardada (ID original: {id_original})")
-                
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando solicitud: {str(e)}")
-                continue
-    
-    return registros_guardados
+    campos_usuario = ('usuario_id', 'user_id', 'student_id')
+    usuarios = _precargar_usuarios(datos_tabla, campos_usuario, batch_size)
+
+    def construir(dato):
+        datos = dato.datos_originales
+        solicitud = _nuevo_historico(
+            ModeloHistorico, dato, 'Docencia_enrollmentapplication',
+            ['id', 'pk', 'curso_id', 'course_id', 'usuario_id', 'user_id', 'curso', 'course', 'usuario', 'user'], logger
+        )
+        # Asignar relaciones FK
+        solicitud.curso_id = mapeo_cursos.get(_entero(_primer_valor(datos, 'curso_id', 'course_id')))
+        usuario_id = _entero(_primer_valor(datos, *campos_usuario))
+        if usuario_id in usuarios:
+            solicitud.usuario_id = usuario_id
+        elif usuario_id:
+            logger.warning(f"Usuario no encontrado: {usuario_id}")
+        completar_campos_obligatorios(solicitud, logger=logger)
+        return solicitud
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, mapeo=mapeo_solicitudes, batch_size=batch_size
+    )
 
 
-def _procesar_cuentas(datos_tabla, ModeloHistorico, mapeo_cuentas, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_cuentas(datos_tabla, ModeloHistorico, mapeo_cuentas, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """Procesa y guarda cuentas bancarias en HistoricalAccountNumber."""
-    registros_guardados = 0
-    
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
-    
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                usuario_id = datos.get('usuario_id', datos.get('user_id', datos.get('student_id')))
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_accountnumber')
-                
-                # Crear cuenta
-                cuenta = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen='Docencia_accountnumber',
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(
-                    cuenta, datos_mapeados, 
-                    campos_excluir=['id', 'pk', 'usuario_id', 'user_id', 'usuario', 'user'], 
-                    logger=logger
-                )
-                
-                # Asignar relación FK
-                if usuario_id:
-                    try:
-                        usuario = User.objects.get(id=usuario_id)
-                        cuenta.usuario = usuario
-                    except User.DoesNotExist:
-                        logger.warning(f"Usuario no encontrado: {usuario_id}")
-                
-                completar_campos_obligatorios(cuenta, logger=logger)
-                cuenta.save()
-                
-                # Guardar mapeo
-                mapeo_cuentas[id_original] = cuenta
-                registros_guardados += 1
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                logger.debug(f"Cuenta guardada: {cuenta.numero_cuenta} (ID original: {id_original})")
-                
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando cuenta: {str(e)}")
-                continue
-    
-    return registros_guardados
-
-
+    campos_usuario = ('usuario_id', 'user_id', 'student_id')
+    usuarios = _precargar_usuarios(datos_tabla, campos_usuario, batch_size)
+
+    def construir(dato):
+        datos = dato.datos_originales
+        cuenta = _nuevo_historico(
+            ModeloHistorico, dato, 'Docencia_accountnumber',
+            ['id', 'pk', 'usuario_id', 'user_id', 'usuario', 'user'], logger
+        )
+        # Asignar relación FK
+        usuario_id = _entero(_primer_valor(datos, *campos_usuario))
+        if usuario_id in usuarios:
+            cuenta.usuario_id = usuario_id
+        elif usuario_id:
+            logger.warning(f"Usuario no encontrado: {usuario_id}")
+        completar_campos_obligatorios(cuenta, logger=logger)
+        return cuenta
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, mapeo=mapeo_cuentas, batch_size=batch_size
+    )
 
 
-def _procesar_pagos(datos_tabla, ModeloHistorico, mapeo_solicitudes, mapeo_cuentas, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_pagos(datos_tabla, ModeloHistorico, mapeo_solicitudes, mapeo_cuentas, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """Procesa y guarda pagos en HistoricalEnrollmentPay."""
-    registros_guardados = 0
-    
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
-    
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                solicitud_id = datos.get('solicitud_id', datos.get('application_id'))
-                cuenta_id = datos.get('cuenta_id', datos.get('account_id'))
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_enrollmentpay')
-                
-                # Crear pago
-                pago = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen='Docencia_enrollmentpay',
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(
-                    pago, datos_mapeados, 
-                    campos_excluir=['id', 'pk', 'solicitud_id', 'application_id', 'cuenta_id', 'account_id', 'solicitud', 'application', 'cuenta', 'account'], 
-                    logger=logger
-                )
-                
-                # Asignar relaciones FK
-                if solicitud_id and solicitud_id in mapeo_solicitudes:
-                    pago.solicitud = mapeo_solicitudes[solicitud_id]
-                
-                if cuenta_id and cuenta_id in mapeo_cuentas:
-                    pago.cuenta = mapeo_cuentas[cuenta_id]
-                
-                completar_campos_obligatorios(pago, logger=logger)
-                pago.save()
-                registros_guardados += 1
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                logger.debug(f"Pago guardado: {pago.monto}")
-                
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando pago: {str(e)}")
-                continue
-    
-    return registros_guardados
+    def construir(dato):
+        datos = dato.datos_originales
+        pago = _nuevo_historico(
+            ModeloHistorico, dato, 'Docencia_enrollmentpay',
+            ['id', 'pk', 'solicitud_id', 'application_id', 'cuenta_id', 'account_id',
+             'solicitud', 'application', 'cuenta', 'account'], logger
+        )
+        # Asignar relaciones FK
+        pago.solicitud_id = mapeo_solicitudes.get(_entero(_primer_valor(datos, 'solicitud_id', 'application_id')))
+        pago.cuenta_id = mapeo_cuentas.get(_entero(_primer_valor(datos, 'cuenta_id', 'account_id')))
+        completar_campos_obligatorios(pago, logger=logger)
+        return pago
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, batch_size=batch_size
+    )
 
 
-def _procesar_inscripciones(datos_tabla, ModeloHistorico, mapeo_asignaturas, mapeo_ediciones, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_inscripciones(datos_tabla, ModeloHistorico, mapeo_asignaturas, mapeo_ediciones, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """Procesa y guarda inscripciones en HistoricalEnrollment."""
-    registros_guardados = 0
-    
-    
-    # Obtener total de registros para progreso
-    total_registros = len(datos_tabla)
-    
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                curso_id = datos.get('curso_id', datos.get('course_id'))
-                usuario_id = datos.get('usuario_id', datos.get('user_id', datos.get('student_id')))
-                edicion_id = datos.get('edicion_id', datos.get('edition_id'))
-                
-                # Aplicar mapeo de campos
-                datos_mapeados = aplicar_mapeo_campos(datos, 'Docencia_enrollment')
-                
-                # Crear inscripción
-                inscripcion = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen='Docencia_enrollment',
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(
-                    inscripcion, datos_mapeados, 
-                    campos_excluir=['id', 'pk', 'curso_id', 'course_id', 'usuario_id', 'user_id', 'edicion_id', 'edition_id', 'curso', 'course', 'usuario', 'user', 'edicion', 'edition'], 
-                    logger=logger
-                )
-                
-                # Asignar relaciones FK
-                if curso_id and curso_id in mapeo_asignaturas:
-                    inscripcion.curso = mapeo_asignaturas[curso_id]
-                
-                if usuario_id:
-                    try:
-                        usuario = User.objects.get(id=usuario_id)
-                        inscripcion.usuario = usuario
-                    except User.DoesNotExist:
-                        logger.warning(f"Usuario no encontrado: {usuario_id}")
-                
-                if edicion_id and edicion_id in mapeo_ediciones:
-                    inscripcion.edicion = mapeo_ediciones[edicion_id]
-                
-                completar_campos_obligatorios(inscripcion, logger=logger)
-                inscripcion.save()
-                registros_guardados += 1
-                
-                transaction.savepoint_commit(sid)
-                
-                # Actualizar progreso cada 100 registros o al final
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=i,
-                        total_registros=total_registros
-                    )
-                logger.debug(f"Inscripción guardada")
-                
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando inscripción: {str(e)}")
-                continue
-    
-    return registros_guardados
-
-
+    campos_usuario = ('usuario_id', 'user_id', 'student_id')
+    usuarios = _precargar_usuarios(datos_tabla, campos_usuario, batch_size)
+
+    def construir(dato):
+        datos = dato.datos_originales
+        inscripcion = _nuevo_historico(
+            ModeloHistorico, dato, 'Docencia_enrollment',
+            ['id', 'pk', 'curso_id', 'course_id', 'usuario_id', 'user_id', 'edicion_id', 'edition_id',
+             'curso', 'course', 'usuario', 'user', 'edicion', 'edition'], logger
+        )
+        # Asignar relaciones FK
+        inscripcion.curso_id = mapeo_asignaturas.get(_entero(_primer_valor(datos, 'curso_id', 'course_id')))
+        usuario_id = _entero(_primer_valor(datos, *campos_usuario))
+        if usuario_id in usuarios:
+            inscripcion.usuario_id = usuario_id
+        elif usuario_id:
+            logger.warning(f"Usuario no encontrado: {usuario_id}")
+        inscripcion.edicion_id = mapeo_ediciones.get(_entero(_primer_valor(datos, 'edicion_id', 'edition_id')))
+        completar_campos_obligatorios(inscripcion, logger=logger)
+        return inscripcion
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, batch_size=batch_size
+    )
 
 
-def _procesar_aplicaciones(datos_tabla, ModeloHistorico, mapeo_cursos, mapeo_ediciones, mapeo_aplicaciones, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, analisis=None, mapeos_historicos=None):
+def _procesar_aplicaciones(datos_tabla, ModeloHistorico, mapeo_cursos, mapeo_ediciones, mapeo_aplicaciones, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None, analisis=None, mapeos_historicos=None):
     """Procesa y guarda aplicaciones en HistoricalApplication usando resolver_fk."""
-    registros_guardados = 0
-    total_registros = len(datos_tabla)
     tabla = 'Docencia_application'
-
-    with transaction.atomic():
-        for i, dato in enumerate(datos_tabla, 1):
-            try:
-                sid = transaction.savepoint()
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-
-                datos_mapeados = aplicar_mapeo_campos(datos, tabla)
-
-                aplicacion = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen=tabla,
-                    dato_archivado=dato
-                )
-                copiar_campos_a_modelo_historico(
-                    aplicacion, datos_mapeados,
-                    campos_excluir=['id', 'pk', 'curso_id', 'course_id', 'usuario_id',
-                                    'user_id', 'student_id', 'edicion_id', 'edition_id',
-                                    'curso', 'course', 'usuario', 'user', 'edicion', 'edition'],
-                    logger=logger
-                )
-
-                # Resolver FK usando el análisis automático si está disponible
-                if analisis and mapeos_historicos:
-                    for campo_fk in ('course_id', 'curso_id', 'edition_id', 'edicion_id',
-                                     'student_id', 'user_id', 'usuario_id'):
-                        valor = datos.get(campo_fk)
-                        if valor is None:
-                            continue
-                        obj = resolver_fk(campo_fk, valor, tabla, analisis, mapeos_historicos)
-                        if obj is None:
-                            continue
-                        # Asignar al campo correcto del modelo
-                        if campo_fk in ('course_id', 'curso_id'):
-                            aplicacion.curso = obj
-                        elif campo_fk in ('edition_id', 'edicion_id'):
-                            aplicacion.edicion = obj
-                        elif campo_fk in ('student_id', 'user_id', 'usuario_id'):
-                            # resolver_fk devuelve User para student_id y user_id
-                            if hasattr(obj, 'username'):
-                                aplicacion.usuario = obj
+    campos_usuario = ('usuario_id', 'user_id', 'student_id')
+    usuarios = set() if analisis and mapeos_historicos else _precargar_usuarios(datos_tabla, campos_usuario, batch_size)
+
+    def construir(dato):
+        datos = dato.datos_originales
+        aplicacion = _nuevo_historico(
+            ModeloHistorico, dato, tabla,
+            ['id', 'pk', 'curso_id', 'course_id', 'usuario_id', 'user_id', 'student_id', 'edicion_id',
+             'edition_id', 'curso', 'course', 'usuario', 'user', 'edicion', 'edition'], logger
+        )
+
+        # Resolver FK usando el análisis automático si está disponible
+        if analisis and mapeos_historicos:
+            for campo_fk in ('course_id', 'curso_id', 'edition_id', 'edicion_id',
+                             'student_id', 'user_id', 'usuario_id'):
+                valor = datos.get(campo_fk)
+                if valor is None:
+                    continue
+                obj = resolver_fk(campo_fk, valor, tabla, analisis, mapeos_historicos)
+                if obj is None:
+                    continue
+                # resolver_fk devuelve User para student_id y user_id, y el pk
+                # del registro histórico para las tablas de docencia
+                if campo_fk in ('student_id', 'user_id', 'usuario_id'):
+                    if isinstance(obj, User):
+                        aplicacion.usuario_id = obj.pk
+                elif isinstance(obj, User):
+                    continue
+                elif campo_fk in ('course_id', 'curso_id'):
+                    aplicacion.curso_id = obj
                 else:
-                    # Fallback a lógica anterior
-                    curso_id = datos.get('curso_id', datos.get('course_id'))
-                    usuario_id = datos.get('usuario_id', datos.get('user_id', datos.get('student_id')))
-                    edicion_id = datos.get('edicion_id', datos.get('edition_id'))
-                    if curso_id and curso_id in mapeo_cursos:
-                        aplicacion.curso = mapeo_cursos[curso_id]
-                    if usuario_id:
-                        try:
-                            aplicacion.usuario = User.objects.get(id=usuario_id)
-                        except User.DoesNotExist:
-                            logger.warning(f"Usuario no encontrado: {usuario_id}")
-                    if edicion_id and edicion_id in mapeo_ediciones:
-                        aplicacion.edicion = mapeo_ediciones[edicion_id]
-
-                completar_campos_obligatorios(aplicacion, logger=logger)
-                aplicacion.save()
-                registros_guardados += 1
-                mapeo_aplicaciones[id_original] = aplicacion
-                if mapeos_historicos:
-                    mapeos_historicos.setdefault(tabla, {})[id_original] = aplicacion
-
-                transaction.savepoint_commit(sid)
-
-                if estadisticas and tablas_seleccionadas and tabla_actual and (i % 100 == 0 or i == total_registros):
-                    _actualizar_progreso_cache(tabla_actual, estadisticas, tablas_seleccionadas,
-                                               registros_procesados=i, total_registros=total_registros)
-                logger.debug("Aplicación guardada")
-
-            except Exception as e:
-                transaction.savepoint_rollback(sid)
-                logger.error(f"Error procesando aplicación: {str(e)}")
-                continue
-
-    return registros_guardados
-
+                    aplicacion.edicion_id = obj
+        else:
+            # Fallback a lógica anterior
+            aplicacion.curso_id = mapeo_cursos.get(_entero(_primer_valor(datos, 'curso_id', 'course_id')))
+            usuario_id = _entero(_primer_valor(datos, *campos_usuario))
+            if usuario_id in usuarios:
+                aplicacion.usuario_id = usuario_id
+            elif usuario_id:
+                logger.warning(f"Usuario no encontrado: {usuario_id}")
+            aplicacion.edicion_id = mapeo_ediciones.get(_entero(_primer_valor(datos, 'edicion_id', 'edition_id')))
+
+        completar_campos_obligatorios(aplicacion, logger=logger)
+        return aplicacion
+
+    return _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, mapeo=mapeo_aplicaciones, batch_size=batch_size
+    )
 
 
-def _procesar_clases(datos_tabla, ModeloHistorico, mapeo_clases, mapeo_asignaturas, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_clases(datos_tabla, ModeloHistorico, mapeo_clases, mapeo_asignaturas, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """
     Procesa y guarda registros de Docencia_class en HistoricalClass.
-    
+
     Args:
         datos_tabla: QuerySet con los datos a procesar
         ModeloHistorico: Modelo HistoricalClass
@@ -1428,174 +1179,116 @@ def _procesar_clases(datos_tabla, ModeloHistorico, mapeo_clases, mapeo_asignatur
         estadisticas: Diccionario de estadísticas (opcional)
         tablas_seleccionadas: Lista de tablas seleccionadas (opcional)
         tabla_actual: Nombre de la tabla actual (opcional)
-    
+        batch_size: Filas por lote (opcional)
+
     Returns:
         int: Número de registros guardados
     """
-    registros_guardados = 0
-    total_registros = datos_tabla.count()
-    
-    logger.info(f"Procesando {total_registros} clases...")
-    
-    with transaction.atomic():
-        for idx, dato in enumerate(datos_tabla, 1):
-            try:
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                
-                # Obtener subject_id (FK a HistoricalSubjectInformation)
-                subject_id_original = datos.get('subject_id')
-                subject = None
-                
-                if subject_id_original and mapeo_asignaturas:
-                    subject = mapeo_asignaturas.get(subject_id_original)
-                    if not subject:
-                        logger.warning(f"No se encontró asignatura con ID original {subject_id_original} para clase {id_original}")
-                
-                # Crear registro histórico
-                clase_historica = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen=dato.tabla_origen,
-                    name=datos.get('name', ''),
-                    classbody=datos.get('classbody', ''),
-                    uploaddate=datos.get('uploaddate'),
-                    datepub=datos.get('datepub'),
-                    dateend=datos.get('dateend'),
-                    slug=datos.get('slug', ''),
-                    subject=subject
-                )
-                
-                # Completar campos obligatorios
-                completar_campos_obligatorios(clase_historica, logger)
-                
-                # Guardar
-                clase_historica.save()
-                
-                # Guardar en mapeo para referencias futuras
-                mapeo_clases[id_original] = clase_historica
-                
-                registros_guardados += 1
-                
-                # Actualizar progreso cada 10 registros
-                if idx % 10 == 0 or idx == total_registros:
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=idx,
-                        total_registros=total_registros
-                    )
-                    logger.info(f"Progreso: {idx}/{total_registros} clases procesadas")
-                
-            except Exception as e:
-                logger.error(f"Error procesando clase {datos.get('id')}: {str(e)}")
-                if estadisticas:
-                    estadisticas['errores'] = estadisticas.get('errores', 0) + 1
-                continue
-    
-    logger.info(f"✅ Clases procesadas: {registros_guardados}/{total_registros}")
+    def construir(dato):
+        datos = dato.datos_originales
+        id_original = _entero(datos.get('id'))
+
+        # Obtener subject_id (FK a HistoricalSubjectInformation)
+        subject_id_original = _entero(datos.get('subject_id'))
+        subject_id = mapeo_asignaturas.get(subject_id_original)
+        if subject_id_original and not subject_id:
+            logger.warning(f"No se encontró asignatura con ID original {subject_id_original} para clase {id_original}")
+
+        # Crear registro histórico
+        clase_historica = ModeloHistorico(
+            id_original=id_original,
+            tabla_origen=dato.tabla_origen,
+            dato_archivado=dato,
+            name=datos.get('name', ''),
+            classbody=datos.get('classbody', ''),
+            uploaddate=datos.get('uploaddate'),
+            datepub=datos.get('datepub'),
+            dateend=datos.get('dateend'),
+            slug=datos.get('slug', ''),
+            subject_id=subject_id
+        )
+        completar_campos_obligatorios(clase_historica, logger)
+        return clase_historica
+
+    registros_guardados = _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, mapeo=mapeo_clases, batch_size=batch_size
+    )
+    logger.info(f"✅ Clases procesadas: {registros_guardados}")
     return registros_guardados
 
 
-def _procesar_clases_studentview(datos_tabla, ModeloHistorico, mapeo_clases, mapeo_aplicaciones, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None):
+def _procesar_clases_studentview(datos_tabla, ModeloHistorico, mapeo_clases, mapeo_aplicaciones, logger, estadisticas=None, tablas_seleccionadas=None, tabla_actual=None, batch_size=None):
     """
     Procesa y guarda registros de Docencia_class_studentView en HistoricalClassStudentView.
-    
+
     Args:
         datos_tabla: QuerySet con los datos a procesar
         ModeloHistorico: Modelo HistoricalClassStudentView
         mapeo_clases: Diccionario con mapeo de clases (FK)
-        mapeo_solicitudes: Diccionario con mapeo de solicitudes/applications (FK)
+        mapeo_aplicaciones: Diccionario con mapeo de applications (FK)
         logger: Logger para registrar operaciones
         estadisticas: Diccionario de estadísticas (opcional)
         tablas_seleccionadas: Lista de tablas seleccionadas (opcional)
         tabla_actual: Nombre de la tabla actual (opcional)
-    
+        batch_size: Filas por lote (opcional)
+
     Returns:
         int: Número de registros guardados
     """
-    registros_guardados = 0
-    total_registros = datos_tabla.count()
-    
-    logger.info(f"Procesando {total_registros} vistas de clase-estudiante...")
-    
-    with transaction.atomic():
-        for idx, dato in enumerate(datos_tabla, 1):
-            try:
-                datos = dato.datos_originales
-                id_original = datos.get('id')
-                
-                # Obtener class_id (FK a HistoricalClass)
-                class_id_original = datos.get('class_id')
-                clase = None
-                
-                if class_id_original and mapeo_clases:
-                    clase = mapeo_clases.get(class_id_original)
-                    if not clase:
-                        logger.warning(f"No se encontró clase con ID original {class_id_original} para studentview {id_original}")
-                
-                # Obtener application_id (FK a HistoricalApplication)
-                application_id_original = datos.get('application_id')
-                application = None
-                
-                if application_id_original and mapeo_aplicaciones:
-                    application = mapeo_aplicaciones.get(application_id_original)
-                    if not application:
-                        logger.warning(f"No se encontró application con ID original {application_id_original} para studentview {id_original}")
-                # Validar que ambos FK existan (son obligatorios)
-                if not clase:
-                    logger.warning(f"⚠️ Saltando studentview {id_original}: class_field es None (class_id={class_id_original})")
-                    continue
-                
-                if not application:
-                    logger.warning(f"⚠️ Saltando studentview {id_original}: application es None (application_id={application_id_original})")
-                    continue
-
-
-                
-                # Crear registro histórico
-                studentview_historica = ModeloHistorico(
-                    id_original=id_original,
-                    tabla_origen=dato.tabla_origen,
-                    class_field=clase,
-                    application=application
-                )
-                
-                # Completar campos obligatorios
-                completar_campos_obligatorios(studentview_historica, logger)
-                
-                # Guardar
-                studentview_historica.save()
-                
-                registros_guardados += 1
-                
-                # Actualizar progreso cada 10 registros
-                if idx % 10 == 0 or idx == total_registros:
-                    _actualizar_progreso_cache(
-                        tabla_actual,
-                        estadisticas,
-                        tablas_seleccionadas,
-                        registros_procesados=idx,
-                        total_registros=total_registros
-                    )
-                    logger.info(f"Progreso: {idx}/{total_registros} studentviews procesadas")
-                
-            except Exception as e:
-                logger.error(f"Error procesando studentview {datos.get('id')}: {str(e)}")
-                if estadisticas:
-                    estadisticas['errores'] = estadisticas.get('errores', 0) + 1
-                continue
-    
-    logger.info(f"✅ StudentViews procesadas: {registros_guardados}/{total_registros}")
+    # Pares (clase, application) ya guardados: la relación es única
+    existentes = set(ModeloHistorico.objects.values_list('class_field_id', 'application_id'))
+
+    def construir(dato):
+        datos = dato.datos_originales
+        id_original = _entero(datos.get('id'))
+
+        # Obtener class_id (FK a HistoricalClass)
+        class_id_original = _entero(datos.get('class_id'))
+        clase_id = mapeo_clases.get(class_id_original)
+
+        # Obtener application_id (FK a HistoricalApplication)
+        application_id_original = _entero(datos.get('application_id'))
+        application_id = mapeo_aplicaciones.get(application_id_original)
+
+        # Validar que ambos FK existan (son obligatorios)
+        if not clase_id:
+            logger.warning(f"⚠️ Saltando studentview {id_original}: class_field es None (class_id={class_id_original})")
+            return None
+        if not application_id:
+            logger.warning(f"⚠️ Saltando studentview {id_original}: application es None (application_id={application_id_original})")
+            return None
+        if (clase_id, application_id) in existentes:
+            return None
+        existentes.add((clase_id, application_id))
+
+        studentview_historica = ModeloHistorico(
+            id_original=id_original,
+            tabla_origen=dato.tabla_origen,
+            dato_archivado=dato,
+            class_field_id=clase_id,
+            application_id=application_id
+        )
+        completar_campos_obligatorios(studentview_historica, logger)
+        return studentview_historica
+
+    registros_guardados = _importar_por_lotes(
+        datos_tabla, ModeloHistorico, construir, logger, estadisticas,
+        tablas_seleccionadas, tabla_actual, batch_size=batch_size
+    )
+    logger.info(f"✅ StudentViews procesadas: {registros_guardados}")
     return registros_guardados
 
 
-
 def _actualizar_progreso_cache(tabla_actual, estadisticas, tablas_seleccionadas, registros_procesados=0, total_registros=0):
     """Actualiza el progreso en cache para mostrar en el frontend."""
     # Calcular porcentaje de la tabla actual
     porcentaje_tabla = int((registros_procesados / total_registros) * 100) if total_registros > 0 else 0
-    
+
+    # Copia bajo el lock: con tablas en paralelo otro hilo puede estar actualizando
+    with _lock_estadisticas:
+        estadisticas = dict(estadisticas)
+
     progreso = {
         'paso_actual': f'Guardando {tabla_actual} en historial',
         'pasos_completados': estadisticas['tablas_procesadas'],
@@ -0,0 +1,133 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext
+
+from datos_archivados.busqueda_service import (
+    buscar_agrupado, filtrar_por_texto, filtro_claves_json, rellenar_texto_busqueda,
+)
+from datos_archivados.models import DatoArchivadoDinamico
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la latencia de la búsqueda en datos archivados: búsqueda anterior '
+        '(icontains sobre el JSON + una consulta de ejemplos por tabla) frente a la '
+        'búsqueda indexada (texto_busqueda con trigramas y @> sobre jsonb_path_ops)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--termino', action='append', dest='terminos',
+            help='Término a buscar (se puede repetir). Por defecto: "curso" y "@"',
+        )
+        parser.add_argument('--tipo', default='global', choices=['global', 'contenido', 'tabla'])
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument(
+            '--username', help='Username archivado para medir la búsqueda por clave (auth_user)',
+        )
+        parser.add_argument(
+            '--rellenar', action='store_true',
+            help='Completa texto_busqueda en los registros que no lo tengan antes de medir',
+        )
+
+    def handle(self, *args, **options):
+        if options['rellenar']:
+            actualizados = rellenar_texto_busqueda()
+            self.stdout.write(f'texto_busqueda completado en {actualizados} registros')
+
+        repeticiones = max(1, options['repeticiones'])
+        tipo = options['tipo']
+        self.stdout.write(
+            f"Registros archivados: {DatoArchivadoDinamico.objects.count()} | "
+            f"motor: {connection.vendor} | repeticiones: {repeticiones}"
+        )
+
+        for termino in options['terminos'] or ['curso', '@']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\nBúsqueda "{termino}" ({tipo})'))
+            self._comparar(
+                lambda: self._busqueda_anterior(termino, tipo),
+                lambda: buscar_agrupado(termino, tipo),
+                repeticiones,
+            )
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Búsqueda en una tabla "{termino}"'))
+            tabla = DatoArchivadoDinamico.objects.values_list('tabla_origen', flat=True).first()
+            if tabla:
+                self._comparar(
+                    lambda: self._busqueda_tabla_anterior(tabla, termino),
+                    lambda: self._busqueda_tabla(tabla, termino),
+                    repeticiones,
+                )
+
+        if options['username']:
+            username = options['username']
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\nBúsqueda por clave username="{username}"'))
+            self._comparar(
+                lambda: list(DatoArchivadoDinamico.objects.filter(
+                    tabla_origen='auth_user', datos_originales__username=username
+                ).values_list('pk', flat=True)),
+                lambda: list(DatoArchivadoDinamico.objects.filter(
+                    filtro_claves_json('username', [username]), tabla_origen='auth_user'
+                ).values_list('pk', flat=True)),
+                repeticiones,
+            )
+
+    def _comparar(self, anterior, nueva, repeticiones):
+        antes = self._medir(anterior, repeticiones)
+        despues = self._medir(nueva, repeticiones)
+        for etiqueta, (mediana, maximo, consultas) in (('anterior', antes), ('indexada', despues)):
+            self.stdout.write(
+                f'  {etiqueta:<9} mediana {mediana:8.1f} ms | máx {maximo:8.1f} ms | {consultas} consultas'
+            )
+        if despues[0] > 0:
+            self.stdout.write(self.style.SUCCESS(f'  mejora: x{antes[0] / despues[0]:.1f}'))
+
+    @staticmethod
+    def _medir(funcion, repeticiones):
+        tiempos = []
+        consultas = 0
+        for _ in range(repeticiones):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                funcion()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas = len(capturadas)
+        return statistics.median(tiempos), max(tiempos), consultas
+
+    @staticmethod
+    def _busqueda_anterior(termino, tipo, limite=10):
+        """Réplica de la búsqueda previa de buscar_datos_ajax, como referencia."""
+        queryset = DatoArchivadoDinamico.objects.all()
+        if tipo == 'tabla':
+            queryset = queryset.filter(tabla_origen__icontains=termino)
+        elif tipo == 'contenido':
+            queryset = queryset.filter(
+                Q(datos_originales__icontains=termino) | Q(nombre_registro__icontains=termino)
+            )
+        else:
+            queryset = queryset.filter(
+                Q(tabla_origen__icontains=termino) |
+                Q(datos_originales__icontains=termino) |
+                Q(nombre_registro__icontains=termino)
+            )
+        tablas = queryset.values('tabla_origen').annotate(total=Count('id')).order_by('-total', 'tabla_origen')[:limite]
+        for tabla in tablas:
+            list(queryset.filter(tabla_origen=tabla['tabla_origen'])[:3])
+        return queryset.count()
+
+    @staticmethod
+    def _busqueda_tabla_anterior(tabla, termino, limite=20):
+        queryset = DatoArchivadoDinamico.objects.filter(tabla_origen=tabla).filter(
+            Q(datos_originales__icontains=termino) | Q(nombre_registro__icontains=termino)
+        )
+        list(queryset.order_by('-fecha_migracion')[:limite])
+        return queryset.count()
+
+    @staticmethod
+    def _busqueda_tabla(tabla, termino, limite=20):
+        queryset = filtrar_por_texto(DatoArchivadoDinamico.objects.filter(tabla_origen=tabla), termino, 'contenido')
+        list(queryset.order_by('-fecha_migracion')[:limite])
+        return queryset.count()
@@ -0,0 +1,503 @@
+"""
+Migración de la base de datos MariaDB antigua repartida en tareas Celery por tabla.
+
+Flujo:
+  1. iniciar_migracion_paralela(): crea el MigracionLog y encola
+     datos_archivados.tasks.preparar_migracion_task.
+  2. preparar_migracion(): inspecciona la base remota una sola vez, guarda la
+     estructura de cada tabla (EstructuraTablaArchivada), crea un MigracionTabla
+     por tabla y encola un grupo de migrar_tabla_task (uno por tabla).
+  3. migrar_tabla(): cada worker abre su propia conexión MySQL, migra su tabla
+     con MigracionService.migrar_tabla_dinamica y actualiza su MigracionTabla.
+  4. actualizar_progreso_global(): agrega el progreso de todas las tablas en la
+     clave de caché 'migracion_progreso' que lee estado_migracion_ajax.
+  5. finalizar_si_corresponde(): la última tabla en terminar cierra el
+     MigracionLog (no se necesita backend de resultados para un chord).
+
+Cancelar marca las tablas pendientes o en curso como canceladas; los workers
+lo detectan al final de cada lote. migrar_tabla_task usa acks_late: si un
+worker cae, la tarea se vuelve a entregar y retoma su tabla en_progreso
+cuando lleva TIMEOUT_TABLA_MINUTOS sin avances (fecha_actualizacion). Continuar vuelve a encolar solo las tablas
+no completadas, y como las filas ya migradas se omiten (id_original precargado)
+ninguna tabla se vuelve a copiar desde cero.
+
+Las credenciales de MariaDB no viajan en los argumentos de las tareas (que el
+backend de resultados puede persistir): se guardan en caché durante
+TTL_CONEXION_MIGRACION_MINUTOS, renovados con cada avance, y se eliminan en
+cuanto la migración termina, falla, se cancela o se da por atascada.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .config_migracion import (
+    CACHE_TIMEOUT_SEGUNDOS, COLA_CELERY_MIGRACION, TIMEOUT_TABLA_MINUTOS, TTL_CONEXION_MIGRACION_MINUTOS,
+)
+
+logger = logging.getLogger(__name__)
+
+CLAVE_PROGRESO = 'migracion_progreso'
+
+
+class MigracionCancelada(Exception):
+    """Se lanza dentro de un worker cuando su tabla fue cancelada."""
+    pass
+
+
+def _clave_conexion(migracion_id):
+    return f'migracion_conexion_{migracion_id}'
+
+
+def guardar_conexion(migracion_id, host, database, user, password, port=3306):
+    cache.set(
+        _clave_conexion(migracion_id),
+        {'host': host, 'database': database, 'user': user, 'password': password, 'port': int(port)},
+        timeout=TTL_CONEXION_MIGRACION_MINUTOS * 60,
+    )
+
+
+def renovar_conexion(migracion_id):
+    """Alarga la vida de las credenciales mientras la migración avanza."""
+    cache.touch(_clave_conexion(migracion_id), TTL_CONEXION_MIGRACION_MINUTOS * 60)
+
+
+def olvidar_conexion(migracion_id):
+    """Elimina las credenciales de la migración (en cualquier estado final)."""
+    cache.delete(_clave_conexion(migracion_id))
+
+
+def crear_servicio(migracion_id):
+    """MigracionService con las credenciales guardadas para la migración, o None si expiraron."""
+    from .services import MigracionService
+
+    datos = cache.get(_clave_conexion(migracion_id))
+    if not datos:
+        return None
+    renovar_conexion(migracion_id)
+    return MigracionService(datos['host'], datos['database'], datos['user'], datos['password'], datos['port'])
+
+
+def _en_segundo_plano(funcion, *args):
+    """Último recurso si el broker no está disponible: ejecuta en un hilo como antes."""
+    def ejecutar():
+        try:
+            funcion(*args)
+        except Exception as e:
+            logger.error(f"Error en migración en segundo plano: {e}", exc_info=True)
+
+    hilo = threading.Thread(target=ejecutar)
+    hilo.daemon = True
+    hilo.start()
+
+
+# ── Inicio y continuación ────────────────────────────────────────────────────
+
+def iniciar_migracion_paralela(usuario, host, database, user, password, port=3306):
+    """Crea el MigracionLog y encola la inspección; las tablas se migran en paralelo después."""
+    from .models import MigracionLog
+    from .tasks import preparar_migracion_task
+
+    migracion = MigracionLog.objects.create(
+        usuario=usuario, estado='en_progreso', host_origen=host, base_datos_origen=database,
+    )
+    guardar_conexion(migracion.id, host, database, user, password, port)
+    actualizar_progreso_global(migracion.id, estado_detalle='Iniciando inspección de base de datos')
+
+    try:
+        preparar_migracion_task.apply_async(args=[migracion.id], queue=COLA_CELERY_MIGRACION)
+    except Exception as e:
+        logger.warning(f"No se pudo encolar la migración {migracion.id}: {e}. Se ejecuta en un hilo.")
+        _en_segundo_plano(preparar_migracion, migracion.id)
+    logger.info(f"Migración paralela {migracion.id} iniciada por {usuario.username}")
+    return migracion
+
+
+def continuar_migracion_paralela(migracion, user, password, port=3306, tablas=None):
+    """
+    Reanuda una migración interrumpida (error o cancelada) encolando solo las
+    tablas no completadas (o solo `tablas`, si se indican). Si la inspección
+    no llegó a terminar, se repite.
+
+    Retorna el número de tablas encoladas (None si se repite la inspección).
+    """
+    from .models import MigracionTabla
+    from .tasks import preparar_migracion_task
+
+    guardar_conexion(migracion.id, migracion.host_origen, migracion.base_datos_origen, user, password, port)
+    migracion.estado = 'en_progreso'
+    migracion.fecha_fin = None
+    migracion.save(update_fields=['estado', 'fecha_fin'])
+
+    if not migracion.tablas.exists():
+        try:
+            preparar_migracion_task.apply_async(args=[migracion.id], queue=COLA_CELERY_MIGRACION)
+        except Exception as e:
+            logger.warning(f"No se pudo encolar la migración {migracion.id}: {e}. Se ejecuta en un hilo.")
+            _en_segundo_plano(preparar_migracion, migracion.id)
+        return None
+
+    reanudar = migracion.tablas.exclude(estado=MigracionTabla.ESTADO_COMPLETADA)
+    if tablas:
+        reanudar = reanudar.filter(nombre_tabla__in=tablas)
+    ids = list(reanudar.values_list('id', flat=True))
+    MigracionTabla.objects.filter(id__in=ids).update(
+        estado=MigracionTabla.ESTADO_PENDIENTE, error='', fecha_fin=None
+    )
+    actualizar_progreso_global(migracion.id, estado_detalle=f'Reanudando {len(ids)} tablas')
+    encolar_tablas(migracion.id, ids)
+    finalizar_si_corresponde(migracion.id)
+    return len(ids)
+
+
+def preparar_migracion(migracion_id):
+    """Inspecciona la base remota, registra una MigracionTabla por tabla y las encola."""
+    from .models import EstructuraTablaArchivada, MigracionLog, MigracionTabla
+    from .services import InspectorBaseDatos
+
+    migracion = MigracionLog.objects.get(id=migracion_id)
+    servicio = crear_servicio(migracion_id)
+    if servicio is None or not servicio.conectar_mariadb():
+        _marcar_error(migracion, "No se pudo conectar a la base de datos MariaDB. Verifique la configuración de conexión.")
+        return []
+
+    try:
+        inspector = InspectorBaseDatos(servicio.connection)
+        tablas = inspector.obtener_tablas()
+        for nombre_tabla in tablas:
+            inspector.inspeccionar_tabla(nombre_tabla)
+        servicio.inspector = inspector
+        for nombre_tabla in tablas:
+            servicio.guardar_estructura_tabla(nombre_tabla)
+    except Exception as e:
+        _marcar_error(migracion, f"Error inspeccionando la base de datos: {e}")
+        return []
+    finally:
+        servicio.desconectar_mariadb()
+
+    if not tablas:
+        _marcar_error(migracion, "No se encontraron tablas para migrar en la base de datos")
+        return []
+
+    MigracionTabla.objects.bulk_create(
+        [MigracionTabla(migracion=migracion, nombre_tabla=nombre) for nombre in tablas],
+        ignore_conflicts=True,
+    )
+    migracion.tablas_inspeccionadas = len(tablas)
+    migracion.save(update_fields=['tablas_inspeccionadas'])
+    logger.info(
+        f"Migración {migracion_id}: {len(tablas)} tablas inspeccionadas "
+        f"({EstructuraTablaArchivada.objects.filter(tabla_origen__in=tablas).count()} estructuras guardadas)"
+    )
+
+    ids = list(migracion.tablas.filter(estado=MigracionTabla.ESTADO_PENDIENTE).values_list('id', flat=True))
+    actualizar_progreso_global(migracion_id, estado_detalle=f'Encolando {len(ids)} tablas')
+    encolar_tablas(migracion_id, ids)
+    return ids
+
+
+def encolar_tablas(migracion_id, tabla_ids):
+    """Encola un grupo de migrar_tabla_task, uno por tabla."""
+    from celery import group
+
+    from .models import MigracionTabla
+    from .tasks import migrar_tabla_task
+
+    if not tabla_ids:
+        return
+    grupo = group(
+        migrar_tabla_task.s(migracion_id, tabla_id).set(queue=COLA_CELERY_MIGRACION)
+        for tabla_id in tabla_ids
+    )
+    try:
+        resultado = grupo.apply_async()
+    except Exception as e:
+        logger.warning(f"No se pudieron encolar las tablas de la migración {migracion_id}: {e}. Se migran en un hilo.")
+        _en_segundo_plano(_migrar_tablas_en_linea, migracion_id, list(tabla_ids))
+        return
+    for tabla_id, tarea in zip(tabla_ids, resultado.results or []):
+        if tarea.id:
+            MigracionTabla.objects.filter(id=tabla_id, task_id='').update(task_id=tarea.id)
+
+
+def _migrar_tablas_en_linea(migracion_id, tabla_ids):
+    for tabla_id in tabla_ids:
+        migrar_tabla(migracion_id, tabla_id)
+
+
+# ── Worker por tabla ─────────────────────────────────────────────────────────
+
+def migrar_tabla(migracion_id, tabla_id):
+    """
+    Migra una tabla con su propia conexión MySQL. Nunca lanza excepción: el
+    resultado queda en el MigracionTabla y en el progreso agregado.
+
+    Toma la tabla si está pendiente o si está en_progreso sin avances desde
+    hace TIMEOUT_TABLA_MINUTOS (la tarea se volvió a entregar tras caerse el
+    worker que la tenía); las filas ya migradas se omiten.
+    """
+    from .models import EstructuraTablaArchivada, MigracionTabla
+    from .services import InspectorBaseDatos
+
+    ahora = timezone.now()
+    sin_avances = ahora - timedelta(minutes=TIMEOUT_TABLA_MINUTOS)
+    actualizados = MigracionTabla.objects.filter(id=tabla_id).filter(
+        Q(estado=MigracionTabla.ESTADO_PENDIENTE)
+        | Q(estado=MigracionTabla.ESTADO_EN_PROGRESO, fecha_actualizacion__lt=sin_avances)
+        | Q(estado=MigracionTabla.ESTADO_EN_PROGRESO, fecha_actualizacion__isnull=True, fecha_inicio__lt=sin_avances)
+    ).update(estado=MigracionTabla.ESTADO_EN_PROGRESO, fecha_inicio=ahora, fecha_actualizacion=ahora)
+    if not actualizados:
+        # Cancelada antes de empezar o en manos de otro worker que sigue avanzando
+        finalizar_si_corresponde(migracion_id)
+        return None
+    tabla = MigracionTabla.objects.get(id=tabla_id)
+    nombre_tabla = tabla.nombre_tabla
+
+    servicio = crear_servicio(migracion_id)
+    if servicio is None or not servicio.conectar_mariadb():
+        _terminar_tabla(tabla, MigracionTabla.ESTADO_ERROR, error='No se pudo conectar a MariaDB (credenciales expiradas o servidor no disponible).')
+        return tabla
+
+    def callback_progreso(**kwargs):
+        MigracionTabla.objects.filter(id=tabla_id).update(
+            registros_origen=kwargs.get('total_registros_tabla', 0),
+            registros_procesados=kwargs.get('registros_procesados', 0),
+            registros_nuevos=kwargs.get('registros_migrados_tabla', 0),
+            registros_fallidos=kwargs.get('registros_fallidos_tabla', 0),
+            filas_por_segundo=kwargs.get('filas_por_segundo', 0),
+            fecha_actualizacion=timezone.now(),
+        )
+        renovar_conexion(migracion_id)
+        if MigracionTabla.objects.filter(id=tabla_id, estado=MigracionTabla.ESTADO_CANCELADA).exists():
+            raise MigracionCancelada(nombre_tabla)
+        actualizar_progreso_global(migracion_id, tabla_actual=nombre_tabla)
+
+    try:
+        # Inspección y precarga dentro del try: un error marca la tabla y la conexión se cierra
+        servicio.inspector = InspectorBaseDatos(servicio.connection)
+        estructura = EstructuraTablaArchivada.objects.filter(tabla_origen=nombre_tabla).values_list('estructura', flat=True).first()
+        servicio.inspector.tablas_inspeccionadas[nombre_tabla] = estructura or servicio.inspector.inspeccionar_tabla(nombre_tabla)
+        servicio.precargar_existentes([nombre_tabla])
+        servicio.migrar_tabla_dinamica(nombre_tabla, None, callback_progreso)
+        estadisticas = servicio.estadisticas_tablas.get(nombre_tabla, {})
+        _terminar_tabla(
+            tabla, MigracionTabla.ESTADO_COMPLETADA,
+            registros_origen=estadisticas.get('registros_origen', 0),
+            registros_procesados=estadisticas.get('registros_procesados', 0),
+            registros_nuevos=estadisticas.get('registros_nuevos', 0),
+            registros_fallidos=estadisticas.get('registros_fallidos', 0),
+            filas_por_segundo=estadisticas.get('filas_por_segundo', 0),
+        )
+    except MigracionCancelada:
+        logger.info(f"Migración de {nombre_tabla} cancelada")
+        _terminar_tabla(tabla, MigracionTabla.ESTADO_CANCELADA)
+    except Exception as e:
+        logger.error(f"Error migrando tabla {nombre_tabla}: {e}", exc_info=True)
+        _terminar_tabla(tabla, MigracionTabla.ESTADO_ERROR, error=str(e)[:2000])
+    finally:
+        servicio.desconectar_mariadb()
+    return tabla
+
+
+def _terminar_tabla(tabla, estado, **campos):
+    from .models import MigracionTabla
+
+    campos.update(estado=estado, fecha_fin=timezone.now())
+    filtro = MigracionTabla.objects.filter(id=tabla.id)
+    if estado != MigracionTabla.ESTADO_CANCELADA:
+        # No pisar una cancelación llegada mientras terminaba el último lote
+        filtro = filtro.exclude(estado=MigracionTabla.ESTADO_CANCELADA)
+    filtro.update(**campos)
+    actualizar_progreso_global(tabla.migracion_id, tabla_actual=tabla.nombre_tabla)
+    finalizar_si_corresponde(tabla.migracion_id)
+
+
+# ── Cancelación ──────────────────────────────────────────────────────────────
+
+def cancelar_migracion(migracion, tablas=None, usuario=None):
+    """
+    Cancela las tablas pendientes o en curso (todas o solo `tablas`). Si no
+    queda ninguna activa la migración se cierra como cancelada.
+    Retorna el número de tablas canceladas.
+    """
+    from .models import MigracionTabla
+
+    activas = migracion.tablas.filter(estado__in=MigracionTabla.ESTADOS_ACTIVOS)
+    if tablas:
+        activas = activas.filter(nombre_tabla__in=tablas)
+    canceladas = activas.update(estado=MigracionTabla.ESTADO_CANCELADA, fecha_fin=timezone.now())
+
+    if not tablas:
+        quien = f' por el usuario {usuario.username}' if usuario else ''
+        type(migracion).objects.filter(id=migracion.id, estado__in=['iniciada', 'en_progreso']).update(
+            estado='cancelada', fecha_fin=timezone.now(), errores=f'Migración cancelada{quien}',
+        )
+        cache.delete(CLAVE_PROGRESO)
+        olvidar_conexion(migracion.id)
+    else:
+        actualizar_progreso_global(migracion.id)
+        finalizar_si_corresponde(migracion.id)
+    return canceladas
+
+
+# ── Coordinación del progreso ────────────────────────────────────────────────
+
+def resumen_tablas(migracion_id):
+    """Totales de las MigracionTabla de una migración en una sola consulta."""
+    from .models import MigracionTabla
+
+    terminal = ~Q(estado__in=MigracionTabla.ESTADOS_ACTIVOS)
+    return MigracionTabla.objects.filter(migracion_id=migracion_id).aggregate(
+        total=Count('id'),
+        activas=Count('id', filter=Q(estado__in=MigracionTabla.ESTADOS_ACTIVOS)),
+        en_progreso=Count('id', filter=Q(estado=MigracionTabla.ESTADO_EN_PROGRESO)),
+        terminadas=Count('id', filter=terminal),
+        con_datos=Count('id', filter=terminal & Q(registros_origen__gt=0)),
+        errores=Count('id', filter=Q(estado=MigracionTabla.ESTADO_ERROR)),
+        canceladas=Count('id', filter=Q(estado=MigracionTabla.ESTADO_CANCELADA)),
+        registros_origen=Sum('registros_origen'),
+        registros_procesados=Sum('registros_procesados'),
+        registros_nuevos=Sum('registros_nuevos'),
+        registros_fallidos=Sum('registros_fallidos'),
+        filas_por_segundo=Sum('filas_por_segundo', filter=Q(estado=MigracionTabla.ESTADO_EN_PROGRESO)),
+    )
+
+
+def actualizar_progreso_global(migracion_id, tabla_actual=None, estado_detalle=''):
+    """
+    Publica en 'migracion_progreso' el progreso agregado de todas las tablas,
+    con las mismas claves que usaba la migración secuencial más el detalle
+    por tabla ('tablas').
+    """
+    from .models import MigracionLog, MigracionTabla
+
+    migracion = MigracionLog.objects.filter(id=migracion_id).only(
+        'fecha_inicio', 'host_origen', 'base_datos_origen', 'tablas_inspeccionadas'
+    ).first()
+    if migracion is None:
+        return None
+    resumen = resumen_tablas(migracion_id)
+    total_tablas = resumen['total'] or migracion.tablas_inspeccionadas
+    terminadas = resumen['terminadas']
+
+    tablas = list(
+        MigracionTabla.objects.filter(migracion_id=migracion_id).values(
+            'nombre_tabla', 'estado', 'registros_origen', 'registros_procesados',
+            'registros_nuevos', 'registros_fallidos', 'filas_por_segundo',
+        )
+    )
+    actual = next((t for t in tablas if t['nombre_tabla'] == tabla_actual), None)
+    if actual is None:
+        actual = next((t for t in tablas if t['estado'] == MigracionTabla.ESTADO_EN_PROGRESO), None)
+
+    if not estado_detalle:
+        if total_tablas and terminadas >= total_tablas:
+            estado_detalle = 'Finalizando migración'
+        else:
+            estado_detalle = (
+                f"{terminadas}/{total_tablas} tablas terminadas, "
+                f"{resumen['en_progreso']} en paralelo "
+                f"({resumen['filas_por_segundo'] or 0} filas/s)"
+            )
+
+    procesados = resumen['registros_procesados'] or 0
+    origen = resumen['registros_origen'] or 0
+    progreso = {
+        'en_progreso': True,
+        'migracion_id': migracion_id,
+        'tabla_actual': actual['nombre_tabla'] if actual else (tabla_actual or 'N/A'),
+        'tabla_numero': terminadas,
+        'total_tablas': total_tablas,
+        'progreso_porcentaje': int((terminadas / total_tablas) * 100) if total_tablas else 0,
+        'tablas_con_datos': resumen['con_datos'],
+        'tablas_vacias': terminadas - resumen['con_datos'],
+        'tablas_en_progreso': resumen['en_progreso'],
+        'tablas_con_error': resumen['errores'],
+        'registros_migrados': resumen['registros_nuevos'] or 0,
+        'registros_fallidos': resumen['registros_fallidos'] or 0,
+        'registros_procesados': procesados,
+        'registros_origen': origen,
+        'filas_por_segundo': resumen['filas_por_segundo'] or 0,
+        'estado_detalle': estado_detalle,
+        'fecha_inicio': migracion.fecha_inicio.isoformat() if migracion.fecha_inicio else timezone.now().isoformat(),
+        'fecha_actualizacion': timezone.now().isoformat(),
+        'host_origen': migracion.host_origen,
+        'base_datos_origen': migracion.base_datos_origen,
+        'registros_procesados_tabla': actual['registros_procesados'] if actual else 0,
+        'total_registros_tabla': actual['registros_origen'] if actual else 0,
+        'porcentaje_tabla': (
+            int(actual['registros_procesados'] * 100 / actual['registros_origen'])
+            if actual and actual['registros_origen'] else 0
+        ),
+        'registros_migrados_tabla': actual['registros_nuevos'] if actual else 0,
+        'registros_fallidos_tabla': actual['registros_fallidos'] if actual else 0,
+        'tablas': tablas,
+    }
+    cache.set(CLAVE_PROGRESO, progreso, timeout=CACHE_TIMEOUT_SEGUNDOS)
+    return progreso
+
+
+def finalizar_si_corresponde(migracion_id):
+    """
+    Cierra el MigracionLog cuando ya no queda ninguna tabla activa. La
+    actualización es condicional (estado en_progreso), así que aunque varios
+    workers terminen a la vez solo uno la aplica. Retorna True si la cerró.
+    """
+    from .models import MigracionLog
+
+    resumen = resumen_tablas(migracion_id)
+    if not resumen['total'] or resumen['activas']:
+        return False
+
+    if resumen['errores']:
+        estado = 'error'
+    elif resumen['canceladas']:
+        estado = 'cancelada'
+    else:
+        estado = 'completada'
+    errores = ''
+    if estado != 'completada':
+        from .models import MigracionTabla
+        fallidas = MigracionTabla.objects.filter(
+            migracion_id=migracion_id,
+            estado__in=[MigracionTabla.ESTADO_ERROR, MigracionTabla.ESTADO_CANCELADA],
+        ).values_list('nombre_tabla', 'estado', 'error')
+        errores = '; '.join(
+            f"{nombre}: {error or estado_tabla}" for nombre, estado_tabla, error in fallidas
+        )[:5000]
+
+    cerradas = MigracionLog.objects.filter(
+        id=migracion_id, estado__in=['iniciada', 'en_progreso']
+    ).update(
+        estado=estado,
+        fecha_fin=timezone.now(),
+        errores=errores,
+        usuarios_migrados=resumen['registros_nuevos'] or 0,
+        tablas_inspeccionadas=resumen['total'],
+        tablas_con_datos=resumen['con_datos'],
+        tablas_vacias=resumen['terminadas'] - resumen['con_datos'],
+    )
+    if not cerradas:
+        return False
+
+    cache.delete(CLAVE_PROGRESO)
+    olvidar_conexion(migracion_id)
+    logger.info(
+        f"Migración {migracion_id} {estado}: {resumen['total']} tablas, "
+        f"{resumen['registros_nuevos'] or 0} registros nuevos"
+    )
+    return True
+
+
+def _marcar_error(migracion, mensaje):
+    logger.error(f"Migración {migracion.id}: {mensaje}")
+    migracion.estado = 'error'
+    migracion.errores = mensaje
+    migracion.fecha_fin = timezone.now()
+    migracion.save(update_fields=['estado', 'errores', 'fecha_fin'])
+    cache.delete(CLAVE_PROGRESO)
+    olvidar_conexion(migracion.id)
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datos_archivados", "0012_fix_add_combinado_columns_to_db"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EstructuraTablaArchivada",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("tabla_origen", models.CharField(max_length=100, unique=True, verbose_name="Tabla de Origen")),
+                ("estructura", models.JSONField(verbose_name="Estructura de la Tabla")),
+                ("fecha_actualizacion", models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")),
+            ],
+            options={
+                "verbose_name": "Estructura de Tabla Archivada",
+                "verbose_name_plural": "Estructuras de Tablas Archivadas",
+                "ordering": ["tabla_origen"],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datos_archivados", "0013_estructuratablaarchivada"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="migracionlog",
+            name="estado",
+            field=models.CharField(
+                choices=[
+                    ("iniciada", "Iniciada"),
+                    ("en_progreso", "En Progreso"),
+                    ("completada", "Completada"),
+                    ("error", "Error"),
+                    ("cancelada", "Cancelada"),
+                ],
+                default="iniciada",
+                max_length=20,
+                verbose_name="Estado",
+            ),
+        ),
+        migrations.CreateModel(
+            name="MigracionTabla",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("nombre_tabla", models.CharField(max_length=100, verbose_name="Tabla")),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("pendiente", "Pendiente"),
+                            ("en_progreso", "En Progreso"),
+                            ("completada", "Completada"),
+                            ("error", "Error"),
+                            ("cancelada", "Cancelada"),
+                        ],
+                        default="pendiente",
+                        max_length=20,
+                        verbose_name="Estado",
+                    ),
+                ),
+                ("task_id", models.CharField(blank=True, max_length=255, verbose_name="ID de tarea")),
+                ("registros_origen", models.IntegerField(default=0, verbose_name="Registros en origen")),
+                ("registros_procesados", models.IntegerField(default=0, verbose_name="Registros procesados")),
+                ("registros_nuevos", models.IntegerField(default=0, verbose_name="Registros nuevos")),
+                ("filas_por_segundo", models.IntegerField(default=0, verbose_name="Filas por segundo")),
+                ("error", models.TextField(blank=True, verbose_name="Error")),
+                ("fecha_inicio", models.DateTimeField(blank=True, null=True, verbose_name="Fecha de inicio")),
+                ("fecha_fin", models.DateTimeField(blank=True, null=True, verbose_name="Fecha de finalización")),
+                (
+                    "migracion",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tablas",
+                        to="datos_archivados.migracionlog",
+                        verbose_name="Migración",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tabla de Migración",
+                "verbose_name_plural": "Tablas de Migración",
+                "ordering": ["migracion", "nombre_tabla"],
+                "unique_together": {("migracion", "nombre_tabla")},
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Búsqueda indexada sobre DatoArchivadoDinamico.
+#
+# Agrega texto_busqueda (valores de datos_originales aplanados en minúsculas)
+# y lo rellena para los registros existentes. En PostgreSQL además crea:
+#   - un índice GIN de trigramas (pg_trgm) sobre texto_busqueda, que resuelve
+#     los LIKE '%término%' de la búsqueda por contenido sin recorrer la tabla;
+#   - un índice GIN jsonb_path_ops sobre datos_originales para las búsquedas
+#     por clave (username, email, user_id, student_id) hechas con @>.
+# Los índices se crean CONCURRENTLY, por eso la migración no es atómica.
+
+from django.db import migrations, models
+
+TABLA = 'datos_archivados_datoarchivadodinamico'
+
+SQL_RELLENAR = f"""
+UPDATE {TABLA} AS d
+SET texto_busqueda = lower(concat_ws(' ', nullif(d.nombre_registro, ''), (
+    SELECT string_agg(valor.value, ' ') FROM jsonb_each_text(d.datos_originales) AS valor
+)))
+WHERE jsonb_typeof(d.datos_originales) = 'object'
+"""
+
+SQL_INDICES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS datos_arch_texto_trgm_idx '
+    f'ON {TABLA} USING gin (texto_busqueda gin_trgm_ops)',
+    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS datos_arch_datos_jsonb_idx '
+    f'ON {TABLA} USING gin (datos_originales jsonb_path_ops)',
+]
+
+SQL_BORRAR_INDICES = [
+    'DROP INDEX CONCURRENTLY IF EXISTS datos_arch_texto_trgm_idx',
+    'DROP INDEX CONCURRENTLY IF EXISTS datos_arch_datos_jsonb_idx',
+]
+
+
+def rellenar_texto_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SQL_RELLENAR)
+        return
+
+    from datos_archivados.models import construir_texto_busqueda
+
+    DatoArchivadoDinamico = apps.get_model('datos_archivados', 'DatoArchivadoDinamico')
+    ultimo_pk = 0
+    while True:
+        lote = list(
+            DatoArchivadoDinamico.objects.filter(pk__gt=ultimo_pk).order_by('pk')
+            .only('pk', 'datos_originales', 'nombre_registro')[:2000]
+        )
+        if not lote:
+            break
+        for dato in lote:
+            dato.texto_busqueda = construir_texto_busqueda(dato.datos_originales, dato.nombre_registro)
+        DatoArchivadoDinamico.objects.bulk_update(lote, ['texto_busqueda'])
+        ultimo_pk = lote[-1].pk
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in SQL_INDICES:
+            schema_editor.execute(sql)
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in SQL_BORRAR_INDICES:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("datos_archivados", "0014_migraciontabla"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="datoarchivadodinamico",
+            name="texto_busqueda",
+            field=models.TextField(blank=True, default="", editable=False, verbose_name="Texto de búsqueda"),
+        ),
+        migrations.RunPython(rellenar_texto_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
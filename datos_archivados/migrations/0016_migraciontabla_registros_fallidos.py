@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datos_archivados', '0015_datoarchivadodinamico_texto_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='migraciontabla',
+            name='registros_fallidos',
+            field=models.IntegerField(default=0, verbose_name='Registros fallidos'),
+        ),
+    ]
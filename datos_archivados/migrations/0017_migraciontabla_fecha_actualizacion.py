@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datos_archivados', '0016_migraciontabla_registros_fallidos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='migraciontabla',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último avance'),
+        ),
+    ]
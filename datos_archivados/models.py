@@ -1,3 +1,4 @@
+import json
 from django.db import models
 from django.contrib.auth.models import User
 from datetime import date
@@ -262,6 +263,7 @@ class MigracionLog(models.Model):
         ('en_progreso', 'En Progreso'),
         ('completada', 'Completada'),
         ('error', 'Error'),
+        ('cancelada', 'Cancelada'),
     ]
     
     fecha_inicio = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Inicio')
@@ -298,6 +300,75 @@ class MigracionLog(models.Model):
         verbose_name_plural = 'Logs de Migración'
         ordering = ['-fecha_inicio']
 
+class MigracionTabla(models.Model):
+    """
+    Progreso de la migración de una tabla MariaDB dentro de una MigracionLog.
+    Cada tabla se migra en su propia tarea Celery; al continuar una migración
+    interrumpida solo se vuelven a encolar las tablas no completadas.
+    """
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_EN_PROGRESO = 'en_progreso'
+    ESTADO_COMPLETADA = 'completada'
+    ESTADO_ERROR = 'error'
+    ESTADO_CANCELADA = 'cancelada'
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_EN_PROGRESO, 'En Progreso'),
+        (ESTADO_COMPLETADA, 'Completada'),
+        (ESTADO_ERROR, 'Error'),
+        (ESTADO_CANCELADA, 'Cancelada'),
+    ]
+    ESTADOS_ACTIVOS = (ESTADO_PENDIENTE, ESTADO_EN_PROGRESO)
+
+    migracion = models.ForeignKey(
+        MigracionLog, on_delete=models.CASCADE, related_name='tablas', verbose_name='Migración'
+    )
+    nombre_tabla = models.CharField(max_length=100, verbose_name='Tabla')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE, verbose_name='Estado')
+    task_id = models.CharField(max_length=255, blank=True, verbose_name='ID de tarea')
+    registros_origen = models.IntegerField(default=0, verbose_name='Registros en origen')
+    registros_procesados = models.IntegerField(default=0, verbose_name='Registros procesados')
+    registros_nuevos = models.IntegerField(default=0, verbose_name='Registros nuevos')
+    registros_fallidos = models.IntegerField(default=0, verbose_name='Registros fallidos')
+    filas_por_segundo = models.IntegerField(default=0, verbose_name='Filas por segundo')
+    error = models.TextField(blank=True, verbose_name='Error')
+    fecha_inicio = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de inicio')
+    fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de finalización')
+    # Último avance del worker; una tabla en_progreso sin avances durante
+    # TIMEOUT_TABLA_MINUTOS puede retomarla otra entrega de su tarea
+    fecha_actualizacion = models.DateTimeField(null=True, blank=True, verbose_name='Último avance')
+
+    def __str__(self):
+        return f"{self.nombre_tabla} ({self.get_estado_display()})"
+
+    class Meta:
+        verbose_name = 'Tabla de Migración'
+        verbose_name_plural = 'Tablas de Migración'
+        ordering = ['migracion', 'nombre_tabla']
+        unique_together = ['migracion', 'nombre_tabla']
+
+
+def construir_texto_busqueda(datos, nombre_registro=None):
+    """
+    Texto plano en minúsculas con los valores de `datos` (y el nombre del
+    registro) que alimenta DatoArchivadoDinamico.texto_busqueda. Equivale a
+    lower(concat_ws(' ', nombre_registro, string_agg(jsonb_each_text))) en
+    PostgreSQL, que es como la migración 0015 rellena los registros existentes.
+    """
+    partes = [nombre_registro] if nombre_registro else []
+    if isinstance(datos, dict):
+        for valor in datos.values():
+            if valor is None:
+                continue
+            if isinstance(valor, bool):
+                partes.append('true' if valor else 'false')
+            elif isinstance(valor, (dict, list)):
+                partes.append(json.dumps(valor, ensure_ascii=False))
+            else:
+                partes.append(str(valor))
+    return ' '.join(partes).lower()
+
+
 class DatoArchivadoDinamico(models.Model):
     """
     Modelo para almacenar datos archivados de cualquier tabla de forma dinámica
@@ -316,6 +387,18 @@ class DatoArchivadoDinamico(models.Model):
     combinado = models.BooleanField(default=False, verbose_name='Combinado')
     fecha_combinacion = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Combinacion')
     registros_procesados = models.IntegerField(default=0, verbose_name='Registros Procesados')
+
+    # Valores de datos_originales aplanados en minúsculas. En PostgreSQL tiene
+    # un índice GIN de trigramas (migración 0015) para las búsquedas por contenido.
+    texto_busqueda = models.TextField(blank=True, default='', editable=False, verbose_name='Texto de búsqueda')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'datos_originales', 'nombre_registro'} & set(update_fields):
+            self.texto_busqueda = construir_texto_busqueda(self.datos_originales, self.nombre_registro)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'texto_busqueda'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.tabla_origen} - ID {self.id_original} (Migrado: {self.fecha_migracion.strftime('%d/%m/%Y')})"
@@ -336,6 +419,21 @@ class DatoArchivadoDinamico(models.Model):
                 return str(datos[campo])
         
         return f"Registro {self.id_original}"
+
+    def obtener_estructura(self):
+        """
+        Estructura de la tabla de origen. Los registros migrados antes de
+        EstructuraTablaArchivada la guardan en estructura_tabla (como texto JSON);
+        los nuevos la comparten a través de EstructuraTablaArchivada.
+        """
+        if self.estructura_tabla:
+            if isinstance(self.estructura_tabla, str):
+                return json.loads(self.estructura_tabla)
+            return self.estructura_tabla
+        estructura = EstructuraTablaArchivada.objects.filter(
+            tabla_origen=self.tabla_origen
+        ).values_list('estructura', flat=True).first()
+        return estructura
     
     class Meta:
         verbose_name = 'Dato Archivado Dinámico'
@@ -348,6 +446,24 @@ class DatoArchivadoDinamico(models.Model):
             models.Index(fields=['tipo_registro']),
         ]
 
+
+class EstructuraTablaArchivada(models.Model):
+    """
+    Estructura (columnas y claves foráneas) de una tabla migrada desde MariaDB.
+    Se guarda una vez por tabla en lugar de repetirla en cada DatoArchivadoDinamico.
+    """
+    tabla_origen = models.CharField(max_length=100, unique=True, verbose_name='Tabla de Origen')
+    estructura = models.JSONField(verbose_name='Estructura de la Tabla')
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
+
+    def __str__(self):
+        return self.tabla_origen
+
+    class Meta:
+        verbose_name = 'Estructura de Tabla Archivada'
+        verbose_name_plural = 'Estructuras de Tablas Archivadas'
+        ordering = ['tabla_origen']
+
 class ReglamentoCursoArchivado(models.Model):
     """
     Almacena el reglamento de un curso archivado.
@@ -7,6 +7,8 @@ from django.db import models
 from django.apps import apps
 import logging
 import json
+import time
+from collections import defaultdict
 from datetime import datetime, date
 from decimal import Decimal
 from .config_migracion import (
@@ -14,8 +16,10 @@ from .config_migracion import (
     LOTE_CONTEO_REGISTROS,
     TIMEOUT_MIGRACION_MINUTOS,
     LOG_CADA_N_REGISTROS,
-    USAR_TRANSACCIONES_ATOMICAS
+    USAR_TRANSACCIONES_ATOMICAS,
+    BATCH_SIZE_INSERCION,
 )
+from .busqueda_service import invalidar_tablas_archivadas
 
 logger = logging.getLogger(__name__)
 
@@ -268,6 +272,11 @@ class MigracionService:
         self.migration_log = None
         self.inspector = None
         self.modelos_dinamicos = {}
+        # Métricas por tabla de la última migración (registros nuevos, filas/s)
+        self.estadisticas_tablas = {}
+        # {tabla_origen: set(id_original)} precargado en la primera tabla migrada
+        self._existentes = None
+        self._tablas_precargadas = None
     
     def conectar_mariadb(self):
         """
@@ -850,23 +859,18 @@ class MigracionService:
                     logger.info(f"Migrando datos de la tabla: {nombre_tabla} ({i}/{total_tablas})")
                     
                     # Callback para actualizaciones en tiempo real durante la migración de la tabla
+                    # Registros nuevos acumulados antes de esta tabla; el callback
+                    # suma los de la tabla en curso sin volver a contar en la BD.
+                    registros_previos_tabla = registros_nuevos_migrados
+
                     def callback_progreso_tabla(**kwargs):
                         nonlocal registros_nuevos_migrados
                         
                         # Actualizar contador global de registros migrados
-                        if kwargs.get('registros_migrados_tabla'):
-                            # Contar registros realmente migrados hasta ahora
-                            from .models import DatoArchivadoDinamico
-                            try:
-                                registros_actuales = DatoArchivadoDinamico.objects.filter(
-                                    fecha_migracion__gte=self.migration_log.fecha_inicio
-                                ).count()
-                                registros_nuevos_migrados = registros_actuales
-                            except Exception as e:
-                                logger.error(f"Error contando registros migrados: {e}")
+                        registros_nuevos_migrados = registros_previos_tabla + kwargs.get('registros_migrados_tabla', 0)
                         
                         # Actualizar progreso con información detallada de la tabla actual
-                        estado_detalle = f"Procesando {kwargs.get('tabla_actual', nombre_tabla)}: {kwargs.get('registros_procesados', 0)}/{kwargs.get('total_registros_tabla', 0)} registros ({kwargs.get('porcentaje_tabla', 0)}%)"
+                        estado_detalle = f"Procesando {kwargs.get('tabla_actual', nombre_tabla)}: {kwargs.get('registros_procesados', 0)}/{kwargs.get('total_registros_tabla', 0)} registros ({kwargs.get('porcentaje_tabla', 0)}%, {kwargs.get('filas_por_segundo', 0)} filas/s)"
                         
                         # Crear progreso actualizado con información de la tabla
                         progreso_tabla = {
@@ -888,6 +892,8 @@ class MigracionService:
                             'total_registros_tabla': kwargs.get('total_registros_tabla', 0),
                             'porcentaje_tabla': kwargs.get('porcentaje_tabla', 0),
                             'registros_migrados_tabla': kwargs.get('registros_migrados_tabla', 0),
+                            'registros_fallidos_tabla': kwargs.get('registros_fallidos_tabla', 0),
+                            'filas_por_segundo': kwargs.get('filas_por_segundo', 0),
                         }
                         
                         cache.set('migracion_progreso', progreso_tabla, timeout=1800)  # 30 minutos
@@ -999,136 +1005,311 @@ class MigracionService:
         finally:
             self.desconectar_mariadb()
     
+    def _columna_clave_primaria(self, nombre_tabla):
+        """
+        Nombre de la columna de clave primaria simple de la tabla, o None si la
+        PK es compuesta o no existe (en ese caso no se puede paginar por clave).
+        """
+        estructura = {}
+        if self.inspector:
+            estructura = self.inspector.tablas_inspeccionadas.get(nombre_tabla) or {}
+        columnas_pk = [
+            col['Field'] for col in estructura.get('columnas', []) if col.get('Key') == 'PRI'
+        ]
+        if len(columnas_pk) == 1:
+            return columnas_pk[0]
+        return None
+
+    def _leer_registros_por_lotes(self, nombre_tabla, tamano_lote):
+        """
+        Generador de lotes (listas de dicts) leídos de MariaDB sin cargar la tabla
+        completa en memoria.
+
+        Si la tabla tiene una clave primaria simple se pagina por clave
+        (WHERE pk > último ORDER BY pk LIMIT n), de modo que cada consulta es
+        corta y usa el índice. En otro caso se usa un cursor sin buffer y
+        fetchmany(), que lee las filas del servidor a medida que se consumen.
+        """
+        columna_pk = self._columna_clave_primaria(nombre_tabla)
+
+        if columna_pk is None:
+            cursor = self.connection.cursor(dictionary=True, buffered=False)
+            try:
+                cursor.execute(f"SELECT * FROM `{nombre_tabla}`")
+                while True:
+                    lote = cursor.fetchmany(tamano_lote)
+                    if not lote:
+                        break
+                    yield lote
+            finally:
+                cursor.close()
+            return
+
+        ultimo = None
+        while True:
+            cursor = self.connection.cursor(dictionary=True)
+            try:
+                if ultimo is None:
+                    cursor.execute(
+                        f"SELECT * FROM `{nombre_tabla}` ORDER BY `{columna_pk}` LIMIT %s",
+                        (tamano_lote,)
+                    )
+                else:
+                    cursor.execute(
+                        f"SELECT * FROM `{nombre_tabla}` WHERE `{columna_pk}` > %s "
+                        f"ORDER BY `{columna_pk}` LIMIT %s",
+                        (ultimo, tamano_lote)
+                    )
+                lote = cursor.fetchall()
+            finally:
+                cursor.close()
+            if not lote:
+                break
+            yield lote
+            if len(lote) < tamano_lote:
+                break
+            ultimo = lote[-1][columna_pk]
+
+    def _ids_existentes(self, nombre_tabla):
+        """
+        Conjunto de id_original ya migrados para la tabla. Todos los pares
+        (tabla_origen, id_original) se precargan con una sola consulta la
+        primera vez y luego se mantienen al día en memoria.
+        """
+        if self._existentes is None:
+            self.precargar_existentes()
+        elif self._tablas_precargadas is not None and nombre_tabla not in self._tablas_precargadas:
+            self._cargar_existentes([nombre_tabla])
+        return self._existentes[nombre_tabla]
+
+    def precargar_existentes(self, tablas=None):
+        """
+        Carga en memoria los pares (tabla_origen, id_original) ya migrados.
+        Con `tablas` solo se cargan esas tablas (usado por los workers que
+        migran una única tabla); sin ella, todas.
+        """
+        self._existentes = defaultdict(set)
+        self._tablas_precargadas = None if tablas is None else set()
+        self._cargar_existentes(tablas)
+
+    def _cargar_existentes(self, tablas=None):
+        from .models import DatoArchivadoDinamico
+
+        pares = DatoArchivadoDinamico.objects.all()
+        if tablas is not None:
+            pares = pares.filter(tabla_origen__in=list(tablas))
+            self._tablas_precargadas.update(tablas)
+        for tabla_origen, id_original in pares.values_list('tabla_origen', 'id_original').iterator(
+            chunk_size=BATCH_SIZE_INSERCION
+        ):
+            self._existentes[tabla_origen].add(id_original)
+
+    def guardar_estructura_tabla(self, nombre_tabla):
+        """Guarda (una vez por tabla) la estructura inspeccionada en EstructuraTablaArchivada."""
+        from .models import EstructuraTablaArchivada
+
+        if not self.inspector or nombre_tabla not in self.inspector.tablas_inspeccionadas:
+            return None
+        estructura = json.loads(json.dumps(self.inspector.tablas_inspeccionadas[nombre_tabla], default=str))
+        objeto, _ = EstructuraTablaArchivada.objects.update_or_create(
+            tabla_origen=nombre_tabla, defaults={'estructura': estructura}
+        )
+        return objeto
+
     def migrar_tabla_dinamica(self, nombre_tabla, modelo_dinamico, callback_progreso=None):
         """
         Migra los datos de una tabla específica usando un modelo dinámico
-        con actualizaciones de progreso en tiempo real
+        con actualizaciones de progreso en tiempo real.
+
+        Las filas se leen en lotes de BATCH_SIZE_INSERCION (paginación por clave
+        primaria o cursor sin buffer) y se insertan con bulk_create, descartando
+        las que ya existían según el conjunto precargado de id_original. Si el
+        INSERT de un lote falla se reintenta fila a fila (_guardar_lote_dinamico)
+        y las filas que no se pueden guardar se cuentan como fallidas.
+
+        Retorna el total de registros en origen; el detalle (nuevos, fallidos y
+        filas por segundo) queda en self.estadisticas_tablas[nombre_tabla].
         """
-        cursor = self.connection.cursor(dictionary=True)
+        cursor = self.connection.cursor()
         try:
-            # Determinar si la tabla tiene columna 'id' para ordenar
-            try:
-                cursor.execute(
-                    "SELECT COUNT(*) FROM information_schema.COLUMNS "
-                    "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = 'id'",
-                    (self.database, nombre_tabla)
-                )
-                tiene_id = cursor.fetchone()['COUNT(*)'] > 0
-            except Exception:
-                tiene_id = False
+            cursor.execute(f"SELECT COUNT(*) FROM `{nombre_tabla}`")
+            total_registros_origen = cursor.fetchone()[0]
+        finally:
+            cursor.close()
 
-            if tiene_id:
-                query = f"SELECT * FROM `{nombre_tabla}` ORDER BY id DESC"
-            else:
-                query = f"SELECT * FROM `{nombre_tabla}`"
+        logger.info(f"📊 Iniciando migración de {nombre_tabla}: {total_registros_origen} registros")
 
-            # Obtener todos los registros de la tabla
-            cursor.execute(query)
-            registros = cursor.fetchall()
-            
-            # Contar registros en la tabla origen
-            total_registros_origen = len(registros)
-            migrados = 0
-            
-            logger.info(f"📊 Iniciando migración de {nombre_tabla}: {total_registros_origen} registros")
-            
-            # Procesar registros en lotes para actualizaciones en tiempo real
-            lote_size = LOTE_ACTUALIZACION_PROGRESO  # Usar configuración optimizada
-            
-            for i, registro in enumerate(registros, 1):
-                try:
-                    # Crear modelo archivado dinámico
-                    modelo_archivado = self.crear_modelo_archivado_dinamico(nombre_tabla, registro)
-                    if modelo_archivado:
-                        migrados += 1
-                    
-                    # Actualizar progreso en tiempo real cada lote_size registros o al final
-                    if i % lote_size == 0 or i == total_registros_origen:
-                        if callback_progreso:
-                            callback_progreso(
-                                tabla_actual=nombre_tabla,
-                                registros_procesados=i,
-                                total_registros_tabla=total_registros_origen,
-                                registros_migrados_tabla=migrados,
-                                porcentaje_tabla=int((i / total_registros_origen) * 100)
-                            )
-                        
-                        logger.info(f"📈 {nombre_tabla}: {i}/{total_registros_origen} procesados ({migrados} nuevos)")
-                        
-                        # Log menos frecuente para bases de datos grandes
-                        if i % LOG_CADA_N_REGISTROS == 0 or i == total_registros_origen:
-                            logger.info(f"📊 Progreso {nombre_tabla}: {i}/{total_registros_origen} registros procesados")
-                        
-                except Exception as e:
-                    logger.error(f"Error migrando registro {registro.get('id', 'N/A')} de {nombre_tabla}: {e}")
-                    continue
-            
-            logger.info(f"✅ {nombre_tabla} completada: {migrados} registros nuevos migrados de {total_registros_origen} totales")
-            
-            # Retornar el total de registros en origen (para contar tablas con datos)
-            return total_registros_origen
-            
+        self.guardar_estructura_tabla(nombre_tabla)
+        existentes = self._ids_existentes(nombre_tabla)
+        inicio = time.perf_counter()
+        procesados = 0
+        migrados = 0
+        fallidos = 0
+        ultimo_aviso = 0
+
+        try:
+            for lote in self._leer_registros_por_lotes(nombre_tabla, BATCH_SIZE_INSERCION):
+                nuevos = []
+                for registro in lote:
+                    objeto = self.crear_modelo_archivado_dinamico(nombre_tabla, registro, existentes)
+                    if objeto is not None:
+                        nuevos.append(objeto)
+                guardados = self._guardar_lote_dinamico(nombre_tabla, nuevos, existentes)
+                migrados += guardados
+                fallidos += len(nuevos) - guardados
+                procesados += len(lote)
+
+                # Actualizar progreso cada LOTE_ACTUALIZACION_PROGRESO registros o al final
+                if procesados - ultimo_aviso >= LOTE_ACTUALIZACION_PROGRESO or procesados >= total_registros_origen:
+                    ultimo_aviso = procesados
+                    filas_por_segundo = self._filas_por_segundo(procesados, inicio)
+                    if callback_progreso:
+                        callback_progreso(
+                            tabla_actual=nombre_tabla,
+                            registros_procesados=procesados,
+                            total_registros_tabla=total_registros_origen,
+                            registros_migrados_tabla=migrados,
+                            registros_fallidos_tabla=fallidos,
+                            porcentaje_tabla=min(100, int((procesados / total_registros_origen) * 100)) if total_registros_origen else 100,
+                            filas_por_segundo=filas_por_segundo,
+                        )
+                    if procesados % LOG_CADA_N_REGISTROS < BATCH_SIZE_INSERCION or procesados >= total_registros_origen:
+                        logger.info(
+                            f"📈 {nombre_tabla}: {procesados}/{total_registros_origen} procesados "
+                            f"({migrados} nuevos, {fallidos} fallidos, {filas_por_segundo} filas/s)"
+                        )
         except Exception as e:
             logger.error(f"Error migrando tabla {nombre_tabla}: {e}")
             raise
-        finally:
-            cursor.close()
-    
-    def crear_modelo_archivado_dinamico(self, nombre_tabla, datos_registro):
+
+        if migrados:
+            invalidar_tablas_archivadas()
+
+        duracion = time.perf_counter() - inicio
+        filas_por_segundo = self._filas_por_segundo(procesados, inicio)
+        self.estadisticas_tablas[nombre_tabla] = {
+            'registros_origen': total_registros_origen,
+            'registros_procesados': procesados,
+            'registros_nuevos': migrados,
+            'registros_fallidos': fallidos,
+            'duracion_segundos': round(duracion, 2),
+            'filas_por_segundo': filas_por_segundo,
+        }
+        logger.info(
+            f"✅ {nombre_tabla} completada: {migrados} registros nuevos migrados de "
+            f"{total_registros_origen} totales en {duracion:.1f} s ({filas_por_segundo} filas/s)"
+        )
+
+        # Retornar el total de registros en origen (para contar tablas con datos)
+        return total_registros_origen
+
+    @staticmethod
+    def _guardar_lote_dinamico(nombre_tabla, objetos, existentes):
         """
-        Crea un registro archivado dinámico en la base de datos local.
-        Soporta tablas cuya clave primaria no se llama 'id'.
+        Inserta un lote de DatoArchivadoDinamico con un único bulk_create en su
+        propia transacción. Si el INSERT falla, sólo ese lote se reintenta fila
+        a fila (un savepoint por fila) para guardar las filas válidas; las que
+        fallan se registran y se quitan de `existentes` para reintentarlas en
+        la próxima migración.
+
+        Returns:
+            int: Filas guardadas
         """
         from .models import DatoArchivadoDinamico
-        
+
+        if not objetos:
+            return 0
         try:
-            # Obtener el valor de la clave primaria del registro.
-            # Primero intentamos el campo 'id' (convención Django/Rails),
-            # luego buscamos cualquier campo que termine en '_id' o que sea
-            # el primer campo numérico del registro.
-            id_original = datos_registro.get('id')
+            with transaction.atomic():
+                DatoArchivadoDinamico.objects.bulk_create(objetos, ignore_conflicts=True)
+            return len(objetos)
+        except Exception as e:
+            logger.warning(
+                f"Falló la inserción por lotes de {len(objetos)} registros de {nombre_tabla}: {e}. "
+                f"Se reintenta fila a fila."
+            )
 
-            if not id_original:
-                # Buscar otros campos que puedan ser la PK
-                for campo, valor in datos_registro.items():
-                    if campo.lower() in ('id', 'pk') and valor is not None:
-                        id_original = valor
-                        break
+        guardados = 0
+        for objeto in objetos:
+            objeto.pk = None
+            objeto._state.adding = True
+            try:
+                with transaction.atomic():
+                    objeto.save(force_insert=True)
+                guardados += 1
+            except Exception as e:
+                logger.error(f"Error guardando registro de {nombre_tabla} (ID original: {objeto.id_original}): {e}")
+                existentes.discard(objeto.id_original)
+        return guardados
 
-            if not id_original:
-                # Usar el primer campo como identificador si no hay 'id'
-                primer_campo = next(iter(datos_registro), None)
-                if primer_campo:
-                    id_original = datos_registro[primer_campo]
+    @staticmethod
+    def _filas_por_segundo(filas, inicio):
+        transcurrido = time.perf_counter() - inicio
+        return round(filas / transcurrido) if transcurrido > 0 else filas
+
+    def obtener_id_original(self, datos_registro):
+        """
+        Valor de la clave primaria del registro. Primero se intenta el campo
+        'id' (convención Django/Rails), luego 'pk' y por último el primer campo.
+        """
+        id_original = datos_registro.get('id')
+
+        if not id_original:
+            # Buscar otros campos que puedan ser la PK
+            for campo, valor in datos_registro.items():
+                if campo.lower() in ('id', 'pk') and valor is not None:
+                    id_original = valor
+                    break
+
+        if not id_original:
+            # Usar el primer campo como identificador si no hay 'id'
+            primer_campo = next(iter(datos_registro), None)
+            if primer_campo:
+                id_original = datos_registro[primer_campo]
+
+        return id_original
+
+    def crear_modelo_archivado_dinamico(self, nombre_tabla, datos_registro, existentes=None):
+        """
+        Construye (sin guardar) el DatoArchivadoDinamico de un registro de origen.
+        Soporta tablas cuya clave primaria no se llama 'id'.
+
+        Retorna None si el registro no tiene clave o ya fue migrado. El id se
+        añade a `existentes` (por defecto el conjunto precargado de la tabla)
+        para descartar duplicados dentro de la misma migración. La estructura
+        de la tabla no se copia en cada fila: vive en EstructuraTablaArchivada.
+        """
+        from .models import DatoArchivadoDinamico, construir_texto_busqueda
+
+        if existentes is None:
+            existentes = self._ids_existentes(nombre_tabla)
+
+        try:
+            id_original = self.obtener_id_original(datos_registro)
 
             if id_original is None:
                 logger.warning(f"Registro sin clave primaria en tabla {nombre_tabla}, se omite: {datos_registro}")
                 return None
-            
-            # Verificar si ya existe
-            if DatoArchivadoDinamico.objects.filter(
-                tabla_origen=nombre_tabla, 
-                id_original=id_original
-            ).exists():
+
+            id_original = int(id_original)
+            if id_original in existentes:
                 return None
-            
+
             # Convertir datos a JSON, manejando tipos especiales
             datos_json = self.convertir_datos_a_json(datos_registro)
-            
-            # Crear registro archivado
-            modelo_archivado = DatoArchivadoDinamico.objects.create(
+            existentes.add(id_original)
+
+            return DatoArchivadoDinamico(
                 tabla_origen=nombre_tabla,
                 id_original=id_original,
                 datos_originales=datos_json,
-                estructura_tabla=json.dumps(self.inspector.tablas_inspeccionadas.get(nombre_tabla, {}))
+                texto_busqueda=construir_texto_busqueda(datos_json),
             )
-            
-            return modelo_archivado
-            
+
         except Exception as e:
             logger.error(f"Error creando modelo archivado para {nombre_tabla}: {e}")
             return None
-    
+
     def convertir_datos_a_json(self, datos):
         """
         Convierte los datos del registro a formato JSON, manejando tipos especiales
@@ -1189,5 +1370,11 @@ class MigracionService:
         if hasattr(self, 'modelos_dinamicos'):
             resumen['tablas_procesadas'] = list(self.modelos_dinamicos.keys())
             resumen['total_tablas'] = len(self.modelos_dinamicos)
+
+        if self.estadisticas_tablas:
+            resumen['estadisticas_tablas'] = self.estadisticas_tablas
+            procesados = sum(e['registros_procesados'] for e in self.estadisticas_tablas.values())
+            segundos = sum(e['duracion_segundos'] for e in self.estadisticas_tablas.values())
+            resumen['filas_por_segundo'] = round(procesados / segundos) if segundos else procesados
         
         return resumen
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+Celery tasks for the datos_archivados application.
+"""
+
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(acks_late=True)
+def preparar_migracion_task(migracion_id):
+    """
+    Inspecciona la base MariaDB de una MigracionLog y encola una
+    migrar_tabla_task por tabla (datos_archivados.migracion_paralela_service).
+    """
+    from .migracion_paralela_service import preparar_migracion
+
+    tablas = preparar_migracion(migracion_id)
+    return {'migracion_id': migracion_id, 'tablas_encoladas': len(tablas)}
+
+
+@shared_task(acks_late=True)
+def migrar_tabla_task(migracion_id, tabla_id):
+    """
+    Migra una tabla con su propia conexión MySQL y actualiza su MigracionTabla.
+
+    Args:
+        migracion_id: ID de la MigracionLog
+        tabla_id: ID de la MigracionTabla a procesar
+    """
+    from .migracion_paralela_service import migrar_tabla
+
+    tabla = migrar_tabla(migracion_id, tabla_id)
+    if tabla is None:
+        return {'tabla_id': tabla_id, 'estado': 'omitida'}
+    tabla.refresh_from_db()
+    return {
+        'tabla': tabla.nombre_tabla,
+        'estado': tabla.estado,
+        'registros_nuevos': tabla.registros_nuevos,
+        'filas_por_segundo': tabla.filas_por_segundo,
+    }
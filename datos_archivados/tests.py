@@ -1,3 +1,611 @@
+import re
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.db import DatabaseError
 from django.test import TestCase
+from django.utils import timezone
+
+from datos_archivados.archivado_service import archivar_datos_curso_academico
+from datos_archivados.models import (
+    AsistenciaArchivada, CalificacionArchivada, CursoAcademicoArchivado, CursoArchivado,
+    DatoArchivadoDinamico, EstructuraTablaArchivada, MatriculaArchivada, MigracionTabla,
+    NotaIndividualArchivada, ReglamentoCursoArchivado, SemestreCursoArchivado, UsuarioArchivado,
+)
+from datos_archivados.services import InspectorBaseDatos, MigracionService
+from principal.models import (
+    ArticuloReglamento, Asistencia, Calificaciones, Curso, CursoAcademico, Matriculas,
+    NotaIndividual, ReglamentoCurso, SemestreCurso,
+)
+
+
+class ArchivadoCursoAcademicoTest(TestCase):
+    """Tests del archivado por lotes de un CursoAcademico (archivado_service)"""
+
+    def setUp(self):
+        self.ca = CursoAcademico.objects.create(nombre='2030-2031', activo=True)
+        self.profesor = User.objects.create_user(username='profesor', first_name='Ana')
+        self.profesor.groups.add(Group.objects.get_or_create(name='Profesores')[0])
+        self.curso = Curso.objects.create(name='Inglés', teacher=self.profesor, curso_academico=self.ca)
+        self.semestre = SemestreCurso.objects.filter(curso=self.curso).first() or SemestreCurso.objects.create(
+            curso=self.curso, numero_semestre=1, activo=True, curso_academico=self.ca
+        )
+        reglamento = ReglamentoCurso.objects.create(curso=self.curso, introduccion='Normas')
+        ArticuloReglamento.objects.create(reglamento=reglamento, titulo='Art. 1', cuerpo='Texto', orden=1)
+
+        self.alumnos = [User.objects.create_user(username=f'alumno{i}') for i in range(3)]
+        for i, alumno in enumerate(self.alumnos):
+            matricula = Matriculas.objects.create(
+                course=self.curso, student=alumno, curso_academico=self.ca, semestre=self.semestre
+            )
+            cal = Calificaciones.objects.create(
+                matricula=matricula if i else None, course=self.curso, student=alumno,
+                curso_academico=self.ca, semestre=self.semestre,
+            )
+            NotaIndividual.objects.create(calificacion=cal, valor=8)
+            NotaIndividual.objects.create(calificacion=cal, valor=6)
+            for dia in (1, 2):
+                Asistencia.objects.create(
+                    course=self.curso, student=alumno, date=date(2030, 1, dia),
+                    presente=bool(dia % 2), semestre=self.semestre,
+                )
+
+    def test_archiva_por_lotes_y_limpia_principal(self):
+        contadores = archivar_datos_curso_academico(self.ca, batch_size=2)
+
+        self.assertEqual(contadores['cursos'], 1)
+        self.assertEqual(contadores['usuarios'], 4)
+        # 3 matrículas + 1 provisional para la calificación sin matrícula
+        self.assertEqual(contadores['matriculas'], 4)
+        self.assertEqual(contadores['calificaciones'], 3)
+        self.assertEqual(contadores['notas'], 6)
+        self.assertEqual(contadores['asistencias'], 6)
+        self.assertEqual(contadores['reglamentos'], 1)
+        self.assertEqual(contadores['articulos_reglamento'], 1)
+        self.assertEqual(
+            set(contadores['tiempos_ms']),
+            {'cursos', 'reglamentos', 'semestres', 'matriculas', 'calificaciones', 'asistencias', 'limpieza'},
+        )
+
+        curso_archivado = CursoArchivado.objects.get(id_original=self.curso.pk)
+        self.assertEqual(curso_archivado.curso_academico.id_original, self.ca.pk)
+        self.assertTrue(ReglamentoCursoArchivado.objects.filter(curso=curso_archivado).exists())
+        semestre_archivado = SemestreCursoArchivado.objects.get(id_original=self.semestre.pk)
+        self.assertFalse(semestre_archivado.activo)
+
+        profesor = UsuarioArchivado.objects.get(id_original=self.profesor.pk)
+        self.assertIn('Profesores', profesor.grupo)
+        self.assertEqual(profesor.usuario_actual, self.profesor)
+
+        provisional = MatriculaArchivada.objects.get(id_original__lt=0)
+        cal = CalificacionArchivada.objects.get(matricula=provisional)
+        self.assertEqual(cal.student.id_original, self.alumnos[0].pk)
+        self.assertEqual(cal.average, 7)
+        self.assertEqual(NotaIndividualArchivada.objects.filter(calificacion=cal).count(), 2)
+        self.assertEqual(
+            AsistenciaArchivada.objects.filter(semestre_archivado=semestre_archivado).count(), 6
+        )
+
+        self.assertFalse(Curso.objects.filter(curso_academico=self.ca).exists())
+        self.assertFalse(Matriculas.objects.exists())
+        self.assertFalse(NotaIndividual.objects.exists())
+        self.assertFalse(Asistencia.objects.exists())
+
+    def test_reutiliza_usuarios_archivados_existentes(self):
+        archivar_datos_curso_academico(self.ca)
+
+        ca2 = CursoAcademico.objects.create(nombre='2031-2032')
+        curso2 = Curso.objects.create(name='Francés', teacher=self.profesor, curso_academico=ca2)
+        Matriculas.objects.create(course=curso2, student=self.alumnos[0], curso_academico=ca2)
+
+        contadores = archivar_datos_curso_academico(ca2)
+        self.assertEqual(contadores['usuarios'], 0)
+        self.assertEqual(UsuarioArchivado.objects.filter(id_original=self.profesor.pk).count(), 1)
+
+    def test_semestres_pendientes_con_ca_ya_archivado(self):
+        ca_archivado = CursoAcademicoArchivado.objects.create(
+            id_original=self.ca.pk, nombre=self.ca.nombre, activo=False, archivado=True,
+            fecha_creacion=self.ca.fecha_creacion,
+        )
+        CursoArchivado.objects.create(
+            id_original=self.curso.pk, name=self.curso.name, teacher_id_original=self.profesor.pk,
+            teacher_name='Ana', curso_academico=ca_archivado,
+        )
+        ya_archivada = Asistencia.objects.first()
+        AsistenciaArchivada.objects.create(
+            id_original=ya_archivada.pk,
+            course=CursoArchivado.objects.get(),
+            student=UsuarioArchivado.objects.create(
+                id_original=self.alumnos[0].pk, username='alumno0',
+                date_joined=self.alumnos[0].date_joined, usuario_actual=self.alumnos[0],
+            ),
+            date=ya_archivada.date,
+        )
+
+        contadores = archivar_datos_curso_academico(self.ca)
+
+        self.assertEqual(contadores['cursos'], 0)
+        self.assertEqual(contadores['usuarios'], 2)
+        self.assertEqual(contadores['asistencias'], 5)
+        self.assertEqual(contadores['notas'], 6)
+        self.assertEqual(SemestreCursoArchivado.objects.count(), 1)
+        self.assertFalse(Curso.objects.filter(curso_academico=self.ca).exists())
+        self.assertFalse(Asistencia.objects.exists())
+
+
+class CursorFalso:
+    """Cursor mínimo de mysql.connector sobre tablas en memoria."""
+
+    def __init__(self, conexion, dictionary=False, buffered=None):
+        self.conexion = conexion
+        self.dictionary = dictionary
+        self.resultado = []
+
+    def execute(self, sql, params=()):
+        self.conexion.consultas.append(sql)
+        if sql == 'SHOW TABLES':
+            self.resultado = [(nombre,) for nombre in self.conexion.tablas]
+            return
+        if sql.startswith('DESCRIBE'):
+            self.resultado = [
+                {'Field': 'id', 'Type': 'int(11)', 'Null': 'NO', 'Key': 'PRI', 'Default': None, 'Extra': ''},
+                {'Field': 'nombre', 'Type': 'varchar(50)', 'Null': 'YES', 'Key': '', 'Default': None, 'Extra': ''},
+            ]
+            return
+        if 'INFORMATION_SCHEMA' in sql:
+            self.resultado = []
+            return
+        filas = self.conexion.tablas[re.search(r'FROM `(\w+)`', sql).group(1)]
+        if sql.startswith('SELECT COUNT(*)'):
+            self.resultado = [(len(filas),)]
+        elif 'WHERE `id` >' in sql:
+            ultimo, limite = params
+            self.resultado = [f for f in filas if f['id'] > ultimo][:limite]
+        elif 'LIMIT' in sql:
+            self.resultado = filas[:params[0]]
+        else:
+            self.resultado = list(filas)
+
+    def fetchone(self):
+        return self.resultado.pop(0) if self.resultado else None
+
+    def fetchall(self):
+        resultado, self.resultado = self.resultado, []
+        return resultado
+
+    def fetchmany(self, tamano):
+        lote, self.resultado = self.resultado[:tamano], self.resultado[tamano:]
+        return lote
+
+    def close(self):
+        pass
+
+
+class ConexionFalsa:
+    def __init__(self, tablas):
+        self.tablas = {nombre: sorted(filas, key=lambda f: f['id']) for nombre, filas in tablas.items()}
+        self.consultas = []
+
+    def cursor(self, **kwargs):
+        return CursorFalso(self, **kwargs)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class MigracionTablaDinamicaTest(TestCase):
+    """Tests de la migración por lotes de tablas MariaDB (MigracionService)"""
+
+    def _servicio(self, filas, columnas_pk=('id',)):
+        servicio = MigracionService('localhost', 'legacy', 'user', 'pass')
+        servicio.connection = ConexionFalsa({'alumnos': filas})
+        servicio.inspector = InspectorBaseDatos(servicio.connection)
+        servicio.inspector.tablas_inspeccionadas['alumnos'] = {
+            'nombre': 'alumnos',
+            'columnas': [
+                {'Field': 'id', 'Type': 'int(11)', 'Key': 'PRI' if 'id' in columnas_pk else ''},
+                {'Field': 'nombre', 'Type': 'varchar(50)', 'Key': ''},
+            ],
+            'claves_foraneas': {},
+        }
+        return servicio
+
+    def test_migra_por_lotes_con_paginacion_por_clave(self):
+        filas = [{'id': i, 'nombre': f'Alumno {i}', 'alta': date(2020, 1, 1)} for i in range(1, 8)]
+        DatoArchivadoDinamico.objects.create(tabla_origen='alumnos', id_original=3, datos_originales={})
+        servicio = self._servicio(filas)
+        avisos = []
+
+        with mock.patch('datos_archivados.services.BATCH_SIZE_INSERCION', 3), \
+                mock.patch('datos_archivados.services.LOTE_ACTUALIZACION_PROGRESO', 1):
+            total = servicio.migrar_tabla_dinamica('alumnos', None, lambda **kw: avisos.append(kw))
+
+        self.assertEqual(total, 7)
+        self.assertEqual(DatoArchivadoDinamico.objects.filter(tabla_origen='alumnos').count(), 7)
+        nuevo = DatoArchivadoDinamico.objects.get(tabla_origen='alumnos', id_original=5)
+        self.assertEqual(nuevo.datos_originales['alta'], '2020-01-01')
+        self.assertIsNone(nuevo.estructura_tabla)
+        self.assertEqual(nuevo.obtener_estructura()['nombre'], 'alumnos')
+        self.assertEqual(EstructuraTablaArchivada.objects.count(), 1)
+
+        # 3 lotes: sin cursor, > 3 y > 6
+        paginadas = [c for c in servicio.connection.consultas if 'ORDER BY `id`' in c]
+        self.assertEqual(len(paginadas), 3)
+        self.assertEqual([a['registros_procesados'] for a in avisos], [3, 6, 7])
+        self.assertEqual(avisos[-1]['registros_migrados_tabla'], 6)
+        self.assertEqual(servicio.estadisticas_tablas['alumnos']['registros_nuevos'], 6)
+        self.assertIn('filas_por_segundo', servicio.estadisticas_tablas['alumnos'])
+
+        # Una segunda pasada no inserta nada
+        servicio.migrar_tabla_dinamica('alumnos', None)
+        self.assertEqual(servicio.estadisticas_tablas['alumnos']['registros_nuevos'], 0)
+
+    def test_lote_fallido_se_reintenta_fila_a_fila(self):
+        filas = [{'id': i, 'nombre': f'Alumno {i}'} for i in range(1, 5)]
+        servicio = self._servicio(filas)
+        avisos = []
+        guardar = DatoArchivadoDinamico.save
+
+        def guardar_fallando(objeto, *args, **kwargs):
+            if objeto.id_original == 2:
+                raise DatabaseError('fila inválida')
+            return guardar(objeto, *args, **kwargs)
+
+        with mock.patch.object(DatoArchivadoDinamico.objects, 'bulk_create', side_effect=DatabaseError('lote')), \
+                mock.patch.object(DatoArchivadoDinamico, 'save', guardar_fallando):
+            servicio.migrar_tabla_dinamica('alumnos', None, lambda **kw: avisos.append(kw))
+
+        self.assertEqual(
+            sorted(DatoArchivadoDinamico.objects.values_list('id_original', flat=True)), [1, 3, 4]
+        )
+        self.assertEqual(avisos[-1]['registros_migrados_tabla'], 3)
+        self.assertEqual(avisos[-1]['registros_fallidos_tabla'], 1)
+        self.assertEqual(servicio.estadisticas_tablas['alumnos']['registros_fallidos'], 1)
+
+        # La fila fallida se vuelve a intentar en la siguiente pasada
+        servicio.migrar_tabla_dinamica('alumnos', None)
+        self.assertEqual(servicio.estadisticas_tablas['alumnos']['registros_nuevos'], 1)
+
+    def test_tabla_sin_clave_simple_usa_cursor_sin_buffer(self):
+        servicio = self._servicio([{'id': 1, 'nombre': 'A'}, {'id': 2, 'nombre': 'B'}], columnas_pk=())
+        servicio.migrar_tabla_dinamica('alumnos', None)
+
+        self.assertIn('SELECT * FROM `alumnos`', servicio.connection.consultas)
+        self.assertEqual(DatoArchivadoDinamico.objects.filter(tabla_origen='alumnos').count(), 2)
+
+
+class MigracionParalelaTest(TestCase):
+    """Tests de la migración repartida en una tarea por tabla (migracion_paralela_service)"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.usuario = User.objects.create_user(username='secretaria')
+        self.tablas = {
+            'alumnos': [{'id': i, 'nombre': f'Alumno {i}'} for i in range(1, 6)],
+            'cursos': [{'id': i, 'nombre': f'Curso {i}'} for i in range(1, 4)],
+            'vacia': [],
+        }
+
+    def _conectar(self, fallar=()):
+        tablas = self.tablas
+
+        def conectar(servicio):
+            servicio.connection = ConexionFalsa(tablas)
+            return True
+
+        def migrar(servicio, nombre_tabla, modelo, callback=None):
+            if nombre_tabla in fallar:
+                raise RuntimeError(f'fallo en {nombre_tabla}')
+            return original(servicio, nombre_tabla, modelo, callback)
+
+        original = MigracionService.migrar_tabla_dinamica
+        return [
+            mock.patch.object(MigracionService, 'conectar_mariadb', conectar),
+            mock.patch.object(MigracionService, 'migrar_tabla_dinamica', migrar),
+        ]
+
+    def _con_parches(self, parches, funcion, *args, **kwargs):
+        for parche in parches:
+            parche.start()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            for parche in parches:
+                parche.stop()
+
+    def test_migra_cada_tabla_y_cierra_el_log(self):
+        from datos_archivados.migracion_paralela_service import iniciar_migracion_paralela
+
+        migracion = self._con_parches(
+            self._conectar(), iniciar_migracion_paralela,
+            self.usuario, 'legacy-host', 'legacy', 'root', 'secreto',
+        )
+        migracion.refresh_from_db()
+
+        self.assertEqual(migracion.estado, 'completada')
+        self.assertEqual(migracion.tablas_inspeccionadas, 3)
+        self.assertEqual(migracion.tablas_con_datos, 2)
+        self.assertEqual(migracion.tablas_vacias, 1)
+        self.assertEqual(migracion.usuarios_migrados, 8)
+        self.assertEqual(
+            set(migracion.tablas.values_list('estado', flat=True)), {MigracionTabla.ESTADO_COMPLETADA}
+        )
+        self.assertEqual(EstructuraTablaArchivada.objects.count(), 3)
+        self.assertEqual(DatoArchivadoDinamico.objects.count(), 8)
+
+    def test_continuar_solo_reencola_tablas_no_completadas(self):
+        from datos_archivados.migracion_paralela_service import (
+            actualizar_progreso_global, continuar_migracion_paralela, crear_servicio,
+            iniciar_migracion_paralela,
+        )
+
+        migracion = self._con_parches(
+            self._conectar(fallar=('cursos',)), iniciar_migracion_paralela,
+            self.usuario, 'legacy-host', 'legacy', 'root', 'secreto',
+        )
+        migracion.refresh_from_db()
+        self.assertEqual(migracion.estado, 'error')
+        self.assertIn('cursos', migracion.errores)
+        # Las credenciales no sobreviven a la migración fallida
+        self.assertIsNone(crear_servicio(migracion.id))
+        alumnos = migracion.tablas.get(nombre_tabla='alumnos')
+        progreso = actualizar_progreso_global(migracion.id)
+        self.assertEqual(progreso['tablas_con_error'], 1)
+        self.assertEqual(progreso['registros_migrados'], 5)
+
+        encoladas = self._con_parches(
+            self._conectar(), continuar_migracion_paralela, migracion, 'root', 'secreto',
+        )
+        self.assertEqual(encoladas, 1)
+        migracion.refresh_from_db()
+        self.assertEqual(migracion.estado, 'completada')
+        self.assertEqual(migracion.tablas.get(nombre_tabla='alumnos').fecha_fin, alumnos.fecha_fin)
+        self.assertEqual(DatoArchivadoDinamico.objects.filter(tabla_origen='cursos').count(), 3)
+
+    def test_tarea_reentregada_retoma_tabla_sin_avances(self):
+        from datos_archivados.migracion_paralela_service import guardar_conexion, migrar_tabla
+        from datos_archivados.models import MigracionLog
+
+        migracion = MigracionLog.objects.create(
+            usuario=self.usuario, estado='en_progreso', host_origen='h', base_datos_origen='legacy',
+        )
+        guardar_conexion(migracion.id, 'h', 'legacy', 'root', 'secreto')
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        alumnos = MigracionTabla.objects.create(
+            migracion=migracion, nombre_tabla='alumnos', estado=MigracionTabla.ESTADO_EN_PROGRESO,
+            fecha_inicio=hace_una_hora, fecha_actualizacion=hace_una_hora,
+        )
+        cursos = MigracionTabla.objects.create(
+            migracion=migracion, nombre_tabla='cursos', estado=MigracionTabla.ESTADO_EN_PROGRESO,
+            fecha_inicio=hace_una_hora, fecha_actualizacion=timezone.now(),
+        )
+
+        # La tabla con avances recientes sigue en manos de su worker
+        self.assertIsNone(self._con_parches(self._conectar(), migrar_tabla, migracion.id, cursos.id))
+        self._con_parches(self._conectar(), migrar_tabla, migracion.id, alumnos.id)
+        alumnos.refresh_from_db()
+        self.assertEqual(alumnos.estado, MigracionTabla.ESTADO_COMPLETADA)
+        self.assertEqual(DatoArchivadoDinamico.objects.filter(tabla_origen='alumnos').count(), 5)
+
+    def test_error_al_inspeccionar_marca_la_tabla_y_desconecta(self):
+        from datos_archivados.migracion_paralela_service import guardar_conexion, migrar_tabla
+        from datos_archivados.models import MigracionLog
+        from datos_archivados.services import InspectorBaseDatos
+
+        migracion = MigracionLog.objects.create(
+            usuario=self.usuario, estado='en_progreso', host_origen='h', base_datos_origen='legacy',
+        )
+        guardar_conexion(migracion.id, 'h', 'legacy', 'root', 'secreto')
+        alumnos = MigracionTabla.objects.create(migracion=migracion, nombre_tabla='alumnos')
+
+        desconectar = mock.Mock()
+        parches = self._conectar() + [
+            mock.patch.object(InspectorBaseDatos, 'inspeccionar_tabla', side_effect=RuntimeError('DESCRIBE falló')),
+            mock.patch.object(MigracionService, 'desconectar_mariadb', desconectar),
+        ]
+        self._con_parches(parches, migrar_tabla, migracion.id, alumnos.id)
+        alumnos.refresh_from_db()
+        self.assertEqual(alumnos.estado, MigracionTabla.ESTADO_ERROR)
+        self.assertIn('DESCRIBE falló', alumnos.error)
+        desconectar.assert_called_once()
+
+        from datos_archivados.migracion_paralela_service import (
+            cancelar_migracion, crear_servicio, guardar_conexion, migrar_tabla,
+        )
+        from datos_archivados.models import MigracionLog
+
+        migracion = MigracionLog.objects.create(
+            usuario=self.usuario, estado='en_progreso', host_origen='h', base_datos_origen='legacy',
+        )
+        alumnos = MigracionTabla.objects.create(migracion=migracion, nombre_tabla='alumnos')
+        cursos = MigracionTabla.objects.create(migracion=migracion, nombre_tabla='cursos')
+
+        self.assertEqual(cancelar_migracion(migracion, tablas=['cursos']), 1)
+        self.assertIsNone(migrar_tabla(migracion.id, cursos.id))
+        migracion.refresh_from_db()
+        self.assertEqual(migracion.estado, 'en_progreso')
+
+        guardar_conexion(migracion.id, 'h', 'legacy', 'root', 'secreto')
+        self.assertEqual(cancelar_migracion(migracion), 1)
+        migracion.refresh_from_db()
+        alumnos.refresh_from_db()
+        self.assertEqual(migracion.estado, 'cancelada')
+        self.assertIsNone(crear_servicio(migracion.id))
+        self.assertEqual(alumnos.estado, MigracionTabla.ESTADO_CANCELADA)
+
+
+class GuardadoHistorialDocenciaTest(TestCase):
+    """Tests del guardado por lotes de las tablas de docencia en historial (historical_data_saver)"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.alumno = User.objects.create_user(username='alumno')
+        self._archivar('Docencia_area', [{'id': 1, 'name': 'Idiomas'}, {'id': 2, 'name': 'Artes'}])
+        self._archivar('Docencia_courseinformation', [
+            {'id': 10, 'name': 'Inglés', 'area_id': 1},
+            {'id': 11, 'name': 'Pintura', 'area_id': '2'},
+            {'id': 12, 'name': 'Sin área', 'area_id': 99},
+        ])
+        self._archivar('Docencia_subjectinformation', [{'id': 20, 'name': 'Inglés I', 'course_id': 10}])
+        self._archivar('Docencia_enrollment', [
+            {'id': 30, 'subject_id': 20, 'course_id': 20, 'user_id': self.alumno.pk},
+            {'id': 31, 'course_id': 20, 'user_id': 987654},
+        ])
+        self._archivar('Docencia_class', [
+            {'id': 40, 'name': 'Clase 1', 'subject_id': 20, 'uploaddate': '2030-01-10',
+             'datepub': '2030-01-10T08:00:00+00:00', 'dateend': '2030-01-20T08:00:00+00:00'},
+            {'id': 41, 'name': 'Clase 2', 'subject_id': 20, 'uploaddate': 'no-es-fecha',
+             'datepub': '2030-01-10T08:00:00+00:00', 'dateend': '2030-01-20T08:00:00+00:00'},
+            {'id': 42, 'name': 'Clase 3', 'subject_id': 20, 'uploaddate': '2030-01-12',
+             'datepub': '2030-01-12T08:00:00+00:00', 'dateend': '2030-01-22T08:00:00+00:00'},
+        ])
+
+    def _archivar(self, tabla, filas):
+        DatoArchivadoDinamico.objects.bulk_create([
+            DatoArchivadoDinamico(tabla_origen=tabla, id_original=fila['id'], datos_originales=fila)
+            for fila in filas
+        ])
+
+    def test_planificar_niveles_agrupa_tablas_independientes(self):
+        from datos_archivados.historical_data_saver import DOCENCIA_TABLES_MAPPING, planificar_niveles
+
+        niveles = planificar_niveles(list(DOCENCIA_TABLES_MAPPING))
+        self.assertEqual(niveles[0], ['Docencia_area', 'Docencia_coursecategory', 'Docencia_accountnumber'])
+        self.assertEqual(niveles[1], ['Docencia_courseinformation'])
+        self.assertEqual(niveles[-1], ['Docencia_class_studentView'])
+        self.assertEqual(sum(len(nivel) for nivel in niveles), 13)
+
+        # Un ciclo en las relaciones detectadas se resuelve con el orden fijo
+        ciclo = {
+            'Docencia_area': {'category_id': ('Docencia_coursecategory', 'id')},
+            'Docencia_coursecategory': {'area_id': ('Docencia_area', 'id')},
+        }
+        self.assertEqual(
+            planificar_niveles(['Docencia_coursecategory', 'Docencia_area'], ciclo),
+            [['Docencia_area'], ['Docencia_coursecategory']],
+        )
+
+    def test_importa_por_lotes_con_fk_y_fallback_por_fila(self):
+        from datos_archivados.historical_data_saver import guardar_datos_docencia_en_historial
+        from historial.models import (
+            HistoricalArea, HistoricalClass, HistoricalCourseInformation, HistoricalEnrollment,
+        )
+
+        tablas = [
+            'Docencia_class', 'Docencia_enrollment', 'Docencia_subjectinformation',
+            'Docencia_courseinformation', 'Docencia_area',
+        ]
+        with mock.patch('datos_archivados.historical_data_saver._actualizar_progreso_cache') as progreso:
+            estadisticas = guardar_datos_docencia_en_historial(tablas, batch_size=2)
+
+        self.assertEqual(estadisticas['Docencia_area_guardados'], 2)
+        self.assertEqual(estadisticas['Docencia_courseinformation_guardados'], 3)
+        self.assertEqual(estadisticas['Docencia_enrollment_guardados'], 2)
+        # La clase con fecha inválida hace fallar su lote, que se reintenta fila a fila
+        self.assertEqual(estadisticas['Docencia_class_guardados'], 2)
+        self.assertEqual(estadisticas['errores'], 1)
+        self.assertEqual(estadisticas['tablas_procesadas'], 5)
+
+        idiomas = HistoricalArea.objects.get(id_original=1)
+        self.assertEqual(HistoricalCourseInformation.objects.get(id_original=10).area, idiomas)
+        self.assertEqual(HistoricalCourseInformation.objects.get(id_original=11).area.nombre, 'Artes')
+        self.assertIsNone(HistoricalCourseInformation.objects.get(id_original=12).area)
+        self.assertEqual(HistoricalEnrollment.objects.get(id_original=30).usuario, self.alumno)
+        self.assertIsNone(HistoricalEnrollment.objects.get(id_original=31).usuario)
+        self.assertEqual(HistoricalEnrollment.objects.get(id_original=30).curso.id_original, 20)
+        self.assertEqual(
+            sorted(HistoricalClass.objects.values_list('id_original', flat=True)), [40, 42]
+        )
+
+        # Progreso: una llamada por lote más el cierre de cada tabla
+        llamadas_clases = [c for c in progreso.call_args_list if c.args[0] == 'Docencia_class']
+        self.assertEqual(len(llamadas_clases), 3)
+
+    def test_mapeos_de_tablas_no_seleccionadas_se_cargan_de_importaciones_previas(self):
+        from datos_archivados.historical_data_saver import guardar_datos_docencia_en_historial
+        from historial.models import HistoricalEnrollment
+
+        guardar_datos_docencia_en_historial(
+            ['Docencia_area', 'Docencia_courseinformation', 'Docencia_subjectinformation']
+        )
+        guardar_datos_docencia_en_historial(['Docencia_enrollment'])
+
+        self.assertEqual(HistoricalEnrollment.objects.get(id_original=30).curso.id_original, 20)
+
+
+class BusquedaArchivadosTest(TestCase):
+    """Tests de la búsqueda indexada sobre DatoArchivadoDinamico (busqueda_service)"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        for i in range(5):
+            DatoArchivadoDinamico.objects.create(
+                tabla_origen='auth_user', id_original=i,
+                datos_originales={'id': i, 'username': f'usuario{i}', 'email': f'u{i}@CFBC.cu', 'is_staff': False},
+            )
+        DatoArchivadoDinamico.objects.create(
+            tabla_origen='Docencia_area', id_original=1, datos_originales={'id': 1, 'name': 'Idiomas cfbc'},
+        )
+        DatoArchivadoDinamico.objects.create(
+            tabla_origen='cfbc_config', id_original=1, datos_originales={'id': 1, 'clave': 'x'},
+        )
+
+    def test_texto_busqueda_se_calcula_al_guardar(self):
+        from datos_archivados.models import construir_texto_busqueda
+
+        dato = DatoArchivadoDinamico.objects.get(tabla_origen='auth_user', id_original=1)
+        self.assertEqual(dato.texto_busqueda, '1 usuario1 u1@cfbc.cu false')
+        self.assertEqual(
+            construir_texto_busqueda({'a': None, 'b': {'c': 'Ñ'}}, 'Nombre'), 'nombre {"c": "ñ"}'
+        )
+
+        dato.datos_originales = {'id': 1, 'username': 'Renombrado'}
+        dato.save(update_fields=['datos_originales'])
+        dato.refresh_from_db()
+        self.assertEqual(dato.texto_busqueda, '1 renombrado')
+
+    def test_buscar_agrupado_en_una_consulta(self):
+        from datos_archivados.busqueda_service import buscar_agrupado, tablas_archivadas
+
+        tablas_archivadas()
+        with self.assertNumQueries(1):
+            resultado = buscar_agrupado('CFBC', 'global')
+
+        self.assertEqual(resultado['total'], 7)
+        self.assertEqual(
+            [(g['tabla'], g['total_registros'], len(g['ejemplos'])) for g in resultado['results']],
+            [('auth_user', 5, 3), ('Docencia_area', 1, 1), ('cfbc_config', 1, 1)],
+        )
+        self.assertEqual(resultado['results'][0]['ejemplos'][0]['campos_coincidentes'][0]['campo'], 'email')
+
+        self.assertEqual(buscar_agrupado('cfbc', 'contenido')['total'], 6)
+        self.assertEqual(buscar_agrupado('cfbc', 'tabla')['total'], 1)
+        self.assertEqual(len(buscar_agrupado('cfbc', 'global', limite=1)['results']), 1)
+
+    def test_filtro_claves_json_y_vista(self):
+        from django.urls import reverse
+
+        from datos_archivados.busqueda_service import filtro_claves_json
+
+        encontrados = DatoArchivadoDinamico.objects.filter(
+            filtro_claves_json('username', ['usuario2', 'usuario4']), tabla_origen='auth_user'
+        )
+        self.assertEqual(sorted(encontrados.values_list('id_original', flat=True)), [2, 4])
+        self.assertFalse(DatoArchivadoDinamico.objects.filter(filtro_claves_json('id', [])).exists())
 
-# Create your tests here.
+        admin = User.objects.create_user(username='admin', is_staff=True)
+        self.client.force_login(admin)
+        respuesta = self.client.get(reverse('datos_archivados:buscar_en_tabla_ajax', args=['auth_user']), {'q': 'usuario3'})
+        datos = respuesta.json()
+        self.assertEqual(datos['total_encontrados'], 1)
+        self.assertEqual(datos['resultados'][0]['campos_coincidentes'][0]['valor'], 'usuario3')
@@ -10,6 +10,8 @@ from django.conf import settings
 import json
 import logging
 
+from .busqueda_service import buscar_agrupado, campos_coincidentes, filtrar_por_texto
+
 # Configurar logger
 logger = logging.getLogger(__name__)
 
@@ -154,17 +156,9 @@ def configurar_migracion_view(request):
             
             servicio.desconectar_mariadb()
             
-            # Ejecutar migración automática en hilo separado
-            def ejecutar_migracion_automatica():
-                try:
-                    servicio.inspeccionar_y_migrar_automaticamente(request.user)
-                except Exception as e:
-                    logger.error(f"Error en hilo de migración automática: {e}", exc_info=True)
-            
-            import threading
-            thread = threading.Thread(target=ejecutar_migracion_automatica)
-            thread.daemon = True
-            thread.start()
+            # Inspección y migración en tareas Celery (una por tabla, en paralelo)
+            from .migracion_paralela_service import iniciar_migracion_paralela
+            iniciar_migracion_paralela(request.user, host, database, user, password, int(port))
             
             messages.success(request, 'Migración automática iniciada correctamente. El sistema inspeccionará la base de datos y migrará todos los datos automáticamente.')
             return redirect('datos_archivados:dashboard')
@@ -189,13 +183,13 @@ def detalle_dato_archivado(request, pk):
         dato = get_object_or_404(DatoArchivadoDinamico, pk=pk)
         
         # Preparar los datos para mostrar
+        estructura = dato.obtener_estructura()
         context = {
             'dato': dato,
             'datos_formateados': json.dumps(dato.datos_originales, indent=2, ensure_ascii=False),
             'estructura_formateada': json.dumps(
-                json.loads(dato.estructura_tabla) if dato.estructura_tabla else {}, 
-                indent=2, ensure_ascii=False
-            ) if dato.estructura_tabla else None,
+                estructura, indent=2, ensure_ascii=False
+            ) if estructura else None,
         }
         
         return render(request, 'datos_archivados/dato_detail.html', context)
@@ -219,7 +213,7 @@ class TablasArchivadosListView(TemplateView):
         
         try:
             from .models import DatoArchivadoDinamico
-            from django.db.models import Count, Max, Q
+            from django.db.models import Count, Max
             
             # Obtener parámetros de búsqueda
             search_query = self.request.GET.get('search', '').strip()
@@ -228,24 +222,8 @@ class TablasArchivadosListView(TemplateView):
             # Query base
             queryset = DatoArchivadoDinamico.objects.all()
             
-            # Aplicar filtros de búsqueda
-            if search_query:
-                if search_type == 'tabla':
-                    # Buscar por nombre de tabla
-                    queryset = queryset.filter(tabla_origen__icontains=search_query)
-                elif search_type == 'contenido':
-                    # Buscar en el contenido de los datos (JSON)
-                    queryset = queryset.filter(
-                        Q(datos_originales__icontains=search_query) |
-                        Q(nombre_registro__icontains=search_query)
-                    )
-                elif search_type == 'global':
-                    # Búsqueda global (tabla + contenido)
-                    queryset = queryset.filter(
-                        Q(tabla_origen__icontains=search_query) |
-                        Q(datos_originales__icontains=search_query) |
-                        Q(nombre_registro__icontains=search_query)
-                    )
+            # Aplicar filtros de búsqueda (tabla, contenido o global)
+            queryset = filtrar_por_texto(queryset, search_query, search_type)
             
             # Obtener estadísticas por tabla con filtros aplicados
             tablas_stats = queryset.values('tabla_origen').annotate(
@@ -391,6 +369,7 @@ def estado_migracion_ajax(request):
     
     try:
         from .models import MigracionLog
+        from .migracion_paralela_service import olvidar_conexion
         from datetime import datetime, timedelta
         from django.utils import timezone
         from django.core.cache import cache
@@ -512,6 +491,7 @@ def estado_migracion_ajax(request):
                                 migracion_log.fecha_fin = timezone.now()
                                 migracion_log.errores = f'Migración atascada por más de 25 minutos. Última actualización: {fecha_actualizacion}'
                                 migracion_log.save()
+                                olvidar_conexion(migracion_log.id)
                         except Exception as e:
                             logger.error(f"Error actualizando log de migración: {e}")
                         
@@ -592,6 +572,7 @@ def estado_migracion_ajax(request):
                     migracion_en_progreso.fecha_fin = timezone.now()
                     migracion_en_progreso.errores = f'Migración atascada por más de 30 minutos. Iniciada: {migracion_en_progreso.fecha_inicio}'
                     migracion_en_progreso.save()
+                    olvidar_conexion(migracion_en_progreso.id)
                     
                     # Retornar como error
                     total_migrados = safe_int(migracion_en_progreso.usuarios_migrados)
@@ -714,27 +695,35 @@ def cancelar_migracion_ajax(request):
     
     try:
         from .models import MigracionLog
-        from django.utils import timezone
         from django.core.cache import cache
+        from .migracion_paralela_service import cancelar_migracion
+        import json
+        
+        # Tablas concretas a cancelar (opcional); sin ellas se cancela todo
+        try:
+            tablas = json.loads(request.body or '{}').get('tablas') or None
+        except (json.JSONDecodeError, AttributeError):
+            tablas = None
         
         # Buscar migración en progreso
         migracion_en_progreso = MigracionLog.objects.filter(
             estado__in=['iniciada', 'en_progreso']
         ).first()
         
+        canceladas = 0
         if migracion_en_progreso:
-            # Marcar como cancelada
-            migracion_en_progreso.estado = 'cancelada'
-            migracion_en_progreso.fecha_fin = timezone.now()
-            migracion_en_progreso.errores = f'Migración cancelada por el usuario {request.user.username}'
-            migracion_en_progreso.save()
-        
-        # Limpiar cache de progreso
-        cache.delete('migracion_progreso')
+            canceladas = cancelar_migracion(migracion_en_progreso, tablas=tablas, usuario=request.user)
+        else:
+            # Limpiar cache de progreso
+            cache.delete('migracion_progreso')
         
         return JsonResponse({
             'success': True,
-            'mensaje': 'Migración cancelada correctamente'
+            'tablas_canceladas': canceladas,
+            'mensaje': (
+                f'{canceladas} tablas canceladas correctamente' if tablas
+                else 'Migración cancelada correctamente'
+            ),
         })
         
     except Exception as e:
@@ -763,9 +752,9 @@ def continuar_migracion_ajax(request):
         # Obtener datos de la solicitud
         data = json.loads(request.body)
         
-        # Buscar la última migración con error
+        # Buscar la última migración interrumpida (con error o cancelada)
         migracion_error = MigracionLog.objects.filter(
-            estado='error'
+            estado__in=['error', 'cancelada']
         ).first()
         
         if not migracion_error:
@@ -773,10 +762,6 @@ def continuar_migracion_ajax(request):
                 'error': 'No se encontró una migración con error para continuar'
             }, status=404)
         
-        # Obtener configuración de conexión desde la migración anterior
-        host = migracion_error.host_origen
-        database = migracion_error.base_datos_origen
-        
         # Necesitamos las credenciales del usuario (deberían enviarse en la solicitud)
         user_db = data.get('user')
         password_db = data.get('password')
@@ -787,26 +772,18 @@ def continuar_migracion_ajax(request):
                 'error': 'Se requieren las credenciales de la base de datos para continuar'
             }, status=400)
         
-        # Crear nueva migración marcando la anterior como "continuada"
         migracion_error.errores += f' | Continuada por {request.user.username} el {timezone.now()}'
-        migracion_error.save()
-        
-        # Ejecutar migración en hilo separado
-        def ejecutar_continuacion_migracion():
-            try:
-                from .services import MigracionService
-                servicio = MigracionService(host, database, user_db, password_db, int(port))
-                servicio.inspeccionar_y_migrar_automaticamente(request.user)
-            except Exception as e:
-                logger.error(f"Error en continuación de migración: {e}")
+        migracion_error.save(update_fields=['errores'])
         
-        import threading
-        thread = threading.Thread(target=ejecutar_continuacion_migracion)
-        thread.daemon = True
-        thread.start()
+        # Reanudar la misma migración: solo se encolan las tablas no completadas
+        from .migracion_paralela_service import continuar_migracion_paralela
+        encoladas = continuar_migracion_paralela(
+            migracion_error, user_db, password_db, int(port), tablas=data.get('tablas') or None
+        )
         
         return JsonResponse({
             'success': True,
+            'tablas_reanudadas': encoladas,
             'mensaje': 'Migración reiniciada correctamente'
         })
         
@@ -1907,9 +1884,6 @@ def buscar_datos_ajax(request):
         return JsonResponse({'error': 'Sin permisos'}, status=403)
     
     try:
-        from .models import DatoArchivadoDinamico
-        from django.db.models import Q, Count
-        
         search_query = request.GET.get('q', '').strip()
         search_type = request.GET.get('type', 'global')
         limit = int(request.GET.get('limit', 10))
@@ -1921,68 +1895,12 @@ def buscar_datos_ajax(request):
                 'query': search_query
             })
         
-        # Construir query de búsqueda
-        queryset = DatoArchivadoDinamico.objects.all()
-        
-        if search_type == 'tabla':
-            queryset = queryset.filter(tabla_origen__icontains=search_query)
-        elif search_type == 'contenido':
-            queryset = queryset.filter(
-                Q(datos_originales__icontains=search_query) |
-                Q(nombre_registro__icontains=search_query)
-            )
-        else:  # global
-            queryset = queryset.filter(
-                Q(tabla_origen__icontains=search_query) |
-                Q(datos_originales__icontains=search_query) |
-                Q(nombre_registro__icontains=search_query)
-            )
-        
-        # Obtener resultados agrupados por tabla
-        tablas_resultados = queryset.values('tabla_origen').annotate(
-            total=Count('id')
-        ).order_by('-total', 'tabla_origen')[:limit]
-        
-        # Obtener algunos registros de ejemplo para cada tabla
-        resultados = []
-        for tabla in tablas_resultados:
-            tabla_nombre = tabla['tabla_origen']
-            total_registros = tabla['total']
-            
-            # Obtener algunos registros de ejemplo
-            ejemplos = queryset.filter(tabla_origen=tabla_nombre)[:3]
-            ejemplos_data = []
-            
-            for ejemplo in ejemplos:
-                # Extraer información relevante del registro
-                datos = ejemplo.datos_originales
-                nombre = ejemplo.obtener_nombre_legible()
-                
-                # Buscar campos que contengan el término de búsqueda
-                campos_coincidentes = []
-                if search_type in ['contenido', 'global']:
-                    for campo, valor in datos.items():
-                        if search_query.lower() in str(valor).lower():
-                            campos_coincidentes.append({
-                                'campo': campo,
-                                'valor': str(valor)[:100] + ('...' if len(str(valor)) > 100 else '')
-                            })
-                
-                ejemplos_data.append({
-                    'id': ejemplo.id,
-                    'nombre': nombre,
-                    'campos_coincidentes': campos_coincidentes[:3]  # Máximo 3 campos
-                })
-            
-            resultados.append({
-                'tabla': tabla_nombre,
-                'total_registros': total_registros,
-                'ejemplos': ejemplos_data
-            })
+        # Resultados agrupados por tabla con sus ejemplos en una sola consulta indexada
+        busqueda = buscar_agrupado(search_query, search_type, limite=limit)
         
         return JsonResponse({
-            'results': resultados,
-            'total': queryset.count(),
+            'results': busqueda['results'],
+            'total': busqueda['total'],
             'query': search_query,
             'search_type': search_type
         })
@@ -2002,7 +1920,6 @@ def buscar_en_tabla_ajax(request, tabla):
     
     try:
         from .models import DatoArchivadoDinamico
-        from django.db.models import Q
         
         search_query = request.GET.get('q', '').strip()
         order_by = request.GET.get('order_by', 'fecha_migracion')
@@ -2013,11 +1930,7 @@ def buscar_en_tabla_ajax(request, tabla):
         queryset = DatoArchivadoDinamico.objects.filter(tabla_origen=tabla)
         
         # Aplicar filtro de búsqueda si existe
-        if search_query:
-            queryset = queryset.filter(
-                Q(datos_originales__icontains=search_query) |
-                Q(nombre_registro__icontains=search_query)
-            )
+        queryset = filtrar_por_texto(queryset, search_query, 'contenido')
         
         # Aplicar ordenamiento
         valid_order_fields = {
@@ -2060,19 +1973,7 @@ def buscar_en_tabla_ajax(request, tabla):
                 nombre_resaltado = nombre
             
             # Buscar campos que coincidan con la búsqueda
-            campos_coincidentes = []
-            if search_query:
-                for campo, valor in dato.datos_originales.items():
-                    if search_query.lower() in str(valor).lower():
-                        valor_str = str(valor)
-                        if len(valor_str) > 100:
-                            valor_str = valor_str[:100] + '...'
-                        campos_coincidentes.append({
-                            'campo': campo,
-                            'valor': valor_str
-                        })
-                        if len(campos_coincidentes) >= 3:  # Máximo 3 campos
-                            break
+            campos = campos_coincidentes(dato.datos_originales, search_query) if search_query else []
             
             datos_json.append({
                 'id': dato.pk,
@@ -2080,7 +1981,7 @@ def buscar_en_tabla_ajax(request, tabla):
                 'nombre': nombre,
                 'nombre_resaltado': nombre_resaltado,
                 'fecha_migracion': dato.fecha_migracion.strftime('%d/%m/%Y %H:%M'),
-                'campos_coincidentes': campos_coincidentes,
+                'campos_coincidentes': campos,
                 'url_detalle': f'/datos-archivados/datos/{dato.pk}/'
             })
         
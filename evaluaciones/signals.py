@@ -1,10 +1,8 @@
 import logging
 
+from django.db import transaction
 from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
-from django.template.loader import render_to_string
 
 from .models import Evaluacion
 
@@ -36,53 +34,17 @@ def marcar_recien_publicada(sender, instance, **kwargs):
 @receiver(post_save, sender=Evaluacion)
 def notificar_nueva_evaluacion(sender, instance, created, **kwargs):
     """
-    Envía un correo a todos los estudiantes matriculados cuando una evaluación
+    Programa el correo a todos los estudiantes matriculados cuando una evaluación
     se publica por primera vez (creada publicada o cambiada de borrador a publicada).
+    El envío lo hace la tarea notificar_evaluacion_publicada por lotes, al
+    confirmarse la transacción, para no bloquear la petición del profesor (sin
+    broker se envía en línea).
     """
     if not getattr(instance, '_recien_publicada', False):
         return
 
-    from principal.models import Matriculas
+    from principal.notificaciones_service import encolar
+    from .tasks import notificar_evaluacion_publicada
 
-    matriculas = Matriculas.objects.filter(
-        course=instance.curso,
-        activo=True,
-    ).select_related('student')
-
-    if not matriculas.exists():
-        return
-
-    site_name = getattr(settings, 'SITE_NAME', 'Plataforma Educativa')
-    site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000').rstrip('/')
-
-    for matricula in matriculas:
-        student = matricula.student
-        if not student.email:
-            continue
-
-        context = {
-            'student_name': student.get_full_name() or student.username,
-            'curso': instance.curso,
-            'evaluacion': instance,
-            'site_name': site_name,
-            'evaluacion_url': f"{site_url}/evaluaciones/mis-evaluaciones/{instance.curso.pk}/",
-        }
-
-        subject = f'Nueva evaluación disponible en {instance.curso.name}'
-        message = render_to_string('evaluaciones/emails/nueva_evaluacion.txt', context)
-        html_message = render_to_string('evaluaciones/emails/nueva_evaluacion.html', context)
-
-        try:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[student.email],
-                html_message=html_message,
-                fail_silently=False,
-            )
-        except Exception as e:
-            logger.warning(
-                'Error enviando email de evaluación "%s" a %s: %s',
-                instance.titulo, student.email, e
-            )
+    evaluacion_id = instance.pk
+    transaction.on_commit(lambda: encolar(notificar_evaluacion_publicada, evaluacion_id))
@@ -0,0 +1,92 @@
+"""
+Celery tasks for the evaluaciones application.
+"""
+
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(acks_late=True)
+def notificar_evaluacion_publicada(evaluacion_id):
+    """
+    Reparte el aviso de una evaluación recién publicada entre tareas de
+    NOTIFICACIONES_TAMANO_LOTE estudiantes (enviar_lote_evaluacion).
+
+    Args:
+        evaluacion_id: ID de la evaluación publicada
+    """
+    from principal.models import Matriculas
+    from principal.notificaciones_service import repartir_en_lotes
+    from .models import Evaluacion
+
+    try:
+        evaluacion = Evaluacion.objects.get(pk=evaluacion_id)
+    except Evaluacion.DoesNotExist:
+        logger.warning(f'Evaluación {evaluacion_id} no existe; no se notifica')
+        return {'status': 'missing', 'evaluacion_id': evaluacion_id}
+
+    estudiantes = list(
+        Matriculas.objects.filter(course_id=evaluacion.curso_id, activo=True)
+        .exclude(student__email='')
+        .order_by('student_id')
+        .values_list('student_id', flat=True)
+        .distinct()
+    )
+    lotes = repartir_en_lotes(enviar_lote_evaluacion, evaluacion_id, estudiantes)
+    return {'status': 'queued', 'evaluacion_id': evaluacion_id, 'destinatarios': len(estudiantes), 'lotes': lotes}
+
+
+@shared_task(acks_late=True)
+def enviar_lote_evaluacion(evaluacion_id, estudiantes_ids, intento=1):
+    """
+    Envía el aviso de evaluación publicada a un lote de estudiantes por una
+    sola conexión SMTP y vuelve a encolar solo a los que fallaron.
+
+    Args:
+        evaluacion_id: ID de la evaluación publicada
+        estudiantes_ids: IDs de los estudiantes del lote
+        intento: Número de intento para estos estudiantes
+    """
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from principal.notificaciones_service import (
+        PlantillaCorreo, destinatarios_de, enviar_personalizados, programar_reintento,
+    )
+    from .models import Evaluacion
+
+    try:
+        evaluacion = Evaluacion.objects.select_related('curso').get(pk=evaluacion_id)
+    except Evaluacion.DoesNotExist:
+        return {'status': 'missing', 'evaluacion_id': evaluacion_id}
+
+    site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000').rstrip('/')
+    plantilla = PlantillaCorreo(
+        f'Nueva evaluación disponible en {evaluacion.curso.name}',
+        'evaluaciones/emails/nueva_evaluacion.txt',
+        'evaluaciones/emails/nueva_evaluacion.html',
+        {
+            'curso': evaluacion.curso,
+            'evaluacion': evaluacion,
+            'site_name': getattr(settings, 'SITE_NAME', 'Plataforma Educativa'),
+            'evaluacion_url': f"{site_url}/evaluaciones/mis-evaluaciones/{evaluacion.curso.pk}/",
+        },
+    )
+    destinatarios = destinatarios_de(User.objects.filter(id__in=estudiantes_ids))
+    enviados, fallidos = enviar_personalizados(plantilla, destinatarios)
+
+    emails = {id_: email for id_, email, _ in destinatarios}
+    for estudiante_id, error in fallidos.items():
+        logger.warning(
+            'Error enviando email de evaluación "%s" a %s (intento %s): %s',
+            evaluacion.titulo, emails[estudiante_id], intento, error
+        )
+    reintento = programar_reintento(enviar_lote_evaluacion, evaluacion_id, fallidos, intento)
+    return {
+        'status': 'success' if not fallidos else 'partial',
+        'evaluacion_id': evaluacion_id,
+        'enviados': len(enviados),
+        'fallidos': len(fallidos),
+        'reintento': reintento,
+    }
@@ -11,6 +11,7 @@ urlpatterns = [
     path("<int:pk>/eliminar/", views.EvaluacionDeleteView.as_view(), name="eliminar"),
     path("<int:pk>/intentos/", views.IntentoListView.as_view(), name="intentos_lista"),
     path("intento/<int:pk>/calificar/", views.calificar_intento, name="calificar_intento"),
+    path("<int:pk>/calificar-lote/", views.calificar_en_lote, name="calificar_lote"),
     # Gestión de opciones de respuesta (AJAX)
     path("pregunta/<int:pregunta_id>/opciones/", views.opciones_pregunta, name="opciones_pregunta"),
     # Vistas del Estudiante
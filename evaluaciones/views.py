@@ -6,6 +6,8 @@ from django.views.generic import ListView, DeleteView
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone
 
+from security.authorization.auth_profile import get_auth_profile
+
 from .models import Evaluacion, IntentoEvaluacion, CalificacionEvaluacion, PreguntaEvaluacion, OpcionEvaluacion
 from .forms import EvaluacionForm, PreguntaEvaluacionFormSet, CalificarIntentoForm, ResponderEvaluacionForm
 
@@ -116,35 +118,15 @@ def _guardar_opciones_desde_post(request, evaluacion):
 
 def _registrar_nota_en_calificaciones(estudiante, curso, puntaje, evaluacion=None):
     """
-    Crea una NotaIndividual en el registro de Calificaciones del estudiante
-    para el curso dado. Si no existe el registro de Calificaciones, lo crea.
-    Guarda la referencia a la evaluación para poder eliminarla si se borra la evaluación.
+    Registra la nota en el registro de Calificaciones del estudiante para el
+    curso dado (lo crea si no existe), con el mismo punto de entrada que la
+    calificación en lote: principal.calificaciones_service.registrar_notas.
+    Guarda la referencia a la evaluación para poder eliminarla si se borra la
+    evaluación; recalificar la misma evaluación sustituye la nota anterior.
     """
-    from principal.models import Calificaciones, NotaIndividual, CursoAcademico, Matriculas
-    from decimal import Decimal
-
-    curso_academico = curso.curso_academico or CursoAcademico.objects.filter(activo=True).first()
-
-    # Intentar obtener el semestre activo del estudiante para este curso
-    semestre = None
-    matricula = Matriculas.objects.filter(
-        course=curso, student=estudiante
-    ).select_related('semestre').order_by('-fecha_matricula').first()
-    if matricula:
-        semestre = matricula.semestre
-
-    calificacion_obj, _ = Calificaciones.objects.get_or_create(
-        course=curso,
-        student=estudiante,
-        curso_academico=curso_academico,
-        semestre=semestre,
-    )
+    from principal.calificaciones_service import registrar_notas
 
-    NotaIndividual.objects.create(
-        calificacion=calificacion_obj,
-        valor=Decimal(str(puntaje)),
-        evaluacion=evaluacion,
-    )
+    registrar_notas(curso, {estudiante.pk: puntaje}, evaluacion=evaluacion)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -390,6 +372,79 @@ class IntentoListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return context
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# 6.5  CalificarEnLote  (funcion)
+# ─────────────────────────────────────────────────────────────────────────────
+
+@login_required
+def calificar_en_lote(request, pk):
+    """
+    Notas de toda la clase para una evaluación en un solo envío. Se guardan
+    con principal.calificaciones_service.registrar_notas (bulk_create y un
+    único recálculo de promedios). Los estudiantes con intento calificado
+    (p. ej. automáticamente en las evaluaciones momentáneas) aparecen con su
+    puntaje como valor inicial.
+    """
+    from principal.calificaciones_service import NotaInvalidaError, registrar_notas, validar_nota
+    from principal.models import Matriculas, NotaIndividual
+
+    evaluacion = get_object_or_404(Evaluacion.objects.select_related('curso'), pk=pk)
+    curso = evaluacion.curso
+    if request.user != curso.teacher:
+        from django.core.exceptions import PermissionDenied
+        raise PermissionDenied
+
+    # Estudiantes activos en el semestre (una fila por estudiante)
+    estudiantes = {}
+    for matricula in (
+        Matriculas.objects.filter(course=curso, estado='P')
+        .select_related('student')
+        .order_by('student__first_name', 'student__last_name', 'student__username')
+    ):
+        estudiantes.setdefault(matricula.student_id, matricula.student)
+
+    valores = dict(
+        CalificacionEvaluacion.objects.filter(intento__evaluacion=evaluacion)
+        .values_list('intento__estudiante_id', 'puntaje')
+    )
+    valores.update(
+        NotaIndividual.objects.filter(evaluacion=evaluacion, calificacion__course=curso)
+        .values_list('calificacion__student_id', 'valor')
+    )
+
+    if request.method == 'POST':
+        notas, errores = {}, []
+        for student_id, estudiante in estudiantes.items():
+            valor = request.POST.get(f'nota_{student_id}', '').strip()
+            valores[student_id] = valor
+            if not valor:
+                continue
+            try:
+                notas[student_id] = validar_nota(valor)
+            except NotaInvalidaError as e:
+                errores.append(f'{estudiante.get_full_name() or estudiante.username}: {e}')
+
+        if errores:
+            for error in errores:
+                messages.error(request, error)
+        elif not notas:
+            messages.warning(request, 'No se ingresó ninguna nota.')
+        else:
+            resultado = registrar_notas(curso, notas, evaluacion=evaluacion)
+            messages.success(request, f'Se registraron {resultado["notas"]} notas en calificaciones.')
+            return redirect('evaluaciones:intentos_lista', pk=evaluacion.pk)
+
+    filas = [
+        {'estudiante': estudiante, 'valor': valores.get(student_id, '')}
+        for student_id, estudiante in estudiantes.items()
+    ]
+    return render(request, 'evaluaciones/profesor/calificar_lote.html', {
+        'evaluacion': evaluacion,
+        'curso': curso,
+        'filas': filas,
+    })
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 6.5  CalificarIntentoView  (funcion)
 # Requirements: 6.3, 6.4, 6.5, 6.6
@@ -741,7 +796,7 @@ def secretaria_evaluacion_create(request):
     from principal.models import Curso
     from django.core.exceptions import PermissionDenied
 
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         raise PermissionDenied
 
     cursos = Curso.objects.filter(curso_academico__isnull=False).order_by('name').distinct()
@@ -801,7 +856,7 @@ class SecretariaIntentoListView(LoginRequiredMixin, UserPassesTestMixin, ListVie
         self.evaluacion = get_object_or_404(Evaluacion, pk=kwargs['eval_id'])
 
     def test_func(self):
-        return self.request.user.groups.filter(name='Secretaría').exists()
+        return get_auth_profile(self.request.user).in_group('Secretaría')
 
     def get_queryset(self):
         return (
@@ -838,7 +893,7 @@ class SecretariaEvaluacionListView(LoginRequiredMixin, UserPassesTestMixin, List
     context_object_name = 'evaluaciones'
 
     def test_func(self):
-        return self.request.user.groups.filter(name='Secretaría').exists()
+        return get_auth_profile(self.request.user).in_group('Secretaría')
 
     def get_queryset(self):
         from principal.models import Curso
@@ -892,7 +947,7 @@ def secretaria_evaluacion_create(request):
     from principal.models import Curso
     from django.core.exceptions import PermissionDenied
 
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         raise PermissionDenied
 
     cursos = Curso.objects.filter(curso_academico__isnull=False).order_by('name').distinct()
@@ -952,7 +1007,7 @@ class SecretariaIntentoListView(LoginRequiredMixin, UserPassesTestMixin, ListVie
         self.evaluacion = get_object_or_404(Evaluacion, pk=kwargs['eval_id'])
 
     def test_func(self):
-        return self.request.user.groups.filter(name='Secretaría').exists()
+        return get_auth_profile(self.request.user).in_group('Secretaría')
 
     def get_queryset(self):
         return (
@@ -979,7 +1034,7 @@ class SecretariaIntentoListView(LoginRequiredMixin, UserPassesTestMixin, ListVie
 def secretaria_calificar_intento(request, pk):
     from django.core.exceptions import PermissionDenied
 
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         raise PermissionDenied
 
     intento = get_object_or_404(
@@ -1124,7 +1179,7 @@ def secretaria_reporte_evaluaciones(request):
     from principal.models import Curso, Matriculas
     from django.contrib.auth.models import User
 
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         raise PermissionDenied
 
     # Parámetros de filtro
@@ -5,7 +5,7 @@ from django.urls import path
 from.models import (
     Curso, Matriculas, Asistencia, Calificaciones, CursoAcademico, NotaIndividual,
     FormularioAplicacion, PreguntaFormulario, OpcionRespuesta, SolicitudInscripcion, RespuestaEstudiante,
-    ReglamentoCurso, ArticuloReglamento,
+    ReglamentoCurso, ArticuloReglamento, ReporteGenerado,
 )
 # Register your models here.
 
@@ -771,6 +771,32 @@ class ReglamentoCursoAdmin(admin.ModelAdmin):
 
 admin.site.register(ReglamentoCurso, ReglamentoCursoAdmin)
 
+
+class ReporteGeneradoAdmin(admin.ModelAdmin):
+    """Trabajos de reportes PDF/Excel generados en segundo plano (solo lectura)."""
+    list_display = ('id', 'tipo', 'estado', 'desde_cache', 'duracion_ms', 'tamano_bytes',
+                    'solicitado_por', 'fecha_creacion')
+    list_filter = ('tipo', 'estado', 'desde_cache')
+    search_fields = ('tipo', 'cache_key', 'task_id', 'solicitado_por__username')
+    date_hierarchy = 'fecha_creacion'
+    list_select_related = ('solicitado_por',)
+    change_list_template = 'admin/principal/reportegenerado/change_list.html'
+
+    def get_readonly_fields(self, request, obj=None):
+        return [f.name for f in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        from .reportes_service import estadisticas_reportes
+        extra_context = extra_context or {}
+        extra_context['estadisticas_reportes'] = estadisticas_reportes()
+        return super().changelist_view(request, extra_context=extra_context)
+
+
+admin.site.register(ReporteGenerado, ReporteGeneradoAdmin)
+
 def custom_get_app_list(self, request, app_label=None):
     """
     Personaliza la lista de aplicaciones para agrupar los modelos de formularios
@@ -0,0 +1,193 @@
+"""
+Registro de asistencias por sesión y matriz de asistencias de un curso.
+
+Antes pasar lista hacía un get_or_create (y a veces un save) por estudiante,
+la página de asistencias del curso resolvía cada celda de la tabla con dos
+consultas (filtros filter_asistencia / filter_by_date) y el resumen contaba
+presentes y totales por estudiante con otras dos. Ahora:
+
+  - registrar_sesion(curso, fecha, presencias): guarda la sesión completa
+    con un solo bulk_create(update_conflicts=True) sobre
+    (student, date, course); los registros existentes solo actualizan
+    `presente`.
+  - MatrizAsistencia: estudiantes × fechas leída con una sola consulta
+    (values_list) y guardada en un bytearray, una celda por byte. Sirve los
+    totales y porcentajes, las rachas de ausencias, la tabla de la página
+    de asistencias y la exportación a Excel.
+"""
+
+import logging
+from collections import namedtuple
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Códigos de celda de la matriz
+SIN_REGISTRO = 0
+PRESENTE = 1
+AUSENTE = 2
+
+_MARCAS = {SIN_REGISTRO: None, PRESENTE: True, AUSENTE: False}
+
+ResumenAsistencia = namedtuple(
+    'ResumenAsistencia',
+    'registros presentes ausentes porcentaje racha_ausencias max_racha_ausencias',
+)
+
+
+def registrar_sesion(curso, fecha, presencias):
+    """
+    Guarda las asistencias de una sesión del curso con un solo INSERT.
+
+    Los estudiantes sin registro en la fecha se crean con el semestre activo
+    del curso (bulk_create no emite la señal post_save que lo asigna); en los
+    que ya lo tenían solo cambia `presente`.
+
+    Args:
+        curso: Curso
+        fecha: date de la sesión
+        presencias: dict {student_id: bool presente}
+
+    Returns:
+        int: Registros guardados
+    """
+    from . import reportes_service
+    from .models import Asistencia, SemestreCurso
+
+    if not presencias:
+        return 0
+    semestre_id = (
+        SemestreCurso.objects.filter(curso=curso, activo=True)
+        .order_by('-numero_semestre').values_list('pk', flat=True).first()
+    )
+    with transaction.atomic():
+        Asistencia.objects.bulk_create(
+            [
+                Asistencia(
+                    course=curso, student_id=student_id, date=fecha,
+                    presente=presente, semestre_id=semestre_id,
+                )
+                for student_id, presente in presencias.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['student', 'date', 'course'],
+            update_fields=['presente'],
+        )
+        reportes_service.datos_modificados(curso.pk)
+    logger.info(f"Asistencia del {fecha} registrada en '{curso.name}': {len(presencias)} estudiantes")
+    return len(presencias)
+
+
+class MatrizAsistencia:
+    """
+    Asistencias de un curso como matriz estudiantes × fechas.
+
+    Las fechas van en orden ascendente. Cada celda es un byte con
+    SIN_REGISTRO, PRESENTE o AUSENTE (un registro con `presente` nulo cuenta
+    como ausencia, igual que en los totales de la página de asistencias).
+    Consultar un estudiante que no está en la matriz devuelve una fila vacía.
+    """
+
+    def __init__(self, estudiantes, fechas, celdas):
+        self.estudiantes = list(estudiantes)
+        self.fechas = list(fechas)
+        self._filas = {student_id: i for i, student_id in enumerate(self.estudiantes)}
+        self._celdas = celdas
+
+    @classmethod
+    def del_curso(cls, course_id, student_ids=None):
+        """
+        Construye la matriz de un curso con una sola consulta.
+
+        Args:
+            course_id: ID del curso
+            student_ids: Estudiantes (filas) en orden; por defecto todos los
+                que tienen asistencias en el curso
+
+        Returns:
+            MatrizAsistencia
+        """
+        from .models import Asistencia
+
+        registros = Asistencia.objects.filter(course_id=course_id)
+        if student_ids is not None:
+            student_ids = list(dict.fromkeys(student_ids))
+            registros = registros.filter(student_id__in=student_ids)
+        registros = list(registros.order_by().values_list('student_id', 'date', 'presente'))
+
+        fechas = sorted({fecha for _, fecha, _ in registros})
+        if student_ids is None:
+            student_ids = sorted({student_id for student_id, _, _ in registros})
+        columnas = {fecha: j for j, fecha in enumerate(fechas)}
+        filas = {student_id: i for i, student_id in enumerate(student_ids)}
+
+        ancho = len(fechas)
+        celdas = bytearray(len(student_ids) * ancho)
+        for student_id, fecha, presente in registros:
+            celdas[filas[student_id] * ancho + columnas[fecha]] = PRESENTE if presente else AUSENTE
+        return cls(student_ids, fechas, celdas)
+
+    def __len__(self):
+        return len(self.estudiantes)
+
+    def _fila(self, student_id):
+        i = self._filas.get(student_id)
+        ancho = len(self.fechas)
+        if i is None:
+            return bytes(ancho)
+        return self._celdas[i * ancho:(i + 1) * ancho]
+
+    def marcas(self, student_id, fechas=None):
+        """
+        Marcas del estudiante (True presente, False ausente, None sin
+        registro), en el orden de `fechas` (por defecto todas, ascendente).
+        """
+        fila = self._fila(student_id)
+        if fechas is None:
+            return [_MARCAS[celda] for celda in fila]
+        columnas = {fecha: j for j, fecha in enumerate(self.fechas)}
+        return [
+            _MARCAS[fila[columnas[fecha]]] if fecha in columnas else None
+            for fecha in fechas
+        ]
+
+    def presentes(self, student_id):
+        """Sesiones a las que asistió el estudiante."""
+        return self._fila(student_id).count(PRESENTE)
+
+    def registros(self, student_id):
+        """Sesiones con registro del estudiante (presente o ausente)."""
+        return len(self.fechas) - self._fila(student_id).count(SIN_REGISTRO)
+
+    def rachas_ausencias(self, student_id):
+        """
+        Ausencias consecutivas del estudiante (las sesiones sin registro no
+        cortan ni suman a la racha).
+
+        Returns:
+            tuple: (racha actual hasta la última sesión registrada, racha más larga)
+        """
+        actual = maxima = 0
+        for celda in self._fila(student_id):
+            if celda == AUSENTE:
+                actual += 1
+                maxima = max(maxima, actual)
+            elif celda == PRESENTE:
+                actual = 0
+        return actual, maxima
+
+    def resumen(self, student_id):
+        """
+        Totales del estudiante sobre sus sesiones registradas.
+
+        Returns:
+            ResumenAsistencia (porcentaje en 0-100 con un decimal; None sin registros)
+        """
+        registros = self.registros(student_id)
+        presentes = self.presentes(student_id)
+        porcentaje = round(presentes / registros * 100, 1) if registros else None
+        return ResumenAsistencia(
+            registros, presentes, registros - presentes, porcentaje,
+            *self.rachas_ausencias(student_id),
+        )
@@ -0,0 +1,208 @@
+"""
+Promedios de Calificaciones y registro de notas por lotes.
+
+Antes cada NotaIndividual guardada o borrada llamaba a Calificaciones.save(),
+que guardaba el registro dos veces y volvía a leer todas sus notas para
+recalcular el promedio; calificar a una clase completa eran cientos de
+idas y vueltas. Ahora:
+
+  - recalcular_promedios(ids): recalcula `average` de varias
+    Calificaciones con un solo UPDATE (subconsulta con AVG por registro).
+  - Las señales de NotaIndividual llaman a promedio_modificado(), que hace
+    ese UPDATE para un registro o, dentro de promedios_diferidos(), solo
+    anota el ID para recalcular todos los afectados al salir del bloque.
+  - registrar_notas(curso, notas): notas de toda una clase con bulk_create
+    (Calificaciones que falten y NotaIndividual) y un único recálculo de
+    promedios. Es el punto de entrada de la vista de notas por lotes y de
+    las evaluaciones (evaluaciones.views / CalificacionService).
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Avg, OuterRef, Subquery
+
+logger = logging.getLogger(__name__)
+
+NOTA_MINIMA = Decimal('0')
+NOTA_MAXIMA = Decimal('10')
+
+_estado = threading.local()
+
+
+class NotaInvalidaError(ValueError):
+    """Valor de nota no numérico o fuera del rango 0-10."""
+    pass
+
+
+def recalcular_promedios(calificacion_ids):
+    """
+    Recalcula el promedio de las Calificaciones dadas con un solo UPDATE.
+
+    Args:
+        calificacion_ids: IDs de Calificaciones
+
+    Returns:
+        int: Registros actualizados
+    """
+    from .models import Calificaciones, NotaIndividual
+
+    from . import reportes_service
+
+    calificacion_ids = list(calificacion_ids)
+    if not calificacion_ids:
+        return 0
+    promedio = (
+        NotaIndividual.objects.filter(calificacion=OuterRef('pk'))
+        .order_by()
+        .values('calificacion')
+        .annotate(promedio=Avg('valor'))
+        .values('promedio')
+    )
+    calificaciones = Calificaciones.objects.filter(pk__in=calificacion_ids)
+
+    def _nueva_version_reportes():
+        # Tras confirmar, para no sumar una consulta dentro de la transacción
+        reportes_service.datos_modificados(
+            *calificaciones.order_by().values_list('course_id', flat=True).distinct()
+        )
+
+    transaction.on_commit(_nueva_version_reportes)
+    return calificaciones.update(average=Subquery(promedio))
+
+
+@contextmanager
+def promedios_diferidos():
+    """
+    Dentro del bloque las señales de NotaIndividual no recalculan el promedio
+    fila a fila: se acumulan los registros afectados y se recalculan todos
+    con un UPDATE al salir (si el bloque termina sin error). Los bloques
+    anidados se integran en el exterior.
+    """
+    if getattr(_estado, 'pendientes', None) is not None:
+        yield
+        return
+    _estado.pendientes = set()
+    try:
+        yield
+    except BaseException:
+        # Con error no se recalcula: la transacción del llamador se revierte
+        _estado.pendientes = None
+        raise
+    pendientes, _estado.pendientes = _estado.pendientes, None
+    recalcular_promedios(pendientes)
+
+
+def promedio_modificado(calificacion_id):
+    """Las notas de `calificacion_id` cambiaron (llamado desde las señales de NotaIndividual)."""
+    pendientes = getattr(_estado, 'pendientes', None)
+    if pendientes is not None:
+        pendientes.add(calificacion_id)
+    else:
+        recalcular_promedios([calificacion_id])
+
+
+def validar_nota(valor):
+    """
+    Convierte `valor` (número o texto, admite coma decimal) a Decimal.
+
+    Raises:
+        NotaInvalidaError: Si no es un número o está fuera del rango 0-10
+    """
+    try:
+        nota = Decimal(str(valor).strip().replace(',', '.'))
+    except (InvalidOperation, ValueError):
+        raise NotaInvalidaError(f'"{valor}" no es un número válido.')
+    if not nota.is_finite() or not NOTA_MINIMA <= nota <= NOTA_MAXIMA:
+        raise NotaInvalidaError(f'El valor {valor} está fuera del rango 0-10.')
+    return nota
+
+
+def registrar_notas(curso, notas, evaluacion=None):
+    """
+    Registra una nota por estudiante en las Calificaciones del curso.
+
+    Cada estudiante usa el registro de Calificaciones de su semestre (el de
+    su matrícula más reciente, o el semestre activo del curso) en el curso
+    académico del curso; los que falten se crean con bulk_create. Con `evaluacion`, la nota sustituye a
+    la que ya hubiera de esa evaluación (recalificar no la duplica).
+
+    Args:
+        curso: Curso
+        notas: dict {student_id: valor}
+        evaluacion: Evaluación de origen (opcional)
+
+    Returns:
+        dict: notas registradas y calificaciones creadas
+
+    Raises:
+        NotaInvalidaError: Si algún valor no es válido (no se guarda nada)
+    """
+    from .models import Calificaciones, CursoAcademico, Matriculas, NotaIndividual, SemestreCurso
+
+    valores = {int(student_id): validar_nota(valor) for student_id, valor in notas.items()}
+    if not valores:
+        return {'notas': 0, 'calificaciones_creadas': 0}
+
+    curso_academico = curso.curso_academico or CursoAcademico.objects.filter(activo=True).first()
+    curso_academico_id = curso_academico.pk if curso_academico else None
+
+    # Semestre de la matrícula más reciente de cada estudiante
+    semestres = {}
+    for student_id, semestre_id in (
+        Matriculas.objects.filter(course=curso, student_id__in=valores)
+        .order_by('student_id', 'fecha_matricula')
+        .values_list('student_id', 'semestre_id')
+    ):
+        semestres[student_id] = semestre_id
+    if not all(semestres.get(student_id) for student_id in valores):
+        # Sin semestre en la matrícula: el semestre activo del curso, como
+        # hace la señal post_save de Calificaciones (que bulk_create no emite)
+        activo = (
+            SemestreCurso.objects.filter(curso=curso, activo=True)
+            .order_by('-numero_semestre').values_list('pk', flat=True).first()
+        )
+        for student_id in valores:
+            semestres[student_id] = semestres.get(student_id) or activo
+
+    existentes = {
+        (cal.student_id, cal.semestre_id): cal
+        for cal in Calificaciones.objects.filter(
+            course=curso, student_id__in=valores, curso_academico_id=curso_academico_id
+        )
+    }
+    faltantes = [
+        Calificaciones(
+            course=curso, student_id=student_id,
+            curso_academico_id=curso_academico_id, semestre_id=semestres.get(student_id),
+        )
+        for student_id in valores
+        if (student_id, semestres.get(student_id)) not in existentes
+    ]
+
+    with transaction.atomic(), promedios_diferidos():
+        for cal in Calificaciones.objects.bulk_create(faltantes):
+            existentes[(cal.student_id, cal.semestre_id)] = cal
+        calificaciones = {
+            student_id: existentes[(student_id, semestres.get(student_id))]
+            for student_id in valores
+        }
+        ids = [cal.pk for cal in calificaciones.values()]
+        if evaluacion is not None:
+            NotaIndividual.objects.filter(calificacion_id__in=ids, evaluacion=evaluacion).delete()
+        # bulk_create no emite señales: los promedios se recalculan al salir
+        NotaIndividual.objects.bulk_create([
+            NotaIndividual(calificacion=calificaciones[student_id], valor=valor, evaluacion=evaluacion)
+            for student_id, valor in valores.items()
+        ])
+        for calificacion_id in ids:
+            promedio_modificado(calificacion_id)
+
+    logger.info(
+        f"Notas registradas en '{curso.name}': {len(valores)} "
+        f"({len(faltantes)} calificaciones nuevas)"
+    )
+    return {'notas': len(valores), 'calificaciones_creadas': len(faltantes)}
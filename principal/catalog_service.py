@@ -0,0 +1,229 @@
+"""
+Modelo de lectura del catálogo público de cursos (HomeView y ListadoCursosView).
+
+La home es la URL más visitada y antes hacía dos consultas por curso
+(¿matriculado?, número de inscritos), evaluaba el queryset de cursos varias
+veces y cargaba todos los FormularioAplicacion del sistema. Ahora:
+
+  - Tarjetas: los cursos del curso académico activo salen de una sola
+    consulta con el número de inscritos, el formulario de aplicación
+    (LEFT JOIN) y si tienen documentos ya anotados. La lista se guarda en la
+    caché junto con las noticias y categorías de la home.
+  - Página anónima: el HTML completo de la home y del listado (por URL) se
+    cachea para los visitantes sin sesión, salvo que tengan mensajes
+    pendientes de mostrar.
+  - Capa por usuario: matrículas y solicitudes del usuario para los cursos
+    mostrados salen de una sola consulta (UNION) y se aplican sobre las
+    tarjetas como conjuntos de IDs.
+
+Todo se versiona con CacheVersion('catalogo'): las señales de
+principal.signals suben la versión al confirmar cualquier cambio en cursos,
+cursos académicos, matrículas, semestres, formularios de aplicación,
+documentos, noticias o categorías, así que nunca se sirve una tarjeta o
+página anterior al cambio. Los cambios de estado por fecha (tarea
+actualizar_estados_cursos) invalidan desde CursoQuerySet, y
+HOME_PAGE_TIMEOUT acota la antigüedad del estado dinámico, que depende de
+la fecha.
+"""
+
+import logging
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Case, Count, Exists, F, OuterRef, Value, When
+from django.http import HttpResponse
+
+from cfbc.cache_utils import (
+    CACHE_KEY_PREFIX, HOME_PAGE_TIMEOUT, PAGE_CACHE_PREFIX, CacheVersion, generate_cache_key,
+)
+
+logger = logging.getLogger(__name__)
+
+VERSION_GROUP = 'catalogo'
+CATALOG_KEY_PREFIX = f'{CACHE_KEY_PREFIX}:catalogo'
+PAGE_KEY_PREFIX = f'{PAGE_CACHE_PREFIX}:catalogo'
+
+# Estados que se muestran en la home ('F' ya no es relevante)
+HOME_STATUSES = ('I', 'IT', 'P')
+HOME_NEWS_LIMIT = 8
+
+
+def course_cards(curso_academico, statuses=None, area=None, tipo=None):
+    """
+    Tarjetas de curso del curso académico en una sola consulta.
+
+    Cada Curso lleva anotados enrollment_count (matrículas) y
+    has_documents, y el formulario_aplicacion ya cargado (LEFT JOIN).
+
+    Returns:
+        list[Curso]
+    """
+    from course_documents.models import CourseDocument
+    from .models import Curso
+
+    if curso_academico is None:
+        return []
+    courses = Curso.objects.filter(curso_academico=curso_academico)
+    if statuses:
+        courses = courses.filter(status__in=statuses)
+    if area:
+        courses = courses.filter(area=area)
+    if tipo:
+        courses = courses.filter(tipo=tipo)
+    return list(
+        courses.select_related('formulario_aplicacion').annotate(
+            enrollment_count=Count('matriculas'),
+            has_documents=Exists(CourseDocument.objects.filter(folder__curso=OuterRef('pk'))),
+        )
+    )
+
+
+def home_catalog():
+    """
+    Datos compartidos de la home (iguales para todos los usuarios), desde la
+    caché versionada.
+
+    Returns:
+        dict: curso_academico, cursos, noticias y categorias
+    """
+    key = CacheVersion.make_key(f'{CATALOG_KEY_PREFIX}:home', VERSION_GROUP)
+    data = cache.get(key)
+    if data is None:
+        from blog.models import Categoria, Noticia
+        from .models import CursoAcademico
+
+        curso_academico = CursoAcademico.objects.filter(activo=True).first()
+        data = {
+            'curso_academico': curso_academico,
+            'cursos': course_cards(curso_academico, statuses=HOME_STATUSES),
+            'noticias': list(
+                Noticia.objects.filter(estado='publicado')
+                .select_related('categoria')
+                .order_by('-fecha_publicacion')[:HOME_NEWS_LIMIT]
+            ),
+            # Categorías que tienen al menos una noticia publicada
+            'categorias': list(
+                Categoria.objects.filter(noticias__estado='publicado').distinct().order_by('nombre')
+            ),
+        }
+        cache.set(key, data, HOME_PAGE_TIMEOUT)
+    return data
+
+
+def listing_catalog(area=None, tipo=None):
+    """
+    Curso académico activo y tarjetas del listado de cursos (filtradas por
+    área y tipo), desde la caché versionada.
+
+    Returns:
+        tuple: (curso_academico, list[Curso])
+    """
+    key = CacheVersion.make_key(
+        generate_cache_key(f'{CATALOG_KEY_PREFIX}:listado', area=area or '', tipo=tipo or ''),
+        VERSION_GROUP,
+    )
+    data = cache.get(key)
+    if data is None:
+        from .models import CursoAcademico
+
+        curso_academico = CursoAcademico.objects.filter(activo=True).first()
+        data = (curso_academico, course_cards(curso_academico, area=area, tipo=tipo))
+        cache.set(key, data, HOME_PAGE_TIMEOUT)
+    return data
+
+
+def apply_user_overlay(courses, user):
+    """
+    Marca en las tarjetas la relación del usuario con cada curso:
+    is_enrolled, tiene_solicitud_pendiente, tiene_solicitud_rechazada y los
+    enlaces de documentos (teacher_dashboard_url / student_dashboard_url,
+    has_new_content_indicator), con una sola consulta.
+
+    Args:
+        courses: Tarjetas de course_cards()
+        user: Usuario (los anónimos reciben todo en False)
+    """
+    enrolled, active, pending, rejected = set(), set(), set(), set()
+    if user is not None and user.is_authenticated and courses:
+        from .models import Matriculas, SolicitudInscripcion
+
+        ids = [course.id for course in courses]
+        # Matrículas (activa / inactiva) y solicitudes en un solo UNION
+        matriculas = (
+            Matriculas.objects.filter(student=user, course_id__in=ids)
+            .annotate(kind=Case(When(activo=True, then=Value('activa')), default=Value('inactiva')))
+            .values_list('course_id', 'kind')
+            .order_by()
+        )
+        solicitudes = (
+            SolicitudInscripcion.objects.filter(
+                estudiante=user, curso_id__in=ids, estado__in=('pendiente', 'rechazada')
+            )
+            .annotate(kind=F('estado'))
+            .values_list('curso_id', 'kind')
+            .order_by()
+        )
+        for course_id, kind in matriculas.union(solicitudes, all=True):
+            if kind == 'pendiente':
+                pending.add(course_id)
+            elif kind == 'rechazada':
+                rejected.add(course_id)
+            else:
+                enrolled.add(course_id)
+                if kind == 'activa':
+                    active.add(course_id)
+
+    group_name = None
+    new_content = set()
+    if user is not None and user.is_authenticated:
+        from security.authorization.auth_profile import get_auth_profile
+
+        group_name = get_auth_profile(user).primary_group
+        if group_name == 'Estudiantes' and active:
+            from course_documents.indicator_service import ContentIndicatorService
+            new_content = ContentIndicatorService.get_course_ids_with_new_content(user)
+
+    for course in courses:
+        course.is_enrolled = course.id in enrolled
+        course.tiene_solicitud_pendiente = course.id in pending
+        course.tiene_solicitud_rechazada = course.id in rejected
+        if group_name == 'Profesores' and course.teacher_id == user.id:
+            course.teacher_dashboard_url = f'/course-documents/teacher/{course.id}/'
+        elif group_name == 'Estudiantes' and course.id in active:
+            course.student_dashboard_url = f'/course-documents/student/{course.id}/'
+            course.has_new_content_indicator = course.id in new_content
+
+
+def cached_anonymous_page(request, render):
+    """
+    Respuesta completa para visitantes anónimos desde la caché (por URL).
+
+    Args:
+        request: Petición (debe ser anónima)
+        render: Función sin argumentos que devuelve la respuesta renderizada
+
+    Returns:
+        HttpResponse
+    """
+    # Los mensajes pendientes (p. ej. tras cerrar sesión) son de este visitante
+    if len(messages.get_messages(request)):
+        return render()
+    key = CacheVersion.make_key(
+        generate_cache_key(PAGE_KEY_PREFIX, request.get_full_path()), VERSION_GROUP
+    )
+    cached = cache.get(key)
+    if cached is not None:
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+    response = render()
+    if response.status_code == 200:
+        cache.set(key, (response.content, response['Content-Type']), HOME_PAGE_TIMEOUT)
+    return response
+
+
+def invalidate():
+    """Descarta tarjetas y páginas anónimas del catálogo (sube la versión)."""
+    try:
+        CacheVersion.increment(VERSION_GROUP)
+    except Exception as e:
+        logger.warning(f'No se pudo invalidar el catálogo de cursos: {e}')
@@ -1,4 +1,4 @@
-from django.contrib.auth.models import Group
+from security.authorization.auth_profile import get_auth_profile
 
 
 def group_name(request):
@@ -8,10 +8,8 @@ def group_name(request):
     context = {'group_name': None, 'is_editor': False}
     
     if request.user.is_authenticated:
-        groups = list(request.user.groups.values_list('name', flat=True))
-        group = Group.objects.filter(user=request.user).first()
-        if group:
-            context['group_name'] = group.name
-        context['is_editor'] = 'Editor' in groups
+        profile = get_auth_profile(request.user)
+        context['group_name'] = profile.primary_group
+        context['is_editor'] = profile.in_group('Editor')
     
     return context
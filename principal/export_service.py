@@ -0,0 +1,249 @@
+"""
+Motor compartido de exportación a Excel en streaming.
+
+Los reportes de principal (matrículas, calificaciones, asistencias y el
+helper generate_excel) se escriben con un libro openpyxl en modo
+write-only: cada fila se serializa a disco en cuanto se agrega, por lo que
+la memoria del worker no crece con el número de filas exportadas.
+
+Piezas principales:
+  - crear_libro(): Workbook(write_only=True) con los estilos con nombre
+    (NamedStyle) ya registrados; las celdas sólo referencian el nombre.
+  - HojaStreaming: hoja que retiene una muestra de las primeras filas para
+    estimar el ancho de las columnas y luego escribe directamente.
+  - respuesta_excel(): guarda el libro en un archivo temporal y lo devuelve
+    como FileResponse (el archivo se elimina al cerrar la respuesta).
+  - iterar_filas(): recorre un QuerySet por bloques con .iterator().
+"""
+
+import logging
+import tempfile
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Filas leídas por bloque desde la base de datos
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXCEL_EXPORT_CHUNK_SIZE', 2000)
+# Filas retenidas en memoria para estimar el ancho de columnas
+EXPORT_WIDTH_SAMPLE = getattr(settings, 'EXCEL_EXPORT_WIDTH_SAMPLE', 200)
+ANCHO_MINIMO = 8
+ANCHO_MAXIMO = 60
+
+
+def _relleno(color):
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+_BORDE = Border(
+    left=Side(style='thin'), right=Side(style='thin'),
+    top=Side(style='thin'), bottom=Side(style='thin'),
+)
+_CENTRO = Alignment(horizontal='center', vertical='center')
+_IZQUIERDA = Alignment(horizontal='left', vertical='center')
+
+# Estilos con nombre que se registran una sola vez por libro.
+# Cada entrada: nombre -> (font, fill, alignment, border)
+ESTILOS = {
+    'titulo':          (Font(name='Arial', bold=True, size=13, color='FFFFFF'), _relleno('001F4D'), _CENTRO, None),
+    'encabezado':      (Font(name='Arial', bold=True, color='FFFFFF'), _relleno('003366'), _CENTRO, _BORDE),
+    'subencabezado':   (Font(name='Arial', bold=True, color='FFFFFF'), _relleno('1F5C99'), _CENTRO, _BORDE),
+    'texto':           (None, None, _IZQUIERDA, _BORDE),
+    'centro':          (None, None, _CENTRO, _BORDE),
+    'borde':           (None, None, None, _BORDE),
+    'vacio':           (Font(italic=True, color='666666'), None, _CENTRO, None),
+    'ok':              (Font(name='Arial', bold=True, color='276221'), _relleno('C6EFCE'), _CENTRO, _BORDE),
+    'mal':             (Font(name='Arial', bold=True, color='9C0006'), _relleno('FFC7CE'), _CENTRO, _BORDE),
+    'aviso':           (Font(name='Arial', bold=True, color='7D5A00'), _relleno('FFEB9C'), _CENTRO, _BORDE),
+    'na':              (Font(name='Arial', color='595959'), _relleno('F2F2F2'), _CENTRO, _BORDE),
+    'presente':        (None, _relleno('C6EFCE'), _CENTRO, _BORDE),
+    'ausente':         (None, _relleno('FFC7CE'), _CENTRO, _BORDE),
+    'estado_activo':   (Font(name='Arial', bold=True, color='1F4E79'), _relleno('BDD7EE'), _CENTRO, _BORDE),
+    'estado_baja':     (Font(name='Arial', bold=True, color='595959'), _relleno('D9D9D9'), _CENTRO, _BORDE),
+}
+
+
+def crear_libro():
+    """
+    Crea un Workbook en modo write-only con los estilos de ESTILOS registrados
+    como NamedStyle, de modo que cada celda sólo guarda una referencia al estilo.
+    """
+    wb = Workbook(write_only=True)
+    for nombre, (font, fill, alignment, border) in ESTILOS.items():
+        estilo = NamedStyle(name=nombre)
+        if font is not None:
+            estilo.font = font
+        if fill is not None:
+            estilo.fill = fill
+        if alignment is not None:
+            estilo.alignment = alignment
+        if border is not None:
+            estilo.border = border
+        wb.add_named_style(estilo)
+    return wb
+
+
+def nombre_completo(first_name, last_name, username):
+    """Equivalente a User.get_full_name() or username sobre valores planos."""
+    return f"{first_name or ''} {last_name or ''}".strip() or username
+
+
+def iterar_filas(objetos, chunk_size=None):
+    """
+    Recorre un QuerySet por bloques con .iterator() para no cargarlo completo;
+    cualquier otro iterable (listas de adaptadores) se recorre tal cual.
+    """
+    if isinstance(objetos, QuerySet):
+        return objetos.iterator(chunk_size=chunk_size or EXPORT_CHUNK_SIZE)
+    return iter(objetos or [])
+
+
+class HojaStreaming:
+    """
+    Hoja de un libro write-only con ancho de columnas estimado por muestreo.
+
+    Las primeras EXPORT_WIDTH_SAMPLE filas se retienen para calcular el ancho
+    de cada columna (openpyxl exige fijarlo antes de escribir la primera fila);
+    a partir de ahí cada fila se escribe directamente y se libera.
+
+    Cada fila es una lista de valores o de tuplas (valor, nombre_estilo).
+    """
+
+    def __init__(self, wb, titulo_hoja, encabezados, titulo=None,
+                 estilos_encabezado=None, estilo_por_defecto='borde',
+                 anchos_minimos=None, freeze_panes=None, muestra=None):
+        self.wb = wb
+        self.ws = wb.create_sheet(title=titulo_hoja[:31])
+        self.encabezados = list(encabezados)
+        self.titulo = titulo
+        self.estilos_encabezado = estilos_encabezado or {}
+        self.estilo_por_defecto = estilo_por_defecto
+        self.anchos_minimos = anchos_minimos or {}
+        self.freeze_panes = freeze_panes
+        self.muestra = EXPORT_WIDTH_SAMPLE if muestra is None else muestra
+        self._pendientes = []
+        self._iniciada = False
+        self._combinar_primera_fila = False
+        self.filas = 0
+
+    # ── Escritura ────────────────────────────────────────────────────────────
+
+    def append(self, fila):
+        self.filas += 1
+        if self._iniciada:
+            self._escribir(fila)
+            return
+        self._pendientes.append(fila)
+        if len(self._pendientes) >= self.muestra:
+            self._iniciar()
+
+    def mensaje_vacio(self, texto):
+        """Agrega una fila combinada con un mensaje de 'sin datos'."""
+        self._combinar_primera_fila = True
+        self.append([(texto, 'vacio')])
+
+    def cerrar(self):
+        if not self._iniciada:
+            self._iniciar()
+
+    def _celda(self, valor):
+        if isinstance(valor, tuple):
+            valor, estilo = valor
+        else:
+            estilo = self.estilo_por_defecto
+        celda = WriteOnlyCell(self.ws, value=valor)
+        if estilo:
+            celda.style = estilo
+        return celda
+
+    def _escribir(self, fila):
+        self.ws.append([self._celda(v) for v in fila])
+
+    def _iniciar(self):
+        """Fija anchos, título y encabezados, y vuelca la muestra retenida."""
+        self._iniciada = True
+        ws = self.ws
+        total_cols = max(len(self.encabezados), 1)
+        fila_actual = 1
+
+        for col, ancho in self._estimar_anchos().items():
+            ws.column_dimensions[get_column_letter(col)].width = ancho
+
+        if self.freeze_panes:
+            ws.freeze_panes = self.freeze_panes
+
+        if self.titulo:
+            if total_cols > 1:
+                ws.merged_cells.add(f"A1:{get_column_letter(total_cols)}1")
+            ws.row_dimensions[1].height = 26
+            ws.append([self._celda((self.titulo, 'titulo'))])
+            fila_actual += 1
+
+        if self.encabezados:
+            ws.append([
+                self._celda((h, self.estilos_encabezado.get(i, 'encabezado')))
+                for i, h in enumerate(self.encabezados, 1)
+            ])
+            fila_actual += 1
+
+        if self._combinar_primera_fila and total_cols > 1:
+            ws.merged_cells.add(
+                f"A{fila_actual}:{get_column_letter(total_cols)}{fila_actual}"
+            )
+
+        for fila in self._pendientes:
+            self._escribir(fila)
+        self._pendientes = []
+
+    def _estimar_anchos(self):
+        anchos = {}
+        for col, h in enumerate(self.encabezados, 1):
+            anchos[col] = len(str(h))
+        for fila in self._pendientes:
+            for col, valor in enumerate(fila, 1):
+                if isinstance(valor, tuple):
+                    valor = valor[0]
+                if valor is not None:
+                    anchos[col] = max(anchos.get(col, 0), len(str(valor)))
+        resultado = {}
+        for col, largo in anchos.items():
+            ancho = min(max(largo + 2, ANCHO_MINIMO), ANCHO_MAXIMO)
+            resultado[col] = max(ancho, self.anchos_minimos.get(col, 0))
+        return resultado
+
+
+def guardar_libro(wb):
+    """
+    Cierra el libro en un archivo temporal anónimo y lo deja posicionado al
+    inicio. El archivo se borra del disco al cerrarse.
+    """
+    if not wb.worksheets:
+        wb.create_sheet(title="Sin datos")
+    archivo = tempfile.TemporaryFile(suffix='.xlsx')
+    wb.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+def respuesta_excel(wb, filename):
+    """
+    Devuelve el libro como FileResponse en streaming, leyendo por bloques
+    desde el archivo temporal en lugar de copiarlo a memoria.
+    """
+    archivo = guardar_libro(wb)
+    response = FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=filename,
+        content_type=XLSX_CONTENT_TYPE,
+    )
+    response.block_size = 64 * 1024
+    return response
@@ -4,7 +4,11 @@ from datetime import date
 from principal.models import Curso
 
 class Command(BaseCommand):
-    help = 'Actualiza automáticamente los estados de los cursos basándose en las fechas límite de inscripción'
+    help = (
+        'Actualiza los estados de los cursos según las fechas límite de inscripción y de inicio, '
+        'y el número de semestre activo (también lo ejecuta Celery beat: '
+        'principal.tasks.actualizar_estados_cursos)'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -16,36 +20,27 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         today = date.today()
-        
-        # Obtener cursos que tienen fecha límite de inscripción
-        cursos_con_fecha = Curso.objects.filter(enrollment_deadline__isnull=False)
-        
-        cambios_realizados = 0
-        
-        for curso in cursos_con_fecha:
-            estado_actual = curso.status
-            estado_dinamico = curso.get_dynamic_status()
-            
-            # Si el estado dinámico es diferente al estado actual, actualizar
-            if estado_actual != estado_dinamico:
-                if dry_run:
+
+        if dry_run:
+            # Solo los cursos con alguna fecha pueden cambiar de estado
+            candidatos = Curso.objects.exclude(
+                enrollment_deadline__isnull=True, start_date__isnull=True
+            ).filter(status__in=['I', 'IT'])
+            cambios_realizados = 0
+            for curso in candidatos:
+                if curso.status != curso.get_dynamic_status():
                     self.stdout.write(
                         self.style.WARNING(
                             f'[DRY RUN] Curso "{curso.name}": '
                             f'{curso.get_status_display()} → {curso.get_dynamic_status_display()}'
                         )
                     )
-                else:
-                    curso.status = estado_dinamico
-                    curso.save()
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Actualizado curso "{curso.name}": '
-                            f'{dict(curso.STATUS_CHOICES)[estado_actual]} → {curso.get_dynamic_status_display()}'
-                        )
-                    )
-                cambios_realizados += 1
-        
+                    cambios_realizados += 1
+            semestres_actualizados = 0
+        else:
+            cambios_realizados = Curso.objects.refresh_dynamic_status(today)
+            semestres_actualizados = Curso.objects.refresh_semestre_activo()
+
         if cambios_realizados == 0:
             self.stdout.write(
                 self.style.SUCCESS('No se encontraron cursos que necesiten actualización de estado.')
@@ -59,7 +54,11 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.SUCCESS(f'Se actualizaron {cambios_realizados} cursos exitosamente.')
                 )
-        
+        if semestres_actualizados:
+            self.stdout.write(
+                self.style.SUCCESS(f'Se corrigió el semestre activo de {semestres_actualizados} cursos.')
+            )
+
         # Mostrar información adicional sobre fechas
         self.stdout.write(f'\nFecha actual del servidor: {today}')
-        self.stdout.write(f'Zona horaria del servidor: {timezone.get_current_timezone()}')
\ No newline at end of file
+        self.stdout.write(f'Zona horaria del servidor: {timezone.get_current_timezone()}')
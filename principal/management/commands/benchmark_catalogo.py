@@ -0,0 +1,68 @@
+"""
+Django management command to benchmark the public course catalog pages.
+"""
+
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from principal import catalog_service
+from principal.views import HomeView, ListadoCursosView
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency and queries per request of HomeView and '
+        'ListadoCursosView for anonymous and authenticated users, with a cold '
+        'and a warm catalog cache'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario')
+        parser.add_argument('--username', help='Authenticated user (default: first active user)')
+
+    def handle(self, *args, **options):
+        if options['username']:
+            user = User.objects.get(username=options['username'])
+        else:
+            user = User.objects.filter(is_active=True).first()
+        if user is None:
+            raise CommandError('No user available for the authenticated scenarios')
+
+        self.stdout.write(f"Requests: {options['requests']} | user: {user.username}")
+        pages = (('home', '/', HomeView.as_view()), ('listado', '/listado_cursos/', ListadoCursosView.as_view()))
+        for name, path, view in pages:
+            for label, request_user in (('anonymous', AnonymousUser()), ('authenticated', user)):
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n{name}, {label}'))
+                self._measure('cold cache', view, path, request_user, options['requests'], invalidate=True)
+                self._measure('warm cache', view, path, request_user, options['requests'], invalidate=False)
+
+    def _measure(self, label, view, path, user, iterations, invalidate):
+        factory = RequestFactory()
+        latencies = []
+        with CaptureQueriesContext(connection) as captured:
+            for _ in range(iterations):
+                if invalidate:
+                    catalog_service.invalidate()
+                request = factory.get(path)
+                request.user = user
+                request.session = SessionStore()
+                request._messages = FallbackStorage(request)
+                started = time.perf_counter()
+                response = view(request)
+                if hasattr(response, 'render'):
+                    response.render()
+                latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        self.stdout.write(
+            f'  {label:<11} median {statistics.median(latencies):.3f} ms | '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1]:.3f} ms | '
+            f'queries/request {len(captured) / iterations:.1f}'
+        )
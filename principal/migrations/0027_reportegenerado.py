@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('principal', '0026_calificaciones_unique_with_semestre'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReporteGenerado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(db_index=True, max_length=50, verbose_name='Tipo de reporte')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('cache_key', models.CharField(max_length=64, verbose_name='Clave de caché')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=15, verbose_name='Estado')),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='reportes/', verbose_name='Archivo')),
+                ('nombre_archivo', models.CharField(blank=True, default='', max_length=255, verbose_name='Nombre de descarga')),
+                ('content_type', models.CharField(blank=True, default='', max_length=100, verbose_name='Tipo de contenido')),
+                ('adjunto', models.BooleanField(default=True, verbose_name='Descargar como adjunto')),
+                ('desde_cache', models.BooleanField(default=False, verbose_name='Servido desde caché')),
+                ('task_id', models.CharField(blank=True, default='', max_length=255, verbose_name='ID de tarea Celery')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('tamano_bytes', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Tamaño (bytes)')),
+                ('duracion_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Tiempo de render (ms)')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de solicitud')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Inicio del render')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin del render')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reportes_generados', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': '📊 Reporte Generado',
+                'verbose_name_plural': '📊 Reportes Generados',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['cache_key', 'estado'], name='idx_reporte_cache_estado'), models.Index(fields=['tipo', 'fecha_creacion'], name='idx_reporte_tipo_fecha')],
+            },
+        ),
+    ]
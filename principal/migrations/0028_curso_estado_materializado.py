@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:21
+
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_semestre_activo(apps, schema_editor):
+    Curso = apps.get_model('principal', 'Curso')
+    SemestreCurso = apps.get_model('principal', 'SemestreCurso')
+    Curso.objects.update(semestre_activo_numero=Coalesce(
+        Subquery(
+            SemestreCurso.objects.filter(curso=OuterRef('pk'), activo=True)
+            .order_by('-numero_semestre')
+            .values('numero_semestre')[:1]
+        ),
+        Value(1),
+    ))
+
+
+def aplicar_estado_por_fecha(apps, schema_editor):
+    """
+    `status` pasa a guardar el estado efectivo: se aplican las transiciones
+    por fecha de Curso.get_dynamic_status (las de CursoQuerySet.refresh_dynamic_status).
+    """
+    Curso = apps.get_model('principal', 'Curso')
+    today = date.today()
+    sin_empezar = Q(start_date__isnull=True) | Q(start_date__gt=today)
+    Curso.objects.filter(status__in=['I', 'IT'], start_date__lte=today).update(status='P')
+    Curso.objects.filter(sin_empezar, status='I', enrollment_deadline__lt=today).update(status='IT')
+    Curso.objects.filter(sin_empezar, status='IT', enrollment_deadline__gte=today).update(status='I')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('principal', '0027_reportegenerado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='curso',
+            name='semestre_activo_numero',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Semestre activo'),
+        ),
+        migrations.RunPython(poblar_semestre_activo, migrations.RunPython.noop),
+        migrations.RunPython(aplicar_estado_por_fecha, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='curso',
+            index=models.Index(fields=['curso_academico', 'status'], name='curso_ca_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='curso',
+            index=models.Index(fields=['status'], name='curso_status_idx'),
+        ),
+    ]
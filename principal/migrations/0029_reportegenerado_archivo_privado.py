@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:49
+
+import principal.reportes_service
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def eliminar_reportes_publicos(apps, schema_editor):
+    """
+    Los reportes anteriores están en MEDIA_ROOT/reportes/, publicados por nginx
+    en /media/ con nombres deducibles: se borran los archivos y sus trabajos
+    (son temporales; una nueva solicitud los vuelve a generar en REPORTES_ROOT).
+    """
+    ReporteGenerado = apps.get_model('principal', 'ReporteGenerado')
+    for nombre in ReporteGenerado.objects.exclude(archivo='').exclude(archivo__isnull=True).values_list(
+        'archivo', flat=True
+    ).distinct():
+        if nombre.startswith('reportes/'):
+            default_storage.delete(nombre)
+    ReporteGenerado.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('principal', '0028_curso_estado_materializado'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_reportes_publicos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reportegenerado',
+            name='archivo',
+            field=models.FileField(blank=True, null=True, storage=principal.reportes_service.obtener_storage, upload_to=principal.reportes_service.nombre_archivo_aleatorio, verbose_name='Archivo'),
+        ),
+    ]
@@ -1,15 +1,72 @@
 from django.utils import timezone
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from accounts.models import Registro
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from datetime import date
-from decimal import Decimal
 import json
 
+from . import reportes_service
+
 # Create your models here.
 # CURSOS
+
+class CursoQuerySet(models.QuerySet):
+    """
+    Mantenimiento por conjunto de las columnas materializadas de Curso:
+    `status` guarda el estado efectivo (el de get_dynamic_status) y
+    `semestre_activo_numero` el número del SemestreCurso activo, para poder
+    filtrar e indexar por ellos sin recorrer los cursos en Python.
+    """
+
+    def refresh_dynamic_status(self, today=None):
+        """
+        Aplica a `status` las transiciones por fecha de get_dynamic_status
+        con tres UPDATE (I/IT → P, I → IT, IT → I).
+
+        Returns:
+            int: Cursos actualizados
+        """
+        today = today or date.today()
+        sin_empezar = models.Q(start_date__isnull=True) | models.Q(start_date__gt=today)
+        changed = self.filter(status__in=['I', 'IT'], start_date__lte=today).update(status='P')
+        changed += self.filter(sin_empezar, status='I', enrollment_deadline__lt=today).update(status='IT')
+        changed += self.filter(sin_empezar, status='IT', enrollment_deadline__gte=today).update(status='I')
+        if changed:
+            _invalidar_catalogo()
+        return changed
+
+    def refresh_semestre_activo(self):
+        """
+        Recalcula `semestre_activo_numero` con un UPDATE y una subconsulta
+        (solo toca los cursos cuyo valor cambia).
+
+        Returns:
+            int: Cursos actualizados
+        """
+        numero = Coalesce(
+            models.Subquery(
+                SemestreCurso.objects.filter(curso=models.OuterRef('pk'), activo=True)
+                .order_by('-numero_semestre')
+                .values('numero_semestre')[:1]
+            ),
+            models.Value(1),
+        )
+        changed = self.exclude(semestre_activo_numero=numero).update(semestre_activo_numero=numero)
+        if changed:
+            _invalidar_catalogo()
+        return changed
+
+
+def _invalidar_catalogo():
+    """Las actualizaciones por conjunto no disparan las señales del catálogo."""
+    from django.db import transaction
+    from principal import catalog_service
+
+    transaction.on_commit(catalog_service.invalidate)
+
 class Curso(models.Model):
     STATUS_CHOICES = [
         ('I', 'En etapa de inscripción'),
@@ -47,6 +104,17 @@ class Curso(models.Model):
     start_date = models.DateField(verbose_name='Fecha de inicio del curso', null=True, blank=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
     fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name='Última actualización')
+    # Número del SemestreCurso activo (1 si no hay ninguno); lo mantienen las
+    # señales de SemestreCurso con CursoQuerySet.refresh_semestre_activo
+    semestre_activo_numero = models.PositiveIntegerField(default=1, editable=False, verbose_name='Semestre activo')
+
+    objects = CursoQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # Se guarda el estado efectivo; el paso de los días lo aplica la tarea
+        # periódica actualizar_estados_cursos (CursoQuerySet.refresh_dynamic_status)
+        self.status = self.get_dynamic_status()
+        super().save(*args, **kwargs)
 
     def get_dynamic_status(self):
         """
@@ -91,12 +159,6 @@ class Curso(models.Model):
         status_dict = dict(self.STATUS_CHOICES)
         return status_dict.get(self.get_dynamic_status(), self.get_status_display())
 
-    @property
-    def semestre_activo_numero(self) -> int:
-        """Retorna el numero_semestre del SemestreCurso activo, o 1 si no hay ninguno."""
-        semestre = self.semestres.filter(activo=True).order_by('-numero_semestre').first()
-        return semestre.numero_semestre if semestre else 1
-
     def __str__(self):
         if self.curso_academico:
             return f"{self.name} ({self.curso_academico.nombre})"
@@ -106,6 +168,10 @@ class Curso(models.Model):
         verbose_name = 'Curso'
         verbose_name_plural = 'Cursos'
         ordering = ['-fecha_actualizacion', '-fecha_creacion']  # Más recientes primero
+        indexes = [
+            models.Index(fields=['curso_academico', 'status'], name='curso_ca_status_idx'),
+            models.Index(fields=['status'], name='curso_status_idx'),
+        ]
 
         
 # Curso y cambio de curso escolar
@@ -245,29 +311,11 @@ class Calificaciones(models.Model):
 # Calcular el promedio 
 
     def calcular_promedio(self):
-        # Obtener todas las notas individuales relacionadas con esta calificación
-        notas_individuales = self.notas.all()
-        notas_validas = [nota.valor for nota in notas_individuales if nota.valor is not None]
-        if notas_validas:
-            return sum(notas_validas) / len(notas_validas)
-        return None
+        """Promedio de las notas individuales (None si no hay notas)."""
+        return self.notas.aggregate(promedio=models.Avg('valor'))['promedio']
 
-
-    def save(self, *args, **kwargs):
-        # Save the instance first to ensure it has a primary key
-        super().save(*args, **kwargs)
-        
-        # Now that the instance has a PK, calculate the average
-        calculated_average = self.calcular_promedio()
-        if calculated_average is not None:
-            new_average = Decimal(str(calculated_average))
-        else:
-            new_average = None
-        
-        # Only update if the average has changed
-        if self.average != new_average:
-            self.average = new_average
-            super().save(update_fields=['average'])
+    # `average` lo mantienen las señales de NotaIndividual con un UPDATE
+    # agregado (principal.calificaciones_service.recalcular_promedios)
 
     class Meta:
         verbose_name= 'Calificacion'
@@ -301,8 +349,11 @@ class NotaIndividual(models.Model):
 @receiver(post_save, sender=NotaIndividual)
 @receiver(post_delete, sender=NotaIndividual)
 def update_calificaciones_average(sender, instance, **kwargs):
-    calificacion = instance.calificacion
-    calificacion.save() # This will trigger the calcular_promedio and update the average
+    """Recalcula el promedio de la calificación (diferido dentro de promedios_diferidos)."""
+    if kwargs.get('raw', False):
+        return
+    from principal.calificaciones_service import promedio_modificado
+    promedio_modificado(instance.calificacion_id)
 
 # FORMULARIOS DE APLICACIÓN A CURSOS
 
@@ -756,6 +807,14 @@ def _crear_semestre_inicial(sender, instance, created, **kwargs):
         crear_semestre_inicial(instance)
 
 
+@receiver([post_save, post_delete], sender=SemestreCurso)
+def _actualizar_semestre_activo(sender, instance, **kwargs):
+    """Mantiene Curso.semestre_activo_numero al crear, cambiar o borrar semestres."""
+    if kwargs.get('raw', False):
+        return
+    Curso.objects.filter(pk=instance.curso_id).refresh_semestre_activo()
+
+
 def _semestre_activo_del_curso(curso):
     """Devuelve el SemestreCurso activo del curso, o None si no existe."""
     return SemestreCurso.objects.filter(curso=curso, activo=True).order_by('-numero_semestre').first()
@@ -786,3 +845,68 @@ def _asignar_semestre_calificacion(sender, instance, created, **kwargs):
         semestre = _semestre_activo_del_curso(instance.course)
         if semestre:
             Calificaciones.objects.filter(pk=instance.pk).update(semestre=semestre)
+
+
+# ── REPORTES GENERADOS EN SEGUNDO PLANO ──────────────────────────────────────
+
+class ReporteGenerado(models.Model):
+    """
+    Trabajo de generación de un reporte pesado (PDF/Excel) ejecutado por Celery.
+
+    El archivo resultante se guarda en REPORTES_ROOT (fuera de MEDIA_ROOT) con un
+    nombre aleatorio y solo se descarga desde la vista autorizada. cache_key (hash
+    de tipo + parámetros) permite que, en los tipos reutilizables, una petición
+    idéntica posterior reutilice el artefacto en lugar de volver a renderizarlo.
+    Ver principal.reportes_service.
+    """
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_PROCESANDO = 'procesando'
+    ESTADO_COMPLETADO = 'completado'
+    ESTADO_ERROR = 'error'
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_PROCESANDO, 'Procesando'),
+        (ESTADO_COMPLETADO, 'Completado'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=50, db_index=True, verbose_name='Tipo de reporte')
+    parametros = models.JSONField(default=dict, blank=True, verbose_name='Parámetros')
+    cache_key = models.CharField(max_length=64, verbose_name='Clave de caché')
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE, verbose_name='Estado')
+    # Almacenamiento privado (REPORTES_ROOT) con nombres aleatorios: nunca en /media/
+    archivo = models.FileField(
+        storage=reportes_service.obtener_storage, upload_to=reportes_service.nombre_archivo_aleatorio,
+        null=True, blank=True, verbose_name='Archivo',
+    )
+    nombre_archivo = models.CharField(max_length=255, blank=True, default='', verbose_name='Nombre de descarga')
+    content_type = models.CharField(max_length=100, blank=True, default='', verbose_name='Tipo de contenido')
+    adjunto = models.BooleanField(default=True, verbose_name='Descargar como adjunto')
+    desde_cache = models.BooleanField(default=False, verbose_name='Servido desde caché')
+    solicitado_por = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='reportes_generados', verbose_name='Solicitado por'
+    )
+    task_id = models.CharField(max_length=255, blank=True, default='', verbose_name='ID de tarea Celery')
+    error = models.TextField(blank=True, default='', verbose_name='Error')
+    tamano_bytes = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='Tamaño (bytes)')
+    duracion_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='Tiempo de render (ms)')
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de solicitud')
+    fecha_inicio = models.DateTimeField(null=True, blank=True, verbose_name='Inicio del render')
+    fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name='Fin del render')
+
+    @property
+    def listo(self):
+        return self.estado == self.ESTADO_COMPLETADO and bool(self.archivo)
+
+    def __str__(self):
+        return f"{self.tipo} ({self.get_estado_display()})"
+
+    class Meta:
+        verbose_name = '📊 Reporte Generado'
+        verbose_name_plural = '📊 Reportes Generados'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['cache_key', 'estado'], name='idx_reporte_cache_estado'),
+            models.Index(fields=['tipo', 'fecha_creacion'], name='idx_reporte_tipo_fecha'),
+        ]
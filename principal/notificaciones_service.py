@@ -0,0 +1,154 @@
+"""
+Envío masivo de notificaciones por correo.
+
+Piezas compartidas por las notificaciones de nuevos documentos
+(course_documents) y de evaluaciones publicadas (evaluaciones):
+
+  - PlantillaCorreo: renderiza las plantillas txt/html una sola vez con un
+    marcador en lugar del nombre del destinatario; personalizar cada correo
+    es un simple replace.
+  - enviar_personalizados(plantilla, destinatarios): envía los correos por una
+    única conexión SMTP (get_connection + send_messages) y devuelve qué
+    destinatarios recibieron el correo y cuáles fallaron.
+  - encolar(tarea, *args): encola la tarea; si la cola no está disponible la
+    ejecuta en línea para no perder la notificación.
+  - repartir_en_lotes(tarea, objeto_id, destinatarios): encola una tarea por
+    lote de destinatarios (tarea(objeto_id, ids_lote, intento)).
+  - programar_reintento(tarea, objeto_id, fallidos, intento): vuelve a encolar
+    solo los destinatarios que fallaron, con espera exponencial, hasta
+    NOTIFICACIONES_MAX_INTENTOS.
+
+Configuración (settings, opcional):
+  - NOTIFICACIONES_TAMANO_LOTE: destinatarios por tarea (50)
+  - NOTIFICACIONES_MAX_INTENTOS: intentos por destinatario (3)
+  - NOTIFICACIONES_ESPERA_REINTENTO: segundos antes del primer reintento (60)
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = getattr(settings, 'NOTIFICACIONES_TAMANO_LOTE', 50)
+MAX_INTENTOS = getattr(settings, 'NOTIFICACIONES_MAX_INTENTOS', 3)
+ESPERA_REINTENTO = getattr(settings, 'NOTIFICACIONES_ESPERA_REINTENTO', 60)
+
+MARCADOR_NOMBRE = '__NOMBRE_DESTINATARIO__'
+
+
+class PlantillaCorreo:
+    """Asunto y cuerpos txt/html renderizados una vez para todos los destinatarios."""
+
+    def __init__(self, asunto, plantilla_txt, plantilla_html, contexto):
+        contexto = dict(contexto, student_name=MARCADOR_NOMBRE)
+        self.asunto = asunto
+        self.texto = render_to_string(plantilla_txt, contexto)
+        self.html = render_to_string(plantilla_html, contexto) if plantilla_html else None
+
+    def mensaje(self, email, nombre, connection=None):
+        """EmailMultiAlternatives personalizado para un destinatario."""
+        mensaje = EmailMultiAlternatives(
+            subject=self.asunto,
+            body=self.texto.replace(MARCADOR_NOMBRE, nombre),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+            connection=connection,
+        )
+        if self.html is not None:
+            mensaje.attach_alternative(self.html.replace(MARCADOR_NOMBRE, escape(nombre)), 'text/html')
+        return mensaje
+
+
+def destinatarios_de(usuarios):
+    """(id, email, nombre) de los usuarios con email."""
+    return [
+        (usuario.id, usuario.email, usuario.get_full_name() or usuario.username)
+        for usuario in usuarios
+        if usuario.email
+    ]
+
+
+def enviar_personalizados(plantilla, destinatarios):
+    """
+    Envía `plantilla` a cada destinatario (id, email, nombre) por una sola
+    conexión SMTP. Cada correo se entrega con su propio send_messages para
+    que un rechazo no impida el envío al resto.
+
+    Returns:
+        tuple: (ids enviados, {id: error} de los fallidos)
+    """
+    enviados = []
+    fallidos = {}
+    if not destinatarios:
+        return enviados, fallidos
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f'No se pudo abrir la conexión de correo: {e}')
+        return enviados, {id_: str(e) for id_, _, _ in destinatarios}
+
+    try:
+        for id_, email, nombre in destinatarios:
+            try:
+                if connection.send_messages([plantilla.mensaje(email, nombre, connection)]):
+                    enviados.append(id_)
+                else:
+                    fallidos[id_] = 'El servidor de correo no aceptó el mensaje'
+            except Exception as e:
+                fallidos[id_] = str(e)
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return enviados, fallidos
+
+
+def encolar(tarea, *args):
+    """
+    Encola `tarea` con `args`. Si el broker no está disponible la tarea se
+    ejecuta en línea, como hace reportes_service.solicitar_reporte: la
+    notificación llega tarde pero no se pierde.
+    """
+    try:
+        return tarea.apply_async(args=args)
+    except Exception as e:
+        logger.warning(f'No se pudo encolar {tarea.name}{args}: {e}. Se ejecuta en línea.')
+        return tarea.apply(args=args)
+
+
+def repartir_en_lotes(tarea, objeto_id, ids_destinatarios, tamano_lote=None):
+    """Encola `tarea` una vez por lote de destinatarios. Devuelve el número de lotes."""
+    tamano_lote = tamano_lote or TAMANO_LOTE
+    lotes = 0
+    for inicio in range(0, len(ids_destinatarios), tamano_lote):
+        encolar(tarea, objeto_id, list(ids_destinatarios[inicio:inicio + tamano_lote]), 1)
+        lotes += 1
+    return lotes
+
+
+def programar_reintento(tarea, objeto_id, fallidos, intento):
+    """
+    Vuelve a encolar `tarea` solo para los destinatarios `fallidos` si quedan
+    intentos. Devuelve True si se programó el reintento.
+
+    Sin broker no se reintenta en línea (la espera es el objetivo del
+    reintento): los fallos quedan en la auditoría del envío.
+    """
+    if not fallidos or intento >= MAX_INTENTOS:
+        return False
+    try:
+        tarea.apply_async(
+            args=(objeto_id, list(fallidos), intento + 1),
+            countdown=ESPERA_REINTENTO * 2 ** (intento - 1),
+        )
+    except Exception as e:
+        logger.error(f'No se pudo programar el reintento de {tarea.name} para {len(fallidos)} destinatarios: {e}')
+        return False
+    return True
@@ -0,0 +1,455 @@
+"""
+Servicio de generación de reportes pesados (PDF/Excel) en segundo plano.
+
+Las vistas de exportación ya no renderizan dentro del ciclo request/response:
+registran un ReporteGenerado y encolan la tarea principal.tasks.generar_reporte
+en la cola 'reports'. El navegador consulta el estado por AJAX y descarga el
+archivo cuando está listo.
+
+Funciones principales:
+  - registrar_reporte(tipo, ...): decorador que asocia un tipo de reporte con
+    la función que lo renderiza a partir de sus parámetros.
+  - solicitar_reporte(tipo, parametros, usuario): crea el trabajo; en los
+    tipos reutilizables, si existe un artefacto reciente con los mismos
+    parámetros y la misma versión de datos (misma cache_key) lo reutiliza
+    sin volver a renderizar.
+  - datos_modificados(*curso_ids): nueva versión de los datos académicos de
+    esos cursos al confirmar la transacción.
+  - ejecutar_reporte(reporte): renderiza y guarda el archivo con un nombre
+    aleatorio en REPORTES_ROOT, midiendo el tiempo de render.
+  - respuesta_archivo(reporte): envía el archivo tras comprobar el acceso
+    (puede_acceder), por streaming o con X-Accel-Redirect.
+  - estadisticas_reportes(): tiempos de render y profundidad de cola por tipo,
+    usados por el admin.
+  - limpiar_reportes_antiguos(): elimina trabajos y archivos vencidos.
+
+Los archivos no se guardan en MEDIA_ROOT (nginx publica /media/ sin login):
+van a REPORTES_ROOT, sin URL pública, y solo se descargan desde la vista
+autorizada.
+
+Solo se reutilizan los tipos registrados con reutilizable=True. Los que
+dependen de notas, asistencias o matrículas (datos_academicos=True) llevan en
+la cache_key la versión de datos del curso filtrado (o la global si el
+reporte no se limita a un curso). Esas tablas cambian con operaciones en
+bloque que no emiten señales, así que los servicios de escritura
+(calificaciones_service, asistencias_service, semestre_service) llaman a
+datos_modificados(); las señales post_save cubren las ediciones sueltas.
+
+Configuración (settings, todas opcionales):
+  - REPORTES_ROOT: carpeta privada de los archivos (BASE_DIR/private/reportes).
+  - REPORTES_X_ACCEL_REDIRECT_PREFIX: location internal de nginx que apunta a
+    REPORTES_ROOT; vacío = Django envía el archivo por streaming.
+  - REPORTES_CACHE_TTL: segundos durante los que un artefacto reutilizable se
+    reutiliza (600).
+  - REPORTES_RETENCION_HORAS: horas que se conservan trabajos y archivos (24).
+  - REPORTES_CELERY_QUEUE: cola Celery de los renders ('reports').
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Q
+from django.http import FileResponse, HttpResponse
+from django.template.loader import get_template
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REPORTES_CACHE_TTL = getattr(settings, 'REPORTES_CACHE_TTL', 600)
+REPORTES_RETENCION_HORAS = getattr(settings, 'REPORTES_RETENCION_HORAS', 24)
+REPORTES_CELERY_QUEUE = getattr(settings, 'REPORTES_CELERY_QUEUE', 'reports')
+
+PDF_CONTENT_TYPE = 'application/pdf'
+
+# Contador de versión de los datos académicos ('global' o 'curso:<id>')
+VERSION_DATOS_KEY = 'reportes:version_datos:{}'
+
+# Módulos que definen los renderizadores (se importan al primer uso para
+# que el worker de Celery los conozca sin depender del orden de carga).
+MODULOS_REPORTES = ('principal.views',)
+
+
+class ReporteError(Exception):
+    """Excepción lanzada cuando un reporte no puede renderizarse."""
+    pass
+
+
+class DefinicionReporte:
+    """Describe un tipo de reporte registrado con registrar_reporte."""
+
+    def __init__(self, tipo, renderizar, content_type, extension, adjunto, reutilizable,
+                 datos_academicos):
+        self.tipo = tipo
+        self.renderizar = renderizar
+        self.content_type = content_type
+        self.extension = extension
+        self.adjunto = adjunto
+        self.reutilizable = reutilizable
+        self.datos_academicos = datos_academicos
+
+
+_REGISTRO = {}
+
+
+def registrar_reporte(tipo, content_type=PDF_CONTENT_TYPE, extension='pdf', adjunto=True,
+                      reutilizable=False, datos_academicos=False):
+    """
+    Decorador que registra la función que renderiza un tipo de reporte.
+
+    La función recibe el dict de parámetros (serializable a JSON) y devuelve
+    una tupla (contenido, nombre_archivo), donde contenido son bytes o un
+    archivo abierto posicionado al inicio.
+
+    Con reutilizable=True un artefacto reciente con los mismos parámetros se
+    sirve sin volver a renderizar. Con datos_academicos=True la cache_key
+    incluye además la versión de datos (version_datos), de modo que una
+    nota, asistencia o matrícula nueva invalida el artefacto; sin él, los
+    parámetros deben identificar por completo los datos.
+    """
+    def decorador(func):
+        _REGISTRO[tipo] = DefinicionReporte(
+            tipo, func, content_type, extension, adjunto, reutilizable, datos_academicos,
+        )
+        return func
+    return decorador
+
+
+def obtener_definicion(tipo):
+    if tipo not in _REGISTRO:
+        for modulo in MODULOS_REPORTES:
+            import_module(modulo)
+    try:
+        return _REGISTRO[tipo]
+    except KeyError:
+        raise ReporteError(f"Tipo de reporte desconocido: {tipo}")
+
+
+def calcular_cache_key(tipo, parametros, version=None):
+    """Hash estable de tipo + parámetros (claves ordenadas, valores como texto) + versión de datos."""
+    clave = {'tipo': tipo, 'parametros': parametros or {}}
+    if version is not None:
+        clave['version'] = version
+    normalizado = json.dumps(clave, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(normalizado.encode('utf-8')).hexdigest()
+
+
+# ── Versión de los datos académicos ──────────────────────────────────────────
+
+def _clave_version(curso_id=None):
+    return VERSION_DATOS_KEY.format(f'curso:{curso_id}' if curso_id else 'global')
+
+
+def version_datos(parametros):
+    """
+    Versión actual de los datos que lee un reporte: la del curso si los
+    parámetros se limitan a uno ('course_id' o el filtro 'curso'), si no la
+    global. Un contador que falta en la caché (nunca creado o desalojado) se
+    inicializa con la marca de tiempo, distinta de cualquier versión anterior.
+    """
+    parametros = parametros or {}
+    clave = _clave_version(parametros.get('course_id') or parametros.get('curso'))
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, time.time_ns(), None)
+        version = cache.get(clave)
+    return version
+
+
+def _incrementar_versiones(curso_ids):
+    for clave in {_clave_version(), *(_clave_version(curso_id) for curso_id in curso_ids if curso_id)}:
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.add(clave, time.time_ns(), None)
+
+
+def datos_modificados(*curso_ids):
+    """
+    Cambiaron notas, asistencias o matrículas de los cursos dados: al
+    confirmar la transacción se incrementan sus versiones y la global, así
+    que los reportes ya generados dejan de reutilizarse.
+    """
+    transaction.on_commit(lambda: _incrementar_versiones(curso_ids))
+
+
+def renderizar_pdf(template_src, context_dict):
+    """Renderiza una plantilla HTML a PDF con xhtml2pdf y devuelve los bytes."""
+    from xhtml2pdf import pisa
+
+    html = get_template(template_src).render(context_dict)
+    result = BytesIO()
+    pdf = pisa.pisaDocument(BytesIO(html.encode('UTF-8')), result)
+    if pdf.err:
+        raise ReporteError(f"Error al generar el PDF desde {template_src}")
+    return result.getvalue()
+
+
+# ── Almacenamiento privado ───────────────────────────────────────────────────
+
+class ReportesStorage(FileSystemStorage):
+    """
+    Archivos de reportes en settings.REPORTES_ROOT, fuera de MEDIA_ROOT y sin
+    URL pública (url() lanza ValueError). La carpeta se lee del setting en
+    cada uso, así que override_settings(REPORTES_ROOT=...) funciona en tests.
+    """
+
+    @property
+    def base_location(self):
+        return settings.REPORTES_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    @property
+    def base_url(self):
+        return None
+
+
+reportes_storage = ReportesStorage()
+
+
+def obtener_storage():
+    """Storage del campo ReporteGenerado.archivo."""
+    return reportes_storage
+
+
+def nombre_archivo_aleatorio(instance, filename):
+    """upload_to de ReporteGenerado.archivo: nombre no deducible de los parámetros."""
+    extension = os.path.splitext(filename)[1]
+    return f"{timezone.now():%Y/%m}/{uuid.uuid4().hex}{extension}"
+
+
+# ── Caché de artefactos ──────────────────────────────────────────────────────
+
+def buscar_en_cache(cache_key):
+    """
+    Devuelve el último reporte completado con esa cache_key dentro del TTL
+    cuyo archivo sigue existiendo, o None.
+    """
+    from .models import ReporteGenerado
+
+    if REPORTES_CACHE_TTL <= 0:
+        return None
+    limite = timezone.now() - timedelta(seconds=REPORTES_CACHE_TTL)
+    reporte = ReporteGenerado.objects.filter(
+        cache_key=cache_key,
+        estado=ReporteGenerado.ESTADO_COMPLETADO,
+        fecha_fin__gte=limite,
+    ).exclude(archivo='').order_by('-fecha_fin').first()
+    if reporte and reporte.archivo.storage.exists(reporte.archivo.name):
+        return reporte
+    return None
+
+
+def _copiar_desde_cache(reporte, original):
+    ahora = timezone.now()
+    reporte.archivo.name = original.archivo.name
+    reporte.nombre_archivo = original.nombre_archivo
+    reporte.content_type = original.content_type
+    reporte.tamano_bytes = original.tamano_bytes
+    reporte.desde_cache = True
+    reporte.duracion_ms = 0
+    reporte.estado = reporte.ESTADO_COMPLETADO
+    reporte.fecha_inicio = ahora
+    reporte.fecha_fin = ahora
+
+
+# ── Ciclo de vida del trabajo ────────────────────────────────────────────────
+
+def solicitar_reporte(tipo, parametros, usuario=None):
+    """
+    Registra un trabajo de reporte y lo encola.
+
+    Si un reporte idéntico se generó hace menos de REPORTES_CACHE_TTL segundos,
+    el nuevo trabajo se crea ya completado apuntando al mismo archivo. Si la
+    cola no está disponible el render se ejecuta en línea como último recurso.
+    """
+    from .models import ReporteGenerado
+    from .tasks import generar_reporte
+
+    definicion = obtener_definicion(tipo)
+    version = version_datos(parametros) if definicion.datos_academicos else None
+    cache_key = calcular_cache_key(tipo, parametros, version)
+    reporte = ReporteGenerado(
+        tipo=tipo,
+        parametros=parametros or {},
+        cache_key=cache_key,
+        adjunto=definicion.adjunto,
+        solicitado_por=usuario if usuario is not None and usuario.is_authenticated else None,
+    )
+
+    original = buscar_en_cache(cache_key) if definicion.reutilizable else None
+    if original is not None:
+        _copiar_desde_cache(reporte, original)
+        reporte.save()
+        logger.info(f"Reporte {tipo} servido desde caché ({cache_key[:12]})")
+        return reporte
+
+    reporte.save()
+    try:
+        resultado = generar_reporte.apply_async(args=[reporte.id], queue=REPORTES_CELERY_QUEUE)
+        ReporteGenerado.objects.filter(pk=reporte.pk, task_id='').update(task_id=resultado.id or '')
+    except Exception as e:
+        logger.warning(f"No se pudo encolar el reporte {reporte.id} ({tipo}): {e}. Se genera en línea.")
+        ejecutar_reporte(reporte)
+    reporte.refresh_from_db()
+    return reporte
+
+
+def ejecutar_reporte(reporte):
+    """
+    Renderiza el reporte y guarda el archivo. Nunca lanza excepción: los
+    errores quedan registrados en el propio ReporteGenerado.
+    """
+    if reporte.estado == reporte.ESTADO_COMPLETADO:
+        return reporte
+
+    reporte.estado = reporte.ESTADO_PROCESANDO
+    reporte.fecha_inicio = timezone.now()
+    reporte.save(update_fields=['estado', 'fecha_inicio'])
+
+    inicio = time.perf_counter()
+    try:
+        definicion = obtener_definicion(reporte.tipo)
+        if definicion.reutilizable:
+            # Otro trabajo con los mismos parámetros pudo terminar mientras este esperaba en cola
+            original = buscar_en_cache(reporte.cache_key)
+            if original is not None:
+                _copiar_desde_cache(reporte, original)
+                reporte.save()
+                return reporte
+        contenido, nombre_archivo = definicion.renderizar(reporte.parametros)
+        if isinstance(contenido, bytes):
+            archivo = ContentFile(contenido)
+        else:
+            archivo = File(contenido)
+        try:
+            reporte.archivo.save(f"reporte.{definicion.extension}", archivo, save=False)
+        finally:
+            archivo.close()
+        reporte.nombre_archivo = nombre_archivo
+        reporte.content_type = definicion.content_type
+        reporte.tamano_bytes = reporte.archivo.size
+        reporte.estado = reporte.ESTADO_COMPLETADO
+        reporte.error = ''
+    except Exception as e:
+        logger.error(f"Error generando reporte {reporte.id} ({reporte.tipo}): {e}", exc_info=True)
+        reporte.estado = reporte.ESTADO_ERROR
+        reporte.error = str(e)[:2000]
+    reporte.duracion_ms = int((time.perf_counter() - inicio) * 1000)
+    reporte.fecha_fin = timezone.now()
+    reporte.save()
+
+    logger.info(
+        f"Reporte {reporte.id} ({reporte.tipo}) {reporte.estado} en {reporte.duracion_ms} ms"
+    )
+    return reporte
+
+
+def puede_acceder(reporte, usuario):
+    """El reporte sólo lo descarga quien lo solicitó, el staff o Secretaría."""
+    from security.authorization.auth_profile import get_auth_profile
+
+    if not usuario.is_authenticated:
+        return False
+    if usuario.is_staff or reporte.solicitado_por_id == usuario.id:
+        return True
+    return get_auth_profile(usuario).in_group('Secretaría')
+
+
+def respuesta_archivo(reporte):
+    """
+    Respuesta con el archivo del reporte (el llamador ya comprobó el acceso):
+    X-Accel-Redirect hacia la location internal de nginx si está configurada,
+    si no FileResponse en streaming.
+    """
+    prefijo = getattr(settings, 'REPORTES_X_ACCEL_REDIRECT_PREFIX', '')
+    if prefijo:
+        response = HttpResponse(content_type=reporte.content_type or None)
+        response['X-Accel-Redirect'] = prefijo.rstrip('/') + '/' + quote(reporte.archivo.name)
+        disposicion = 'attachment' if reporte.adjunto else 'inline'
+        if reporte.nombre_archivo:
+            disposicion += f"; filename*=UTF-8''{quote(reporte.nombre_archivo)}"
+        response['Content-Disposition'] = disposicion
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+    response = FileResponse(
+        reporte.archivo.open('rb'),
+        as_attachment=reporte.adjunto,
+        filename=reporte.nombre_archivo or None,
+        content_type=reporte.content_type or None,
+    )
+    response.block_size = 64 * 1024
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+# ── Métricas y mantenimiento ─────────────────────────────────────────────────
+
+def estadisticas_reportes(dias=7):
+    """
+    Resumen por tipo de reporte de los últimos `dias` días: total, servidos
+    desde caché, errores, en cola (pendientes), en proceso y tiempos de
+    render (promedio y máximo).
+    """
+    from .models import ReporteGenerado
+
+    desde = timezone.now() - timedelta(days=dias)
+    renderizados = Q(estado=ReporteGenerado.ESTADO_COMPLETADO, desde_cache=False)
+    filas = ReporteGenerado.objects.filter(fecha_creacion__gte=desde).values('tipo').annotate(
+        total=Count('id'),
+        servidos_cache=Count('id', filter=Q(desde_cache=True)),
+        errores=Count('id', filter=Q(estado=ReporteGenerado.ESTADO_ERROR)),
+        en_cola=Count('id', filter=Q(estado=ReporteGenerado.ESTADO_PENDIENTE)),
+        en_proceso=Count('id', filter=Q(estado=ReporteGenerado.ESTADO_PROCESANDO)),
+        promedio_ms=Avg('duracion_ms', filter=renderizados),
+        maximo_ms=Max('duracion_ms', filter=renderizados),
+    ).order_by('tipo')
+    return [
+        {**fila, 'promedio_ms': round(fila['promedio_ms']) if fila['promedio_ms'] is not None else None}
+        for fila in filas
+    ]
+
+
+def limpiar_reportes_antiguos(horas=None):
+    """
+    Elimina los trabajos más antiguos que la retención y los archivos que ya
+    no referencia ningún trabajo restante. Devuelve un dict con los totales.
+    """
+    from .models import ReporteGenerado
+
+    horas = REPORTES_RETENCION_HORAS if horas is None else horas
+    limite = timezone.now() - timedelta(hours=horas)
+    vencidos = ReporteGenerado.objects.filter(fecha_creacion__lt=limite)
+
+    nombres = set(vencidos.exclude(archivo='').values_list('archivo', flat=True))
+    eliminados, _ = vencidos.delete()
+
+    en_uso = set(
+        ReporteGenerado.objects.filter(archivo__in=nombres).values_list('archivo', flat=True)
+    )
+    storage = ReporteGenerado._meta.get_field('archivo').storage
+    archivos = 0
+    for nombre in nombres - en_uso:
+        try:
+            storage.delete(nombre)
+            archivos += 1
+        except Exception as e:
+            logger.warning(f"No se pudo eliminar el archivo de reporte {nombre}: {e}")
+
+    return {'reportes_eliminados': eliminados, 'archivos_eliminados': archivos}
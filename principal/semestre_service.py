@@ -7,13 +7,25 @@ Funciones principales:
   - terminar_semestre(curso): Ejecuta el proceso completo de cierre de semestre:
     archiva los datos académicos en datos_archivados y reinicia el curso para
     el siguiente semestre.
+  - terminar_semestres(cursos): Cierra el semestre de varios cursos en una sola
+    pasada (usado por la tarea Celery principal.tasks.terminar_semestres_task),
+    con contadores y tiempos por curso.
+
+Rendimiento:
+  - Las filas se copian con bulk_create por lotes (ARCHIVADO_BATCH_SIZE) usando
+    los helpers de datos_archivados.archivado_service; las notas y asistencias
+    se leen con .iterator() y la limpieza de principal es por conjunto.
 
 Manejo de errores:
   - Si terminar_semestre falla, se lanza SemestreError con mensaje descriptivo.
   - La transacción atómica garantiza que no quedan datos parciales.
+  - En terminar_semestres cada curso tiene su propia transacción: un curso que
+    falla se revierte y se informa sin afectar al resto.
 """
 
 import logging
+import time
+
 from django.db import transaction
 from django.utils import timezone
 
@@ -65,7 +77,7 @@ def crear_semestre_inicial(curso):
     return semestre
 
 
-def terminar_semestre(curso, finalizar=False):
+def terminar_semestre(curso, finalizar=False, usuarios_map=None, batch_size=None):
     """
     Ejecuta el proceso completo de cierre de semestre dentro de transaction.atomic().
 
@@ -73,8 +85,8 @@ def terminar_semestre(curso, finalizar=False):
       1. Obtener el SemestreCurso activo del curso (o usar numero_semestre=1 si no hay).
       2. Verificar que no exista ya un SemestreCursoArchivado con ese id_original.
       3. Crear SemestreCursoArchivado en datos_archivados.
-      4. Archivar Matriculas, Calificaciones, NotaIndividual, Asistencia.
-      5. Eliminar esos datos de principal.
+      4. Archivar Matriculas, Calificaciones, NotaIndividual, Asistencia (por lotes).
+      5. Eliminar esos datos de principal (DELETE por conjunto).
       6. Marcar SemestreCurso actual como activo=False.
       7. Si finalizar=False: Crear nuevo SemestreCurso con numero_semestre = anterior + 1
          y reiniciar Curso.status = 'I'.
@@ -84,31 +96,44 @@ def terminar_semestre(curso, finalizar=False):
         curso: instancia de principal.Curso.
         finalizar: si True, el curso se marca como finalizado ('F') en lugar de
                    crear un nuevo semestre y reiniciarlo a 'I'.
+        usuarios_map: dict opcional {user.pk: UsuarioArchivado.pk} compartido
+                      entre varios cierres; solo se actualiza si la transacción
+                      se confirma.
+        batch_size: filas por lote de bulk_create (por defecto ARCHIVADO_BATCH_SIZE).
 
     Retorna:
-        dict con contadores {semestre_num, matriculas, calificaciones, notas, asistencias}.
+        dict con contadores {semestre_num, matriculas, calificaciones, notas,
+        asistencias, usuarios, tiempos_ms}.
 
     Lanza:
         SemestreError si cualquier paso falla (transacción revertida).
     """
     from principal.models import (
-        SemestreCurso, CursoAcademico,
+        Curso, SemestreCurso, CursoAcademico,
         Matriculas, Calificaciones, NotaIndividual, Asistencia,
+        SolicitudInscripcion, RespuestaEstudiante,
     )
     from datos_archivados.models import (
         SemestreCursoArchivado,
         CursoAcademicoArchivado,
-        UsuarioArchivado,
+        CursoArchivado,
         MatriculaArchivada,
         CalificacionArchivada,
         NotaIndividualArchivada,
         AsistenciaArchivada,
     )
+    from datos_archivados.archivado_service import (
+        ARCHIVADO_BATCH_SIZE, borrar_sin_senales, crear_en_lotes, medir_fase,
+        nuevo_curso_archivado, usuarios_archivados_para,
+    )
+    from principal import reportes_service
+
+    batch_size = batch_size or ARCHIVADO_BATCH_SIZE
 
     # Obtener el semestre activo actual
     semestre_activo = SemestreCurso.objects.filter(
         curso=curso, activo=True
-    ).order_by('-numero_semestre').first()
+    ).select_related('curso_academico').order_by('-numero_semestre').first()
 
     numero_semestre_actual = semestre_activo.numero_semestre if semestre_activo else 1
 
@@ -127,210 +152,195 @@ def terminar_semestre(curso, finalizar=False):
         'calificaciones': 0,
         'notas': 0,
         'asistencias': 0,
+        'usuarios': 0,
     }
+    tiempos = {}
+    # Copia local: si la transacción se revierte, los UsuarioArchivado creados
+    # aquí desaparecen y no deben quedar en el mapa compartido.
+    usuarios_locales = dict(usuarios_map) if usuarios_map is not None else {}
 
     try:
         with transaction.atomic():
 
-            # ── 1. Obtener CursoAcademico activo para el nuevo semestre ───────
-            curso_academico_activo = CursoAcademico.objects.filter(activo=True).first()
-            if curso_academico_activo is None:
-                logger.warning(
-                    f"No hay CursoAcademico activo al terminar semestre "
-                    f"de '{curso.name}'. El nuevo SemestreCurso se creará sin CA."
-                )
-
-            # ── 2. Crear SemestreCursoArchivado ───────────────────────────────
-            # Buscar CursoAcademicoArchivado correspondiente al CA del semestre activo
-            ca_archivado = None
-            if semestre_activo and semestre_activo.curso_academico:
-                ca_archivado = CursoAcademicoArchivado.objects.filter(
-                    id_original=semestre_activo.curso_academico.pk
-                ).first()
-
-            # Necesitamos un CursoArchivado para vincular el SemestreCursoArchivado.
-            # Como el curso NO se elimina (a diferencia del archivado de CursoAcademico),
-            # creamos un registro de semestre archivado directamente con los datos del curso.
-            # Usamos un enfoque simplificado: guardamos los datos del semestre en
-            # SemestreCursoArchivado con referencia al CursoArchivado si existe,
-            # o creamos uno temporal para este semestre.
-
-            # Buscar si ya existe un CursoArchivado para este curso
-            from datos_archivados.models import CursoArchivado
-            curso_archivado = CursoArchivado.objects.filter(
-                id_original=curso.pk
-            ).order_by('-fecha_migracion').first()
-
-            if curso_archivado is None:
-                # Crear un CursoArchivado temporal para este semestre
-                # Necesitamos un CursoAcademicoArchivado de referencia
-                if ca_archivado is None:
-                    # Crear un CursoAcademicoArchivado de referencia si no existe
-                    ca_ref = semestre_activo.curso_academico if semestre_activo else None
-                    if ca_ref:
-                        ca_archivado, _ = CursoAcademicoArchivado.objects.get_or_create(
-                            id_original=ca_ref.pk,
-                            defaults={
-                                'nombre': ca_ref.nombre,
-                                'activo': ca_ref.activo,
-                                'archivado': True,
-                                'fecha_creacion': ca_ref.fecha_creacion,
-                            }
-                        )
-                    else:
-                        # Sin CA, crear uno genérico para este semestre
-                        ca_archivado, _ = CursoAcademicoArchivado.objects.get_or_create(
-                            id_original=0,
-                            defaults={
-                                'nombre': f'Semestre {numero_semestre_actual} - {curso.name}',
-                                'activo': False,
-                                'archivado': True,
-                                'fecha_creacion': timezone.now().date(),
-                            }
+            with medir_fase(tiempos, 'semestre'):
+                # ── 1. Obtener CursoAcademico activo para el nuevo semestre ───
+                curso_academico_activo = None
+                if not (semestre_activo and semestre_activo.curso_academico_id) and not finalizar:
+                    curso_academico_activo = CursoAcademico.objects.filter(activo=True).first()
+                    if curso_academico_activo is None:
+                        logger.warning(
+                            f"No hay CursoAcademico activo al terminar semestre "
+                            f"de '{curso.name}'. El nuevo SemestreCurso se creará sin CA."
                         )
 
-                curso_archivado = CursoArchivado.objects.create(
-                    id_original=curso.pk,
-                    name=curso.name,
-                    description=curso.description,
-                    area=curso.area,
-                    tipo=curso.tipo,
-                    teacher_id_original=curso.teacher.pk,
-                    teacher_name=curso.teacher.get_full_name() or curso.teacher.username,
-                    image=curso.image.name if curso.image else None,
-                    class_quantity=curso.class_quantity,
-                    status=curso.status,
-                    curso_academico=ca_archivado,
-                    enrollment_deadline=curso.enrollment_deadline,
-                    start_date=curso.start_date,
-                    teacher_actual=curso.teacher,
+                # ── 2. Crear SemestreCursoArchivado ───────────────────────────
+                # Buscar CursoAcademicoArchivado correspondiente al CA del semestre activo
+                ca_ref = semestre_activo.curso_academico if semestre_activo else None
+                ca_archivado = None
+                if ca_ref:
+                    ca_archivado = CursoAcademicoArchivado.objects.filter(
+                        id_original=ca_ref.pk
+                    ).first()
+
+                # El curso NO se elimina (a diferencia del archivado de CursoAcademico):
+                # se reutiliza su CursoArchivado si existe o se crea uno para este semestre.
+                curso_archivado = CursoArchivado.objects.filter(
+                    id_original=curso.pk
+                ).order_by('-fecha_migracion').first()
+
+                if curso_archivado is None:
+                    # Necesitamos un CursoAcademicoArchivado de referencia
+                    if ca_archivado is None:
+                        if ca_ref:
+                            ca_archivado, _ = CursoAcademicoArchivado.objects.get_or_create(
+                                id_original=ca_ref.pk,
+                                defaults={
+                                    'nombre': ca_ref.nombre,
+                                    'activo': ca_ref.activo,
+                                    'archivado': True,
+                                    'fecha_creacion': ca_ref.fecha_creacion,
+                                }
+                            )
+                        else:
+                            # Sin CA, crear uno genérico para este semestre
+                            ca_archivado, _ = CursoAcademicoArchivado.objects.get_or_create(
+                                id_original=0,
+                                defaults={
+                                    'nombre': f'Semestre {numero_semestre_actual} - {curso.name}',
+                                    'activo': False,
+                                    'archivado': True,
+                                    'fecha_creacion': timezone.now().date(),
+                                }
+                            )
+                    curso_archivado = nuevo_curso_archivado(curso, ca_archivado, status=curso.status)
+                    curso_archivado.save()
+
+                semestre_archivado = SemestreCursoArchivado.objects.create(
+                    id_original=semestre_activo.pk if semestre_activo else 0,
+                    curso_archivado=curso_archivado,
+                    numero_semestre=numero_semestre_actual,
+                    activo=True,
+                    curso_academico_archivado=ca_archivado,
+                    fecha_inicio=semestre_activo.fecha_inicio if semestre_activo else None,
+                    fecha_cierre=timezone.now().date(),
+                    fecha_creacion=semestre_activo.fecha_creacion if semestre_activo else timezone.now(),
                 )
 
-            # Crear el SemestreCursoArchivado
-            semestre_archivado = SemestreCursoArchivado.objects.create(
-                id_original=semestre_activo.pk if semestre_activo else 0,
-                curso_archivado=curso_archivado,
-                numero_semestre=numero_semestre_actual,
-                activo=True,
-                curso_academico_archivado=ca_archivado,
-                fecha_inicio=semestre_activo.fecha_inicio if semestre_activo else None,
-                fecha_cierre=timezone.now().date(),
-                fecha_creacion=semestre_activo.fecha_creacion if semestre_activo else timezone.now(),
-            )
-
-            # ── 3. Archivar usuarios (helper) ─────────────────────────────────
-            usuarios_archivados_map = {}
-
-            def obtener_o_crear_usuario_archivado(user):
-                if user.pk in usuarios_archivados_map:
-                    return usuarios_archivados_map[user.pk]
-                existente = UsuarioArchivado.objects.filter(
-                    id_original=user.pk,
-                    usuario_actual=user
-                ).first()
-                if existente:
-                    usuarios_archivados_map[user.pk] = existente
-                    return existente
-                perfil = getattr(user, 'registro', None)
-                ua = UsuarioArchivado.objects.create(
-                    id_original=user.pk,
-                    username=user.username,
-                    first_name=user.first_name,
-                    last_name=user.last_name,
-                    email=user.email,
-                    date_joined=user.date_joined,
-                    is_active=user.is_active,
-                    nacionalidad=getattr(perfil, 'nacionalidad', None) if perfil else None,
-                    carnet=getattr(perfil, 'carnet', None) if perfil else None,
-                    sexo=getattr(perfil, 'sexo', 'M') if perfil else 'M',
-                    address=getattr(perfil, 'address', None) if perfil else None,
-                    location=getattr(perfil, 'location', None) if perfil else None,
-                    provincia=getattr(perfil, 'provincia', None) if perfil else None,
-                    telephone=getattr(perfil, 'telephone', None) if perfil else None,
-                    movil=getattr(perfil, 'movil', None) if perfil else None,
-                    grado=getattr(perfil, 'grado', 'grado1') if perfil else 'grado1',
-                    ocupacion=getattr(perfil, 'ocupacion', 'ocupacion1') if perfil else 'ocupacion1',
-                    titulo=getattr(perfil, 'titulo', None) if perfil else None,
-                    grupo=', '.join(user.groups.values_list('name', flat=True)),
-                    usuario_actual=user,
+            # ── 3. Archivar Matrículas ────────────────────────────────────────
+            with medir_fase(tiempos, 'matriculas'):
+                matriculas = list(
+                    Matriculas.objects.filter(course=curso).values_list(
+                        'pk', 'student_id', 'activo', 'fecha_matricula', 'estado'
+                    )
+                )
+                usuarios_archivados_para(
+                    [m[1] for m in matriculas], usuarios_locales, contadores, batch_size
+                )
+                matriculas_archivadas = [
+                    MatriculaArchivada(
+                        id_original=pk,
+                        course=curso_archivado,
+                        student_id=usuarios_locales[student_id],
+                        semestre_archivado=semestre_archivado,
+                        activo=activo,
+                        fecha_matricula=fecha_matricula,
+                        estado=estado,
+                    )
+                    for pk, student_id, activo, fecha_matricula, estado in matriculas
+                ]
+                contadores['matriculas'] += crear_en_lotes(
+                    MatriculaArchivada, matriculas_archivadas, batch_size
                 )
-                usuarios_archivados_map[user.pk] = ua
-                return ua
-
-            # ── 4. Archivar Matrículas ────────────────────────────────────────
-            matriculas_qs = Matriculas.objects.filter(course=curso).select_related('student')
-            matriculas_archivadas_map = {}
-
-            for matricula in matriculas_qs:
-                estudiante_archivado = obtener_o_crear_usuario_archivado(matricula.student)
-                ma = MatriculaArchivada.objects.create(
-                    id_original=matricula.pk,
-                    course=curso_archivado,
-                    student=estudiante_archivado,
-                    semestre_archivado=semestre_archivado,
-                    activo=matricula.activo,
-                    fecha_matricula=matricula.fecha_matricula,
-                    estado=matricula.estado,
+                matriculas_archivadas_map = {ma.id_original: ma.pk for ma in matriculas_archivadas}
+                del matriculas, matriculas_archivadas
+
+            # ── 4. Archivar Calificaciones y Notas ────────────────────────────
+            with medir_fase(tiempos, 'calificaciones'):
+                calificaciones = list(
+                    Calificaciones.objects.filter(course=curso).values_list(
+                        'pk', 'student_id', 'matricula_id', 'average'
+                    )
+                )
+                usuarios_archivados_para(
+                    [c[1] for c in calificaciones], usuarios_locales, contadores, batch_size
                 )
-                matriculas_archivadas_map[matricula.pk] = ma
-                contadores['matriculas'] += 1
-
-            # ── 5. Archivar Calificaciones y Notas ────────────────────────────
-            calificaciones_qs = Calificaciones.objects.filter(
-                course=curso
-            ).select_related('student', 'matricula').prefetch_related('notas')
-
-            for calificacion in calificaciones_qs:
-                estudiante_archivado = obtener_o_crear_usuario_archivado(calificacion.student)
-                matricula_archivada = None
-                if calificacion.matricula:
-                    matricula_archivada = matriculas_archivadas_map.get(calificacion.matricula.pk)
-
-                if not matricula_archivada:
-                    matricula_archivada = MatriculaArchivada.objects.create(
-                        id_original=calificacion.pk * -1,
+
+                fecha_provisional = curso.start_date or timezone.now().date()
+                matriculas_provisionales = [
+                    MatriculaArchivada(
+                        id_original=pk * -1,
                         course=curso_archivado,
-                        student=estudiante_archivado,
+                        student_id=usuarios_locales[student_id],
                         activo=True,
-                        fecha_matricula=curso.start_date or timezone.now().date(),
+                        fecha_matricula=fecha_provisional,
                         estado='P',
                     )
+                    for pk, student_id, matricula_id, _ in calificaciones
+                    if matricula_id not in matriculas_archivadas_map
+                ]
+                crear_en_lotes(MatriculaArchivada, matriculas_provisionales, batch_size)
+                provisionales_map = {ma.id_original * -1: ma.pk for ma in matriculas_provisionales}
+
+                calificaciones_archivadas = [
+                    CalificacionArchivada(
+                        id_original=pk,
+                        matricula_id=matriculas_archivadas_map.get(matricula_id) or provisionales_map[pk],
+                        course=curso_archivado,
+                        student_id=usuarios_locales[student_id],
+                        semestre_archivado=semestre_archivado,
+                        average=average,
+                    )
+                    for pk, student_id, matricula_id, average in calificaciones
+                ]
+                contadores['calificaciones'] += crear_en_lotes(
+                    CalificacionArchivada, calificaciones_archivadas, batch_size
+                )
+                calificaciones_map = {ca.id_original: ca.pk for ca in calificaciones_archivadas}
+                del calificaciones, calificaciones_archivadas
 
-                calificacion_archivada = CalificacionArchivada.objects.create(
-                    id_original=calificacion.pk,
-                    matricula=matricula_archivada,
-                    course=curso_archivado,
-                    student=estudiante_archivado,
-                    semestre_archivado=semestre_archivado,
-                    average=calificacion.average,
+                notas = NotaIndividual.objects.filter(calificacion__course=curso).values_list(
+                    'pk', 'calificacion_id', 'valor', 'fecha_creacion'
                 )
-                contadores['calificaciones'] += 1
-
-                for nota in calificacion.notas.all():
-                    NotaIndividualArchivada.objects.create(
-                        id_original=nota.pk,
-                        calificacion=calificacion_archivada,
-                        valor=nota.valor if nota.valor is not None else 0,
-                        fecha_creacion=nota.fecha_creacion,
-                    )
-                    contadores['notas'] += 1
-
-            # ── 6. Archivar Asistencias ───────────────────────────────────────
-            asistencias_qs = Asistencia.objects.filter(
-                course=curso
-            ).select_related('student')
-
-            for asistencia in asistencias_qs:
-                estudiante_archivado = obtener_o_crear_usuario_archivado(asistencia.student)
-                AsistenciaArchivada.objects.create(
-                    id_original=asistencia.pk,
-                    course=curso_archivado,
-                    student=estudiante_archivado,
-                    semestre_archivado=semestre_archivado,
-                    presente=asistencia.presente,
-                    date=asistencia.date,
+                contadores['notas'] += crear_en_lotes(
+                    NotaIndividualArchivada,
+                    (
+                        NotaIndividualArchivada(
+                            id_original=pk,
+                            calificacion_id=calificaciones_map[calificacion_id],
+                            valor=valor if valor is not None else 0,
+                            fecha_creacion=fecha_creacion,
+                        )
+                        for pk, calificacion_id, valor, fecha_creacion in notas.iterator(chunk_size=batch_size)
+                    ),
+                    batch_size,
+                    necesita_ids=False,
+                )
+
+            # ── 5. Archivar Asistencias ───────────────────────────────────────
+            with medir_fase(tiempos, 'asistencias'):
+                asistencias = Asistencia.objects.filter(course=curso)
+                usuarios_archivados_para(
+                    asistencias.values_list('student_id', flat=True).distinct(),
+                    usuarios_locales, contadores, batch_size,
+                )
+                contadores['asistencias'] += crear_en_lotes(
+                    AsistenciaArchivada,
+                    (
+                        AsistenciaArchivada(
+                            id_original=pk,
+                            course=curso_archivado,
+                            student_id=usuarios_locales[student_id],
+                            semestre_archivado=semestre_archivado,
+                            presente=presente,
+                            date=fecha,
+                        )
+                        for pk, student_id, presente, fecha in asistencias.values_list(
+                            'pk', 'student_id', 'presente', 'date'
+                        ).iterator(chunk_size=batch_size)
+                    ),
+                    batch_size,
+                    necesita_ids=False,
                 )
-                contadores['asistencias'] += 1
 
             logger.info(
                 f"Datos del semestre {numero_semestre_actual} de '{curso.name}' archivados: "
@@ -340,45 +350,36 @@ def terminar_semestre(curso, finalizar=False):
                 f"{contadores['asistencias']} asistencias."
             )
 
-            # ── 7. Limpiar datos de principal ─────────────────────────────────
+            # ── 6. Limpiar datos de principal ─────────────────────────────────
             # Solo se ejecuta si el archivado fue exitoso (dentro de la misma transacción)
+            with medir_fase(tiempos, 'limpieza'):
+                # Notas: sin señales, sus calificaciones se eliminan a continuación
+                borrar_sin_senales(NotaIndividual.objects.filter(calificacion__course=curso))
+                Calificaciones.objects.filter(course=curso).delete()
+                Asistencia.objects.filter(course=curso).delete()
+                Matriculas.objects.filter(course=curso).delete()
+
+                # Solicitudes de inscripción y sus respuestas
+                # IMPORTANTE: se deben limpiar para que los estudiantes puedan
+                # volver a aplicar en el nuevo semestre del mismo curso.
+                RespuestaEstudiante.objects.filter(solicitud__curso=curso).delete()
+                SolicitudInscripcion.objects.filter(curso=curso).delete()
+                logger.info(
+                    f"Solicitudes de inscripción del semestre {numero_semestre_actual} "
+                    f"de '{curso.name}' eliminadas para el nuevo semestre."
+                )
+                reportes_service.datos_modificados(curso.pk)
 
-            # 7a. Notas individuales
-            NotaIndividual.objects.filter(calificacion__course=curso).delete()
-
-            # 7b. Calificaciones
-            Calificaciones.objects.filter(course=curso).delete()
-
-            # 7c. Asistencias
-            Asistencia.objects.filter(course=curso).delete()
-
-            # 7d. Matrículas
-            Matriculas.objects.filter(course=curso).delete()
-
-            # 7e. Solicitudes de inscripción y sus respuestas
-            # IMPORTANTE: se deben limpiar para que los estudiantes puedan
-            # volver a aplicar en el nuevo semestre del mismo curso.
-            from principal.models import SolicitudInscripcion, RespuestaEstudiante
-            solicitudes_del_curso = SolicitudInscripcion.objects.filter(curso=curso)
-            for solicitud in solicitudes_del_curso:
-                RespuestaEstudiante.objects.filter(solicitud=solicitud).delete()
-            solicitudes_del_curso.delete()
-            logger.info(
-                f"Solicitudes de inscripción del semestre {numero_semestre_actual} "
-                f"de '{curso.name}' eliminadas para el nuevo semestre."
-            )
-
-            # ── 8. Actualizar SemestreCurso ───────────────────────────────────
+            # ── 7. Actualizar SemestreCurso ───────────────────────────────────
             if semestre_activo:
                 semestre_activo.activo = False
                 semestre_activo.fecha_cierre = timezone.now().date()
                 semestre_activo.save(update_fields=['activo', 'fecha_cierre'])
 
-            # ── 9. Crear nuevo SemestreCurso o finalizar el Curso ────────────
+            # ── 8. Crear nuevo SemestreCurso o finalizar el Curso ────────────
             if finalizar:
                 # Modo finalizar: el curso queda cerrado, no se crea nuevo semestre
-                from principal.models import Curso as CursoModel
-                CursoModel.objects.filter(pk=curso.pk).update(status='F')
+                Curso.objects.filter(pk=curso.pk).update(status='F')
                 curso.status = 'F'
                 logger.info(
                     f"Semestre {numero_semestre_actual} archivado y curso '{curso.name}' "
@@ -390,7 +391,7 @@ def terminar_semestre(curso, finalizar=False):
                 # El nuevo semestre hereda el mismo CursoAcademico del semestre que se cierra,
                 # no el CA "activo global". Así el curso permanece vinculado a su CA original
                 # aunque se use el modal después de que ese CA haya sido archivado.
-                ca_nuevo_semestre = semestre_activo.curso_academico if semestre_activo else curso_academico_activo
+                ca_nuevo_semestre = ca_ref or curso_academico_activo
                 SemestreCurso.objects.create(
                     curso=curso,
                     numero_semestre=nuevo_numero,
@@ -399,14 +400,15 @@ def terminar_semestre(curso, finalizar=False):
                     fecha_inicio=timezone.now().date(),
                 )
 
-                # ── 10. Reiniciar estado del Curso ────────────────────────────
-                from principal.models import Curso as CursoModel
-                CursoModel.objects.filter(pk=curso.pk).update(status='I')
+                # ── 9. Reiniciar estado del Curso ─────────────────────────────
+                # Se guarda el estado efectivo ('P' si la fecha de inicio ya pasó)
                 curso.status = 'I'
+                curso.status = curso.get_dynamic_status()
+                Curso.objects.filter(pk=curso.pk).update(status=curso.status)
 
                 logger.info(
                     f"Semestre {numero_semestre_actual} terminado para '{curso.name}'. "
-                    f"Nuevo semestre: {nuevo_numero}. Curso reiniciado a estado 'I'."
+                    f"Nuevo semestre: {nuevo_numero}. Curso reiniciado a estado '{curso.status}'."
                 )
 
     except SemestreError:
@@ -422,4 +424,92 @@ def terminar_semestre(curso, finalizar=False):
             f"Los datos se conservan intactos. Causa: {exc}"
         ) from exc
 
+    if usuarios_map is not None:
+        usuarios_map.update(usuarios_locales)
+    contadores['tiempos_ms'] = tiempos
     return contadores
+
+
+def terminar_semestres(cursos_ids, finalizar=False, al_avanzar=None, batch_size=None):
+    """
+    Cierra el semestre activo de varios cursos en una sola pasada.
+
+    Cada curso se procesa con terminar_semestre en su propia transacción
+    (todo o nada por curso); los UsuarioArchivado resueltos en un curso se
+    reutilizan en los siguientes sin volver a consultarlos.
+
+    Parámetros:
+        cursos_ids: ids de principal.Curso a cerrar.
+        finalizar: igual que en terminar_semestre.
+        al_avanzar: callable opcional (procesados, total, resultado) llamado
+                    tras cada curso, usado para informar el progreso.
+        batch_size: filas por lote de bulk_create.
+
+    Retorna:
+        dict {total, completados, fallidos, duracion_ms, resultados}, donde
+        resultados es una lista con un dict por curso:
+        {curso_id, curso, success, contadores | error, duracion_ms}.
+    """
+    from principal.models import Curso
+
+    inicio_total = time.perf_counter()
+    ids = list(dict.fromkeys(int(pk) for pk in cursos_ids))
+    cursos = Curso.objects.filter(pk__in=ids).select_related('teacher').in_bulk()
+    usuarios_map = {}
+    resultados = []
+
+    for indice, curso_id in enumerate(ids, start=1):
+        curso = cursos.get(curso_id)
+        inicio = time.perf_counter()
+        resultado = {'curso_id': curso_id, 'curso': curso.name if curso else None}
+        if curso is None:
+            resultado.update(success=False, error='Curso no encontrado.')
+        else:
+            try:
+                resultado['contadores'] = terminar_semestre(
+                    curso, finalizar=finalizar, usuarios_map=usuarios_map, batch_size=batch_size
+                )
+                resultado['success'] = True
+            except SemestreError as e:
+                resultado.update(success=False, error=str(e))
+        resultado['duracion_ms'] = round((time.perf_counter() - inicio) * 1000)
+        resultados.append(resultado)
+        if al_avanzar is not None:
+            al_avanzar(indice, len(ids), resultado)
+
+    completados = sum(1 for r in resultados if r['success'])
+    resumen = {
+        'total': len(ids),
+        'completados': completados,
+        'fallidos': len(ids) - completados,
+        'duracion_ms': round((time.perf_counter() - inicio_total) * 1000),
+        'resultados': resultados,
+    }
+    logger.info(
+        f"Cierre de semestre en lote: {completados}/{len(ids)} cursos "
+        f"en {resumen['duracion_ms']} ms."
+    )
+    return resumen
+
+
+# ── Progreso del cierre en lote ──────────────────────────────────────────────
+
+PROGRESO_TIMEOUT = 3600
+
+
+def clave_progreso(task_id):
+    return f'terminar_semestres_progreso_{task_id}'
+
+
+def guardar_progreso(task_id, progreso):
+    """Publica en caché el estado del cierre en lote identificado por task_id."""
+    from django.core.cache import cache
+
+    progreso['fecha_actualizacion'] = timezone.now().isoformat()
+    cache.set(clave_progreso(task_id), progreso, timeout=PROGRESO_TIMEOUT)
+
+
+def obtener_progreso(task_id):
+    from django.core.cache import cache
+
+    return cache.get(clave_progreso(task_id))
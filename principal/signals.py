@@ -1,7 +1,8 @@
 """
 Signals para configuración automática del sistema
 """
-from django.db.models.signals import post_migrate, post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import Group, User
 from principal.config_grupos import GRUPOS_SISTEMA, configurar_permisos_grupo
@@ -117,4 +118,38 @@ def agregar_superusuario_a_administracion(sender, instance, created, **kwargs):
     except Exception as e:
         logger.error(f"Error agregando superusuario al grupo Administración: {e}")
         import traceback
-        logger.error(f"Detalles: {traceback.format_exc()}")
\ No newline at end of file
+        logger.error(f"Detalles: {traceback.format_exc()}")
+
+@receiver([post_save, post_delete], sender='principal.Curso', dispatch_uid='catalogo_curso')
+@receiver([post_save, post_delete], sender='principal.CursoAcademico', dispatch_uid='catalogo_curso_academico')
+@receiver([post_save, post_delete], sender='principal.Matriculas', dispatch_uid='catalogo_matricula')
+@receiver([post_save, post_delete], sender='principal.SemestreCurso', dispatch_uid='catalogo_semestre')
+@receiver([post_save, post_delete], sender='principal.FormularioAplicacion', dispatch_uid='catalogo_formulario')
+@receiver([post_save, post_delete], sender='course_documents.CourseDocument', dispatch_uid='catalogo_documento')
+@receiver([post_save, post_delete], sender='blog.Noticia', dispatch_uid='catalogo_noticia')
+@receiver([post_save, post_delete], sender='blog.Categoria', dispatch_uid='catalogo_categoria')
+def invalidar_catalogo(sender, **kwargs):
+    """
+    Invalida las tarjetas y páginas anónimas del catálogo de cursos al
+    confirmar la transacción.
+    """
+    if kwargs.get('raw', False):
+        return
+    from principal import catalog_service
+    transaction.on_commit(catalog_service.invalidate)
+
+
+@receiver([post_save, post_delete], sender='principal.Curso', dispatch_uid='reportes_curso')
+@receiver([post_save, post_delete], sender='principal.Matriculas', dispatch_uid='reportes_matricula')
+@receiver([post_save, post_delete], sender='principal.Calificaciones', dispatch_uid='reportes_calificacion')
+@receiver(post_save, sender='principal.Asistencia', dispatch_uid='reportes_asistencia')
+def invalidar_reportes_academicos(sender, instance, **kwargs):
+    """
+    Nueva versión de datos para los reportes del curso al editar un registro
+    suelto (los servicios por lotes llaman a datos_modificados directamente).
+    Asistencia no escucha post_delete para conservar el borrado rápido.
+    """
+    if kwargs.get('raw', False):
+        return
+    from principal import reportes_service
+    reportes_service.datos_modificados(getattr(instance, 'course_id', instance.pk))
@@ -0,0 +1,119 @@
+"""
+Celery tasks for the principal application.
+"""
+
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=30, acks_late=True)
+def generar_reporte(self, reporte_id):
+    """
+    Renderiza un ReporteGenerado (PDF/Excel) y guarda el archivo resultante.
+
+    Args:
+        reporte_id: ID del ReporteGenerado a procesar
+    """
+    from .models import ReporteGenerado
+    from .reportes_service import ejecutar_reporte
+
+    try:
+        reporte = ReporteGenerado.objects.get(id=reporte_id)
+    except ReporteGenerado.DoesNotExist:
+        logger.warning(f"ReporteGenerado {reporte_id} no existe; se descarta la tarea")
+        return {'status': 'missing', 'reporte_id': reporte_id}
+
+    if self.request.id and not reporte.task_id:
+        reporte.task_id = self.request.id
+        reporte.save(update_fields=['task_id'])
+
+    reporte = ejecutar_reporte(reporte)
+    return {
+        'status': reporte.estado,
+        'reporte_id': reporte.id,
+        'tipo': reporte.tipo,
+        'duracion_ms': reporte.duracion_ms,
+        'desde_cache': reporte.desde_cache,
+    }
+
+
+@shared_task
+def limpiar_reportes_antiguos():
+    """Elimina los reportes y archivos que superaron REPORTES_RETENCION_HORAS."""
+    from .reportes_service import limpiar_reportes_antiguos as limpiar
+
+    resultado = limpiar()
+    logger.info(
+        f"Limpieza de reportes: {resultado['reportes_eliminados']} trabajos, "
+        f"{resultado['archivos_eliminados']} archivos"
+    )
+    return resultado
+
+
+@shared_task
+def actualizar_estados_cursos():
+    """
+    Mantiene al día las columnas materializadas de Curso: el estado efectivo
+    (las transiciones por fecha de get_dynamic_status) y el número de
+    semestre activo.
+    """
+    from .models import Curso
+
+    resultado = {
+        'estados_actualizados': Curso.objects.refresh_dynamic_status(),
+        'semestres_actualizados': Curso.objects.refresh_semestre_activo(),
+    }
+    if any(resultado.values()):
+        logger.info(
+            f"Estados de cursos: {resultado['estados_actualizados']} estados y "
+            f"{resultado['semestres_actualizados']} semestres activos actualizados"
+        )
+    return resultado
+
+
+@shared_task(bind=True, acks_late=True)
+def terminar_semestres_task(self, task_id, cursos_ids, finalizar=False):
+    """
+    Cierra el semestre de varios cursos (principal.semestre_service.terminar_semestres)
+    publicando el progreso curso a curso en caché y en el estado de la tarea.
+
+    Args:
+        task_id: clave de progreso asignada al encolar (devuelta al navegador)
+        cursos_ids: IDs de los cursos a cerrar
+        finalizar: si True los cursos quedan finalizados en lugar de reiniciarse
+    """
+    from .semestre_service import guardar_progreso, terminar_semestres
+
+    progreso = {
+        'estado': 'procesando',
+        'total': len(cursos_ids),
+        'procesados': 0,
+        'completados': 0,
+        'fallidos': 0,
+        'resultados': [],
+    }
+    guardar_progreso(task_id, progreso)
+
+    def al_avanzar(procesados, total, resultado):
+        progreso['procesados'] = procesados
+        progreso['completados' if resultado['success'] else 'fallidos'] += 1
+        progreso['resultados'].append(resultado)
+        guardar_progreso(task_id, progreso)
+        try:
+            self.update_state(state='PROGRESS', meta={'procesados': procesados, 'total': total})
+        except Exception:
+            pass
+
+    try:
+        resumen = terminar_semestres(cursos_ids, finalizar=finalizar, al_avanzar=al_avanzar)
+    except Exception as e:
+        logger.error(f"Error en el cierre de semestres en lote {task_id}: {e}", exc_info=True)
+        progreso.update(estado='error', error=str(e))
+        guardar_progreso(task_id, progreso)
+        raise
+
+    progreso.update(estado='completado', duracion_ms=resumen['duracion_ms'])
+    guardar_progreso(task_id, progreso)
+    return {key: value for key, value in resumen.items() if key != 'resultados'}
@@ -0,0 +1,145 @@
+"""
+Tests del registro de asistencias por sesión y de la matriz de asistencias
+(asistencias_service)
+"""
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from .asistencias_service import MatrizAsistencia, registrar_sesion
+from .models import Asistencia, Curso, CursoAcademico, Matriculas
+
+
+class AsistenciasServiceTest(TestCase):
+    """Tests de registrar_sesion y MatrizAsistencia"""
+
+    def setUp(self):
+        self.profesor = User.objects.create_user(username='profesor', password='testpass123')
+        self.alumnos = [User.objects.create_user(username=f'alumno{i}') for i in range(4)]
+        self.ca = CursoAcademico.objects.create(nombre='2030-2031', activo=True)
+        self.curso = Curso.objects.create(
+            name='Inglés', teacher=self.profesor, curso_academico=self.ca, class_quantity=10
+        )
+        self.matriculas = [
+            Matriculas.objects.create(course=self.curso, student=alumno, curso_academico=self.ca)
+            for alumno in self.alumnos
+        ]
+
+    def _presencias(self, fecha):
+        return dict(
+            Asistencia.objects.filter(course=self.curso, date=fecha).values_list('student__username', 'presente')
+        )
+
+    def test_registrar_sesion_inserta_y_actualiza(self):
+        fecha = date(2030, 3, 2)
+        with self.assertNumQueries(4):  # semestre activo + SAVEPOINT + INSERT + RELEASE
+            registrar_sesion(self.curso, fecha, {alumno.pk: True for alumno in self.alumnos})
+        # Cada registro nuevo queda en el semestre activo del curso
+        self.assertFalse(Asistencia.objects.filter(course=self.curso, semestre__isnull=True).exists())
+
+        registrar_sesion(self.curso, fecha, {self.alumnos[0].pk: False})
+        self.assertEqual(Asistencia.objects.filter(course=self.curso).count(), 4)
+        self.assertEqual(
+            self._presencias(fecha),
+            {'alumno0': False, 'alumno1': True, 'alumno2': True, 'alumno3': True},
+        )
+
+    def test_matriz_totales_y_rachas(self):
+        sesiones = [
+            (date(2030, 3, 2), {0: True, 1: False}),
+            (date(2030, 3, 4), {0: False, 1: False}),
+            (date(2030, 3, 6), {0: False, 1: True}),
+            (date(2030, 3, 9), {0: False}),
+        ]
+        for fecha, presencias in sesiones:
+            registrar_sesion(self.curso, fecha, {self.alumnos[i].pk: p for i, p in presencias.items()})
+
+        ids = [alumno.pk for alumno in self.alumnos]
+        with self.assertNumQueries(1):
+            matriz = MatrizAsistencia.del_curso(self.curso.id, ids)
+        self.assertEqual(len(matriz), 4)
+        self.assertEqual(matriz.fechas, [fecha for fecha, _ in sesiones])
+        self.assertEqual(matriz.marcas(ids[1]), [False, False, True, None])
+        self.assertEqual(matriz.marcas(ids[1], [date(2030, 3, 6), date(2030, 1, 1)]), [True, None])
+
+        self.assertEqual(matriz.resumen(ids[0]), (4, 1, 3, 25.0, 3, 3))
+        # La sesión sin registro no corta la racha ni suma
+        self.assertEqual(matriz.resumen(ids[1]), (3, 1, 2, 33.3, 0, 2))
+        self.assertEqual(matriz.resumen(ids[2]), (0, 0, 0, None, 0, 0))
+        # Un estudiante que no está en la matriz tiene la fila vacía
+        self.assertEqual(matriz.marcas(-1), [None] * 4)
+
+
+class AsistenciasVistasTest(TestCase):
+    """Tests de las vistas de pasar lista y de la tabla de asistencias del curso"""
+
+    def setUp(self):
+        self.profesor = User.objects.create_user(username='profesor', password='testpass123')
+        self.ca = CursoAcademico.objects.create(nombre='2030-2031', activo=True)
+        self.curso = Curso.objects.create(
+            name='Inglés', teacher=self.profesor, curso_academico=self.ca, class_quantity=10
+        )
+        self.client.force_login(self.profesor)
+
+    def _matricular(self, cantidad):
+        alumnos = [User.objects.create_user(username=f'alumno{i}') for i in range(cantidad)]
+        return [
+            Matriculas.objects.create(course=self.curso, student=alumno, curso_academico=self.ca)
+            for alumno in alumnos
+        ]
+
+    def _pasar_lista(self, fecha, ausentes):
+        return self.client.post(
+            reverse('principal:add_asistencias', args=[self.curso.id]),
+            {'date': fecha, **{f'asistencia_{m.id}': m.id for m in ausentes}},
+        )
+
+    def test_pasar_lista_no_depende_del_tamano_de_la_clase(self):
+        matriculas = self._matricular(3)
+        with self.assertNumQueries(9) as pequena:
+            self._pasar_lista('2030-03-02', ausentes=[matriculas[0]])
+        matriculas += [
+            Matriculas.objects.create(
+                course=self.curso, student=User.objects.create_user(username=f'extra{i}'),
+                curso_academico=self.ca,
+            )
+            for i in range(20)
+        ]
+        with self.assertNumQueries(len(pequena)):
+            response = self._pasar_lista('2030-03-03', ausentes=matriculas[:2])
+
+        self.assertRedirects(response, reverse('principal:asistencias', args=[self.curso.id]))
+        self.assertEqual(Asistencia.objects.filter(date=date(2030, 3, 3)).count(), 23)
+        self.assertEqual(Asistencia.objects.filter(date=date(2030, 3, 3), presente=False).count(), 2)
+
+    def test_pasar_lista_dos_veces_actualiza(self):
+        matriculas = self._matricular(2)
+        self._pasar_lista('2030-03-02', ausentes=[matriculas[0]])
+        self._pasar_lista('2030-03-02', ausentes=[matriculas[1]])
+        self.assertEqual(
+            dict(Asistencia.objects.values_list('student_id', 'presente')),
+            {matriculas[0].student_id: True, matriculas[1].student_id: False},
+        )
+
+    def test_tabla_de_asistencias_del_curso(self):
+        matriculas = self._matricular(2)
+        self._pasar_lista('2030-03-02', ausentes=[matriculas[0]])
+        self._pasar_lista('2030-03-04', ausentes=[])
+
+        response = self.client.get(reverse('principal:asistencias', args=[self.curso.id]))
+        self.assertEqual(response.status_code, 200)
+        # Las fechas más recientes primero
+        self.assertEqual(response.context['fechas_asistencia'], [date(2030, 3, 4), date(2030, 3, 2)])
+        self.assertEqual(response.context['asistencias_registradas'], 2)
+        filas = {m.student_id: m for m in response.context['matriculas']}
+        ausente = filas[matriculas[0].student_id]
+        self.assertEqual(ausente.marcas_asistencia, [True, False])
+        self.assertEqual(ausente.resumen_asistencia.porcentaje, 50.0)
+        self.assertContains(response, '✗ Ausente', count=1)
+
+        response = self.client.get(
+            reverse('principal:asistencias', args=[self.curso.id]), {'fecha': '2030-03-02'}
+        )
+        self.assertEqual(response.context['fechas_asistencia'], [date(2030, 3, 2)])
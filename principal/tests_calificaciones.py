@@ -0,0 +1,111 @@
+"""
+Tests de los promedios de Calificaciones y del registro de notas por lotes
+(calificaciones_service)
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from evaluaciones.models import Evaluacion
+from .calificaciones_service import (
+    NotaInvalidaError, promedios_diferidos, recalcular_promedios, registrar_notas,
+)
+from .models import Calificaciones, Curso, CursoAcademico, Matriculas, NotaIndividual
+
+
+class CalificacionesServiceTest(TestCase):
+    """Tests del recálculo agregado de promedios y de registrar_notas"""
+
+    def setUp(self):
+        self.profesor = User.objects.create_user(username='profesor', password='testpass123')
+        self.alumnos = [User.objects.create_user(username=f'alumno{i}') for i in range(4)]
+        self.ca = CursoAcademico.objects.create(nombre='2030-2031', activo=True)
+        self.curso = Curso.objects.create(name='Inglés', teacher=self.profesor, curso_academico=self.ca)
+        for alumno in self.alumnos:
+            Matriculas.objects.create(course=self.curso, student=alumno, curso_academico=self.ca)
+        self.evaluacion = Evaluacion.objects.create(curso=self.curso, titulo='Parcial', tipo='momentanea')
+
+    def _promedios(self):
+        return dict(
+            Calificaciones.objects.filter(course=self.curso).values_list('student__username', 'average')
+        )
+
+    def test_senal_recalcula_con_un_update(self):
+        cal = Calificaciones.objects.create(course=self.curso, student=self.alumnos[0], curso_academico=self.ca)
+        NotaIndividual.objects.create(calificacion=cal, valor=8)
+        with self.assertNumQueries(2):  # INSERT + UPDATE del promedio
+            nota = NotaIndividual.objects.create(calificacion=cal, valor=5)
+        cal.refresh_from_db()
+        self.assertEqual(cal.average, Decimal('6.5'))
+
+        nota.delete()
+        cal.refresh_from_db()
+        self.assertEqual(cal.average, Decimal('8.0'))
+
+    def test_promedios_diferidos_recalcula_al_salir(self):
+        cal = Calificaciones.objects.create(course=self.curso, student=self.alumnos[0], curso_academico=self.ca)
+        with promedios_diferidos():
+            for valor in (10, 6, 8):
+                NotaIndividual.objects.create(calificacion=cal, valor=valor)
+            cal.refresh_from_db()
+            self.assertIsNone(cal.average)
+        cal.refresh_from_db()
+        self.assertEqual(cal.average, Decimal('8.0'))
+
+    def test_registrar_notas_de_la_clase(self):
+        notas = {alumno.pk: 7 + i for i, alumno in enumerate(self.alumnos)}
+        resultado = registrar_notas(self.curso, notas, evaluacion=self.evaluacion)
+
+        self.assertEqual(resultado, {'notas': 4, 'calificaciones_creadas': 4})
+        self.assertEqual(
+            self._promedios(),
+            {'alumno0': Decimal('7.0'), 'alumno1': Decimal('8.0'), 'alumno2': Decimal('9.0'), 'alumno3': Decimal('10.0')},
+        )
+        # Cada calificación queda en el semestre de la matrícula
+        self.assertFalse(Calificaciones.objects.filter(course=self.curso, semestre__isnull=True).exists())
+
+    def test_recalificar_sustituye_la_nota_de_la_evaluacion(self):
+        cal = Calificaciones.objects.create(
+            course=self.curso, student=self.alumnos[0], curso_academico=self.ca,
+            semestre=Matriculas.objects.get(student=self.alumnos[0]).semestre,
+        )
+        NotaIndividual.objects.create(calificacion=cal, valor=4)
+        registrar_notas(self.curso, {self.alumnos[0].pk: 6}, evaluacion=self.evaluacion)
+        registrar_notas(self.curso, {self.alumnos[0].pk: '8,6'}, evaluacion=self.evaluacion)
+
+        self.assertEqual(NotaIndividual.objects.filter(calificacion=cal).count(), 2)
+        cal.refresh_from_db()
+        self.assertEqual(cal.average, Decimal('6.3'))  # (4 + 8.6) / 2
+
+    def test_consultas_no_dependen_del_tamano_de_la_clase(self):
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(8):
+            registrar_notas(self.curso, {alumno.pk: 9 for alumno in self.alumnos}, evaluacion=self.evaluacion)
+
+    def test_nota_invalida_no_guarda_nada(self):
+        with self.assertRaises(NotaInvalidaError):
+            registrar_notas(self.curso, {self.alumnos[0].pk: 9, self.alumnos[1].pk: 11})
+        self.assertFalse(NotaIndividual.objects.exists())
+        self.assertEqual(recalcular_promedios([]), 0)
+
+    def test_calificar_en_lote_vista(self):
+        url = reverse('evaluaciones:calificar_lote', args=[self.evaluacion.pk])
+        self.client.force_login(self.alumnos[0])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.profesor)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        datos = {f'nota_{self.alumnos[0].pk}': '9', f'nota_{self.alumnos[1].pk}': '5.5'}
+        respuesta = self.client.post(url, datos)
+        self.assertRedirects(
+            respuesta, reverse('evaluaciones:intentos_lista', args=[self.evaluacion.pk]),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(
+            self._promedios(), {'alumno0': Decimal('9.0'), 'alumno1': Decimal('5.5')}
+        )
+
+        respuesta = self.client.post(url, {f'nota_{self.alumnos[2].pk}': 'diez'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(NotaIndividual.objects.filter(evaluacion=self.evaluacion).count(), 2)
@@ -0,0 +1,95 @@
+"""
+Tests del modelo de lectura del catálogo de cursos (catalog_service)
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import catalog_service
+from .models import Curso, CursoAcademico, FormularioAplicacion, Matriculas, SolicitudInscripcion
+
+
+class CatalogServiceTest(TestCase):
+    """Tarjetas anotadas, capa por usuario e invalidación por versión"""
+
+    def setUp(self):
+        cache.clear()
+        self.profesor = User.objects.create_user(username='profesor', password='testpass123')
+        self.estudiante = User.objects.create_user(username='estudiante', password='testpass123')
+        self.ca = CursoAcademico.objects.create(nombre='2030-2031', activo=True)
+        self.ingles = Curso.objects.create(name='Inglés', teacher=self.profesor, curso_academico=self.ca)
+        self.frances = Curso.objects.create(name='Francés', teacher=self.profesor, curso_academico=self.ca)
+        self.aleman = Curso.objects.create(name='Alemán', teacher=self.profesor, curso_academico=self.ca)
+        Matriculas.objects.create(course=self.ingles, student=self.estudiante, curso_academico=self.ca)
+
+    def _solicitud(self, curso, estado):
+        formulario = FormularioAplicacion.objects.create(curso=curso, titulo=f'Formulario {curso.name}')
+        return SolicitudInscripcion.objects.create(
+            curso=curso, estudiante=self.estudiante, formulario=formulario,
+            curso_academico=self.ca, estado=estado,
+        )
+
+    def test_tarjetas_en_una_consulta(self):
+        self._solicitud(self.frances, 'pendiente')
+        with self.assertNumQueries(1):
+            cursos = {curso.id: curso for curso in catalog_service.course_cards(self.ca)}
+            self.assertEqual(cursos[self.ingles.id].enrollment_count, 1)
+            self.assertEqual(cursos[self.aleman.id].enrollment_count, 0)
+            self.assertFalse(cursos[self.ingles.id].has_documents)
+            self.assertEqual(cursos[self.frances.id].formulario_aplicacion.titulo, 'Formulario Francés')
+
+    def test_capa_de_usuario(self):
+        self._solicitud(self.frances, 'pendiente')
+        self._solicitud(self.aleman, 'rechazada')
+        cursos = catalog_service.course_cards(self.ca)
+        catalog_service.apply_user_overlay(cursos, self.estudiante)
+        marcas = {
+            curso.id: (curso.is_enrolled, curso.tiene_solicitud_pendiente, curso.tiene_solicitud_rechazada)
+            for curso in cursos
+        }
+        self.assertEqual(marcas[self.ingles.id], (True, False, False))
+        self.assertEqual(marcas[self.frances.id], (False, True, False))
+        self.assertEqual(marcas[self.aleman.id], (False, False, True))
+
+    def test_capa_anonima_sin_consultas(self):
+        from django.contrib.auth.models import AnonymousUser
+
+        cursos = catalog_service.course_cards(self.ca)
+        with self.assertNumQueries(0):
+            catalog_service.apply_user_overlay(cursos, AnonymousUser())
+        self.assertFalse(any(curso.is_enrolled for curso in cursos))
+
+    def test_catalogo_cacheado_e_invalidado_al_confirmar(self):
+        catalog_service.home_catalog()
+        with self.assertNumQueries(0):
+            catalog_service.home_catalog()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Matriculas.objects.create(course=self.frances, student=self.profesor, curso_academico=self.ca)
+        cursos = {curso.id: curso for curso in catalog_service.home_catalog()['cursos']}
+        self.assertEqual(cursos[self.frances.id].enrollment_count, 1)
+
+    def test_home_anonima_servida_desde_cache(self):
+        primera = self.client.get(reverse('principal:home'))
+        self.assertEqual(primera.status_code, 200)
+        with CaptureQueriesContext(connection) as consultas:
+            segunda = self.client.get(reverse('principal:home'))
+        self.assertEqual(segunda.content, primera.content)
+        self.assertFalse(any('principal_curso' in q['sql'] for q in consultas.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aleman.name = 'Alemán avanzado'
+            self.aleman.save()
+        self.assertContains(self.client.get(reverse('principal:home')), 'Alemán avanzado')
+
+    def test_listado_con_usuario(self):
+        self._solicitud(self.frances, 'pendiente')
+        self.client.force_login(self.estudiante)
+        respuesta = self.client.get(reverse('principal:listado_cursos'))
+        self.assertEqual(respuesta.status_code, 200)
+        cursos = {curso.id: curso for curso in respuesta.context['page_obj'].object_list}
+        self.assertTrue(cursos[self.ingles.id].is_enrolled)
+        self.assertTrue(cursos[self.frances.id].tiene_solicitud_pendiente)
@@ -0,0 +1,155 @@
+"""
+Tests para el motor de exportación a Excel en streaming (export_service)
+"""
+import shutil
+import tempfile
+from datetime import date
+from io import BytesIO
+
+import openpyxl
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .export_service import HojaStreaming, crear_libro, guardar_libro
+from .models import (
+    Asistencia, Calificaciones, CursoAcademico, Curso, Matriculas, NotaIndividual,
+)
+
+
+def _leer_respuesta(response):
+    contenido = b''.join(response.streaming_content)
+    return openpyxl.load_workbook(BytesIO(contenido))
+
+
+class HojaStreamingTest(TestCase):
+    """Tests de la hoja write-only con anchos estimados por muestreo"""
+
+    def test_anchos_estimados_desde_la_muestra(self):
+        wb = crear_libro()
+        hoja = HojaStreaming(wb, 'Datos', ['A', 'B'], anchos_minimos={2: 20}, muestra=2)
+        hoja.append(['x' * 30, 'corto'])
+        hoja.append(['y', 'z'])
+        # Filas posteriores a la muestra no cambian el ancho
+        hoja.append(['w' * 100, 'z'])
+        hoja.cerrar()
+
+        libro = openpyxl.load_workbook(guardar_libro(wb))
+        ws = libro['Datos']
+        self.assertEqual(ws.column_dimensions['A'].width, 32)
+        self.assertEqual(ws.column_dimensions['B'].width, 20)
+        self.assertEqual(ws.max_row, 4)
+
+    def test_estilos_con_nombre_y_titulo_combinado(self):
+        wb = crear_libro()
+        hoja = HojaStreaming(wb, 'Datos', ['A', 'B', 'C'], titulo='Reporte', freeze_panes='A3')
+        hoja.append([('ok', 'ok'), 1, 2])
+        hoja.cerrar()
+
+        ws = openpyxl.load_workbook(guardar_libro(wb))['Datos']
+        self.assertEqual(ws['A1'].value, 'Reporte')
+        self.assertIn('A1:C1', [str(r) for r in ws.merged_cells.ranges])
+        self.assertEqual(ws['A2'].style, 'encabezado')
+        self.assertEqual(ws['A3'].style, 'ok')
+        self.assertEqual(ws.freeze_panes, 'A3')
+
+
+class ExportacionesExcelTest(TestCase):
+    """Tests de las vistas de exportación de matrículas, calificaciones y asistencias"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Los reportes se guardan en REPORTES_ROOT (ver reportes_service)
+        cls.media_root = tempfile.mkdtemp()
+        cls._media = override_settings(REPORTES_ROOT=cls.media_root)
+        cls._media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='secretaria', password='testpass123')
+        self.profesor = User.objects.create_user(username='profesor', password='testpass123')
+        self.ca = CursoAcademico.objects.create(nombre='2030-2031', activo=True)
+        self.curso_a = Curso.objects.create(name='Inglés', teacher=self.profesor, curso_academico=self.ca)
+        self.curso_b = Curso.objects.create(name='Francés', teacher=self.profesor, curso_academico=self.ca)
+        self.alumnos = [
+            User.objects.create_user(username=f'alumno{i}', first_name=f'Nombre{i}', last_name='Apellido')
+            for i in range(3)
+        ]
+        for alumno in self.alumnos:
+            Matriculas.objects.create(course=self.curso_a, student=alumno, curso_academico=self.ca)
+        Matriculas.objects.create(course=self.curso_b, student=self.alumnos[0], curso_academico=self.ca)
+        self.client.force_login(self.admin)
+
+    def test_export_matriculas_una_hoja_por_curso(self):
+        response = self.client.get(reverse('principal:export_matriculas_excel'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('matriculas.xlsx', response['Content-Disposition'])
+        libro = _leer_respuesta(response)
+        self.assertEqual(libro.sheetnames, ['Francés', 'Inglés'])
+        ws = libro['Inglés']
+        self.assertEqual(ws['A1'].value, 'Matrículas — Inglés')
+        self.assertEqual(ws['D2'].value, 'Estado')
+        self.assertEqual(ws['A3'].value, 'Nombre0 Apellido')
+        self.assertEqual(ws['D3'].value, 'Activo')
+        self.assertEqual(ws.max_row, 5)
+
+    def test_export_matriculas_sin_datos(self):
+        response = self.client.get(reverse('principal:export_matriculas_excel'), {'estado': 'A'})
+        libro = _leer_respuesta(response)
+        self.assertEqual(libro.sheetnames, ['Sin datos'])
+
+    def test_export_calificaciones_con_notas(self):
+        cal = Calificaciones.objects.create(
+            course=self.curso_a, student=self.alumnos[0], curso_academico=self.ca
+        )
+        NotaIndividual.objects.create(calificacion=cal, valor=8)
+        NotaIndividual.objects.create(calificacion=cal, valor=4)
+        Calificaciones.objects.create(course=self.curso_a, student=self.alumnos[1], curso_academico=self.ca)
+
+        response = self.client.get(reverse('principal:export_calificaciones_excel'))
+        ws = _leer_respuesta(response)['Inglés']
+        self.assertEqual([c.value for c in ws[2]], ['Estudiante', 'Curso Académico', 'Nota 1', 'Nota 2', 'Promedio'])
+        self.assertEqual([c.value for c in ws[3]][2:], [8, 4, 6])
+        self.assertEqual(ws['C3'].style, 'ok')
+        self.assertEqual(ws['D3'].style, 'mal')
+        self.assertEqual([c.value for c in ws[4]][2:], ['—', '—', 'N/A'])
+
+    def test_export_asistencias_porcentajes(self):
+        Asistencia.objects.create(course=self.curso_a, student=self.alumnos[0], date=date(2030, 1, 1), presente=True)
+        Asistencia.objects.create(course=self.curso_a, student=self.alumnos[0], date=date(2030, 1, 2), presente=False)
+        Asistencia.objects.create(course=self.curso_a, student=self.alumnos[1], date=date(2030, 1, 1), presente=True)
+
+        response = self.client.get(
+            reverse('principal:export_asistencias_excel'), {'curso': self.curso_a.id}
+        )
+        ws = _leer_respuesta(response)['Inglés']
+        self.assertEqual([c.value for c in ws[2]][4:], ['01/01/2030', '02/01/2030', '% Asistencia'])
+        self.assertEqual([c.value for c in ws[3]][1:], [2, 1, 1, '✓', '✗', '50.0%'])
+        self.assertEqual([c.value for c in ws[4]][1:], [2, 1, 1, '✓', '—', '50.0%'])
+        self.assertEqual([c.value for c in ws[5]][1:], [2, 0, 2, '—', '—', '0.0%'])
+
+    def test_generate_excel_curso_academico(self):
+        from .views import generate_excel
+
+        cal = Calificaciones.objects.create(
+            course=self.curso_a, student=self.alumnos[0], curso_academico=self.ca
+        )
+        NotaIndividual.objects.create(calificacion=cal, valor=9)
+        libro = openpyxl.load_workbook(generate_excel({
+            'curso_academico': self.ca,
+            'cursos': Curso.objects.all(),
+            'matriculas': Matriculas.objects.filter(course=self.curso_b),
+            'calificaciones': Calificaciones.objects.all(),
+            'asistencias': Asistencia.objects.none(),
+        }))
+        self.assertEqual(
+            libro.sheetnames, ['Información General', 'Matrículas', 'Cursos', 'Calificaciones']
+        )
+        self.assertEqual(libro['Matrículas'].max_row, 2)
+        self.assertEqual([c.value for c in libro['Calificaciones'][2]][2:], [9, 9])
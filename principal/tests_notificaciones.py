@@ -0,0 +1,132 @@
+"""
+Tests para el envío de notificaciones por lotes (notificaciones_service)
+"""
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from course_documents.models import AuditLog, CourseDocument, DocumentFolder
+from course_documents.services import NotificationService
+from evaluaciones.models import Evaluacion
+from .models import Curso, CursoAcademico, Matriculas
+from . import notificaciones_service
+
+
+class NotificacionesPorLotesTest(TestCase):
+    """Tests de la evaluación publicada y del documento nuevo"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls._media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.ca = CursoAcademico.objects.create(nombre='2032-2033', activo=True)
+        self.profesor = User.objects.create_user(username='profesor_notif', email='prof@test.com')
+        self.curso = Curso.objects.create(name='Alemán', teacher=self.profesor, curso_academico=self.ca)
+        self.alumnos = [
+            User.objects.create_user(
+                username=f'alumno_notif{i}', email=f'alumno{i}@test.com',
+                first_name=f'Ana <{i}>', last_name='Pérez',
+            )
+            for i in range(3)
+        ]
+        for alumno in self.alumnos:
+            Matriculas.objects.create(course=self.curso, student=alumno, curso_academico=self.ca, activo=True)
+        sin_email = User.objects.create_user(username='alumno_sin_email')
+        Matriculas.objects.create(course=self.curso, student=sin_email, curso_academico=self.ca, activo=True)
+
+        lote = mock.patch.object(notificaciones_service, 'TAMANO_LOTE', 2)
+        lote.start()
+        self.addCleanup(lote.stop)
+
+    def test_evaluacion_publicada_se_envia_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Evaluacion.objects.create(curso=self.curso, titulo='Parcial 1', estado='publicada')
+        # La petición del profesor no envía nada: solo programa la tarea
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(len(callbacks), 1)
+
+        with mock.patch(
+            'principal.notificaciones_service.render_to_string', wraps=notificaciones_service.render_to_string
+        ) as render:
+            callbacks[0]()
+
+        # Dos lotes (2 + 1 estudiantes), plantillas txt y html una vez por lote
+        self.assertEqual(render.call_count, 4)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [a.email for a in self.alumnos])
+        mensaje = next(m for m in mail.outbox if m.to == ['alumno0@test.com'])
+        self.assertIn('Ana <0> Pérez', mensaje.body)
+        self.assertIn('Ana &lt;0&gt; Pérez', mensaje.alternatives[0][0])
+        self.assertNotIn(notificaciones_service.MARCADOR_NOMBRE, mensaje.body)
+
+    def test_sin_broker_se_envia_en_linea(self):
+        from celery.app.task import Task
+
+        with mock.patch.object(Task, 'apply_async', side_effect=OSError('broker caído')):
+            with self.captureOnCommitCallbacks(execute=True):
+                Evaluacion.objects.create(curso=self.curso, titulo='Parcial 2', estado='publicada')
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [a.email for a in self.alumnos])
+
+    def test_borrador_no_notifica(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Evaluacion.objects.create(curso=self.curso, titulo='Borrador')
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_documento_nuevo_reintenta_solo_fallidos(self):
+        folder = DocumentFolder.objects.create(curso=self.curso, name='Guías', created_by=self.profesor)
+        backend = mail.get_connection()
+        enviar = backend.send_messages
+
+        def send_messages(mensajes):
+            if mensajes[0].to == ['alumno1@test.com']:
+                raise OSError('Buzón no disponible')
+            return enviar(mensajes)
+
+        with mock.patch('principal.notificaciones_service.get_connection', return_value=backend), \
+                mock.patch.object(backend, 'send_messages', side_effect=send_messages) as envios:
+            with self.captureOnCommitCallbacks(execute=True):
+                document = CourseDocument.objects.create(
+                    folder=folder, name='Guía 1', uploaded_by=self.profesor,
+                    file=SimpleUploadedFile('guia.txt', b'contenido'),
+                )
+        self.addCleanup(document.file.delete, False)
+
+        # 3 envíos iniciales + 2 reintentos del que falla
+        self.assertEqual(envios.call_count, 5)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(AuditLog.objects.filter(action='email_sent', document=document).count(), 2)
+        errores = AuditLog.objects.filter(action='email_error', document=document)
+        self.assertEqual(errores.count(), notificaciones_service.MAX_INTENTOS)
+        self.assertEqual(set(errores.values_list('user_id', flat=True)), {self.alumnos[1].id})
+        self.assertTrue(errores.filter(details__contains='intento 3').exists())
+        self.assertEqual(
+            AuditLog.objects.filter(action='notification_batch_sent', document=document).count(), 4
+        )
+
+    def test_reintento_manual_solo_pendientes(self):
+        folder = DocumentFolder.objects.create(curso=self.curso, name='Guías', created_by=self.profesor)
+        document = CourseDocument.objects.create(
+            folder=folder, name='Guía 2', uploaded_by=self.profesor,
+            file=SimpleUploadedFile('guia2.txt', b'contenido'),
+        )
+        self.addCleanup(document.file.delete, False)
+        for alumno, accion in ((self.alumnos[0], 'email_error'), (self.alumnos[1], 'email_error'),
+                               (self.alumnos[1], 'email_sent')):
+            AuditLog.objects.create(user=alumno, action=accion, curso=self.curso, document=document)
+
+        self.assertEqual(NotificationService.retry_failed_notifications(), 1)
+        self.assertEqual([m.to for m in mail.outbox], [['alumno0@test.com']])
@@ -0,0 +1,208 @@
+"""
+Tests para la cola de reportes en segundo plano (reportes_service)
+"""
+import os
+import shutil
+import tempfile
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import reportes_service
+from .asistencias_service import registrar_sesion
+from .calificaciones_service import registrar_notas
+from .models import CursoAcademico, Curso, Matriculas, ReporteGenerado
+from .reportes_service import (
+    calcular_cache_key, ejecutar_reporte, estadisticas_reportes,
+    limpiar_reportes_antiguos, registrar_reporte, solicitar_reporte,
+)
+
+
+@registrar_reporte('prueba_reutilizable', content_type='text/plain', extension='txt', reutilizable=True)
+def _reporte_prueba_reutilizable(parametros):
+    return f"version {parametros.get('version')}".encode(), 'prueba.txt'
+
+
+class ReportesServiceTest(TestCase):
+    """Tests del ciclo de vida de ReporteGenerado y de la caché de artefactos"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.reportes_root = tempfile.mkdtemp()
+        cls._media = override_settings(MEDIA_ROOT=cls.media_root, REPORTES_ROOT=cls.reportes_root)
+        cls._media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        shutil.rmtree(cls.reportes_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='secretaria', password='testpass123')
+        self.otro = User.objects.create_user(username='otro', password='testpass123')
+        self.ca = CursoAcademico.objects.create(nombre='2030-2031', activo=True)
+        self.curso = Curso.objects.create(name='Inglés', teacher=self.usuario, curso_academico=self.ca)
+        Matriculas.objects.create(course=self.curso, student=self.otro, curso_academico=self.ca)
+
+    def test_cache_key_independiente_del_orden(self):
+        self.assertEqual(
+            calcular_cache_key('matriculas_excel', {'curso': '1', 'estado': 'A'}),
+            calcular_cache_key('matriculas_excel', {'estado': 'A', 'curso': '1'}),
+        )
+        self.assertNotEqual(
+            calcular_cache_key('matriculas_excel', {'curso': '1'}),
+            calcular_cache_key('calificaciones_excel', {'curso': '1'}),
+        )
+
+    def test_solicitud_identica_se_sirve_desde_cache(self):
+        primero = solicitar_reporte('prueba_reutilizable', {'version': 1}, self.usuario)
+        self.assertTrue(primero.listo)
+        self.assertFalse(primero.desde_cache)
+        self.assertIsNotNone(primero.duracion_ms)
+
+        with mock.patch('principal.tasks.generar_reporte.apply_async') as encolar:
+            segundo = solicitar_reporte('prueba_reutilizable', {'version': 1}, self.otro)
+        encolar.assert_not_called()
+        self.assertTrue(segundo.listo)
+        self.assertTrue(segundo.desde_cache)
+        self.assertEqual(segundo.archivo.name, primero.archivo.name)
+
+        # Otra versión de los datos es otra cache_key
+        tercero = solicitar_reporte('prueba_reutilizable', {'version': 2}, self.usuario)
+        self.assertFalse(tercero.desde_cache)
+
+    def test_reportes_de_datos_se_invalidan_al_cambiar_el_curso(self):
+        otro_curso = Curso.objects.create(name='Francés', teacher=self.usuario, curso_academico=self.ca)
+        filtros = {'curso': str(self.curso.id)}
+        primero = solicitar_reporte('matriculas_excel', filtros, self.usuario)
+        del_otro = solicitar_reporte('matriculas_excel', {'curso': str(otro_curso.id)}, self.usuario)
+        todos = solicitar_reporte('matriculas_excel', {}, self.usuario)
+        self.assertTrue(solicitar_reporte('matriculas_excel', filtros, self.usuario).desde_cache)
+
+        # Pasar lista (bulk_create, sin señales) cambia la versión del curso al confirmar
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_sesion(self.curso, date(2030, 10, 1), {self.otro.id: True})
+        segundo = solicitar_reporte('matriculas_excel', filtros, self.usuario)
+        self.assertFalse(segundo.desde_cache)
+        self.assertNotEqual(segundo.archivo.name, primero.archivo.name)
+        self.assertNotEqual(segundo.cache_key, primero.cache_key)
+
+        # Los reportes de otros cursos se siguen reutilizando; los globales no
+        tercero = solicitar_reporte('matriculas_excel', {'curso': str(otro_curso.id)}, self.usuario)
+        self.assertEqual(tercero.cache_key, del_otro.cache_key)
+        self.assertTrue(tercero.desde_cache)
+        self.assertNotEqual(solicitar_reporte('matriculas_excel', {}, self.usuario).cache_key, todos.cache_key)
+
+    def test_notas_nuevas_cambian_la_version_del_curso(self):
+        version = reportes_service.version_datos({'course_id': self.curso.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_notas(self.curso, {self.otro.id: '8'})
+        self.assertNotEqual(reportes_service.version_datos({'course_id': self.curso.id}), version)
+
+    def test_version_de_datos_sobrevive_al_desalojo(self):
+        version = reportes_service.version_datos({'course_id': self.curso.id})
+        cache.delete(reportes_service.VERSION_DATOS_KEY.format(f'curso:{self.curso.id}'))
+        self.assertNotEqual(reportes_service.version_datos({'course_id': self.curso.id}), version)
+
+    def test_archivo_privado_con_nombre_aleatorio(self):
+        reporte = solicitar_reporte('matriculas_excel', {}, self.usuario)
+        ruta = reporte.archivo.path
+        self.assertTrue(ruta.startswith(os.path.realpath(self.reportes_root) + os.sep))
+        self.assertNotIn(reporte.cache_key, reporte.archivo.name)
+        self.assertEqual(os.listdir(self.media_root), [])
+        # Sin URL pública: solo la vista de descarga autorizada lo sirve
+        with self.assertRaises(ValueError):
+            reporte.archivo.url
+
+    @override_settings(REPORTES_X_ACCEL_REDIRECT_PREFIX='/protected-reportes/')
+    def test_descarga_delegada_en_nginx(self):
+        reporte = solicitar_reporte('matriculas_excel', {}, self.usuario)
+        self.client.force_login(self.usuario)
+        response = self.client.get(reverse('principal:descargar_reporte', args=[reporte.id]))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-reportes/' + reporte.archivo.name)
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+        self.assertEqual(response.content, b'')
+
+    def test_cola_no_disponible_genera_en_linea(self):
+        with mock.patch('principal.tasks.generar_reporte.apply_async', side_effect=OSError('broker')):
+            reporte = solicitar_reporte('matriculas_excel', {}, self.usuario)
+        self.assertEqual(reporte.estado, ReporteGenerado.ESTADO_COMPLETADO)
+
+    def test_error_de_render_queda_registrado(self):
+        reporte = ReporteGenerado.objects.create(
+            tipo='calificacion_pdf', parametros={'student_id': 0, 'course_id': 0},
+            cache_key=calcular_cache_key('calificacion_pdf', {'student_id': 0, 'course_id': 0}),
+        )
+        ejecutar_reporte(reporte)
+        reporte.refresh_from_db()
+        self.assertEqual(reporte.estado, ReporteGenerado.ESTADO_ERROR)
+        self.assertTrue(reporte.error)
+        self.assertEqual(estadisticas_reportes()[0]['errores'], 1)
+
+    def test_admin_muestra_trabajos_en_cola_y_en_proceso(self):
+        for estado in (ReporteGenerado.ESTADO_PENDIENTE, ReporteGenerado.ESTADO_PENDIENTE,
+                       ReporteGenerado.ESTADO_PROCESANDO):
+            ReporteGenerado.objects.create(tipo='matriculas_excel', estado=estado, cache_key='x')
+        fila = estadisticas_reportes()[0]
+        self.assertEqual((fila['en_cola'], fila['en_proceso']), (2, 1))
+
+        admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:principal_reportegenerado_changelist'))
+        self.assertContains(response, 'En proceso')
+
+    def test_limpieza_conserva_archivos_en_uso(self):
+        primero = solicitar_reporte('prueba_reutilizable', {}, self.usuario)
+        segundo = solicitar_reporte('prueba_reutilizable', {}, self.usuario)
+        nombre = primero.archivo.name
+        ReporteGenerado.objects.filter(pk=primero.pk).update(
+            fecha_creacion=primero.fecha_creacion - reportes_service.timedelta(days=2)
+        )
+        resultado = limpiar_reportes_antiguos()
+        self.assertEqual(resultado['reportes_eliminados'], 1)
+        self.assertEqual(resultado['archivos_eliminados'], 0)
+        self.assertTrue(segundo.archivo.storage.exists(nombre))
+
+        ReporteGenerado.objects.update(
+            fecha_creacion=primero.fecha_creacion - reportes_service.timedelta(days=2)
+        )
+        self.assertEqual(limpiar_reportes_antiguos()['archivos_eliminados'], 1)
+        self.assertFalse(segundo.archivo.storage.exists(nombre))
+
+    def test_vista_muestra_espera_y_endpoints_de_estado(self):
+        self.client.force_login(self.usuario)
+        with mock.patch('principal.tasks.generar_reporte.apply_async') as encolar:
+            encolar.return_value.id = 'tarea-1'
+            response = self.client.get(reverse('principal:export_matriculas_excel'))
+        self.assertTemplateUsed(response, 'reportes/reporte_en_proceso.html')
+        reporte = ReporteGenerado.objects.get()
+        self.assertEqual(reporte.task_id, 'tarea-1')
+
+        estado = self.client.get(reverse('principal:estado_reporte', args=[reporte.id])).json()
+        self.assertEqual(estado['estado'], ReporteGenerado.ESTADO_PENDIENTE)
+        self.assertIsNone(estado['url_descarga'])
+
+        ejecutar_reporte(reporte)
+        estado = self.client.get(reverse('principal:estado_reporte', args=[reporte.id])).json()
+        self.assertTrue(estado['listo'])
+        response = self.client.get(estado['url_descarga'])
+        self.assertIn('matriculas.xlsx', response['Content-Disposition'])
+
+    def test_descarga_restringida_al_solicitante(self):
+        reporte = solicitar_reporte('matriculas_excel', {}, self.usuario)
+        url = reverse('principal:descargar_reporte', args=[reporte.id])
+
+        self.client.force_login(self.otro)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        grupo, _ = Group.objects.get_or_create(name='Secretaría')
+        self.otro.groups.add(grupo)
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,216 @@
+"""
+Tests para el cierre de semestre por lotes (semestre_service)
+"""
+import json
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django.urls import reverse
+
+from datos_archivados.models import (
+    AsistenciaArchivada, CalificacionArchivada, MatriculaArchivada,
+    NotaIndividualArchivada, SemestreCursoArchivado, UsuarioArchivado,
+)
+from .models import (
+    Asistencia, Calificaciones, Curso, CursoAcademico, FormularioAplicacion, Matriculas,
+    NotaIndividual, SemestreCurso, SolicitudInscripcion,
+)
+from .semestre_service import SemestreError, terminar_semestre, terminar_semestres
+
+
+class TerminarSemestreTest(TestCase):
+    """Tests del archivado de un semestre y del cierre de varios cursos"""
+
+    def setUp(self):
+        self.ca = CursoAcademico.objects.create(nombre='2030-2031', activo=True)
+        self.profesor = User.objects.create_user(username='profesor')
+        self.alumnos = [User.objects.create_user(username=f'alumno{i}') for i in range(3)]
+        self.cursos = [
+            Curso.objects.create(name=nombre, teacher=self.profesor, curso_academico=self.ca)
+            for nombre in ('Inglés', 'Francés')
+        ]
+        for curso in self.cursos:
+            semestre = SemestreCurso.objects.get(curso=curso, activo=True)
+            for i, alumno in enumerate(self.alumnos):
+                matricula = Matriculas.objects.create(
+                    course=curso, student=alumno, curso_academico=self.ca, semestre=semestre
+                )
+                cal = Calificaciones.objects.create(
+                    matricula=matricula if i else None, course=curso, student=alumno,
+                    curso_academico=self.ca, semestre=semestre,
+                )
+                NotaIndividual.objects.create(calificacion=cal, valor=9)
+                Asistencia.objects.create(
+                    course=curso, student=alumno, date=date(2030, 2, 1), presente=True, semestre=semestre
+                )
+            formulario = FormularioAplicacion.objects.get_or_create(curso=curso, defaults={'titulo': 'Aplicación'})[0]
+            SolicitudInscripcion.objects.create(curso=curso, estudiante=self.alumnos[0], formulario=formulario)
+
+    def test_archiva_y_reinicia_el_curso(self):
+        curso = self.cursos[0]
+        semestre = SemestreCurso.objects.get(curso=curso, activo=True)
+
+        contadores = terminar_semestre(curso, batch_size=2)
+
+        self.assertEqual(contadores['semestre_num'], 1)
+        self.assertEqual(contadores['matriculas'], 3)
+        self.assertEqual(contadores['calificaciones'], 3)
+        self.assertEqual(contadores['notas'], 3)
+        self.assertEqual(contadores['asistencias'], 3)
+        self.assertEqual(contadores['usuarios'], 3)
+        self.assertIn('limpieza', contadores['tiempos_ms'])
+
+        semestre_archivado = SemestreCursoArchivado.objects.get(id_original=semestre.pk)
+        self.assertEqual(
+            MatriculaArchivada.objects.filter(semestre_archivado=semestre_archivado).count(), 3
+        )
+        self.assertTrue(MatriculaArchivada.objects.filter(id_original__lt=0, estado='P').exists())
+        self.assertEqual(
+            CalificacionArchivada.objects.filter(semestre_archivado=semestre_archivado).count(), 3
+        )
+        self.assertEqual(NotaIndividualArchivada.objects.count(), 3)
+        self.assertEqual(AsistenciaArchivada.objects.count(), 3)
+
+        self.assertFalse(Matriculas.objects.filter(course=curso).exists())
+        self.assertFalse(NotaIndividual.objects.filter(calificacion__course=curso).exists())
+        self.assertFalse(SolicitudInscripcion.objects.filter(curso=curso).exists())
+        self.assertTrue(Matriculas.objects.filter(course=self.cursos[1]).exists())
+
+        nuevo = SemestreCurso.objects.get(curso=curso, activo=True)
+        self.assertEqual(nuevo.numero_semestre, 2)
+        self.assertEqual(nuevo.curso_academico, self.ca)
+        curso.refresh_from_db()
+        self.assertEqual(curso.status, 'I')
+        self.assertEqual(curso.semestre_activo_numero, 2)
+
+        with self.assertRaises(SemestreError):
+            SemestreCursoArchivado.objects.filter(pk=semestre_archivado.pk).update(id_original=nuevo.pk)
+            terminar_semestre(curso)
+
+    def test_revertir_restaura_el_semestre_activo(self):
+        curso = self.cursos[0]
+        terminar_semestre(curso)
+        semestre_archivado = SemestreCursoArchivado.objects.get(curso_archivado__id_original=curso.pk)
+        secretaria = User.objects.create_user(username='secretaria')
+        secretaria.groups.add(Group.objects.get_or_create(name='Secretaría')[0])
+        self.client.force_login(secretaria)
+
+        response = self.client.post(
+            reverse('principal:revertir_semestre', args=[curso.pk]),
+            json.dumps({'semestre_archivado_id': semestre_archivado.pk}),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(SemestreCurso.objects.get(curso=curso, activo=True).numero_semestre, 1)
+        curso.refresh_from_db()
+        self.assertEqual(curso.semestre_activo_numero, 1)
+
+    def test_lote_reutiliza_usuarios_y_aisla_fallos(self):
+        progreso = []
+        resumen = terminar_semestres(
+            [self.cursos[0].pk, 999999, self.cursos[1].pk], finalizar=True,
+            al_avanzar=lambda procesados, total, resultado: progreso.append((procesados, total)),
+        )
+
+        self.assertEqual(resumen['total'], 3)
+        self.assertEqual(resumen['completados'], 2)
+        self.assertEqual(resumen['fallidos'], 1)
+        self.assertEqual(progreso, [(1, 3), (2, 3), (3, 3)])
+        self.assertEqual(resumen['resultados'][0]['contadores']['usuarios'], 3)
+        self.assertEqual(resumen['resultados'][2]['contadores']['usuarios'], 0)
+        self.assertFalse(resumen['resultados'][1]['success'])
+        self.assertEqual(UsuarioArchivado.objects.count(), 3)
+        self.assertEqual(Curso.objects.filter(status='F').count(), 2)
+
+    def test_fallo_de_un_curso_revierte_solo_ese_curso(self):
+        with mock.patch(
+            'principal.models.Asistencia.objects.filter', side_effect=RuntimeError('fallo')
+        ):
+            with self.assertRaises(SemestreError):
+                terminar_semestre(self.cursos[0])
+        self.assertEqual(Matriculas.objects.filter(course=self.cursos[0]).count(), 3)
+        self.assertFalse(SemestreCursoArchivado.objects.exists())
+        self.assertFalse(UsuarioArchivado.objects.exists())
+
+    def test_vista_en_lote_encola_y_publica_progreso(self):
+        secretaria = User.objects.create_user(username='secretaria')
+        secretaria.groups.add(Group.objects.get_or_create(name='Secretaría')[0])
+        self.client.force_login(secretaria)
+
+        response = self.client.post(
+            reverse('principal:terminar_semestres_lote'),
+            data=json.dumps({'cursos': [c.pk for c in self.cursos]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        estado = self.client.get(response.json()['url_estado']).json()
+        self.assertEqual(estado['estado'], 'completado')
+        self.assertEqual(estado['completados'], 2)
+        self.assertEqual(len(estado['resultados']), 2)
+
+        self.client.force_login(self.profesor)
+        response = self.client.post(
+            reverse('principal:terminar_semestres_lote'),
+            data=json.dumps({'cursos': [self.cursos[0].pk]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class EstadoMaterializadoTest(TestCase):
+    """Tests de las columnas materializadas status y semestre_activo_numero de Curso"""
+
+    def setUp(self):
+        self.ca = CursoAcademico.objects.create(nombre='2030-2031', activo=True)
+        self.profesor = User.objects.create_user(username='profesor')
+        self.curso = Curso.objects.create(name='Inglés', teacher=self.profesor, curso_academico=self.ca)
+
+    def test_semestre_activo_se_mantiene_con_las_senales(self):
+        self.assertEqual(self.curso.semestre_activo_numero, 1)
+        SemestreCurso.objects.filter(curso=self.curso).update(activo=False)
+        SemestreCurso.objects.create(curso=self.curso, numero_semestre=2, activo=True)
+        self.curso.refresh_from_db()
+        self.assertEqual(self.curso.semestre_activo_numero, 2)
+
+        SemestreCurso.objects.get(curso=self.curso, numero_semestre=2).delete()
+        self.curso.refresh_from_db()
+        self.assertEqual(self.curso.semestre_activo_numero, 1)
+
+    def test_save_guarda_el_estado_efectivo(self):
+        hoy = date.today()
+        self.curso.enrollment_deadline = hoy - timedelta(days=1)
+        self.curso.save()
+        self.assertEqual(Curso.objects.get(pk=self.curso.pk).status, 'IT')
+
+    def test_refresco_por_conjunto_coincide_con_get_dynamic_status(self):
+        hoy = date(2030, 3, 10)
+        casos = [
+            ('I', None, None),
+            ('I', hoy - timedelta(days=1), None),
+            ('I', hoy, None),
+            ('IT', hoy + timedelta(days=1), None),
+            ('IT', hoy - timedelta(days=5), hoy + timedelta(days=5)),
+            ('I', hoy - timedelta(days=5), hoy),
+            ('IT', None, hoy - timedelta(days=1)),
+            ('F', hoy - timedelta(days=5), hoy - timedelta(days=1)),
+        ]
+        ids = []
+        for status, limite, inicio in casos:
+            curso = Curso.objects.create(name='Curso', teacher=self.profesor, curso_academico=self.ca)
+            Curso.objects.filter(pk=curso.pk).update(status=status, enrollment_deadline=limite, start_date=inicio)
+            ids.append(curso.pk)
+
+        with mock.patch('principal.models.date') as fecha:
+            fecha.today.return_value = hoy
+            esperados = [c.get_dynamic_status() for c in Curso.objects.filter(pk__in=ids).order_by('pk')]
+            with self.captureOnCommitCallbacks(execute=True):
+                actualizados = Curso.objects.filter(pk__in=ids).refresh_dynamic_status()
+
+        self.assertEqual(
+            list(Curso.objects.filter(pk__in=ids).order_by('pk').values_list('status', flat=True)), esperados
+        )
+        self.assertEqual(actualizados, sum(1 for (s, _, _), e in zip(casos, esperados) if s != e))
+        self.assertEqual(Curso.objects.filter(pk__in=ids).refresh_dynamic_status(hoy), 0)
@@ -56,6 +56,8 @@ urlpatterns = [
     path('matriculas/<int:matricula_id>/cambiar-estado/', views.cambiar_estado_matricula, name='cambiar_estado_matricula'),
     
     path('export-usuarios-excel/', views.export_usuarios_excel, name='export_usuarios_excel'),
+    path('reportes/<int:pk>/estado/', views.estado_reporte, name='estado_reporte'),
+    path('reportes/<int:pk>/descargar/', views.descargar_reporte, name='descargar_reporte'),
     path('verify_email/', views.verify_email, name='verify_email'),
     
     # Rutas para el sistema de formularios de aplicación a cursos
@@ -124,6 +126,8 @@ urlpatterns = [
 
     # Endpoint AJAX: Terminar Semestre
     path('cursos/<int:curso_id>/terminar-semestre/', views.terminar_semestre_view, name='terminar_semestre'),
+    path('cursos/terminar-semestre/lote/', views.terminar_semestres_lote_view, name='terminar_semestres_lote'),
+    path('cursos/terminar-semestre/lote/<str:task_id>/', views.estado_terminar_semestres_view, name='estado_terminar_semestres'),
 
     # Endpoint AJAX: Revertir Semestre
     path('cursos/<int:curso_id>/revertir-semestre/', views.revertir_semestre_view, name='revertir_semestre'),
@@ -2,6 +2,7 @@
 Utilidades para la gestión de grupos y permisos
 """
 from django.contrib.auth.models import Group, User
+from security.authorization.auth_profile import get_auth_profile
 from .config_grupos import GRUPOS_SISTEMA, obtener_nombres_grupos
 import logging
 
@@ -64,7 +65,7 @@ def es_miembro_de_grupo(usuario, nombre_grupo):
         except User.DoesNotExist:
             return False
     
-    return usuario.groups.filter(name=nombre_grupo).exists()
+    return get_auth_profile(usuario).in_group(nombre_grupo)
 
 def obtener_grupos_usuario(usuario):
     """
@@ -76,7 +77,7 @@ def obtener_grupos_usuario(usuario):
         except User.DoesNotExist:
             return []
     
-    return list(usuario.groups.values_list('name', flat=True))
+    return list(get_auth_profile(usuario).group_names)
 
 def configurar_usuario_inicial(username, email, password, grupos=None):
     """
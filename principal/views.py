@@ -22,18 +22,21 @@ from .forms import (
     ReglamentoGeneralForm, ArticuloReglamentoGeneralFormSet,
 )
 from django.contrib.auth.models import Group, User
-from django.db.models import Q, Max, Case, When, IntegerField
+from django.db import transaction
+from django.db.models import Q, Max, Count, Case, When, IntegerField, QuerySet
 from datetime import date, datetime
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.core.paginator import Paginator
 from django.template.loader import get_template
 from xhtml2pdf import pisa
 from io import BytesIO
+from collections import defaultdict
+from itertools import chain, groupby
+from operator import itemgetter
 import openpyxl
 import unicodedata
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from accounts.models import Registro
-from blog.models import Noticia, Categoria
 try:
     from course_documents.indicator_service import ContentIndicatorService
 except ImportError:
@@ -42,9 +45,16 @@ from .models import (
     CursoAcademico, Curso, Matriculas, Calificaciones, Asistencia,
     FormularioAplicacion, PreguntaFormulario, OpcionRespuesta, SolicitudInscripcion, RespuestaEstudiante, NotaIndividual,
     ReglamentoCurso, ArticuloReglamento,
-    ReglamentoGeneral, ArticuloReglamentoGeneral,
+    ReglamentoGeneral, ArticuloReglamentoGeneral, ReporteGenerado,
 )
-from course_documents.mixins import DocumentsProfileMixin, DocumentsCourseMixin
+from .export_service import (
+    EXPORT_CHUNK_SIZE, XLSX_CONTENT_TYPE, HojaStreaming, crear_libro,
+    guardar_libro, iterar_filas, nombre_completo,
+)
+from . import asistencias_service, calificaciones_service, catalog_service, reportes_service
+from .reportes_service import ReporteError, registrar_reporte, renderizar_pdf
+from course_documents.mixins import DocumentsProfileMixin
+from security.authorization.auth_profile import get_auth_profile
 
 logger = logging.getLogger(__name__)
 
@@ -57,7 +67,7 @@ class UsuariosRegistradosView(LoginRequiredMixin, UserPassesTestMixin, ListView)
     paginate_by = 100  # Mostrar 100 usuarios por página como en el admin de Django
     
     def test_func(self):
-        return self.request.user.groups.filter(name='Secretaría').exists()
+        return get_auth_profile(self.request.user).in_group('Secretaría')
 
     def get_queryset(self):
         queryset = Registro.objects.all().select_related('user').prefetch_related('user__groups')
@@ -161,16 +171,23 @@ def export_usuarios_excel(request):
         'registros': registros
     }
     excel_file = generate_excel(context)
-    response = HttpResponse(excel_file.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="usuarios_registrados.xlsx"'
-    return response
+    return FileResponse(
+        excel_file, as_attachment=True, filename="usuarios_registrados.xlsx",
+        content_type=XLSX_CONTENT_TYPE,
+    )
 
 @login_required
 def export_matriculas_pdf(request):
-    curso_academico_id = request.GET.get('curso_academico')
-    curso_id = request.GET.get('curso')
-    student_id = request.GET.get('student')
-    estado = request.GET.get('estado')
+    filtros = _filtros_reporte(request, ('curso_academico', 'curso', 'student', 'estado'))
+    return _responder_reporte(request, 'matriculas_pdf', filtros)
+
+
+@registrar_reporte('matriculas_pdf', adjunto=False, reutilizable=True, datos_academicos=True)
+def _reporte_matriculas_pdf(filtros):
+    curso_academico_id = filtros.get('curso_academico')
+    curso_id = filtros.get('curso')
+    student_id = filtros.get('student')
+    estado = filtros.get('estado')
 
     matriculas = Matriculas.objects.all()
 
@@ -187,19 +204,24 @@ def export_matriculas_pdf(request):
         'matriculas': matriculas,
         'curso_academico': CursoAcademico.objects.get(id=curso_academico_id) if curso_academico_id else None,
     }
-    return render_to_pdf('matriculas_pdf.html', context)
+    return renderizar_pdf('matriculas_pdf.html', context), 'matriculas.pdf'
 
 @login_required
 def export_matriculas_excel(request):
-    curso_academico_id = request.GET.get('curso_academico')
-    curso_id = request.GET.get('curso')
-    student_id = request.GET.get('student')
-    estado = request.GET.get('estado')
+    filtros = _filtros_reporte(request, ('curso_academico', 'curso', 'student', 'estado'))
+    return _responder_reporte(request, 'matriculas_excel', filtros)
+
+
+@registrar_reporte('matriculas_excel', content_type=XLSX_CONTENT_TYPE, extension='xlsx',
+                   reutilizable=True, datos_academicos=True)
+def _reporte_matriculas_excel(filtros):
+    curso_academico_id = filtros.get('curso_academico')
+    curso_id = filtros.get('curso')
+    student_id = filtros.get('student')
+    estado = filtros.get('estado')
 
     # Aplicar los mismos filtros que MatriculasListView
-    matriculas = Matriculas.objects.select_related(
-        'student', 'course', 'curso_academico'
-    ).all()
+    matriculas = Matriculas.objects.all()
 
     if curso_academico_id:
         matriculas = matriculas.filter(curso_academico__id=curso_academico_id)
@@ -210,131 +232,138 @@ def export_matriculas_excel(request):
     if estado:
         matriculas = matriculas.filter(estado=estado)
 
-    matriculas = matriculas.order_by('course__name', 'student__first_name', 'student__last_name')
-
-    # ── Estilos ───────────────────────────────────────────────────────────────
-    header_font   = Font(name='Arial', bold=True, color='FFFFFF')
-    header_fill   = PatternFill(start_color='003366', end_color='003366', fill_type='solid')
-    center        = Alignment(horizontal='center', vertical='center')
-    left_align    = Alignment(horizontal='left',   vertical='center')
-    thin_border   = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'),  bottom=Side(style='thin')
-    )
-    estado_fills = {
-        'A':  PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid'),  # Aprobado - verde
-        'P':  PatternFill(start_color='BDD7EE', end_color='BDD7EE', fill_type='solid'),  # Activo - azul
-        'BA': PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid'),  # Baja por Ausencia - gris
-        'BL': PatternFill(start_color='D9D9D9', end_color='D9D9D9', fill_type='solid'),  # Baja por Licencia - gris
-        'BI': PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid'),  # Baja por Insuf. - amarillo
+    # course_id tras el nombre mantiene contiguas las filas de cada curso
+    # aunque dos cursos compartan nombre.
+    filas = matriculas.order_by(
+        'course__name', 'course_id', 'student__first_name', 'student__last_name'
+    ).values(
+        'course_id', 'course__name',
+        'student__username', 'student__first_name', 'student__last_name',
+        'curso_academico__nombre', 'fecha_matricula', 'estado',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    estados_display = dict(Matriculas.ESTADO_CHOICES)
+    estado_estilos = {
+        'A': 'ok', 'P': 'estado_activo', 'BA': 'estado_baja', 'BL': 'estado_baja', 'BI': 'aviso',
     }
-    estado_fonts = {
-        'A':  Font(name='Arial', bold=True, color='276221'),
-        'P':  Font(name='Arial', bold=True, color='1F4E79'),
-        'BA': Font(name='Arial', bold=True, color='595959'),
-        'BL': Font(name='Arial', bold=True, color='595959'),
-        'BI': Font(name='Arial', bold=True, color='7D5A00'),
-    }
-
-    wb = openpyxl.Workbook()
-    wb.remove(wb.active)  # eliminar hoja vacía por defecto
-
-    # Agrupar matrículas por curso
-    cursos_vistos = {}
-    for m in matriculas:
-        cid = m.course.id
-        if cid not in cursos_vistos:
-            cursos_vistos[cid] = {'course': m.course, 'matriculas': []}
-        cursos_vistos[cid]['matriculas'].append(m)
-
-    if not cursos_vistos:
-        ws = wb.create_sheet(title="Sin datos")
-        ws['A1'] = "No se encontraron matrículas con los filtros seleccionados."
-    else:
-        HEADERS = ['Estudiante', 'Curso Académico', 'Fecha de Matrícula', 'Estado']
-
-        for cid, grupo in cursos_vistos.items():
-            course = grupo['course']
-            mats   = grupo['matriculas']
-            sheet_title = course.name[:31]
-
-            ws = wb.create_sheet(title=sheet_title)
-
-            # Fila 1: título del curso
-            ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(HEADERS))
-            tc = ws.cell(row=1, column=1, value=f"Matrículas — {course.name}")
-            tc.font = Font(name='Arial', bold=True, size=13, color='FFFFFF')
-            tc.fill = PatternFill(start_color='001F4D', end_color='001F4D', fill_type='solid')
-            tc.alignment = center
-            ws.row_dimensions[1].height = 26
-
-            # Fila 2: encabezados
-            for col, h in enumerate(HEADERS, 1):
-                c = ws.cell(row=2, column=col, value=h)
-                c.font = header_font
-                c.fill = header_fill
-                c.alignment = center
-                c.border = thin_border
-
-            # Filas de datos
-            for row_num, m in enumerate(mats, 3):
-                nombre = m.student.get_full_name() or m.student.username
-                ca_nombre = m.curso_academico.nombre if m.curso_academico else '—'
-                fecha = m.fecha_matricula.strftime('%d/%m/%Y') if m.fecha_matricula else '—'
-                estado_display = m.get_estado_display()
-
-                valores = [nombre, ca_nombre, fecha, estado_display]
-                for col, val in enumerate(valores, 1):
-                    c = ws.cell(row=row_num, column=col, value=val)
-                    c.alignment = left_align if col == 1 else center
-                    c.border = thin_border
-
-                # Color en la columna Estado
-                estado_cell = ws.cell(row=row_num, column=4)
-                if m.estado in estado_fills:
-                    estado_cell.fill = estado_fills[m.estado]
-                    estado_cell.font = estado_fonts[m.estado]
-
-            # Anchos de columna
-            ws.column_dimensions['A'].width = 30
-            ws.column_dimensions['B'].width = 22
-            ws.column_dimensions['C'].width = 18
-            ws.column_dimensions['D'].width = 14
-
-            ws.freeze_panes = 'A3'
-
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="matriculas.xlsx"'
-    return response
+    HEADERS = ['Estudiante', 'Curso Académico', 'Fecha de Matrícula', 'Estado']
+
+    wb = crear_libro()
+    hay_datos = False
+    for _, grupo in groupby(filas, key=itemgetter('course_id')):
+        primera = next(grupo)
+        hay_datos = True
+        hoja = HojaStreaming(
+            wb, primera['course__name'], HEADERS,
+            titulo=f"Matrículas — {primera['course__name']}",
+            anchos_minimos={1: 30, 2: 22, 3: 18, 4: 14},
+            freeze_panes='A3',
+        )
+        for m in chain([primera], grupo):
+            fecha = m['fecha_matricula']
+            hoja.append([
+                (nombre_completo(m['student__first_name'], m['student__last_name'], m['student__username']), 'texto'),
+                (m['curso_academico__nombre'] or '—', 'centro'),
+                (fecha.strftime('%d/%m/%Y') if fecha else '—', 'centro'),
+                (estados_display.get(m['estado'], m['estado']), estado_estilos.get(m['estado'], 'centro')),
+            ])
+        hoja.cerrar()
+
+    if not hay_datos:
+        hoja = HojaStreaming(wb, "Sin datos", [], estilo_por_defecto=None)
+        hoja.append(["No se encontraron matrículas con los filtros seleccionados."])
+        hoja.cerrar()
+
+    return guardar_libro(wb), "matriculas.xlsx"
 
 # Función auxiliar para generar PDF
 def render_to_pdf(template_src, context_dict={}):
-    template = get_template(template_src)
-    html = template.render(context_dict)
-    result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
-    if not pdf.err:
-        return HttpResponse(result.getvalue(), content_type='application/pdf')
-    return None
+    try:
+        return HttpResponse(renderizar_pdf(template_src, context_dict), content_type='application/pdf')
+    except ReporteError:
+        return None
+
+
+# Reportes en segundo plano (ver reportes_service)
+def _filtros_reporte(request, nombres):
+    """Filtros GET no vacíos que forman los parámetros (y la cache_key) del reporte."""
+    return {nombre: request.GET[nombre] for nombre in nombres if request.GET.get(nombre)}
+
+
+def _responder_reporte(request, tipo, parametros):
+    """
+    Solicita el reporte a la cola 'reports'. Si ya está disponible (caché o
+    render inmediato) se descarga directamente; si no, se muestra la página
+    de espera que consulta estado_reporte hasta que el archivo esté listo.
+    """
+    reporte = reportes_service.solicitar_reporte(tipo, parametros, request.user)
+    if reporte.listo:
+        return reportes_service.respuesta_archivo(reporte)
+    if reporte.estado == reporte.ESTADO_ERROR:
+        return HttpResponse('Error al generar el reporte', status=500)
+    return render(request, 'reportes/reporte_en_proceso.html', {'reporte': reporte})
+
+
+@login_required
+def estado_reporte(request, pk):
+    """Endpoint AJAX con el estado de un ReporteGenerado."""
+    reporte = get_object_or_404(ReporteGenerado, pk=pk)
+    if not reportes_service.puede_acceder(reporte, request.user):
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    return JsonResponse({
+        'id': reporte.id,
+        'estado': reporte.estado,
+        'listo': reporte.listo,
+        'error': reporte.error if reporte.estado == reporte.ESTADO_ERROR else '',
+        'url_descarga': reverse('principal:descargar_reporte', args=[reporte.id]) if reporte.listo else None,
+    })
+
+
+@login_required
+def descargar_reporte(request, pk):
+    """Descarga el archivo de un ReporteGenerado completado."""
+    reporte = get_object_or_404(ReporteGenerado, pk=pk)
+    if not reportes_service.puede_acceder(reporte, request.user):
+        return HttpResponse('No autorizado', status=403)
+    if not reporte.listo:
+        return render(request, 'reportes/reporte_en_proceso.html', {'reporte': reporte})
+    return reportes_service.respuesta_archivo(reporte)
 
 # Función auxiliar para generar Excel
+def _precargar(objetos, select_related=(), prefetch_related=()):
+    """Añade select/prefetch a los QuerySets; las listas de adaptadores pasan tal cual."""
+    if isinstance(objetos, QuerySet):
+        if select_related:
+            objetos = objetos.select_related(*select_related)
+        if prefetch_related:
+            objetos = objetos.prefetch_related(*prefetch_related)
+    return objetos
+
+
+def _hay_filas(objetos):
+    """bool() sobre un QuerySet lo evaluaría completo; exists() sólo pide una fila."""
+    if isinstance(objetos, QuerySet):
+        return objetos.exists()
+    return bool(objetos)
+
+
+def _max_notas(calificaciones):
+    """Número máximo de notas individuales entre las calificaciones dadas."""
+    if isinstance(calificaciones, QuerySet):
+        return calificaciones.annotate(
+            _num_notas=Count('notas')
+        ).aggregate(maximo=Max('_num_notas'))['maximo'] or 0
+    return max((c.notas.count() for c in calificaciones), default=0)
+
+
 def generate_excel(context_dict={}):
-    # Crear un nuevo libro de Excel
-    wb = openpyxl.Workbook()
-    
-    # Estilos para el Excel
-    header_font = Font(name='Arial', bold=True, color='FFFFFF')
-    header_fill = PatternFill(start_color='003366', end_color='003366', fill_type='solid')
-    header_alignment = Alignment(horizontal='center', vertical='center')
-    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-    
+    """
+    Genera el Excel del curso académico / usuarios registrados con el motor
+    en streaming de export_service. Devuelve un archivo temporal posicionado
+    al inicio, listo para enviarse con FileResponse.
+    """
+    wb = crear_libro()
+
     # Obtener datos del contexto
     curso_academico = context_dict.get('curso_academico')
     cursos = context_dict.get('cursos', [])
@@ -342,239 +371,119 @@ def generate_excel(context_dict={}):
     calificaciones = context_dict.get('calificaciones', [])
     asistencias = context_dict.get('asistencias', [])
     registros = context_dict.get('registros', []) # Añadir registros al contexto
-    
+
     # Hoja de información general
     if curso_academico:
-        ws_info = wb.active
-        ws_info.title = "Información General"
-        ws_info['A1'] = f"Curso Académico: {curso_academico.nombre}"
-        ws_info['A2'] = f"Activo: {'Sí' if curso_academico.activo else 'No'}"
-        ws_info['A3'] = f"Archivado: {'Sí' if curso_academico.archivado else 'No'}"
-        ws_info['A4'] = f"Fecha de Creación: {curso_academico.fecha_creacion}"
-        # Crear hoja de matrículas como hoja adicional
-        ws_matriculas = wb.create_sheet(title="Matrículas")
-    else:
-        # Si no hay curso_academico, usar la hoja activa para matrículas
-        ws_matriculas = wb.active
-        ws_matriculas.title = "Matrículas"
-    
-    # Hoja de cursos
-    if cursos:
-        ws_cursos = wb.create_sheet(title="Cursos")
-        # Encabezados
-        headers_cursos = ["Nombre del Curso", "Profesor", "Estado"]
-        for col_num, header in enumerate(headers_cursos, 1):
-            cell = ws_cursos.cell(row=1, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-        
-        # Datos
-        for row_num, curso in enumerate(cursos, 2):
-            ws_cursos.cell(row=row_num, column=1, value=curso.name)
-            ws_cursos.cell(row=row_num, column=2, value=curso.teacher.get_full_name() or curso.teacher.username)
-            ws_cursos.cell(row=row_num, column=3, value=curso.get_status_display())
-            
-            # Aplicar bordes a todas las celdas
-            for col_num in range(1, 4):
-                ws_cursos.cell(row=row_num, column=col_num).border = border
-        
-        # Ajustar ancho de columnas
-        for col in ws_cursos.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            adjusted_width = (max_length + 2)
-            ws_cursos.column_dimensions[column].width = adjusted_width
-    
-    # Encabezados para la hoja de matrículas
-    headers = ["Estudiante", "Curso Académico", "Curso", "Fecha Matrícula", "Estado Matrícula"]
-    for col_num, header in enumerate(headers, 1):
-        cell = ws_matriculas.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = border
-    
-    if matriculas:
-        # Datos
-        for row_num, matricula in enumerate(matriculas, 2):
-            ws_matriculas.cell(row=row_num, column=1, value=matricula.student.get_full_name() or matricula.student.username)
-            ws_matriculas.cell(row=row_num, column=2, value=matricula.course.curso_academico.nombre if matricula.course and matricula.course.curso_academico else 'N/A')
-            ws_matriculas.cell(row=row_num, column=3, value=matricula.course.name if matricula.course else 'N/A')
-            ws_matriculas.cell(row=row_num, column=4, value=matricula.fecha_matricula.strftime('%d/%m/%Y') if matricula.fecha_matricula else 'N/A')
-            ws_matriculas.cell(row=row_num, column=5, value=matricula.get_estado_display())
-            
-            # Aplicar bordes a todas las celdas
-            for col_num in range(1, 6):
-                ws_matriculas.cell(row=row_num, column=col_num).border = border
-    else:
+        hoja_info = HojaStreaming(wb, "Información General", [], estilo_por_defecto=None)
+        hoja_info.append([f"Curso Académico: {curso_academico.nombre}"])
+        hoja_info.append([f"Activo: {'Sí' if curso_academico.activo else 'No'}"])
+        hoja_info.append([f"Archivado: {'Sí' if curso_academico.archivado else 'No'}"])
+        hoja_info.append([f"Fecha de Creación: {curso_academico.fecha_creacion}"])
+        hoja_info.cerrar()
+
+    # Hoja de matrículas (siempre presente)
+    hoja = HojaStreaming(
+        wb, "Matrículas",
+        ["Estudiante", "Curso Académico", "Curso", "Fecha Matrícula", "Estado Matrícula"],
+    )
+    matriculas = _precargar(matriculas, select_related=('student', 'course__curso_academico'))
+    for matricula in iterar_filas(matriculas):
+        hoja.append([
+            matricula.student.get_full_name() or matricula.student.username,
+            matricula.course.curso_academico.nombre if matricula.course and matricula.course.curso_academico else 'N/A',
+            matricula.course.name if matricula.course else 'N/A',
+            matricula.fecha_matricula.strftime('%d/%m/%Y') if matricula.fecha_matricula else 'N/A',
+            matricula.get_estado_display(),
+        ])
+    if not hoja.filas:
         # Si no hay matrículas, agregar una fila indicándolo
-        ws_matriculas.cell(row=2, column=1, value="No se encontraron matrículas con los filtros seleccionados")
-        ws_matriculas.merge_cells('A2:E2')
-        ws_matriculas.cell(row=2, column=1).alignment = Alignment(horizontal='center')
-        ws_matriculas.cell(row=2, column=1).font = Font(italic=True, color='666666')
-    
-    # Ajustar ancho de columnas
-    for col in ws_matriculas.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            if cell.value:
-                max_length = max(max_length, len(str(cell.value)))
-        adjusted_width = (max_length + 2)
-        ws_matriculas.column_dimensions[column].width = adjusted_width
+        hoja.mensaje_vacio("No se encontraron matrículas con los filtros seleccionados")
+    hoja.cerrar()
+
+    # Hoja de cursos
+    if _hay_filas(cursos):
+        hoja = HojaStreaming(wb, "Cursos", ["Nombre del Curso", "Profesor", "Estado"])
+        for curso in iterar_filas(_precargar(cursos, select_related=('teacher',))):
+            hoja.append([
+                curso.name,
+                curso.teacher.get_full_name() or curso.teacher.username,
+                curso.get_status_display(),
+            ])
+        hoja.cerrar()
 
-    
     # Hoja de calificaciones
-    if calificaciones:
-        ws_calificaciones = wb.create_sheet(title="Calificaciones")
-        
-        # Determinar el número máximo de notas individuales
-        max_notas = 0
-        for calificacion in calificaciones:
-            num_notas = calificacion.notas.count()
-            if num_notas > max_notas:
-                max_notas = num_notas
-        
-        # Crear encabezados dinámicos
+    if _hay_filas(calificaciones):
+        max_notas = _max_notas(calificaciones)
         headers = ["Estudiante", "Curso"]
-        for i in range(1, max_notas + 1):
-            headers.append(f"Nota {i}")
+        headers += [f"Nota {i}" for i in range(1, max_notas + 1)]
         headers.append("Promedio")
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws_calificaciones.cell(row=1, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-        
-        # Datos
-        for row_num, calificacion in enumerate(calificaciones, 2):
-            # Información básica
-            ws_calificaciones.cell(row=row_num, column=1, value=calificacion.student.get_full_name() or calificacion.student.username)
-            ws_calificaciones.cell(row=row_num, column=2, value=calificacion.course.name)
-            
-            # Notas individuales
-            notas_individuales = list(calificacion.notas.all().order_by('fecha_creacion'))
-            for i, nota in enumerate(notas_individuales, 3):
-                ws_calificaciones.cell(row=row_num, column=i, value=nota.valor)
-            
-            # Rellenar con N/A las notas que no existen
-            for i in range(len(notas_individuales) + 3, max_notas + 3):
-                ws_calificaciones.cell(row=row_num, column=i, value='N/A')
-            
-            # Promedio
-            ws_calificaciones.cell(row=row_num, column=max_notas + 3, value=calificacion.average if calificacion.average is not None else 'N/A')
-            
-            # Aplicar bordes a todas las celdas
-            for col_num in range(1, max_notas + 4):
-                ws_calificaciones.cell(row=row_num, column=col_num).border = border
-        
+        hoja = HojaStreaming(wb, "Calificaciones", headers)
+
+        es_queryset = isinstance(calificaciones, QuerySet)
+        calificaciones = _precargar(
+            calificaciones, select_related=('student', 'course'), prefetch_related=('notas',)
+        )
+        for calificacion in iterar_filas(calificaciones):
+            # Las notas precargadas ya vienen ordenadas por fecha_creacion (Meta.ordering)
+            notas = calificacion.notas.all()
+            if not es_queryset:
+                notas = notas.order_by('fecha_creacion')
+            valores = [nota.valor for nota in notas]
+            valores += ['N/A'] * (max_notas - len(valores))
+            hoja.append(
+                [calificacion.student.get_full_name() or calificacion.student.username,
+                 calificacion.course.name]
+                + valores
+                + [calificacion.average if calificacion.average is not None else 'N/A']
+            )
+        hoja.cerrar()
+
     # Hoja de usuarios registrados
-    if registros:
-        ws_usuarios = wb.create_sheet(title="Usuarios Registrados")
-        # Encabezados
+    if _hay_filas(registros):
         headers = [
             "Nombre", "Apellidos", "Email", "Nacionalidad", "Carnet ID", "Carnet Disponible", "Sexo",
             "Dirección", "Municipio", "Provincia", "Movil", "Grado Académico",
             "Ocupación", "Religioso", "Título", "Título Disponible", "Grupo", "Fecha de Registro"
         ]
-        for col_num, header in enumerate(headers, 1):
-            cell = ws_usuarios.cell(row=1, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-        
-        # Datos
-        for row_num, registro in enumerate(registros, 2):
-            ws_usuarios.cell(row=row_num, column=1, value=registro.user.first_name)
-            ws_usuarios.cell(row=row_num, column=2, value=registro.user.last_name)
-            ws_usuarios.cell(row=row_num, column=3, value=registro.user.email)
-            ws_usuarios.cell(row=row_num, column=4, value=registro.nacionalidad)
-            ws_usuarios.cell(row=row_num, column=5, value=registro.carnet)
-            ws_usuarios.cell(row=row_num, column=6, value="Sí" if registro.foto_carnet else "No")
-            ws_usuarios.cell(row=row_num, column=7, value=registro.sexo)
-            ws_usuarios.cell(row=row_num, column=8, value=registro.address)
-            ws_usuarios.cell(row=row_num, column=9, value=registro.location)
-            ws_usuarios.cell(row=row_num, column=10, value=registro.provincia)
-            ws_usuarios.cell(row=row_num, column=11, value=registro.movil)
-            ws_usuarios.cell(row=row_num, column=12, value=registro.get_grado_display())
-            ws_usuarios.cell(row=row_num, column=13, value=registro.get_ocupacion_display())
-            ws_usuarios.cell(row=row_num, column=14, value="Sí" if registro.es_religioso else "No")
-            ws_usuarios.cell(row=row_num, column=15, value=registro.titulo)
-            ws_usuarios.cell(row=row_num, column=16, value="Sí" if registro.foto_titulo else "No")
-            ws_usuarios.cell(row=row_num, column=17, value=registro.user.groups.first().name if registro.user.groups.first() else '')
-            ws_usuarios.cell(row=row_num, column=18, value=registro.user.date_joined.strftime("%d/%m/%Y"))
-            
-            for col_num in range(1, len(headers) + 1):
-                ws_usuarios.cell(row=row_num, column=col_num).border = border
-        
-        # Ajustar ancho de columnas
-        for col in ws_usuarios.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            adjusted_width = (max_length + 2)
-            ws_usuarios.column_dimensions[column].width = adjusted_width
-
-    if calificaciones:
-        # Ajustar ancho de columnas
-        for col in ws_calificaciones.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            adjusted_width = (max_length + 2)
-            ws_calificaciones.column_dimensions[column].width = adjusted_width
+        hoja = HojaStreaming(wb, "Usuarios Registrados", headers)
+        registros = _precargar(registros, select_related=('user',), prefetch_related=('user__groups',))
+        for registro in iterar_filas(registros):
+            grupo = min(registro.user.groups.all(), key=lambda g: g.pk, default=None)
+            hoja.append([
+                registro.user.first_name,
+                registro.user.last_name,
+                registro.user.email,
+                registro.nacionalidad,
+                registro.carnet,
+                "Sí" if registro.foto_carnet else "No",
+                registro.sexo,
+                registro.address,
+                registro.location,
+                registro.provincia,
+                registro.movil,
+                registro.get_grado_display(),
+                registro.get_ocupacion_display(),
+                "Sí" if registro.es_religioso else "No",
+                registro.titulo,
+                "Sí" if registro.foto_titulo else "No",
+                grupo.name if grupo else '',
+                registro.user.date_joined.strftime("%d/%m/%Y"),
+            ])
+        hoja.cerrar()
 
     # Hoja de asistencias
-    if asistencias:
-        ws_asistencias = wb.create_sheet(title="Asistencias")
-        # Encabezados
-        headers = ["Estudiante", "Curso", "Fecha", "Presente"]
-        for col_num, header in enumerate(headers, 1):
-            cell = ws_asistencias.cell(row=1, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-
-        # Datos
-        for row_num, asistencia in enumerate(asistencias, 2):
-            ws_asistencias.cell(row=row_num, column=1, value=asistencia.student.get_full_name() or asistencia.student.username)
-            ws_asistencias.cell(row=row_num, column=2, value=asistencia.course.name)
-            ws_asistencias.cell(row=row_num, column=3, value=asistencia.date.strftime('%d/%m/%Y') if asistencia.date else 'N/A')
-            ws_asistencias.cell(row=row_num, column=4, value='Sí' if asistencia.presente else 'No')
-
-            # Aplicar bordes a todas las celdas
-            for col_num in range(1, 5):
-                ws_asistencias.cell(row=row_num, column=col_num).border = border
-
-        # Ajustar ancho de columnas
-        for col in ws_asistencias.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            adjusted_width = (max_length + 2)
-            ws_asistencias.column_dimensions[column].width = adjusted_width
-
-    # Guardar el archivo en memoria
-    excel_file = BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
-
-    return excel_file
+    if _hay_filas(asistencias):
+        hoja = HojaStreaming(wb, "Asistencias", ["Estudiante", "Curso", "Fecha", "Presente"])
+        for asistencia in iterar_filas(_precargar(asistencias, select_related=('student', 'course'))):
+            hoja.append([
+                asistencia.student.get_full_name() or asistencia.student.username,
+                asistencia.course.name,
+                asistencia.date.strftime('%d/%m/%Y') if asistencia.date else 'N/A',
+                'Sí' if asistencia.presente else 'No',
+            ])
+        hoja.cerrar()
+
+    return guardar_libro(wb)
 
 
 # ── Adaptadores para datos archivados ─────────────────────────────────────────
@@ -1375,7 +1284,7 @@ class CursoAcademicoDetailView(DetailView):
             if curso_id:
                 cursos_qs = cursos_qs.filter(id=curso_id)
             if estado_curso:
-                cursos_qs = [c for c in cursos_qs if c.get_dynamic_status() == estado_curso]
+                cursos_qs = cursos_qs.filter(status=estado_curso)
 
             cursos_list = [_CursoPrincipalAdapter(c, _semestre_map_principal) for c in cursos_qs]
 
@@ -1508,7 +1417,7 @@ class CursoAcademicoDetailView(DetailView):
         if curso_id:
             cursos_qs = cursos_qs.filter(id=curso_id)
         if estado_curso:
-            cursos_qs = [c for c in cursos_qs if c.get_dynamic_status() == estado_curso]
+            cursos_qs = cursos_qs.filter(status=estado_curso)
 
         matriculas_qs = Matriculas.objects.filter(
             semestre__in=semestres_activos_ids,
@@ -1520,8 +1429,7 @@ class CursoAcademicoDetailView(DetailView):
         if estado_matricula:
             matriculas_qs = matriculas_qs.filter(estado=estado_matricula)
         if estado_curso:
-            ids_cursos = [c.id for c in Curso.objects.filter(curso_academico=curso_academico) if c.get_dynamic_status() == estado_curso]
-            matriculas_qs = matriculas_qs.filter(course_id__in=ids_cursos)
+            matriculas_qs = matriculas_qs.filter(course__status=estado_curso)
 
         calificaciones_qs = Calificaciones.objects.filter(
             semestre__in=semestres_activos_ids,
@@ -1531,8 +1439,7 @@ class CursoAcademicoDetailView(DetailView):
         if estudiante_id:
             calificaciones_qs = calificaciones_qs.filter(student_id=estudiante_id)
         if estado_curso:
-            ids_cursos = [c.id for c in Curso.objects.filter(curso_academico=curso_academico) if c.get_dynamic_status() == estado_curso]
-            calificaciones_qs = calificaciones_qs.filter(course_id__in=ids_cursos)
+            calificaciones_qs = calificaciones_qs.filter(course__status=estado_curso)
 
         asistencias_matriculas_qs = Matriculas.objects.filter(
             semestre__in=semestres_activos_ids,
@@ -1546,8 +1453,7 @@ class CursoAcademicoDetailView(DetailView):
         if estado_matricula:
             asistencias_matriculas_qs = asistencias_matriculas_qs.filter(estado=estado_matricula)
         if estado_curso:
-            ids_cursos = [c.id for c in Curso.objects.filter(curso_academico=curso_academico) if c.get_dynamic_status() == estado_curso]
-            asistencias_matriculas_qs = asistencias_matriculas_qs.filter(course_id__in=ids_cursos)
+            asistencias_matriculas_qs = asistencias_matriculas_qs.filter(course__status=estado_curso)
 
         cursos_list = [_CursoPrincipalAdapter(c, _semestre_map_principal) for c in cursos_qs]
         matriculas_list = [_MatriculaPrincipalAdapter(m, _semestre_map_principal) for m in matriculas_qs]
@@ -1811,10 +1717,11 @@ class CursoAcademicoDetailView(DetailView):
 
             excel_file = generate_excel(excel_context)
             if excel_file:
-                response = HttpResponse(excel_file.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
                 filename = f"curso_academico_{context['curso_academico'].nombre}.xlsx"
-                response['Content-Disposition'] = f'attachment; filename={filename}'
-                return response
+                return FileResponse(
+                    excel_file, as_attachment=True, filename=filename,
+                    content_type=XLSX_CONTENT_TYPE,
+                )
         # Si no se solicita PDF ni Excel, renderizar normalmente
         return super().render_to_response(context, **response_kwargs)
 
@@ -1823,191 +1730,86 @@ class BaseContextMixin:
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
-        group_name = None
         if user.is_authenticated:
-            group = Group.objects.filter(user=user).first()
-            if group:
-                group_name = group.name
-            context['group_name'] = group_name
+            context['group_name'] = get_auth_profile(user).primary_group
         return context
 
 
-class HomeView(DocumentsCourseMixin, BaseContextMixin, TemplateView):
+class HomeView(BaseContextMixin, TemplateView):
     template_name = 'home.html'
 
+    def get(self, request, *args, **kwargs):
+        # Los visitantes anónimos reciben la página completa desde la caché
+        if not request.user.is_authenticated:
+            return catalog_service.cached_anonymous_page(
+                request, lambda: super(HomeView, self).get(request, *args, **kwargs).render()
+            )
+        return super().get(request, *args, **kwargs)
+
     @override
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        curso_academico_activo = CursoAcademico.objects.filter(activo=True).first()
-        if curso_academico_activo:
-            # Incluir todos los estados activos: inscripción, plazo terminado y en progreso.
-            # Se excluye 'F' (Finalizado) porque esos cursos ya no son relevantes en la home.
-            courses = Curso.objects.filter(
-                curso_academico=curso_academico_activo,
-                status__in=['I', 'IT', 'P']
-            )
-        else:
-            courses = Curso.objects.none()
-        
-        # Obtener todos los formularios de aplicación existentes
-        formularios = FormularioAplicacion.objects.all()
-        formularios_por_curso = {f.curso_id: f for f in formularios}
-        
-        # Asignar los formularios a los cursos
-        for curso in courses:
-            if curso.id in formularios_por_curso:
-                curso.formulario_aplicacion = formularios_por_curso[curso.id]
-            else:
-                curso.formulario_aplicacion = None
-        
+        # Cursos activos (inscripción, plazo terminado y en progreso), noticias y
+        # categorías: compartidos por todos los usuarios y cacheados
+        catalog = catalog_service.home_catalog()
+        courses = catalog['cursos']
+        catalog_service.apply_user_overlay(courses, self.request.user)
+
         # Group courses into chunks of four for the carousel (compatibilidad con otros templates)
-        grouped_courses = [courses[i:i + 4] for i in range(0, len(courses), 4)]
-        context['grouped_courses'] = grouped_courses
+        context['grouped_courses'] = [courses[i:i + 4] for i in range(0, len(courses), 4)]
 
         # Lista plana de cursos activos para el nuevo template
-        context['cursos_activos'] = list(courses)
-        
+        context['cursos_activos'] = courses
+
         # Grupos de 3 para el carrusel de la home
-        courses_list = list(courses)
-        context['cursos_grupos_3'] = [courses_list[i:i+3] for i in range(0, len(courses_list), 3)]
-        
-        # Obtener las noticias publicadas más recientes
-        noticias = Noticia.objects.filter(estado='publicado').order_by('-fecha_publicacion')[:8]
-        
+        context['cursos_grupos_3'] = [courses[i:i + 3] for i in range(0, len(courses), 3)]
+
+        # Noticias publicadas más recientes
+        noticias = catalog['noticias']
+
         # Agrupar noticias en chunks de 4 para el carousel (compatibilidad con otros templates)
-        grouped_noticias = [noticias[i:i + 4] for i in range(0, len(noticias), 4)]
-        context['grouped_noticias'] = grouped_noticias
+        context['grouped_noticias'] = [noticias[i:i + 4] for i in range(0, len(noticias), 4)]
 
         # Lista plana de noticias publicadas para el nuevo template
-        context['noticias_publicadas'] = list(noticias)
-        
+        context['noticias_publicadas'] = noticias
+
         # Grupos de 3 para el carrusel de noticias de la home
-        noticias_list = list(noticias)
-        context['noticias_grupos_3'] = [noticias_list[i:i+3] for i in range(0, len(noticias_list), 3)]
+        context['noticias_grupos_3'] = [noticias[i:i + 3] for i in range(0, len(noticias), 3)]
 
         # Categorías que tienen al menos una noticia publicada
-        categorias = Categoria.objects.filter(
-            noticias__estado='publicado'
-        ).distinct().order_by('nombre')
-        context['categorias_con_noticias'] = categorias
-
-        student = self.request.user if self.request.user.is_authenticated else None
-        
-        # Crear conjuntos de IDs de cursos con solicitudes pendientes y rechazadas
-        cursos_con_solicitudes_pendientes = set()
-        cursos_con_solicitudes_rechazadas = set()
-        
-        if student:
-            # Obtener todos los IDs de cursos con solicitudes pendientes EN EL SEMESTRE ACTIVO
-            cursos_con_solicitudes_pendientes = set(
-                SolicitudInscripcion.objects.filter(
-                    estudiante=student,
-                    estado='pendiente',
-                    curso_academico=curso_academico_activo
-                ).values_list('curso_id', flat=True)
-            )
-            
-            # Obtener todos los IDs de cursos con solicitudes rechazadas EN EL SEMESTRE ACTIVO
-            cursos_con_solicitudes_rechazadas = set(
-                SolicitudInscripcion.objects.filter(
-                    estudiante=student,
-                    estado='rechazada',
-                    curso_academico=curso_academico_activo
-                ).values_list('curso_id', flat=True)
-            )
-
-        for item in courses:
-            if student:
-                # Verificar si el estudiante está matriculado
-                item.is_enrolled = Matriculas.objects.filter(
-                    course=item, 
-                    student=student
-                ).exists()
-                
-                # Verificar si el estudiante tiene una solicitud pendiente para este curso
-                item.tiene_solicitud_pendiente = item.id in cursos_con_solicitudes_pendientes
-                
-                # Verificar si el estudiante tiene una solicitud rechazada para este curso
-                item.tiene_solicitud_rechazada = item.id in cursos_con_solicitudes_rechazadas
-            else:
-                item.is_enrolled = False
-                item.tiene_solicitud_pendiente = False
-                item.tiene_solicitud_rechazada = False
-            
-            # Calcular el conteo de inscripciones
-            enrollment_count = Matriculas.objects.filter(course=item).count()
-            item.enrollment_count = enrollment_count
-            
-            # Ya no necesitamos este código porque los formularios se cargan en get_context_data
+        context['categorias_con_noticias'] = catalog['categorias']
 
         context['courses'] = courses
         return context
-        return context
-
 
 
 class ListadoCursosView(BaseContextMixin, TemplateView):
     template_name = 'cursos.html'
 
+    def get(self, request, *args, **kwargs):
+        # Los visitantes anónimos reciben la página completa desde la caché (por URL)
+        if not request.user.is_authenticated:
+            return catalog_service.cached_anonymous_page(
+                request, lambda: super(ListadoCursosView, self).get(request, *args, **kwargs).render()
+            )
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        curso_academico_activo = CursoAcademico.objects.filter(activo=True).first()
-        if curso_academico_activo:
-            courses = Curso.objects.filter(curso_academico=curso_academico_activo)
-        else:
-            courses = Curso.objects.none()
 
-        # Filtrar por área si viene el parámetro GET
+        # Filtrar por área y tipo si vienen los parámetros GET
         area = self.request.GET.get('area')
-        if area:
-            courses = courses.filter(area=area)
-
-        # Filtrar por tipo si viene el parámetro GET
         tipo = self.request.GET.get('tipo')
-        if tipo:
-            courses = courses.filter(tipo=tipo)
-
-        student = self.request.user if self.request.user.is_authenticated else None
-
-        cursos_con_solicitudes_pendientes = set()
-        cursos_con_solicitudes_rechazadas = set()
-        if student and student.is_authenticated:
-            cursos_con_solicitudes_pendientes = set(
-                SolicitudInscripcion.objects.filter(
-                    estudiante=student, estado='pendiente',
-                    curso_academico=curso_academico_activo
-                ).values_list('curso_id', flat=True)
-            )
-            cursos_con_solicitudes_rechazadas = set(
-                SolicitudInscripcion.objects.filter(
-                    estudiante=student, estado='rechazada',
-                    curso_academico=curso_academico_activo
-                ).values_list('curso_id', flat=True)
-            )
-
-        formularios = FormularioAplicacion.objects.all()
-        formularios_por_curso = {f.curso_id: f for f in formularios}
-
-        courses_list = list(courses)
-        for item in courses_list:
-            if student and student.is_authenticated:
-                item.is_enrolled = Matriculas.objects.filter(
-                    course=item, student=student).exists()
-                item.tiene_solicitud_pendiente = item.id in cursos_con_solicitudes_pendientes
-                item.tiene_solicitud_rechazada = item.id in cursos_con_solicitudes_rechazadas
-            else:
-                item.is_enrolled = False
-                item.tiene_solicitud_pendiente = False
-                item.tiene_solicitud_rechazada = False
-
-            item.enrollment_count = Matriculas.objects.filter(course=item).count()
-            item.formulario_aplicacion = formularios_por_curso.get(item.id)
+        curso_academico_activo, courses_list = catalog_service.listing_catalog(area=area, tipo=tipo)
 
         # Paginación: 8 tarjetas por página
         paginator = Paginator(courses_list, 8)
         page_number = self.request.GET.get('page', 1)
         page_obj = paginator.get_page(page_number)
 
+        # Matrículas, solicitudes y enlaces de documentos del usuario
+        catalog_service.apply_user_overlay(page_obj.object_list, self.request.user)
+
         context['courses'] = page_obj
         context['page_obj'] = page_obj
         context['is_paginated'] = paginator.num_pages > 1
@@ -2018,14 +1820,7 @@ class ListadoCursosView(BaseContextMixin, TemplateView):
 
         user = self.request.user
         if user.is_authenticated:
-            group = Group.objects.filter(user=user).first()
-            context['group_name'] = group.name if group else None
-            # Agregar info de documentos a cada curso (equivalente a DocumentsCourseMixin)
-            for course in page_obj:
-                from course_documents.mixins import DocumentsCourseMixin as _DCM
-                _dcm = _DCM()
-                _dcm.request = self.request
-                _dcm._add_course_document_info(course, user)
+            context['group_name'] = get_auth_profile(user).primary_group
         else:
             context['group_name'] = None
 
@@ -2290,16 +2085,16 @@ class LoginRedirectView(LoginRequiredMixin, TemplateView):
                     del request.session['usuario_creado_desde']
             
             # Redirección según el grupo del usuario
-            if user.groups.filter(name='Editor').exists():
+            if get_auth_profile(user).in_group('Editor'):
                 return redirect('blog:panel_editores')
 
-            if user.groups.filter(name__in=['Profesores', 'Administración', 'Secretaría']).exists():
+            if get_auth_profile(user).in_group('Profesores', 'Administración', 'Secretaría'):
                 return redirect('principal:profile')
 
-            if user.groups.filter(name__in=['Blog Autor', 'Blog Moderador']).exists():
+            if get_auth_profile(user).in_group('Blog Autor', 'Blog Moderador'):
                 return redirect('principal:profile')
 
-            if user.groups.filter(name='Estudiantes').exists():
+            if get_auth_profile(user).in_group('Estudiantes'):
                 # Ir al perfil solo si tiene al menos una matrícula aprobada
                 tiene_matricula = Matriculas.objects.filter(student=user).exists()
                 if tiene_matricula:
@@ -2321,9 +2116,8 @@ class ProfileView(DocumentsProfileMixin, BaseContextMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         user = self.request.user
 
-        # Obtener el primer grupo del usuario de forma segura
-        user_group = user.groups.first()
-        group_name = user_group.name if user_group else None
+        # Primer grupo del usuario (perfil de autorización cacheado)
+        group_name = get_auth_profile(user).primary_group
         
         # Asegurar que group_name esté en el contexto (BaseContextMixin ya lo hace, pero por seguridad)
         context['group_name'] = group_name
@@ -2450,6 +2244,12 @@ class ProfileView(DocumentsProfileMixin, BaseContextMixin, TemplateView):
                 # para mostrarlos en "Historial de Cursos" igual que Andy.
                 cursos_finalizados_activos = []
 
+                # Cursos con contenido nuevo desde el set en caché del estudiante
+                cursos_con_contenido_nuevo = (
+                    ContentIndicatorService.get_course_ids_with_new_content(user)
+                    if ContentIndicatorService else set()
+                )
+
                 for course in enrolled_courses:
                     # Asignar estado de matrícula directamente desde el dict
                     matricula = matriculas_dict.get(course.id)
@@ -2527,11 +2327,7 @@ class ProfileView(DocumentsProfileMixin, BaseContextMixin, TemplateView):
                         course.fecha_revision = solicitud.fecha_revision
                         course.revisado_por = solicitud.revisado_por
                         # Número de semestre al que aplicó (semestre activo del curso)
-                        from principal.models import SemestreCurso as _SemestreCursoSol
-                        semestre_sol = _SemestreCursoSol.objects.filter(
-                            curso=course, activo=True
-                        ).order_by('-numero_semestre').first()
-                        course.solicitud_semestre_numero = semestre_sol.numero_semestre if semestre_sol else course.semestre_activo_numero
+                        course.solicitud_semestre_numero = course.semestre_activo_numero
 
                         # Cursos en inscripción con solicitud (cualquier estado) van a
                         # solicitudes_courses para mostrar el estado de la aplicación.
@@ -2547,10 +2343,7 @@ class ProfileView(DocumentsProfileMixin, BaseContextMixin, TemplateView):
                         approved_courses.append(course)
 
                     # Agregar indicador de contenido nuevo si course_documents está disponible
-                    if ContentIndicatorService:
-                        course.has_new_content_indicator = ContentIndicatorService.has_new_content(course, user)
-                    else:
-                        course.has_new_content_indicator = False
+                    course.has_new_content_indicator = course.id in cursos_con_contenido_nuevo
                     course.es_curso_anterior = False
                     matricula_course = matriculas_dict.get(course.id)
                     course.semestre_matricula_obj = matricula_course.semestre if matricula_course else None
@@ -2943,7 +2736,7 @@ class MatriculasListView(BaseContextMixin, ListView):
 @require_POST
 def cambiar_estado_matricula(request, matricula_id):
     """Permite a Secretaría cambiar el estado de una matrícula."""
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden()
     matricula = get_object_or_404(Matriculas, pk=matricula_id)
@@ -3333,17 +3126,20 @@ class StudentCourseAttendanceView(BaseContextMixin, ListView):
                 student__usuario_actual=student,
                 semestre_archivado=semestre_archivado_seleccionado,
             ).order_by('date')
-            total_classes = asistencias_arch.count()
-            present_count = asistencias_arch.filter(presente=True).count()
             context['asistencias'] = asistencias_arch
         else:
             asistencias = context['asistencias']
             if semestre_seleccionado:
                 asistencias = asistencias.filter(semestre=semestre_seleccionado)
-            total_classes = asistencias.count()
-            present_count = asistencias.filter(presente=True).count()
             context['asistencias'] = asistencias
 
+        # Total y presentes en una sola consulta
+        totales = context['asistencias'].aggregate(
+            total=Count('id'), presentes=Count('id', filter=Q(presente=True))
+        )
+        total_classes = totales['total']
+        present_count = totales['presentes']
+
         context['total_classes'] = total_classes
         context['present_count'] = present_count
         context['attendance_percentage'] = round((present_count / total_classes) * 100, 1) if total_classes > 0 else 0
@@ -3608,8 +3404,17 @@ class CalificacionDetalleArchivadoView(BaseContextMixin, TemplateView):
 @login_required
 def export_calificacion_pdf(request, student_id, course_id):
     """Exporta el detalle de calificaciones de un estudiante en un curso como PDF."""
-    student      = get_object_or_404(User, id=student_id)
-    course       = get_object_or_404(Curso, id=course_id)
+    get_object_or_404(User, id=student_id)
+    get_object_or_404(Curso, id=course_id)
+    return _responder_reporte(
+        request, 'calificacion_pdf', {'student_id': student_id, 'course_id': course_id}
+    )
+
+
+@registrar_reporte('calificacion_pdf', adjunto=False, reutilizable=True, datos_academicos=True)
+def _reporte_calificacion_pdf(parametros):
+    student      = User.objects.get(id=parametros['student_id'])
+    course       = Curso.objects.get(id=parametros['course_id'])
     calificacion = Calificaciones.objects.filter(
         student=student, course=course
     ).prefetch_related('notas').first()
@@ -3621,7 +3426,10 @@ def export_calificacion_pdf(request, student_id, course_id):
         'calificacion': calificacion,
         'notas':        notas,
     }
-    return render_to_pdf('calificacion_detalle_pdf.html', context)
+    return (
+        renderizar_pdf('calificacion_detalle_pdf.html', context),
+        f"calificaciones_{student.username}_{course.id}.pdf",
+    )
 
 
 @login_required
@@ -3630,14 +3438,19 @@ def export_calificaciones_excel(request):
     Exporta calificaciones a Excel según los filtros activos.
     Una hoja por curso. Columnas: Estudiante, Nota 1, Nota 2, ..., Promedio.
     """
-    curso_academico_id = request.GET.get('curso_academico')
-    curso_id           = request.GET.get('curso')
-    estudiante_id      = request.GET.get('estudiante')
+    filtros = _filtros_reporte(request, ('curso_academico', 'curso', 'estudiante'))
+    return _responder_reporte(request, 'calificaciones_excel', filtros)
+
+
+@registrar_reporte('calificaciones_excel', content_type=XLSX_CONTENT_TYPE, extension='xlsx',
+                   reutilizable=True, datos_academicos=True)
+def _reporte_calificaciones_excel(filtros):
+    curso_academico_id = filtros.get('curso_academico')
+    curso_id           = filtros.get('curso')
+    estudiante_id      = filtros.get('estudiante')
 
     # Mismos filtros que CalificacionesListView
-    calificaciones = Calificaciones.objects.select_related(
-        'student', 'course', 'curso_academico'
-    ).prefetch_related('notas')
+    calificaciones = Calificaciones.objects.all()
 
     if curso_academico_id:
         calificaciones = calificaciones.filter(curso_academico__id=curso_academico_id)
@@ -3646,149 +3459,71 @@ def export_calificaciones_excel(request):
     if estudiante_id:
         calificaciones = calificaciones.filter(student__id=estudiante_id)
 
-    calificaciones = calificaciones.order_by(
-        'course__name', 'student__first_name', 'student__last_name', 'student__username'
-    )
-
-    # ── Estilos ───────────────────────────────────────────────────────────────
-    header_font    = Font(name='Arial', bold=True, color='FFFFFF')
-    header_fill    = PatternFill(start_color='003366', end_color='003366', fill_type='solid')
-    nota_fill      = PatternFill(start_color='1F5C99', end_color='1F5C99', fill_type='solid')
-    aprobado_fill  = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-    reprobado_fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-    na_fill        = PatternFill(start_color='F2F2F2', end_color='F2F2F2', fill_type='solid')
-    aprobado_font  = Font(name='Arial', bold=True, color='276221')
-    reprobado_font = Font(name='Arial', bold=True, color='9C0006')
-    na_font        = Font(name='Arial', color='595959')
-    center         = Alignment(horizontal='center', vertical='center')
-    left_align     = Alignment(horizontal='left',   vertical='center')
-    thin_border    = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'),  bottom=Side(style='thin')
-    )
-
-    wb = openpyxl.Workbook()
-    wb.remove(wb.active)
-
-    # Agrupar por curso
-    cursos_vistos = {}
-    for cal in calificaciones:
-        cid = cal.course.id
-        if cid not in cursos_vistos:
-            cursos_vistos[cid] = {'course': cal.course, 'calificaciones': []}
-        cursos_vistos[cid]['calificaciones'].append(cal)
-
-    if not cursos_vistos:
-        ws = wb.create_sheet(title="Sin datos")
-        ws['A1'] = "No se encontraron calificaciones con los filtros seleccionados."
-    else:
-        for cid, grupo in cursos_vistos.items():
-            course = grupo['course']
-            cals   = grupo['calificaciones']
-            sheet_title = course.name[:31]
-
-            # Determinar el máximo de notas en este curso
-            max_notas = max((cal.notas.count() for cal in cals), default=0)
-
-            ws = wb.create_sheet(title=sheet_title)
-
-            # Fila 1: título
-            total_cols = 2 + max_notas + 1   # Estudiante + CursoAcad + notas + Promedio
-            ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=total_cols)
-            tc = ws.cell(row=1, column=1, value=f"Calificaciones — {course.name}")
-            tc.font = Font(name='Arial', bold=True, size=13, color='FFFFFF')
-            tc.fill = PatternFill(start_color='001F4D', end_color='001F4D', fill_type='solid')
-            tc.alignment = center
-            ws.row_dimensions[1].height = 26
-
-            # Fila 2: encabezados
-            headers_fijos = ['Estudiante', 'Curso Académico']
-            for col, h in enumerate(headers_fijos, 1):
-                c = ws.cell(row=2, column=col, value=h)
-                c.font = header_font; c.fill = header_fill
-                c.alignment = center; c.border = thin_border
+    filas = calificaciones.order_by(
+        'course__name', 'course_id', 'student__first_name', 'student__last_name', 'student__username'
+    ).values(
+        'id', 'course_id', 'course__name',
+        'student__username', 'student__first_name', 'student__last_name',
+        'curso_academico__nombre', 'average',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    wb = crear_libro()
+    hay_datos = False
+    for cid, grupo in groupby(filas, key=itemgetter('course_id')):
+        primera = next(grupo)
+        hay_datos = True
+
+        # Notas del curso en una sola consulta: {calificacion_id: [valores]}
+        notas_por_calificacion = defaultdict(list)
+        notas_qs = NotaIndividual.objects.filter(
+            calificacion__in=calificaciones.filter(course_id=cid)
+        ).order_by('calificacion_id', 'fecha_creacion', 'id').values_list('calificacion_id', 'valor')
+        for calificacion_id, valor in notas_qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            notas_por_calificacion[calificacion_id].append(valor)
+        max_notas = max((len(v) for v in notas_por_calificacion.values()), default=0)
+
+        col_prom = 3 + max_notas
+        headers = ['Estudiante', 'Curso Académico']
+        headers += [f'Nota {i + 1}' for i in range(max_notas)]
+        headers.append('Promedio')
+        anchos = {1: 30, 2: 22, col_prom: 12}
+        anchos.update({3 + i: 10 for i in range(max_notas)})
+        hoja = HojaStreaming(
+            wb, primera['course__name'], headers,
+            titulo=f"Calificaciones — {primera['course__name']}",
+            estilos_encabezado={3 + i: 'subencabezado' for i in range(max_notas)},
+            anchos_minimos=anchos,
+            freeze_panes='A3',
+        )
 
+        for cal in chain([primera], grupo):
+            fila = [
+                (nombre_completo(cal['student__first_name'], cal['student__last_name'], cal['student__username']), 'texto'),
+                (cal['curso_academico__nombre'] or '—', 'centro'),
+            ]
+            # Notas individuales
+            notas = notas_por_calificacion.get(cal['id'], [])
             for i in range(max_notas):
-                c = ws.cell(row=2, column=3 + i, value=f'Nota {i + 1}')
-                c.font = header_font; c.fill = nota_fill
-                c.alignment = center; c.border = thin_border
-
-            col_prom = 3 + max_notas
-            c = ws.cell(row=2, column=col_prom, value='Promedio')
-            c.font = header_font; c.fill = header_fill
-            c.alignment = center; c.border = thin_border
-
-            # Filas de datos
-            for row_num, cal in enumerate(cals, 3):
-                nombre    = cal.student.get_full_name() or cal.student.username
-                ca_nombre = cal.curso_academico.nombre if cal.curso_academico else '—'
-                notas     = list(cal.notas.all().order_by('fecha_creacion'))
-
-                c = ws.cell(row=row_num, column=1, value=nombre)
-                c.alignment = left_align; c.border = thin_border
-
-                c = ws.cell(row=row_num, column=2, value=ca_nombre)
-                c.alignment = center; c.border = thin_border
-
-                # Notas individuales
-                for i in range(max_notas):
-                    c = ws.cell(row=row_num, column=3 + i)
-                    c.border = thin_border
-                    c.alignment = center
-                    if i < len(notas):
-                        val = float(notas[i].valor)
-                        c.value = val
-                        if val >= 6:
-                            c.fill = aprobado_fill
-                            c.font = aprobado_font
-                        else:
-                            c.fill = reprobado_fill
-                            c.font = reprobado_font
-                    else:
-                        c.value = '—'
-                        c.fill = na_fill
-                        c.font = na_font
-
-                # Promedio
-                c = ws.cell(row=row_num, column=col_prom)
-                c.border = thin_border; c.alignment = center
-                if cal.average is not None:
-                    prom = float(cal.average)
-                    c.value = round(prom, 1)
-                    if prom >= 6:
-                        c.fill = aprobado_fill
-                        c.font = Font(name='Arial', bold=True, color='276221')
-                    else:
-                        c.fill = reprobado_fill
-                        c.font = Font(name='Arial', bold=True, color='9C0006')
+                if i < len(notas):
+                    val = float(notas[i])
+                    fila.append((val, 'ok' if val >= 6 else 'mal'))
                 else:
-                    c.value = 'N/A'
-                    c.fill = na_fill
-                    c.font = na_font
+                    fila.append(('—', 'na'))
+            # Promedio
+            if cal['average'] is not None:
+                prom = float(cal['average'])
+                fila.append((round(prom, 1), 'ok' if prom >= 6 else 'mal'))
+            else:
+                fila.append(('N/A', 'na'))
+            hoja.append(fila)
+        hoja.cerrar()
 
-            # Anchos de columna
-            ws.column_dimensions['A'].width = 30
-            ws.column_dimensions['B'].width = 22
-            for i in range(max_notas):
-                ws.column_dimensions[
-                    ws.cell(row=2, column=3 + i).column_letter
-                ].width = 10
-            ws.column_dimensions[
-                ws.cell(row=2, column=col_prom).column_letter
-            ].width = 12
+    if not hay_datos:
+        hoja = HojaStreaming(wb, "Sin datos", [], estilo_por_defecto=None)
+        hoja.append(["No se encontraron calificaciones con los filtros seleccionados."])
+        hoja.cerrar()
 
-            ws.freeze_panes = 'A3'
-
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="calificaciones.xlsx"'
-    return response
+    return guardar_libro(wb), "calificaciones.xlsx"
 
 
 # Vistas para Asistencias
@@ -4149,15 +3884,27 @@ class AsistenciaDetalleArchivadoView(BaseContextMixin, TemplateView):
 @login_required
 def export_asistencia_detalle_pdf(request, student_id, course_id):
     """Exporta el detalle de asistencias de un estudiante en un curso como PDF."""
-    student = get_object_or_404(User, id=student_id)
-    course  = get_object_or_404(Curso, id=course_id)
+    get_object_or_404(User, id=student_id)
+    get_object_or_404(Curso, id=course_id)
+    return _responder_reporte(
+        request, 'asistencia_detalle_pdf', {'student_id': student_id, 'course_id': course_id}
+    )
+
+
+@registrar_reporte('asistencia_detalle_pdf', adjunto=False, reutilizable=True, datos_academicos=True)
+def _reporte_asistencia_detalle_pdf(parametros):
+    student = User.objects.get(id=parametros['student_id'])
+    course  = Curso.objects.get(id=parametros['course_id'])
 
     asistencias = Asistencia.objects.filter(
         student=student, course=course
     ).order_by('date')
 
-    total    = asistencias.count()
-    presentes = asistencias.filter(presente=True).count()
+    totales = asistencias.aggregate(
+        total=Count('id'), presentes=Count('id', filter=Q(presente=True))
+    )
+    total     = totales['total']
+    presentes = totales['presentes']
     ausentes  = total - presentes
     porcentaje = round((presentes / total) * 100, 2) if total > 0 else 0
 
@@ -4170,164 +3917,92 @@ def export_asistencia_detalle_pdf(request, student_id, course_id):
         'ausentes':   ausentes,
         'porcentaje': porcentaje,
     }
-    return render_to_pdf('asistencia_detalle_pdf.html', context)
+    return (
+        renderizar_pdf('asistencia_detalle_pdf.html', context),
+        f"asistencias_{student.username}_{course.id}.pdf",
+    )
 
 
-@login_required
-def export_asistencias_curso_excel(request, course_id):
-    """
-    Exporta a Excel una tabla con todos los estudiantes del curso,
-    sus asistencias por fecha y su porcentaje de asistencia.
+def _escribir_hoja_asistencias(wb, course_id, course_name, alumnos, titulo_hoja=None):
     """
-    course = get_object_or_404(Curso, id=course_id)
-
-    # Obtener matrículas activas del curso
-    matriculas = Matriculas.objects.filter(
-        course=course, activo=True
-    ).select_related('student').order_by('student__first_name', 'student__last_name', 'student__username')
+    Escribe la hoja de asistencias de un curso: una fila por estudiante,
+    una columna por fecha y el % de asistencia al final.
 
-    # Obtener todas las fechas únicas con asistencias registradas, ordenadas
-    fechas = list(
-        Asistencia.objects.filter(course=course)
-        .values_list('date', flat=True)
-        .distinct()
-        .order_by('date')
-    )
+    alumnos: iterable de tuplas (student_id, nombre). Las asistencias del
+    curso se leen en una sola consulta (MatrizAsistencia).
+    """
+    matriz = asistencias_service.MatrizAsistencia.del_curso(course_id)
+    fechas = matriz.fechas
 
-    # Estilos
-    header_font       = Font(name='Arial', bold=True, color='FFFFFF')
-    header_fill       = PatternFill(start_color='003366', end_color='003366', fill_type='solid')
-    subheader_fill    = PatternFill(start_color='1F5C99', end_color='1F5C99', fill_type='solid')
-    presente_fill     = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-    ausente_fill      = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-    pct_ok_fill       = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-    pct_warn_fill     = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
-    pct_bad_fill      = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-    center            = Alignment(horizontal='center', vertical='center')
-    left              = Alignment(horizontal='left',   vertical='center')
-    thin_border       = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'),  bottom=Side(style='thin')
+    col_offset = 5   # Estudiante + Total + Presentes + Ausentes + (empieza en col 5)
+    col_pct = col_offset + len(fechas)
+    headers = ['Estudiante', 'Total Clases', 'Presentes', 'Ausentes']
+    headers += [fecha.strftime('%d/%m/%Y') for fecha in fechas]
+    headers.append('% Asistencia')
+    anchos = {1: 30, 2: 14, 3: 14, 4: 14, col_pct: 14}
+    anchos.update({col_offset + i: 12 for i in range(len(fechas))})
+
+    hoja = HojaStreaming(
+        wb, titulo_hoja or course_name, headers,
+        titulo=f"Asistencias — {course_name}",
+        estilos_encabezado={col_offset + i: 'subencabezado' for i in range(len(fechas))},
+        anchos_minimos=anchos,
+        freeze_panes='B3',
     )
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Asistencias"
-
-    # ── Fila 1: título del curso ──────────────────────────────────────────────
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(fechas) + 4)
-    title_cell = ws.cell(row=1, column=1, value=f"Asistencias — {course.name}")
-    title_cell.font = Font(name='Arial', bold=True, size=14, color='FFFFFF')
-    title_cell.fill = PatternFill(start_color='001F4D', end_color='001F4D', fill_type='solid')
-    title_cell.alignment = center
-    ws.row_dimensions[1].height = 28
-
-    # ── Fila 2: encabezados ───────────────────────────────────────────────────
-    headers_fijos = ['Estudiante', 'Total Clases', 'Presentes', 'Ausentes']
-    col_offset = len(headers_fijos) + 1   # columna donde empiezan las fechas
-
-    for col, h in enumerate(headers_fijos, 1):
-        c = ws.cell(row=2, column=col, value=h)
-        c.font = header_font
-        c.fill = header_fill
-        c.alignment = center
-        c.border = thin_border
-
-    for i, fecha in enumerate(fechas):
-        c = ws.cell(row=2, column=col_offset + i, value=fecha.strftime('%d/%m/%Y'))
-        c.font = header_font
-        c.fill = subheader_fill
-        c.alignment = center
-        c.border = thin_border
-
-    # columna % al final
-    col_pct = col_offset + len(fechas)
-    c = ws.cell(row=2, column=col_pct, value='% Asistencia')
-    c.font = header_font
-    c.fill = header_fill
-    c.alignment = center
-    c.border = thin_border
-
-    # ── Filas de datos ────────────────────────────────────────────────────────
-    for row_num, matricula in enumerate(matriculas, 3):
-        student = matricula.student
-        nombre = student.get_full_name() or student.username
-
-        # Asistencias de este estudiante indexadas por fecha
-        asistencias_qs = Asistencia.objects.filter(student=student, course=course)
-        asistencias_dict = {a.date: a.presente for a in asistencias_qs}
-
-        total   = len(fechas)
-        present = sum(1 for f in fechas if asistencias_dict.get(f) is True)
+    total = len(fechas)
+    for student_id, nombre in alumnos:
+        present = matriz.presentes(student_id)
         absent  = total - present
         pct     = round((present / total) * 100, 1) if total > 0 else 0.0
 
-        # Nombre
-        c = ws.cell(row=row_num, column=1, value=nombre)
-        c.alignment = left
-        c.border = thin_border
-
-        # Total / Presentes / Ausentes
-        for col, val in zip([2, 3, 4], [total, present, absent]):
-            c = ws.cell(row=row_num, column=col, value=val)
-            c.alignment = center
-            c.border = thin_border
-
-        # Columnas de fechas
-        for i, fecha in enumerate(fechas):
-            presente = asistencias_dict.get(fecha)
+        fila = [(nombre, 'texto'), (total, 'centro'), (present, 'centro'), (absent, 'centro')]
+        for presente in matriz.marcas(student_id):
             if presente is True:
-                texto = '✓'
-                fill  = presente_fill
+                fila.append(('✓', 'presente'))
             elif presente is False:
-                texto = '✗'
-                fill  = ausente_fill
+                fila.append(('✗', 'ausente'))
             else:
-                texto = '—'
-                fill  = None
-            c = ws.cell(row=row_num, column=col_offset + i, value=texto)
-            c.alignment = center
-            c.border = thin_border
-            if fill:
-                c.fill = fill
-
-        # % Asistencia
-        c = ws.cell(row=row_num, column=col_pct, value=f'{pct}%')
-        c.alignment = center
-        c.border = thin_border
+                fila.append(('—', 'centro'))
         if pct >= 75:
-            c.fill = pct_ok_fill
-            c.font = Font(name='Arial', bold=True, color='276221')
+            fila.append((f'{pct}%', 'ok'))
         elif pct >= 50:
-            c.fill = pct_warn_fill
-            c.font = Font(name='Arial', bold=True, color='7D5A00')
+            fila.append((f'{pct}%', 'aviso'))
         else:
-            c.fill = pct_bad_fill
-            c.font = Font(name='Arial', bold=True, color='9C0006')
+            fila.append((f'{pct}%', 'mal'))
+        hoja.append(fila)
+    hoja.cerrar()
 
-    # ── Ajustar anchos de columna ─────────────────────────────────────────────
-    ws.column_dimensions['A'].width = 30   # Nombre
-    for col in ['B', 'C', 'D']:
-        ws.column_dimensions[col].width = 14
-    for i in range(len(fechas)):
-        col_letter = ws.cell(row=2, column=col_offset + i).column_letter
-        ws.column_dimensions[col_letter].width = 12
-    ws.column_dimensions[ws.cell(row=2, column=col_pct).column_letter].width = 14
 
-    # Congelar la primera columna y la fila de encabezados
-    ws.freeze_panes = 'B3'
+@login_required
+def export_asistencias_curso_excel(request, course_id):
+    """
+    Exporta a Excel una tabla con todos los estudiantes del curso,
+    sus asistencias por fecha y su porcentaje de asistencia.
+    """
+    get_object_or_404(Curso, id=course_id)
+    return _responder_reporte(request, 'asistencias_curso_excel', {'course_id': course_id})
+
+
+@registrar_reporte('asistencias_curso_excel', content_type=XLSX_CONTENT_TYPE, extension='xlsx',
+                   reutilizable=True, datos_academicos=True)
+def _reporte_asistencias_curso_excel(parametros):
+    course = Curso.objects.get(id=parametros['course_id'])
+
+    # Matrículas activas del curso
+    alumnos = (
+        (m['student_id'], nombre_completo(m['student__first_name'], m['student__last_name'], m['student__username']))
+        for m in Matriculas.objects.filter(course=course, activo=True)
+        .order_by('student__first_name', 'student__last_name', 'student__username')
+        .values('student_id', 'student__first_name', 'student__last_name', 'student__username')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
 
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    wb = crear_libro()
+    _escribir_hoja_asistencias(wb, course.id, course.name, alumnos, titulo_hoja="Asistencias")
 
     filename = f"asistencias_{course.name.replace(' ', '_')}.xlsx"
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    return guardar_libro(wb), filename
 
 
 @login_required
@@ -4337,176 +4012,53 @@ def export_asistencias_excel(request):
     asistencias_list (curso_academico, curso, estudiante).
     Genera una hoja por cada curso presente en los resultados.
     """
+    filtros = _filtros_reporte(request, ('curso_academico', 'curso', 'estudiante'))
+    return _responder_reporte(request, 'asistencias_excel', filtros)
+
+
+@registrar_reporte('asistencias_excel', content_type=XLSX_CONTENT_TYPE, extension='xlsx',
+                   reutilizable=True, datos_academicos=True)
+def _reporte_asistencias_excel(filtros):
     # ── Aplicar los mismos filtros que AsistenciasListView ────────────────────
-    matriculas = Matriculas.objects.select_related(
-        'student', 'course', 'curso_academico'
-    ).filter(activo=True)
+    matriculas = Matriculas.objects.filter(activo=True)
 
-    curso_academico_id = request.GET.get('curso_academico')
+    curso_academico_id = filtros.get('curso_academico')
     if curso_academico_id:
         matriculas = matriculas.filter(curso_academico__id=curso_academico_id)
 
-    curso_id = request.GET.get('curso')
+    curso_id = filtros.get('curso')
     if curso_id:
         matriculas = matriculas.filter(course__id=curso_id)
 
-    estudiante_id = request.GET.get('estudiante')
+    estudiante_id = filtros.get('estudiante')
     if estudiante_id:
         matriculas = matriculas.filter(student__id=estudiante_id)
 
-    matriculas = matriculas.order_by(
-        'course__name', 'student__first_name', 'student__last_name', 'student__username'
-    )
-
-    # ── Estilos ───────────────────────────────────────────────────────────────
-    header_font    = Font(name='Arial', bold=True, color='FFFFFF')
-    header_fill    = PatternFill(start_color='003366', end_color='003366', fill_type='solid')
-    subheader_fill = PatternFill(start_color='1F5C99', end_color='1F5C99', fill_type='solid')
-    presente_fill  = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-    ausente_fill   = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-    pct_ok_fill    = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-    pct_warn_fill  = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
-    pct_bad_fill   = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-    center         = Alignment(horizontal='center', vertical='center')
-    left_align     = Alignment(horizontal='left',   vertical='center')
-    thin_border    = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'),  bottom=Side(style='thin')
-    )
-
-    wb = openpyxl.Workbook()
-    wb.remove(wb.active)   # eliminar hoja vacía por defecto
-
-    # ── Agrupar matrículas por curso ──────────────────────────────────────────
-    from itertools import groupby
-    from operator import attrgetter
-
-    cursos_vistos = {}
-    for matricula in matriculas:
-        cid = matricula.course.id
-        if cid not in cursos_vistos:
-            cursos_vistos[cid] = {'course': matricula.course, 'matriculas': []}
-        cursos_vistos[cid]['matriculas'].append(matricula)
+    filas = matriculas.order_by(
+        'course__name', 'course_id', 'student__first_name', 'student__last_name', 'student__username'
+    ).values(
+        'course_id', 'course__name', 'student_id',
+        'student__first_name', 'student__last_name', 'student__username',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    wb = crear_libro()
+    hay_datos = False
+    for cid, grupo in groupby(filas, key=itemgetter('course_id')):
+        primera = next(grupo)
+        hay_datos = True
+        alumnos = (
+            (m['student_id'], nombre_completo(m['student__first_name'], m['student__last_name'], m['student__username']))
+            for m in chain([primera], grupo)
+        )
+        _escribir_hoja_asistencias(wb, cid, primera['course__name'], alumnos)
 
-    if not cursos_vistos:
+    if not hay_datos:
         # Sin datos: devolver Excel con mensaje
-        ws = wb.create_sheet(title="Sin datos")
-        ws['A1'] = "No se encontraron estudiantes con los filtros seleccionados."
-    else:
-        for cid, grupo in cursos_vistos.items():
-            course      = grupo['course']
-            mats        = grupo['matriculas']
-            sheet_title = course.name[:31]   # Excel limita a 31 chars
-
-            # Fechas únicas del curso ordenadas
-            fechas = list(
-                Asistencia.objects.filter(course=course)
-                .values_list('date', flat=True)
-                .distinct()
-                .order_by('date')
-            )
-
-            ws = wb.create_sheet(title=sheet_title)
-            col_offset = 5   # Estudiante + Total + Presentes + Ausentes + (empieza en col 5)
-
-            # Fila 1: título
-            total_cols = col_offset + len(fechas)   # última col = %
-            ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=total_cols)
-            tc = ws.cell(row=1, column=1, value=f"Asistencias — {course.name}")
-            tc.font = Font(name='Arial', bold=True, size=13, color='FFFFFF')
-            tc.fill = PatternFill(start_color='001F4D', end_color='001F4D', fill_type='solid')
-            tc.alignment = center
-            ws.row_dimensions[1].height = 26
-
-            # Fila 2: encabezados fijos
-            for col, h in enumerate(['Estudiante', 'Total Clases', 'Presentes', 'Ausentes'], 1):
-                c = ws.cell(row=2, column=col, value=h)
-                c.font = header_font; c.fill = header_fill
-                c.alignment = center; c.border = thin_border
-
-            # Encabezados de fechas
-            for i, fecha in enumerate(fechas):
-                c = ws.cell(row=2, column=col_offset + i, value=fecha.strftime('%d/%m/%Y'))
-                c.font = header_font; c.fill = subheader_fill
-                c.alignment = center; c.border = thin_border
-
-            # Columna % al final
-            col_pct = col_offset + len(fechas)
-            c = ws.cell(row=2, column=col_pct, value='% Asistencia')
-            c.font = header_font; c.fill = header_fill
-            c.alignment = center; c.border = thin_border
-
-            # Filas de datos
-            for row_num, matricula in enumerate(mats, 3):
-                student = matricula.student
-                nombre  = student.get_full_name() or student.username
-
-                asistencias_dict = {
-                    a.date: a.presente
-                    for a in Asistencia.objects.filter(student=student, course=course)
-                }
-
-                total   = len(fechas)
-                present = sum(1 for f in fechas if asistencias_dict.get(f) is True)
-                absent  = total - present
-                pct     = round((present / total) * 100, 1) if total > 0 else 0.0
-
-                c = ws.cell(row=row_num, column=1, value=nombre)
-                c.alignment = left_align; c.border = thin_border
-
-                for col, val in zip([2, 3, 4], [total, present, absent]):
-                    c = ws.cell(row=row_num, column=col, value=val)
-                    c.alignment = center; c.border = thin_border
-
-                for i, fecha in enumerate(fechas):
-                    presente = asistencias_dict.get(fecha)
-                    if presente is True:
-                        texto, fill = '✓', presente_fill
-                    elif presente is False:
-                        texto, fill = '✗', ausente_fill
-                    else:
-                        texto, fill = '—', None
-                    c = ws.cell(row=row_num, column=col_offset + i, value=texto)
-                    c.alignment = center; c.border = thin_border
-                    if fill:
-                        c.fill = fill
-
-                c = ws.cell(row=row_num, column=col_pct, value=f'{pct}%')
-                c.alignment = center; c.border = thin_border
-                if pct >= 75:
-                    c.fill = pct_ok_fill
-                    c.font = Font(name='Arial', bold=True, color='276221')
-                elif pct >= 50:
-                    c.fill = pct_warn_fill
-                    c.font = Font(name='Arial', bold=True, color='7D5A00')
-                else:
-                    c.fill = pct_bad_fill
-                    c.font = Font(name='Arial', bold=True, color='9C0006')
-
-            # Anchos de columna
-            ws.column_dimensions['A'].width = 30
-            for col in ['B', 'C', 'D']:
-                ws.column_dimensions[col].width = 14
-            for i in range(len(fechas)):
-                ws.column_dimensions[
-                    ws.cell(row=2, column=col_offset + i).column_letter
-                ].width = 12
-            ws.column_dimensions[
-                ws.cell(row=2, column=col_pct).column_letter
-            ].width = 14
-
-            ws.freeze_panes = 'B3'
-
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+        hoja = HojaStreaming(wb, "Sin datos", [], estilo_por_defecto=None)
+        hoja.append(["No se encontraron estudiantes con los filtros seleccionados."])
+        hoja.cerrar()
 
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="asistencias.xlsx"'
-    return response
+    return guardar_libro(wb), "asistencias.xlsx"
 
 
 class StudentCourseNotesView(BaseContextMixin, ListView):
@@ -4734,8 +4286,7 @@ class CoursesView(BaseContextMixin, TemplateView):
 
         user = self.request.user
         if user.is_authenticated:
-            group = Group.objects.filter(user=user).first()
-            context['group_name'] = group.name if group else None
+            context['group_name'] = get_auth_profile(user).primary_group
         else:
             context['group_name'] = None
 
@@ -4845,7 +4396,7 @@ class CourseUpdateView(BaseContextMixin, UpdateView):
 @login_required
 def eliminar_curso(request, curso_id):
     # Verificar si el usuario pertenece al grupo 'Secretaría'
-    if request.user.groups.filter(name='Secretaría').exists():
+    if get_auth_profile(request.user).in_group('Secretaría'):
         try:
             # Obtener el curso
             curso = Curso.objects.get(id=curso_id)
@@ -5131,31 +4682,33 @@ class AddNotaView(LoginRequiredMixin, View):
         # ── Obtener/crear Calificaciones ──────────────────────────────────────
         calificacion = self._get_calificacion(matricula)
 
-        # ── Eliminar notas marcadas ───────────────────────────────────────────
-        if deletes:
-            NotaIndividual.objects.filter(
-                calificacion=calificacion,
-                id__in=[d for d in deletes if d],
-            ).delete()
-
-        # ── Guardar / actualizar notas válidas ────────────────────────────────
-        for fila in filas_validas:
-            if fila['valor'] is None:
-                continue
-            if fila['id']:
-                # Actualizar existente
+        # El promedio se recalcula una sola vez al final (no por cada nota)
+        with transaction.atomic(), calificaciones_service.promedios_diferidos():
+            # ── Eliminar notas marcadas ───────────────────────────────────────
+            if deletes:
                 NotaIndividual.objects.filter(
-                    id=fila['id'], calificacion=calificacion
-                ).update(valor=fila['valor'])
-            else:
-                # Crear nueva
-                NotaIndividual.objects.create(
                     calificacion=calificacion,
-                    valor=fila['valor'],
-                )
+                    id__in=[d for d in deletes if d],
+                ).delete()
 
-        # Recalcular promedio
-        calificacion.save()
+            # ── Guardar / actualizar notas válidas ────────────────────────────
+            for fila in filas_validas:
+                if fila['valor'] is None:
+                    continue
+                if fila['id']:
+                    # Actualizar existente
+                    NotaIndividual.objects.filter(
+                        id=fila['id'], calificacion=calificacion
+                    ).update(valor=fila['valor'])
+                else:
+                    # Crear nueva
+                    NotaIndividual.objects.create(
+                        calificacion=calificacion,
+                        valor=fila['valor'],
+                    )
+
+            # Las actualizaciones con .update() no emiten señales
+            calificaciones_service.promedio_modificado(calificacion.pk)
 
         messages.success(request, 'Calificaciones guardadas correctamente.')
         return self._redirect_after_save(request, matricula)
@@ -5210,12 +4763,6 @@ class AsistenciaView(BaseContextMixin, TemplateView):
         # Obtener el curso académico activo
         curso_academico_activo = CursoAcademico.objects.filter(activo=True).first()
         
-        # Filtrar asistencias — incluir todos los estudiantes del curso académico activo
-        asistencias = Asistencia.objects.filter(
-            course=course,
-            student__matriculas__curso_academico=curso_academico_activo,
-        ).select_related('student', 'course').order_by('-date').distinct()
-        
         # Todas las matrículas del curso: activos (estado='P') primero, luego inactivos
         matriculas_qs = Matriculas.objects.filter(
             course=course,
@@ -5224,16 +4771,31 @@ class AsistenciaView(BaseContextMixin, TemplateView):
             Case(When(estado='P', then=0), default=1, output_field=IntegerField()),
             'student__first_name', 'student__last_name'
         )
-        # Anotar cada matrícula con flag de activo en semestre para el template
         matriculas = list(matriculas_qs)
-        for m in matriculas:
-            m.es_activo_semestre = (m.estado == 'P')
-        
+
+        # Asistencias de los estudiantes del curso académico activo en una
+        # sola consulta; la tabla muestra las fechas más recientes primero
+        matriz = asistencias_service.MatrizAsistencia.del_curso(
+            course.id, [m.student_id for m in matriculas]
+        )
+        fechas = matriz.fechas[::-1]
+
         # Filtrar por fecha si se proporciona en la solicitud
         fecha_filtro = self.request.GET.get('fecha')
         if fecha_filtro:
-            asistencias = asistencias.filter(date=fecha_filtro)
-        
+            try:
+                fecha = datetime.strptime(fecha_filtro, '%Y-%m-%d').date()
+            except ValueError:
+                fecha = None
+            fechas = [f for f in fechas if f == fecha]
+
+        # Anotar cada matrícula con flag de activo en semestre, sus marcas por
+        # fecha y su resumen de asistencias para el template
+        for m in matriculas:
+            m.es_activo_semestre = (m.estado == 'P')
+            m.marcas_asistencia = matriz.marcas(m.student_id, fechas)
+            m.resumen_asistencia = matriz.resumen(m.student_id)
+
         # Calcular la cantidad de asistencias registradas (fechas únicas)
         asistencias_registradas = Asistencia.objects.filter(course=course).values('date').distinct().count()
         
@@ -5244,7 +4806,7 @@ class AsistenciaView(BaseContextMixin, TemplateView):
         clases_restantes = cantidad_total_clases - asistencias_registradas
 
         context['course'] = course
-        context['asistencias'] = asistencias
+        context['fechas_asistencia'] = fechas
         context['matriculas'] = matriculas
         context['curso_academico'] = curso_academico_activo
         context['cantidad_total_clases'] = cantidad_total_clases
@@ -5270,14 +4832,12 @@ class AddAsistenciaView(LoginRequiredMixin, TemplateView):
         matriculas = list(matriculas_qs)
         for m in matriculas:
             m.es_activo_semestre = (m.estado == 'P')
-        asistencias = Asistencia.objects.order_by('date')
 
         asistencias_registradas = Asistencia.objects.filter(course=course).values('date').distinct().count()
         clases_restantes = course.class_quantity - asistencias_registradas
 
         context['course'] = course
         context['matriculas'] = matriculas
-        context['asistencias'] = asistencias
         context['today'] = date.today()
         context['clases_restantes'] = clases_restantes
         context['modo_modificar'] = clases_restantes <= 0
@@ -5289,33 +4849,29 @@ class AddAsistenciaView(LoginRequiredMixin, TemplateView):
         matriculas = Matriculas.objects.filter(course=course, estado='P')
 
         if request.method == 'POST':
-            date_str = request.POST.get('date')
+            try:
+                attendance_date = datetime.strptime(request.POST.get('date') or '', '%Y-%m-%d').date()
+            except ValueError:
+                messages.error(request, "Formato de fecha inválido.")
+                return redirect('principal:add_asistencias', course_id=course_id)
 
             # Calcular clases restantes
             asistencias_registradas = Asistencia.objects.filter(course=course).values('date').distinct().count()
             clases_restantes = course.class_quantity - asistencias_registradas
 
             # Verificar si la fecha ya tiene asistencias registradas
-            fecha_ya_existe = Asistencia.objects.filter(course=course, date=date_str).exists()
+            fecha_ya_existe = Asistencia.objects.filter(course=course, date=attendance_date).exists()
 
             # Si no quedan clases y la fecha es nueva, bloquear
             if clases_restantes <= 0 and not fecha_ya_existe:
                 messages.error(request, "No quedan clases disponibles. Solo puedes modificar asistencias de fechas ya registradas.")
                 return redirect('principal:add_asistencias', course_id=course_id)
 
-            for matricula in matriculas:
-                absent = request.POST.get('asistencia_' + str(matricula.id))
-                # Buscar si ya existe un registro de asistencia para este estudiante en esta fecha
-                asistencia, created = Asistencia.objects.get_or_create(
-                    student=matricula.student,
-                    course=course,
-                    date=date_str,
-                    defaults={'presente': not bool(absent)}
-                )
-                # Si el registro ya existía, actualizar el estado de presente
-                if not created:
-                    asistencia.presente = not bool(absent)
-                    asistencia.save()
+            # La casilla marcada indica ausencia; toda la sesión en un solo INSERT
+            asistencias_service.registrar_sesion(course, attendance_date, {
+                student_id: not request.POST.get(f'asistencia_{matricula_id}')
+                for matricula_id, student_id in matriculas.values_list('id', 'student_id')
+            })
 
         # Redirigir a la misma página para mostrar las asistencias actualizadas
         return redirect('principal:asistencias', course_id=course_id)
@@ -5331,6 +4887,7 @@ def eliminar_asistencia(request, asistencia_id):
     
     # Eliminar la asistencia
     asistencia.delete()
+    reportes_service.datos_modificados(course_id)
     
     # Redirigir a la página de asistencias del curso
     return redirect('principal:asistencias', course_id=course_id)
@@ -5349,19 +4906,18 @@ def add_asistencias(request, course_id):
             messages.error(request, "Formato de fecha inválido.")
             return redirect('principal:add_asistencias', course_id=course.id)
 
-        # Eliminar asistencias existentes para esta fecha y curso
-        Asistencia.objects.filter(course=course, date=attendance_date).delete()
-
-        for matricula in matriculas:
-            is_absent = request.POST.get(f'asistencia_{matricula.id}')
-            presente = not bool(is_absent) # Si está marcado, significa que está ausente, por lo tanto, no presente
-
-            Asistencia.objects.create(
-                course=course,
-                student=matricula.student,
-                date=attendance_date,
-                presente=presente
-            )
+        # Si está marcado, significa que está ausente, por lo tanto, no presente
+        presencias = {
+            student_id: not request.POST.get(f'asistencia_{matricula_id}')
+            for matricula_id, student_id in matriculas.values_list('id', 'student_id')
+        }
+        with transaction.atomic():
+            # La fecha queda solo con los estudiantes activos, como antes al
+            # borrarla y volver a crearla
+            Asistencia.objects.filter(course=course, date=attendance_date).exclude(
+                student_id__in=presencias
+            ).delete()
+            asistencias_service.registrar_sesion(course, attendance_date, presencias)
         messages.success(request, "Asistencias guardadas correctamente.")
         return redirect('principal:asistencias', course_id=course.id) # Redirige a la página de asistencias del curso
     
@@ -5406,14 +4962,14 @@ class SecretariaRequiredMixin(UserPassesTestMixin):
     Mixin que verifica que el usuario pertenezca al grupo Secretaría.
     """
     def test_func(self):
-        return self.request.user.groups.filter(name='Secretaría').exists()
+        return get_auth_profile(self.request.user).in_group('Secretaría')
 
 class ProfesorRequiredMixin(UserPassesTestMixin):
     """
     Mixin que verifica que el usuario pertenezca al grupo Profesores.
     """
     def test_func(self):
-        return self.request.user.groups.filter(name='Profesores').exists()
+        return get_auth_profile(self.request.user).in_group('Profesores')
 
 class FormularioAplicacionListView(LoginRequiredMixin, SecretariaRequiredMixin, ListView):
     """
@@ -6000,6 +5556,29 @@ def exportar_reglamento_general_pdf(request):
     Vista para exportar el reglamento general del centro en PDF.
     Si existe un ReglamentoGeneral dinámico lo usa; si no, usa el contenido estático.
     """
+    import hashlib
+    import json
+
+    # La versión (fecha de modificación del reglamento y huella de sus artículos,
+    # que no tienen fecha propia) y el año forman parte de la cache_key: editar
+    # el reglamento o un artículo, o cambiar de año, invalida el PDF ya generado.
+    reglamento = ReglamentoGeneral.objects.only('fecha_modificacion').first()
+    version = None
+    if reglamento:
+        articulos = list(
+            reglamento.articulos.order_by('pk').values_list('pk', 'orden', 'titulo', 'cuerpo')
+        )
+        version = hashlib.sha256(
+            json.dumps([reglamento.fecha_modificacion.isoformat(), articulos]).encode()
+        ).hexdigest()
+    return _responder_reporte(request, 'reglamento_general_pdf', {
+        'version': version,
+        'ano': timezone.now().year,
+    })
+
+
+@registrar_reporte('reglamento_general_pdf', reutilizable=True)
+def _reporte_reglamento_general_pdf(parametros):
     reglamento = ReglamentoGeneral.objects.prefetch_related('articulos').first()
     dinamico = reglamento and (reglamento.introduccion.strip() or reglamento.articulos.exists())
 
@@ -6013,17 +5592,10 @@ def exportar_reglamento_general_pdf(request):
     }
     
     # Generar el PDF usando la plantilla específica para PDF
-    template = get_template('registration/reglamento_general_pdf.html')
-    html = template.render(context)
-    result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
-    
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="Reglamento_General_CFBC.pdf"'
-        return response
-    
-    return HttpResponse('Error al generar el PDF', status=500)
+    return (
+        renderizar_pdf('registration/reglamento_general_pdf.html', context),
+        'Reglamento_General_CFBC.pdf',
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -6461,7 +6033,7 @@ def exportar_solicitudes_excel(request):
     Vista para exportar las solicitudes de inscripción a Excel según el filtro de estado.
     """
     # Verificar permisos - solo profesores y secretarías pueden exportar
-    if not request.user.groups.filter(name__in=['Profesores', 'Secretaría']).exists():
+    if not get_auth_profile(request.user).in_group('Profesores', 'Secretaría'):
         messages.error(request, 'No tienes permisos para exportar solicitudes.')
         return redirect('principal:solicitudes_list')
     
@@ -6552,7 +6124,7 @@ def guardar_pregunta_y_redirigir(request, formulario_id):
     Vista para guardar una pregunta y redirigir a la página de opciones.
     """
     # Verificar que el usuario pertenezca al grupo 'Secretaría'
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         messages.error(request, 'No tienes permisos para realizar esta acción.')
         return redirect('principal:formulario_list')
     
@@ -6620,7 +6192,7 @@ def eliminar_formulario(request, pk):
     Vista para eliminar un formulario de aplicación.
     """
     # Verificar que el usuario pertenezca al grupo Secretaría
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         messages.error(request, 'No tienes permisos para realizar esta acción.')
         return redirect('principal:cursos')
     
@@ -6848,7 +6420,7 @@ def exportar_solicitud_excel(request, solicitud_id):
     Incluye información del estudiante, solicitud y respuestas del formulario.
     """
     # Verificar permisos - solo profesores y secretarías pueden exportar
-    if not request.user.groups.filter(name__in=['Profesores', 'Secretaría']).exists():
+    if not get_auth_profile(request.user).in_group('Profesores', 'Secretaría'):
         messages.error(request, 'No tienes permisos para exportar esta solicitud.')
         return redirect('principal:solicitudes_list')
     
@@ -7067,7 +6639,7 @@ def obtener_historial_usuario(request, user_id):
     )
     
     # Verificar que el usuario sea secretaria
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         return JsonResponse({'error': 'No tiene permisos para ver esta información'}, status=403)
     
     try:
@@ -7356,19 +6928,20 @@ def _buscar_aplicaciones_historicas(user):
 
     También cubre el caso donde se guardó user_id directo, y FK directa.
     """
+    from datos_archivados.busqueda_service import filtro_claves_json
     from datos_archivados.models import DatoArchivadoDinamico
     from historial.models import HistoricalApplication
     from django.db.models import Q
 
     # Paso 1: encontrar el/los IDs del usuario en auth_user archivado
     datos_user = DatoArchivadoDinamico.objects.filter(
+        filtro_claves_json('username', [user.username]),
         tabla_origen='auth_user',
-        datos_originales__username=user.username
     )
     if not datos_user.exists() and user.email:
         datos_user = DatoArchivadoDinamico.objects.filter(
+            filtro_claves_json('email', [user.email]),
             tabla_origen='auth_user',
-            datos_originales__email=user.email
         )
     usuario_ids_originales = [
         d.datos_originales.get('id')
@@ -7384,8 +6957,8 @@ def _buscar_aplicaciones_historicas(user):
     # Paso 2: encontrar los IDs de Docencia_studentpersonalinformation para este usuario
     student_info_ids = list(
         DatoArchivadoDinamico.objects.filter(
+            filtro_claves_json('user_id', usuario_ids_originales),
             tabla_origen='Docencia_studentpersonalinformation',
-            datos_originales__user_id__in=usuario_ids_originales
         ).values_list('id_original', flat=True)
     )
 
@@ -7395,15 +6968,15 @@ def _buscar_aplicaciones_historicas(user):
 
     if student_info_ids:
         ids_por_student_id = DatoArchivadoDinamico.objects.filter(
+            filtro_claves_json('student_id', student_info_ids),
             tabla_origen='Docencia_application',
-            datos_originales__student_id__in=student_info_ids
         ).values_list('id_original', flat=True)
         q |= Q(id_original__in=ids_por_student_id)
 
     # También cubrir si algún registro usó user_id directo de auth_user
     ids_por_user_id = DatoArchivadoDinamico.objects.filter(
+        filtro_claves_json('user_id', usuario_ids_originales),
         tabla_origen='Docencia_application',
-        datos_originales__user_id__in=usuario_ids_originales
     ).values_list('id_original', flat=True)
     q |= Q(id_original__in=ids_por_user_id)
 
@@ -7418,6 +6991,7 @@ def _buscar_matriculas_historicas(user, usuario_ids_originales):
     Busca HistoricalEnrollment.
     Cadena: auth_user -> studentpersonalinformation.user_id -> enrollment.student_id
     """
+    from datos_archivados.busqueda_service import filtro_claves_json
     from datos_archivados.models import DatoArchivadoDinamico
     from historial.models import HistoricalEnrollment
     from django.db.models import Q
@@ -7429,22 +7003,22 @@ def _buscar_matriculas_historicas(user, usuario_ids_originales):
 
     student_info_ids = list(
         DatoArchivadoDinamico.objects.filter(
+            filtro_claves_json('user_id', usuario_ids_originales),
             tabla_origen='Docencia_studentpersonalinformation',
-            datos_originales__user_id__in=usuario_ids_originales
         ).values_list('id_original', flat=True)
     )
 
     q = Q(usuario=user)
     if student_info_ids:
         ids_por_student_id = DatoArchivadoDinamico.objects.filter(
+            filtro_claves_json('student_id', student_info_ids),
             tabla_origen='Docencia_enrollment',
-            datos_originales__student_id__in=student_info_ids
         ).values_list('id_original', flat=True)
         q |= Q(id_original__in=ids_por_student_id)
 
     ids_por_user_id = DatoArchivadoDinamico.objects.filter(
+        filtro_claves_json('user_id', usuario_ids_originales),
         tabla_origen='Docencia_enrollment',
-        datos_originales__user_id__in=usuario_ids_originales
     ).values_list('id_original', flat=True)
     q |= Q(id_original__in=ids_por_user_id)
 
@@ -7455,23 +7029,24 @@ def _buscar_matriculas_historicas(user, usuario_ids_originales):
 
 def _buscar_solicitudes_historicas(user, usuario_ids_originales):
     """Busca HistoricalEnrollmentApplication cubriendo user_id y student_id."""
+    from datos_archivados.busqueda_service import filtro_claves_json
     from datos_archivados.models import DatoArchivadoDinamico
     from historial.models import HistoricalEnrollmentApplication
     from django.db.models import Q
 
     if usuario_ids_originales:
         ids_por_user_id = DatoArchivadoDinamico.objects.filter(
+            filtro_claves_json('user_id', usuario_ids_originales),
             tabla_origen='Docencia_enrollmentapplication',
-            datos_originales__user_id__in=usuario_ids_originales
         ).values_list('id_original', flat=True)
         ids_por_student_id = DatoArchivadoDinamico.objects.filter(
+            filtro_claves_json('student_id', usuario_ids_originales),
             tabla_origen='Docencia_enrollmentapplication',
-            datos_originales__student_id__in=usuario_ids_originales
         ).values_list('id_original', flat=True)
         # También buscar por nombre completo (campo legacy)
         ids_por_nombre = DatoArchivadoDinamico.objects.filter(
+            filtro_claves_json('name', [user.get_full_name()]),
             tabla_origen='Docencia_enrollmentapplication',
-            datos_originales__name=user.get_full_name()
         ).values_list('id_original', flat=True) if user.get_full_name() else []
         todos_ids = set(list(ids_por_user_id) + list(ids_por_student_id) + list(ids_por_nombre))
         return HistoricalEnrollmentApplication.objects.filter(
@@ -7503,7 +7078,7 @@ def ver_detalles_historial_usuario(request, user_id):
     )
 
     # Verificar que el usuario sea secretaria
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         messages.error(request, 'No tiene permisos para ver esta información')
         return redirect('principal:profile')
 
@@ -7794,9 +7369,21 @@ def exportar_detalles_historial_pdf(request, user_id):
     """
     Vista para exportar el historial completo de un usuario a PDF.
     """
-    from django.template.loader import render_to_string
-    from xhtml2pdf import pisa
-    from io import BytesIO
+    # Verificar que el usuario sea secretaria
+    if not get_auth_profile(request.user).in_group('Secretaría'):
+        messages.error(request, 'No tiene permisos para exportar esta información')
+        return redirect('principal:profile')
+
+    if not User.objects.filter(id=user_id).exists():
+        messages.error(request, 'Usuario no encontrado')
+        return redirect('principal:usuarios_registrados')
+
+    return _responder_reporte(request, 'historial_pdf', {'user_id': user_id})
+
+
+@registrar_reporte('historial_pdf', reutilizable=True, datos_academicos=True)
+def _reporte_historial_pdf(parametros):
+    """Renderiza el historial completo de un usuario (ver exportar_detalles_historial_pdf)."""
     from historial.models import (
         HistoricalArea,
         HistoricalCourseCategory,
@@ -7813,16 +7400,7 @@ def exportar_detalles_historial_pdf(request, user_id):
         HistoricalClassStudentView,
     )
 
-    # Verificar que el usuario sea secretaria
-    if not request.user.groups.filter(name='Secretaría').exists():
-        messages.error(request, 'No tiene permisos para exportar esta información')
-        return redirect('principal:profile')
-
-    try:
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        messages.error(request, 'Usuario no encontrado')
-        return redirect('principal:usuarios_registrados')
+    user = User.objects.get(id=parametros['user_id'])
 
     # Obtener los mismos datos que en ver_detalles_historial_usuario
     historial_data = {
@@ -8041,20 +7619,8 @@ def exportar_detalles_historial_pdf(request, user_id):
         'usuario_historial': user,
     }
     
-    html_string = render_to_string('detalles_historial_usuario_pdf.html', context)
-    
-    # Crear el PDF
-    result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html_string.encode("UTF-8")), result)
-    
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        filename = f'historial_{user.username}_{user.id}.pdf'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    
-    messages.error(request, 'Error al generar el PDF')
-    return redirect('principal:detalles_historial_usuario', user_id=user_id)
+    filename = f'historial_{user.username}_{user.id}.pdf'
+    return renderizar_pdf('detalles_historial_usuario_pdf.html', context), filename
 
 
 # ── API AJAX para el admin: verificar si hay curso académico activo ───────────
@@ -8145,7 +7711,7 @@ def terminar_semestre_view(request, curso_id):
     from principal.models import Curso
 
     # Verificar permisos: solo Secretaría
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         return JsonResponse(
             {'success': False, 'error': 'No tienes permisos para realizar esta acción.'},
             status=403
@@ -8257,6 +7823,83 @@ def terminar_semestre_view(request, curso_id):
         )
 
 
+@login_required
+@require_POST
+def terminar_semestres_lote_view(request):
+    """
+    Endpoint AJAX para cerrar el semestre de varios cursos a la vez.
+    Solo accesible para el grupo Secretaría.
+
+    Body JSON esperado:
+      - cursos: lista de IDs de curso
+      - accion: 'terminar_semestre' | 'finalizar_curso'
+
+    Encola principal.tasks.terminar_semestres_task y retorna {success, task_id,
+    url_estado}; el progreso se consulta en estado_terminar_semestres_view.
+    """
+    import json
+    import uuid
+    from principal.semestre_service import guardar_progreso
+    from principal.tasks import terminar_semestres_task
+
+    if not get_auth_profile(request.user).in_group('Secretaría'):
+        return JsonResponse(
+            {'success': False, 'error': 'No tienes permisos para realizar esta acción.'},
+            status=403
+        )
+
+    try:
+        body = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        body = {}
+
+    try:
+        cursos_ids = [int(pk) for pk in body.get('cursos') or []]
+    except (TypeError, ValueError):
+        cursos_ids = []
+    if not cursos_ids:
+        return JsonResponse({'success': False, 'error': 'Debe indicar al menos un curso.'}, status=400)
+
+    finalizar = body.get('accion') == 'finalizar_curso'
+    task_id = uuid.uuid4().hex
+    guardar_progreso(task_id, {
+        'estado': 'pendiente', 'total': len(cursos_ids), 'procesados': 0,
+        'completados': 0, 'fallidos': 0, 'resultados': [],
+    })
+    try:
+        terminar_semestres_task.apply_async(
+            args=[task_id, cursos_ids], kwargs={'finalizar': finalizar}, task_id=task_id
+        )
+    except Exception as e:
+        logger.warning(f"No se pudo encolar el cierre de semestres {task_id}: {e}. Se ejecuta en línea.")
+        terminar_semestres_task.apply(
+            args=[task_id, cursos_ids], kwargs={'finalizar': finalizar}, task_id=task_id
+        )
+
+    return JsonResponse({
+        'success': True,
+        'task_id': task_id,
+        'url_estado': reverse('principal:estado_terminar_semestres', args=[task_id]),
+    })
+
+
+@login_required
+def estado_terminar_semestres_view(request, task_id):
+    """Progreso de un cierre de semestres en lote (contadores y tiempos por curso)."""
+    from principal.semestre_service import obtener_progreso
+
+    if not get_auth_profile(request.user).in_group('Secretaría'):
+        return JsonResponse(
+            {'success': False, 'error': 'No tienes permisos para realizar esta acción.'},
+            status=403
+        )
+
+    progreso = obtener_progreso(task_id)
+    if progreso is None:
+        return JsonResponse({'success': False, 'error': 'Proceso no encontrado o expirado.'}, status=404)
+    return JsonResponse({'success': True, **progreso})
+
+
 @login_required
 def revertir_semestre_view(request, curso_id):
     """
@@ -8277,7 +7920,7 @@ def revertir_semestre_view(request, curso_id):
     from principal.models import Curso, SemestreCurso, SolicitudInscripcion, Matriculas, Calificaciones, NotaIndividual, Asistencia
     from datos_archivados.models import SemestreCursoArchivado, MatriculaArchivada, CalificacionArchivada, NotaIndividualArchivada, AsistenciaArchivada, CursoArchivado
 
-    if not request.user.groups.filter(name='Secretaría').exists():
+    if not get_auth_profile(request.user).in_group('Secretaría'):
         return JsonResponse({'success': False, 'error': 'No tienes permisos para realizar esta acción.'}, status=403)
 
     try:
@@ -8429,6 +8072,9 @@ def revertir_semestre_view(request, curso_id):
                     fecha_inicio=semestre_archivado.fecha_inicio,
                     fecha_cierre=semestre_archivado.fecha_cierre,
                 )
+            # Los .update() de los pasos 2 y 4 no emiten la señal que mantiene
+            # Curso.semestre_activo_numero
+            Curso.objects.filter(pk=curso.pk).refresh_semestre_activo()
 
             # 5. Eliminar los datos archivados del semestre restaurado
             from datos_archivados.models import UsuarioArchivado
@@ -8448,6 +8094,9 @@ def revertir_semestre_view(request, curso_id):
             curso.status = 'P'
             curso.enrollment_deadline = None
             curso.start_date = None
+            # El .update() tampoco emite post_save: el catálogo cacheado se invalida aquí
+            transaction.on_commit(catalog_service.invalidate)
+            reportes_service.datos_modificados(curso.pk)
 
     except Exception as exc:
         import logging
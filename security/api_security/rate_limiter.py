@@ -0,0 +1,197 @@
+"""
+Motor de rate limiting compartido (GCRA sobre Redis).
+
+Lo usan cfbc.middleware.RateLimitMiddleware (límites por categoría de ruta)
+y PerUserRateLimitService (límite por usuario de security.middleware).
+
+Algoritmo GCRA (Generic Cell Rate Algorithm): por cada cliente se guarda un
+único valor, el TAT (theoretical arrival time). Con `requests` peticiones por
+`window` segundos cada petición "cuesta" window/requests y se admite mientras
+el TAT resultante no supere ahora + window. Equivale a una ventana deslizante
+sin contadores por ventana: admite ráfagas de hasta `requests` y luego se
+recarga de forma continua.
+
+Cada chequeo es un único EVALSHA de un script Lua (consultar el bloqueo,
+leer y avanzar el TAT, bloquear si se excede), así que es atómico ante
+peticiones concurrentes y cuesta un solo viaje a Redis. Con cachés que no
+son Redis (locmem en desarrollo y tests) se usa la misma lógica en Python
+protegida con un lock del proceso.
+
+Configuración (settings, opcional):
+  - RATE_LIMIT_CATEGORIES: dict que sobreescribe o amplía RATE_LIMITS, con
+    {'requests': int, 'window': segundos, 'block': segundos}. 'block' es el
+    tiempo de bloqueo al exceder el límite (0 = sin bloqueo, solo esperar).
+"""
+
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Límites por categoría: (requests por window segundos, bloqueo al exceder)
+RATE_LIMITS = {
+    'login': {'requests': 5, 'window': 60, 'block': 300},       # 5/min, bloqueo 5min
+    'api': {'requests': 30, 'window': 60, 'block': 120},        # 30/min, bloqueo 2min
+    'upload': {'requests': 10, 'window': 60, 'block': 300},     # 10/min, bloqueo 5min
+    'general': {'requests': 200, 'window': 60, 'block': 60},    # 200/min, bloqueo 1min
+    'user': {'requests': 100, 'window': 60, 'block': 60},       # por usuario autenticado
+}
+RATE_LIMITS.update(getattr(settings, 'RATE_LIMIT_CATEGORIES', {}))
+
+KEY_PREFIX = 'ratelimit'
+
+# Tolerancia (ms) para los errores de redondeo de window/requests
+_EPSILON_MS = 0.001
+
+# KEYS[1] = TAT del cliente, KEYS[2] = marca de bloqueo
+# ARGV = ahora (ms), coste por petición (ms), ventana (ms), bloqueo (ms)
+# Devuelve {admitida, restantes, espera_ms, bloqueada_ahora}
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local block = tonumber(ARGV[4])
+
+local blocked = redis.call('PTTL', KEYS[2])
+if blocked > 0 then
+    return {0, 0, blocked, 0}
+end
+
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local wait = new_tat - window - now
+if wait > 0.001 then
+    if block > 0 then
+        redis.call('SET', KEYS[2], '1', 'PX', block)
+        return {0, 0, block, 1}
+    end
+    return {0, 0, math.ceil(wait), 0}
+end
+
+local ttl = math.ceil(new_tat - now)
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', ttl)
+return {1, math.floor((window - (new_tat - now)) / interval + 0.000001), ttl, 0}
+"""
+
+
+class RateLimitDecision:
+    """Resultado de un chequeo del limitador."""
+
+    def __init__(self, allowed, remaining, limit, retry_after, reset_at, newly_blocked=False):
+        self.allowed = allowed
+        self.remaining = remaining
+        self.limit = limit
+        self.retry_after = retry_after    # segundos hasta poder reintentar / recarga completa
+        self.reset_at = reset_at          # timestamp unix (s)
+        self.newly_blocked = newly_blocked  # esta petición provocó el bloqueo
+
+
+_local_lock = threading.Lock()
+_scripts = {}
+
+
+def get_config(category, limit=None):
+    """Configuración de `category`; `limit` sustituye el número de peticiones."""
+    config = dict(RATE_LIMITS.get(category) or RATE_LIMITS['general'])
+    if limit is not None:
+        config['requests'] = limit
+    return config
+
+
+def check(category, identifier, config=None):
+    """
+    Registra una petición de `identifier` en `category` y decide si se admite.
+
+    Args:
+        category: Categoría de RATE_LIMITS
+        identifier: Cliente ('user:5', 'ip:1.2.3.4', ...)
+        config: Configuración explícita (por defecto get_config(category))
+
+    Returns:
+        RateLimitDecision
+    """
+    config = config or get_config(category)
+    limit = config['requests']
+    window_ms = config['window'] * 1000
+    interval_ms = window_ms / limit
+    block_ms = config.get('block', 0) * 1000
+    base_key = f'{KEY_PREFIX}:{category}:{identifier}'
+    now_ms = time.time() * 1000
+
+    try:
+        client = _redis_client()
+        if client is not None:
+            allowed, remaining, wait_ms, newly_blocked = _script(client)(
+                keys=[cache.make_key(base_key), cache.make_key(f'{base_key}:block')],
+                args=[f'{now_ms:.3f}', f'{interval_ms:.6f}', window_ms, block_ms],
+            )
+        else:
+            allowed, remaining, wait_ms, newly_blocked = _check_local(
+                base_key, now_ms, interval_ms, window_ms, block_ms
+            )
+    except Exception as e:
+        # Si la caché no responde se deja pasar: mejor sin límite que sin servicio
+        logger.warning(f'Rate limiter no disponible ({category}:{identifier}): {e}')
+        return RateLimitDecision(True, limit, limit, 0, int(now_ms / 1000))
+
+    retry_after = int(math.ceil(wait_ms / 1000))
+    return RateLimitDecision(
+        allowed=bool(allowed),
+        remaining=max(0, int(remaining)),
+        limit=limit,
+        retry_after=retry_after,
+        reset_at=int(now_ms / 1000) + retry_after,
+        newly_blocked=bool(newly_blocked),
+    )
+
+
+def reset(category, identifier):
+    """Elimina el estado y el bloqueo de un cliente."""
+    base_key = f'{KEY_PREFIX}:{category}:{identifier}'
+    cache.delete_many([base_key, f'{base_key}:block'])
+
+
+def _redis_client():
+    """Cliente Redis crudo si la caché por defecto es django_redis; si no, None."""
+    if not type(cache).__module__.startswith('django_redis'):
+        return None
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _script(client):
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(GCRA_SCRIPT)
+    return script
+
+
+def _check_local(base_key, now_ms, interval_ms, window_ms, block_ms):
+    """Mismo algoritmo que GCRA_SCRIPT sobre la API de caché, bajo un lock del proceso."""
+    block_key = f'{base_key}:block'
+    with _local_lock:
+        state = cache.get_many([base_key, block_key])
+        blocked_until = state.get(block_key, 0)
+        if blocked_until > now_ms:
+            return 0, 0, blocked_until - now_ms, 0
+
+        tat = max(state.get(base_key, now_ms), now_ms)
+        new_tat = tat + interval_ms
+        wait = new_tat - window_ms - now_ms
+        if wait > _EPSILON_MS:
+            if block_ms > 0:
+                cache.set(block_key, now_ms + block_ms, math.ceil(block_ms / 1000))
+                return 0, 0, block_ms, 1
+            return 0, 0, math.ceil(wait), 0
+
+        ttl = math.ceil(new_tat - now_ms)
+        cache.set(base_key, new_tat, math.ceil(ttl / 1000))
+        return 1, math.floor((window_ms - (new_tat - now_ms)) / interval_ms + 1e-6), ttl, 0
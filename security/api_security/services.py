@@ -19,12 +19,13 @@ from typing import List, Optional, Tuple
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.cache import cache
 from django.http import HttpRequest, HttpResponse
 from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from rest_framework_simplejwt.exceptions import TokenError
 
+from security import audit_sink
+from security.api_security import rate_limiter
 from security.models import APIKey, JWTSession, SecurityAuditLog
 
 logger = logging.getLogger(__name__)
@@ -59,11 +60,11 @@ class PerUserRateLimitService:
     - Respuesta HTTP 429 con header Retry-After cuando se excede
     """
 
-    DEFAULT_RATE_LIMIT = 100  # requests per minute
-    WINDOW_SECONDS = 60
+    # Categoría del limitador compartido (security.api_security.rate_limiter)
+    CATEGORY = 'user'
 
-    CACHE_PREFIX = 'ratelimit_user_'
-    BLOCK_PREFIX = 'ratelimit_blocked_'
+    DEFAULT_RATE_LIMIT = rate_limiter.RATE_LIMITS[CATEGORY]['requests']  # requests per minute
+    WINDOW_SECONDS = rate_limiter.RATE_LIMITS[CATEGORY]['window']
 
     @classmethod
     def check_rate_limit(
@@ -83,62 +84,33 @@ class PerUserRateLimitService:
         Returns:
             RateLimitResult: Resultado del chequeo
         """
-        if limit is None:
-            limit = cls.DEFAULT_RATE_LIMIT
-
-        # Verificar si el usuario está bloqueado
-        block_key = f'{cls.BLOCK_PREFIX}{user.id}'
-        blocked_until = cache.get(block_key)
-        if blocked_until:
-            remaining_seconds = int((blocked_until - timezone.now()).total_seconds())
-            if remaining_seconds > 0:
-                return RateLimitResult(
-                    is_allowed=False,
-                    remaining=0,
-                    retry_after=remaining_seconds,
-                    limit=limit,
-                )
-            else:
-                cache.delete(block_key)
-
-        # Obtener contador actual
-        cache_key = f'{cls.CACHE_PREFIX}{user.id}:{endpoint or "global"}'
-        current = cache.get(cache_key, 0)
-
-        if current >= limit:
-            # Bloquear por 60 segundos
-            block_until = timezone.now() + timedelta(seconds=cls.WINDOW_SECONDS)
-            cache.set(block_key, block_until, timeout=cls.WINDOW_SECONDS)
+        # Un solo viaje a Redis: bloqueo, contador y bloqueo nuevo en un script
+        config = rate_limiter.get_config(cls.CATEGORY, limit=limit)
+        limit = config['requests']
+        decision = rate_limiter.check(
+            cls.CATEGORY, f'{user.id}:{endpoint or "global"}', config
+        )
 
-            # Registrar evento
-            SecurityAuditLog.objects.create(
+        if decision.newly_blocked:
+            audit_sink.record(
+                SecurityAuditLog,
                 event_type=SecurityAuditLog.EventTypes.API_REQUEST,
                 user=user,
                 action='rate_limit_exceeded',
                 resource=f'api/{endpoint}' if endpoint else 'api',
                 details={
                     'limit': limit,
-                    'current': current,
+                    'current': limit,
                     'endpoint': endpoint,
                 },
                 severity=SecurityAuditLog.SeverityLevels.WARNING,
                 threat_level=4,
             )
 
-            return RateLimitResult(
-                is_allowed=False,
-                remaining=0,
-                retry_after=cls.WINDOW_SECONDS,
-                limit=limit,
-            )
-
-        # Incrementar contador
-        cache.set(cache_key, current + 1, timeout=cls.WINDOW_SECONDS)
-
         return RateLimitResult(
-            is_allowed=True,
-            remaining=limit - current - 1,
-            retry_after=0,
+            is_allowed=decision.allowed,
+            remaining=decision.remaining,
+            retry_after=0 if decision.allowed else max(1, decision.retry_after),
             limit=limit,
         )
 
@@ -9,6 +9,10 @@ from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from security.api_security import rate_limiter
 
 from security.api_security.services import (
     PerUserRateLimitService, RateLimitResult,
@@ -60,6 +64,84 @@ class PerUserRateLimitServiceTests(TestCase):
         headers = PerUserRateLimitService.get_rate_limit_headers(result)
         self.assertIn('Retry-After', headers)
 
+    def test_rate_limit_block_is_audited_once(self):
+        """Exceeding the limit should log a single audit event for the block."""
+        for i in range(13):
+            PerUserRateLimitService.check_rate_limit(self.user, limit=10)
+        self.assertEqual(
+            SecurityAuditLog.objects.filter(action='rate_limit_exceeded', user=self.user).count(), 1
+        )
+
+
+class RateLimiterTests(TestCase):
+    """Tests for the shared GCRA rate limiter."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_exact_limit_under_concurrency(self):
+        """Parallel clients should never get more than the limit admitted."""
+        config = {'requests': 50, 'window': 60, 'block': 0}
+
+        def hit(_):
+            return rate_limiter.check('api', 'ip:10.0.0.1', config).allowed
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(hit, range(200)))
+        self.assertEqual(sum(results), 50)
+
+    def test_refills_continuously(self):
+        """After the burst, one request is admitted every window/requests seconds."""
+        config = {'requests': 2, 'window': 10, 'block': 0}
+        with mock.patch('security.api_security.rate_limiter.time.time', return_value=1000.0) as now:
+            self.assertTrue(rate_limiter.check('api', 'c', config).allowed)
+            self.assertEqual(rate_limiter.check('api', 'c', config).remaining, 0)
+            denied = rate_limiter.check('api', 'c', config)
+            self.assertFalse(denied.allowed)
+            self.assertEqual(denied.retry_after, 5)
+
+            now.return_value = 1005.0
+            self.assertTrue(rate_limiter.check('api', 'c', config).allowed)
+            self.assertFalse(rate_limiter.check('api', 'c', config).allowed)
+
+    def test_block_after_exceeding(self):
+        """With a block period, the client stays blocked even after refilling."""
+        config = {'requests': 1, 'window': 10, 'block': 60}
+        with mock.patch('security.api_security.rate_limiter.time.time', return_value=1000.0) as now:
+            rate_limiter.check('login', 'ip:1.2.3.4', config)
+            blocked = rate_limiter.check('login', 'ip:1.2.3.4', config)
+            self.assertTrue(blocked.newly_blocked)
+            self.assertEqual(blocked.retry_after, 60)
+
+            now.return_value = 1030.0
+            again = rate_limiter.check('login', 'ip:1.2.3.4', config)
+            self.assertFalse(again.allowed)
+            self.assertFalse(again.newly_blocked)
+            self.assertEqual(again.retry_after, 30)
+
+            now.return_value = 1061.0
+            self.assertTrue(rate_limiter.check('login', 'ip:1.2.3.4', config).allowed)
+
+    def test_redis_single_script_call(self):
+        """With Redis, each check is one script invocation on both keys."""
+        script = mock.Mock(return_value=[1, 29, 2000, 0])
+        client = mock.Mock()
+        client.register_script.return_value = script
+        with mock.patch('security.api_security.rate_limiter._redis_client', return_value=client):
+            decision = rate_limiter.check('api', 'user:7', rate_limiter.get_config('api'))
+
+        self.assertTrue(decision.allowed)
+        self.assertEqual(decision.remaining, 29)
+        self.assertEqual(decision.retry_after, 2)
+        script.assert_called_once()
+        keys = script.call_args.kwargs['keys']
+        self.assertEqual(keys, [cache.make_key('ratelimit:api:user:7'), cache.make_key('ratelimit:api:user:7:block')])
+
+    def test_cache_failure_allows_request(self):
+        """If the cache is unavailable the request is allowed."""
+        with mock.patch('security.api_security.rate_limiter._check_local', side_effect=ConnectionError):
+            self.assertTrue(rate_limiter.check('api', 'user:7').allowed)
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # API Key Service Tests
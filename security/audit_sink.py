@@ -0,0 +1,273 @@
+"""
+Registro diferido de auditoría (SecurityAuditLog, AuditLog, AuthorizationAuditLog).
+
+Los servicios que auditan en rutas calientes (WAF, rate limiting por
+usuario, cifrado, descargas, decisiones de autorización) llaman a
+`record(Modelo, **campos)` en lugar de `Modelo.objects.create(...)`.
+
+Modos (AUDIT_SINK_MODE):
+  - 'sync': INSERT inmediato, como antes. Es el modo de los tests.
+  - 'buffer': el registro se construye en memoria (el timestamp y los
+    defaults se fijan en ese momento) y se añade a un buffer del proceso.
+    El buffer se drena al terminar la petición o la tarea de Celery, o al
+    llegar a AUDIT_SINK_BATCH_SIZE registros, con un único RPUSH a una
+    lista de Redis. La tarea periódica security.tasks.flush_audit_sink la
+    vacía con un bulk_create por modelo, así que el volumen de auditoría
+    escala con los workers de Celery y no con el tráfico web.
+
+Volcado: cada lote pasa con LMOVE de la cola a una lista de procesamiento y
+solo se borra de ella (confirmación) después de escribirse en la base de
+datos. Si el worker cae a mitad, el siguiente volcado escribe primero lo que
+quedó en procesamiento; un único volcado corre a la vez (FLUSH_RUNNING_KEY).
+
+Back-pressure: si la cola de Redis ya tiene AUDIT_SINK_MAX_PENDING
+registros, el proceso que drena escribe su lote directamente en la base de
+datos (y pide un volcado inmediato) en vez de seguir llenando Redis; ningún
+registro se descarta. Sin Redis (locmem en desarrollo) el buffer se escribe
+con bulk_create al drenarse.
+
+Al apagarse un worker de Celery o un proceso web el buffer pendiente se
+escribe directamente en la base de datos.
+"""
+
+import atexit
+import logging
+import pickle
+import threading
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DataError, IntegrityError, transaction
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'auditoria:pendientes'
+PROCESSING_KEY = 'auditoria:procesando'
+FLUSH_LOCK_KEY = 'auditoria:volcado-solicitado'
+FLUSH_RUNNING_KEY = 'auditoria:volcando'
+FLUSH_RUNNING_TIMEOUT = 300
+
+# KEYS[1] = cola; ARGV[1] = máximo de pendientes, ARGV[2..] = registros
+# Devuelve la longitud de la cola, o -1 si está llena y no se añadió nada
+PUSH_SCRIPT = """
+local limite = tonumber(ARGV[1])
+if redis.call('LLEN', KEYS[1]) + #ARGV - 1 > limite then
+    return -1
+end
+return redis.call('RPUSH', KEYS[1], unpack(ARGV, 2))
+"""
+
+_buffer = []
+_buffer_lock = threading.Lock()
+_scripts = {}
+
+
+def _mode():
+    return getattr(settings, 'AUDIT_SINK_MODE', 'buffer')
+
+
+def _batch_size():
+    return getattr(settings, 'AUDIT_SINK_BATCH_SIZE', 100)
+
+
+def _max_pending():
+    return getattr(settings, 'AUDIT_SINK_MAX_PENDING', 50000)
+
+
+def record(model, **fields):
+    """
+    Registra una fila de auditoría de `model`.
+
+    Args:
+        model: Clase del modelo de auditoría
+        **fields: Campos de la fila, como en objects.create
+
+    Returns:
+        Instancia del modelo (sin guardar todavía en modo 'buffer')
+    """
+    instance = model(**fields)
+    if _mode() == 'sync':
+        instance.save(force_insert=True)
+        return instance
+
+    entry = (
+        model._meta.label,
+        {
+            field.attname: getattr(instance, field.attname)
+            for field in model._meta.concrete_fields
+            if not field.primary_key
+        },
+    )
+    with _buffer_lock:
+        _buffer.append(entry)
+        full = len(_buffer) >= _batch_size()
+    if full:
+        drain()
+    return instance
+
+
+def drain(direct=False):
+    """
+    Vacía el buffer del proceso hacia la cola de Redis (o a la base de datos
+    si no hay Redis, si la cola está llena o si `direct`).
+
+    Si la base de datos no responde los registros vuelven al buffer para el
+    siguiente drenado.
+
+    Returns:
+        int: Registros drenados
+    """
+    global _buffer
+    with _buffer_lock:
+        records, _buffer = _buffer, []
+    if not records:
+        return 0
+
+    if not direct:
+        try:
+            client = _redis_client()
+            if client is not None and _push(client, records):
+                return len(records)
+        except Exception as e:
+            logger.warning(f'Cola de auditoría no disponible, escribiendo {len(records)} registros: {e}')
+
+    try:
+        _write(records)
+    except Exception as e:
+        with _buffer_lock:
+            _buffer[:0] = records
+        logger.error(f'No se pudieron escribir {len(records)} registros de auditoría, quedan en el buffer: {e}')
+        return 0
+    return len(records)
+
+
+def flush(max_records=5000):
+    """
+    Escribe en la base de datos los registros encolados en Redis.
+
+    Returns:
+        int: Registros escritos
+    """
+    client = _redis_client()
+    if client is None:
+        return drain(direct=True)
+    if not cache.add(FLUSH_RUNNING_KEY, 1, FLUSH_RUNNING_TIMEOUT):
+        return 0
+
+    queue = cache.make_key(QUEUE_KEY)
+    processing = cache.make_key(PROCESSING_KEY)
+    try:
+        # Lote que un volcado anterior no llegó a confirmar
+        written = _write_processing(client, processing)
+        while written < max_records:
+            count = min(_batch_size() * 5, max_records - written)
+            pipe = client.pipeline(transaction=False)
+            for _ in range(count):
+                pipe.lmove(queue, processing, 'LEFT', 'RIGHT')
+            moved = sum(1 for item in pipe.execute() if item is not None)
+            written += _write_processing(client, processing)
+            if moved < count:
+                break
+    finally:
+        cache.delete(FLUSH_RUNNING_KEY)
+    return written
+
+
+def _write_processing(client, processing):
+    """
+    Escribe la lista de procesamiento y la confirma (DEL). Si la escritura
+    falla los registros se quedan en ella para el siguiente volcado.
+    """
+    raw = client.lrange(processing, 0, -1)
+    if not raw:
+        return 0
+    _write([pickle.loads(item) for item in raw])
+    client.delete(processing)
+    return len(raw)
+
+
+def pending():
+    """Registros esperando en Redis, en la cola o sin confirmar (0 sin Redis)."""
+    client = _redis_client()
+    if client is None:
+        return 0
+    return client.llen(cache.make_key(QUEUE_KEY)) + client.llen(cache.make_key(PROCESSING_KEY))
+
+
+def _push(client, records):
+    """RPUSH condicionado al máximo de pendientes. False si la cola está llena."""
+    key = cache.make_key(QUEUE_KEY)
+    length = _script(client)(
+        keys=[key],
+        args=[_max_pending()] + [pickle.dumps(entry) for entry in records],
+    )
+    if length < 0:
+        logger.warning(
+            f'Cola de auditoría llena ({_max_pending()} pendientes): '
+            f'{len(records)} registros se escriben directamente'
+        )
+        _request_flush()
+        return False
+    if length >= _max_pending() // 2:
+        _request_flush()
+    return True
+
+
+def _request_flush():
+    """Encola un volcado inmediato (como mucho uno cada pocos segundos)."""
+    if cache.add(FLUSH_LOCK_KEY, 1, 5):
+        from security.tasks import flush_audit_sink
+        flush_audit_sink.delay()
+
+
+def _write(records):
+    """
+    bulk_create por modelo; si un lote falla por los datos de alguna fila
+    (IntegrityError/DataError) se reintenta fila a fila y solo se descartan
+    las filas inválidas. Cualquier otro error (conexión caída, etc.) se
+    propaga para que el llamador conserve los registros.
+    """
+    by_model = defaultdict(list)
+    for label, values in records:
+        by_model[label].append(values)
+
+    for label, rows in by_model.items():
+        model = apps.get_model(label)
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([model(**values) for values in rows])
+        except (IntegrityError, DataError) as e:
+            logger.warning(f'bulk_create de {label} falló ({e}); se escribe fila a fila')
+            for values in rows:
+                try:
+                    with transaction.atomic():
+                        model(**values).save(force_insert=True)
+                except (IntegrityError, DataError) as row_error:
+                    logger.error(f'Registro de auditoría {label} descartado: {row_error} ({values})')
+
+
+def _redis_client():
+    """Cliente Redis crudo si la caché por defecto es django_redis; si no, None."""
+    if not type(cache).__module__.startswith('django_redis'):
+        return None
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _script(client):
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(PUSH_SCRIPT)
+    return script
+
+
+def _drain_on_exit():
+    try:
+        drain(direct=True)
+    except Exception as e:
+        logger.error(f'No se pudo escribir la auditoría pendiente al salir: {e}')
+
+
+atexit.register(_drain_on_exit)
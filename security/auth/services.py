@@ -16,6 +16,7 @@ import struct
 import time
 import secrets
 import string
+from collections import namedtuple
 from datetime import timedelta
 from typing import List, Optional, Tuple
 
@@ -29,6 +30,13 @@ from security.models import (
     UserSecurityProfile, SecurityAuditLog,
 )
 
+LOCAL_CACHE_MAX_ENTRIES = 10000
+
+# Memorias locales del proceso: última marca de actividad escrita por sesión
+# (modo 'redis') y estado de bloqueo por (usuario, IP) con su caducidad
+_recent_activity = {}
+_lockout_memo = {}
+
 
 class TOTPService:
     """
@@ -190,7 +198,8 @@ class SessionSecurityService:
     Servicio de gestión de sesiones de seguridad.
 
     Controla sesiones concurrentes, timeouts por inactividad,
-    e invalidación de sesiones.
+    e invalidación de sesiones. Las sesiones de cada usuario se localizan
+    con el registro de security.auth.session_registry.
     """
 
     @staticmethod
@@ -204,16 +213,8 @@ class SessionSecurityService:
         Returns:
             int: Número de sesiones activas
         """
-        from django.contrib.sessions.models import Session
-        sessions = Session.objects.filter(
-            expire_date__gte=timezone.now()
-        )
-        count = 0
-        for session in sessions:
-            data = session.get_decoded()
-            if str(user.id) == str(data.get('_auth_user_id')):
-                count += 1
-        return count
+        from security.auth import session_registry
+        return session_registry.count(user.id)
 
     @staticmethod
     def check_concurrent_sessions(user: User) -> bool:
@@ -258,15 +259,8 @@ class SessionSecurityService:
         Returns:
             int: Número de sesiones invalidadas
         """
-        from django.contrib.sessions.models import Session
-        count = 0
-        sessions = Session.objects.filter(expire_date__gte=timezone.now())
-        for session in sessions:
-            data = session.get_decoded()
-            if str(user.id) == str(data.get('_auth_user_id')):
-                session.expire_date = timezone.now() - timedelta(seconds=1)
-                session.save()
-                count += 1
+        from security.auth import session_registry
+        count = session_registry.invalidate_user(user.id)
 
         # Registrar evento de seguridad
         if count > 0:
@@ -289,33 +283,54 @@ class SessionSecurityService:
         Returns:
             int: Número de sesiones invalidadas
         """
-        from django.contrib.sessions.models import Session
+        from security.auth import session_registry
         cutoff = timezone.now() - timedelta(minutes=15)
-        count = 0
-
-        sessions = Session.objects.filter(expire_date__gte=timezone.now())
-        for session in sessions:
-            data = session.get_decoded()
-            last_activity = data.get('last_activity')
-            if last_activity:
-                last_activity_dt = timezone.datetime.fromisoformat(last_activity)
-                if last_activity_dt < cutoff:
-                    session.expire_date = timezone.now()
-                    session.save()
-                    count += 1
-
-        return count
+        return session_registry.sweep_inactive(cutoff.timestamp())
 
     @staticmethod
-    def update_last_activity(request):
+    def update_last_activity(request) -> bool:
         """
-        Actualiza la marca de última actividad en la sesión.
+        Actualiza la marca de última actividad, como mucho una vez cada
+        SESSION_ACTIVITY_GRANULARITY segundos por sesión.
+
+        Con SESSION_ACTIVITY_TRACKING = 'session' la marca se guarda en la
+        sesión, que se reescribe (y renueva su caducidad) solo cuando cambia.
+        Con 'redis' la sesión no se toca: se actualiza su puntuación en el
+        registro de sesiones y se renueva su TTL en el mismo pipeline.
 
         Args:
             request: HttpRequest
+
+        Returns:
+            bool: True si se escribió la marca
         """
-        if request.user.is_authenticated:
-            request.session['last_activity'] = timezone.now().isoformat()
+        if not request.user.is_authenticated:
+            return False
+        from security.auth import session_registry
+        session = request.session
+        now = timezone.now()
+        granularity = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY', 60)
+
+        if getattr(settings, 'SESSION_ACTIVITY_TRACKING', 'session') == 'redis':
+            session_key = session.session_key
+            last = _recent_activity.get(session_key)
+            if not session_key or (last is not None and now.timestamp() - last < granularity):
+                return False
+            if len(_recent_activity) >= LOCAL_CACHE_MAX_ENTRIES:
+                _recent_activity.clear()
+            _recent_activity[session_key] = now.timestamp()
+            session_registry.touch(request.user.pk, session_key, now.timestamp(), extend_session=True)
+            return True
+
+        last = session.get('last_activity')
+        if last and (now - timezone.datetime.fromisoformat(last)).total_seconds() < granularity:
+            return False
+        session['last_activity'] = now.isoformat()
+        session_registry.touch(request.user.pk, session.session_key, now.timestamp())
+        return True
+
+
+LockoutStatus = namedtuple('LockoutStatus', 'ip_locked user_locked cached')
 
 
 class AccountLockoutService:
@@ -333,6 +348,7 @@ class AccountLockoutService:
     ATTEMPT_WINDOW_MINUTES = 15
     IP_LOCKOUT_PREFIX = 'ip_lockout_'
     IP_ATTEMPT_PREFIX = 'ip_attempt_'
+    USER_LOCKOUT_PREFIX = 'user_lockout_'
 
     @classmethod
     def record_failed_attempt(cls, user: User, ip_address: str = None):
@@ -420,6 +436,80 @@ class AccountLockoutService:
         profile, _ = UserSecurityProfile.objects.get_or_create(user=user)
         return profile.is_account_locked
 
+    @classmethod
+    def lockout_status(cls, user_id, ip_address: str = None) -> LockoutStatus:
+        """
+        Estado de bloqueo de la IP y del usuario para el middleware: una sola
+        lectura get_many a la caché compartida, memorizada en el proceso
+        SESSION_LOCKOUT_LOCAL_TTL segundos.
+
+        El bloqueo del usuario se lee de la copia en caché que mantiene
+        sync_user_lock (y que warm_user_locks repone), no de
+        UserSecurityProfile.
+
+        Args:
+            user_id: ID del usuario
+            ip_address: Dirección IP (opcional)
+
+        Returns:
+            LockoutStatus: (ip_locked, user_locked, cached)
+        """
+        now = time.monotonic()
+        memo = _lockout_memo.get((user_id, ip_address))
+        if memo is not None and memo[0] > now:
+            return LockoutStatus(memo[1], memo[2], True)
+
+        ip_key = f'{cls.IP_LOCKOUT_PREFIX}{ip_address}' if ip_address else None
+        user_key = f'{cls.USER_LOCKOUT_PREFIX}{user_id}'
+        values = cache.get_many([key for key in (ip_key, user_key) if key])
+        status = LockoutStatus(bool(ip_key and values.get(ip_key)), bool(values.get(user_key)), False)
+
+        if len(_lockout_memo) >= LOCAL_CACHE_MAX_ENTRIES:
+            _lockout_memo.clear()
+        ttl = getattr(settings, 'SESSION_LOCKOUT_LOCAL_TTL', 5)
+        _lockout_memo[(user_id, ip_address)] = (now + ttl, status.ip_locked, status.user_locked)
+        return status
+
+    @classmethod
+    def sync_user_lock(cls, profile: UserSecurityProfile):
+        """
+        Copia account_locked_until del perfil a la caché compartida (con TTL
+        hasta el desbloqueo) para que lockout_status no consulte la base de
+        datos.
+
+        Args:
+            profile: UserSecurityProfile
+        """
+        key = f'{cls.USER_LOCKOUT_PREFIX}{profile.user_id}'
+        remaining = 0
+        if profile.account_locked_until:
+            remaining = (profile.account_locked_until - timezone.now()).total_seconds()
+        if remaining > 0:
+            cache.set(key, True, timeout=int(remaining) + 1)
+        else:
+            cache.delete(key)
+        _lockout_memo.clear()
+
+    @classmethod
+    def warm_user_locks(cls) -> int:
+        """
+        Copia a la caché todos los bloqueos de cuenta vigentes. sync_user_lock
+        solo publica los perfiles que se guardan; los bloqueos anteriores al
+        despliegue o a un vaciado de la caché se recuperan con este repaso
+        (migración 0006 y comando warm_lockout_cache).
+
+        Returns:
+            int: Bloqueos copiados
+        """
+        locked = UserSecurityProfile.objects.filter(
+            account_locked_until__gt=timezone.now()
+        ).only('user_id', 'account_locked_until')
+        count = 0
+        for profile in locked.iterator():
+            cls.sync_user_lock(profile)
+            count += 1
+        return count
+
     @classmethod
     def record_successful_login(cls, user: User, ip_address: str = None):
         """
@@ -0,0 +1,139 @@
+"""
+Métricas de sobrecoste de SessionSecurityMiddleware.
+
+El middleware mide su propio tiempo por petición y lo acumula en contadores
+del proceso (sin ir a Redis en cada petición). Cada FLUSH_INTERVAL segundos
+el proceso vuelca lo acumulado con un solo pipeline HINCRBY/HINCRBYFLOAT al
+hash del minuto en curso, 'metrics:session_security:<AAAA-MM-DDTHH:MM>', que
+expira a la hora. summary() suma los últimos minutos de todos los procesos;
+lo publican /metrics/summary/ y el texto de /metrics/.
+
+Contadores:
+  - requests, time_ms (suma) y max_ms
+  - activity_writes / activity_skipped: marcas de actividad escritas o
+    ahorradas por la granularidad
+  - lockout_lookups / lockout_local_hits: consultas de bloqueo a la caché
+    compartida o resueltas por el TTL local
+  - blocked: peticiones rechazadas por bloqueo
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+KEY = 'metrics:session_security:{}'
+FLUSH_INTERVAL = 10
+COUNTERS = (
+    'requests', 'activity_writes', 'activity_skipped',
+    'lockout_lookups', 'lockout_local_hits', 'blocked',
+)
+
+_lock = threading.Lock()
+_pending = {}
+_last_flush = time.monotonic()
+
+
+def record(elapsed_ms, **counters):
+    """Acumula una petición (`elapsed_ms`) y los contadores dados."""
+    global _last_flush
+    with _lock:
+        _pending['requests'] = _pending.get('requests', 0) + 1
+        _pending['time_ms'] = _pending.get('time_ms', 0.0) + elapsed_ms
+        _pending['max_ms'] = max(_pending.get('max_ms', 0.0), elapsed_ms)
+        for name, value in counters.items():
+            if value:
+                _pending[name] = _pending.get(name, 0) + value
+        due = time.monotonic() - _last_flush >= FLUSH_INTERVAL
+        if due:
+            _last_flush = time.monotonic()
+    if due:
+        flush()
+
+
+def flush():
+    """
+    Vuelca los contadores del proceso al hash del minuto en curso. Sin Redis
+    se quedan en el proceso (snapshot/summary los leen de ahí).
+    """
+    global _pending
+    client = _redis_client()
+    if client is None:
+        return
+    with _lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return
+    key = cache.make_key(KEY.format(_minute(timezone.now())))
+    try:
+        pipe = client.pipeline(transaction=False)
+        for name, value in pending.items():
+            if name == 'max_ms':
+                continue
+            if isinstance(value, float):
+                pipe.hincrbyfloat(key, name, value)
+            else:
+                pipe.hincrby(key, name, value)
+        pipe.expire(key, 3600)
+        pipe.execute()
+        # El máximo no se puede sumar: se guarda con compare-and-set optimista
+        stored = client.hget(key, 'max_ms')
+        if stored is None or float(stored) < pending.get('max_ms', 0.0):
+            client.hset(key, 'max_ms', pending.get('max_ms', 0.0))
+    except Exception as e:
+        logger.debug(f'No se pudieron volcar las métricas de sesión: {e}')
+
+
+def snapshot():
+    """Contadores del proceso aún sin volcar."""
+    with _lock:
+        return dict(_pending)
+
+
+def summary(minutes=5):
+    """
+    Totales de los últimos `minutes` minutos (todos los procesos).
+
+    Returns:
+        dict: contadores, avg_ms y max_ms
+    """
+    totals = {name: 0 for name in COUNTERS}
+    totals.update(time_ms=0.0, max_ms=0.0)
+    client = _redis_client()
+    if client is None:
+        rows = [snapshot()]
+    else:
+        now = timezone.now()
+        pipe = client.pipeline(transaction=False)
+        for offset in range(minutes):
+            minute = _minute(now - timedelta(minutes=offset))
+            pipe.hgetall(cache.make_key(KEY.format(minute)))
+        rows = [
+            {field.decode(): float(value) for field, value in row.items()}
+            for row in pipe.execute()
+        ]
+    for row in rows:
+        for name, value in row.items():
+            if name == 'max_ms':
+                totals['max_ms'] = max(totals['max_ms'], float(value))
+            elif name in totals:
+                totals[name] += value
+    totals['avg_ms'] = round(totals['time_ms'] / totals['requests'], 3) if totals['requests'] else 0.0
+    return {name: (int(value) if name in COUNTERS else round(value, 3)) for name, value in totals.items()}
+
+
+def _minute(value):
+    return value.strftime('%Y-%m-%dT%H:%M')
+
+
+def _redis_client():
+    """Cliente Redis crudo si la caché por defecto es django_redis; si no, None."""
+    if not type(cache).__module__.startswith('django_redis'):
+        return None
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
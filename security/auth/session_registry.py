@@ -0,0 +1,254 @@
+"""
+Registro de sesiones por usuario.
+
+Las sesiones viven en Redis (SESSION_ENGINE de caché, alias 'session') y
+Django no ofrece forma de encontrar las de un usuario sin recorrerlas y
+decodificarlas todas. Este registro mantiene, en la misma caché:
+
+  - sesiones:usuario:<id>  ZSET session_key -> última actividad (epoch)
+  - sesiones:actividad     ZSET '<id>:<session_key>' -> última actividad
+
+Se actualiza al iniciar sesión, al cerrarla y con la actividad
+(SessionSecurityService.update_last_activity). Contar las sesiones
+concurrentes o cerrar todas las de un usuario cuesta O(sesiones del
+usuario) y el barrido de inactividad O(log N + sesiones vencidas), siempre
+contra Redis y sin tocar la base de datos. Las entradas con más de
+SESSION_COOKIE_AGE sin actividad ya no tienen sesión detrás y se podan en
+cada consulta.
+
+Sin Redis (locmem en desarrollo y tests) los mismos comandos se emulan con
+diccionarios en la caché, sin garantías de atomicidad.
+"""
+
+import logging
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.cache import KEY_PREFIX as SESSION_CACHE_KEY_PREFIX
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+USER_KEY = 'sesiones:usuario:{}'
+ACTIVITY_KEY = 'sesiones:actividad'
+SWEEP_BATCH_SIZE = 1000
+CACHE_SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+
+
+def touch(user_id, session_key, timestamp=None, extend_session=False):
+    """
+    Registra la sesión de `user_id` o actualiza su última actividad.
+
+    Con `extend_session` también renueva el TTL de la sesión (backend de
+    caché) en el mismo pipeline, sin reescribir sus datos.
+    """
+    if not session_key:
+        return
+    timestamp = timestamp or time.time()
+    client = _client()
+    user_key = _key(USER_KEY.format(user_id))
+    pipe = client.pipeline(transaction=False)
+    pipe.zadd(user_key, {session_key: timestamp})
+    pipe.expire(user_key, settings.SESSION_COOKIE_AGE)
+    pipe.zadd(_key(ACTIVITY_KEY), {_member(user_id, session_key): timestamp})
+    if extend_session and settings.SESSION_ENGINE == CACHE_SESSION_ENGINE:
+        pipe.expire(_key(SESSION_CACHE_KEY_PREFIX + session_key), settings.SESSION_COOKIE_AGE)
+    pipe.execute()
+
+
+def unregister(user_id, session_key):
+    """Quita la sesión del registro (logout)."""
+    if not session_key:
+        return
+    pipe = _client().pipeline(transaction=False)
+    pipe.zrem(_key(USER_KEY.format(user_id)), session_key)
+    pipe.zrem(_key(ACTIVITY_KEY), _member(user_id, session_key))
+    pipe.execute()
+
+
+def count(user_id):
+    """Número de sesiones activas de `user_id`."""
+    pipe = _client().pipeline()
+    user_key = _key(USER_KEY.format(user_id))
+    pipe.zremrangebyscore(user_key, '-inf', _expired_before())
+    pipe.zcard(user_key)
+    return pipe.execute()[1]
+
+
+def session_keys(user_id):
+    """session_key de las sesiones activas de `user_id`, de la más antigua a la más reciente."""
+    pipe = _client().pipeline()
+    user_key = _key(USER_KEY.format(user_id))
+    pipe.zremrangebyscore(user_key, '-inf', _expired_before())
+    pipe.zrange(user_key, 0, -1)
+    return [_text(key) for key in pipe.execute()[1]]
+
+
+def invalidate_user(user_id, keep=None):
+    """
+    Cierra todas las sesiones de `user_id` (salvo `keep`, si se indica).
+
+    Returns:
+        int: Sesiones cerradas
+    """
+    keys = [key for key in session_keys(user_id) if key != keep]
+    if not keys:
+        return 0
+    _delete_sessions(keys)
+    pipe = _client().pipeline(transaction=False)
+    pipe.zrem(_key(USER_KEY.format(user_id)), *keys)
+    pipe.zrem(_key(ACTIVITY_KEY), *(_member(user_id, key) for key in keys))
+    pipe.execute()
+    return len(keys)
+
+
+def sweep_inactive(cutoff):
+    """
+    Cierra las sesiones sin actividad desde `cutoff` (epoch) y las quita del
+    registro, por lotes de SWEEP_BATCH_SIZE.
+
+    Returns:
+        int: Sesiones cerradas
+    """
+    client = _client()
+    activity_key = _key(ACTIVITY_KEY)
+    total = 0
+    while True:
+        members = [
+            _text(member)
+            for member in client.zrangebyscore(activity_key, '-inf', cutoff, start=0, num=SWEEP_BATCH_SIZE)
+        ]
+        if not members:
+            return total
+        by_user = {}
+        for member in members:
+            user_id, _, session_key = member.partition(':')
+            by_user.setdefault(user_id, []).append(session_key)
+        _delete_sessions([key for keys in by_user.values() for key in keys])
+
+        pipe = client.pipeline(transaction=False)
+        for user_id, keys in by_user.items():
+            pipe.zrem(_key(USER_KEY.format(user_id)), *keys)
+        pipe.zrem(activity_key, *members)
+        pipe.execute()
+        total += len(members)
+
+
+def _delete_sessions(session_keys):
+    """Borra las sesiones del SESSION_ENGINE (un solo delete_many con el backend de caché)."""
+    engine = import_module(settings.SESSION_ENGINE)
+    stores = [engine.SessionStore(session_key=key) for key in session_keys]
+    if settings.SESSION_ENGINE == CACHE_SESSION_ENGINE:
+        _cache().delete_many([store.cache_key for store in stores])
+        return
+    for store in stores:
+        store.delete()
+
+
+def _expired_before():
+    return time.time() - settings.SESSION_COOKIE_AGE
+
+
+def _member(user_id, session_key):
+    return f'{user_id}:{session_key}'
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _cache():
+    return caches[getattr(settings, 'SESSION_CACHE_ALIAS', 'default')]
+
+
+def _key(name):
+    # Con Redis las claves van con el prefijo de la caché de sesiones;
+    # el emulador ya lo aplica al guardar.
+    return _cache().make_key(name) if _redis_client() is not None else name
+
+
+def _client():
+    client = _redis_client()
+    return client if client is not None else _CacheSortedSets(_cache())
+
+
+def _redis_client():
+    """Cliente Redis crudo si la caché de sesiones es django_redis; si no, None."""
+    if not type(_cache()).__module__.startswith('django_redis'):
+        return None
+    from django_redis import get_redis_connection
+    return get_redis_connection(getattr(settings, 'SESSION_CACHE_ALIAS', 'default'))
+
+
+class _CacheSortedSets:
+    """Los comandos ZSET que usa el registro, sobre diccionarios en la caché."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def pipeline(self, transaction=True):
+        return _CachePipeline(self)
+
+    def _load(self, key):
+        return self.cache.get(key) or {}
+
+    def zadd(self, key, mapping):
+        data = self._load(key)
+        added = len(set(mapping) - set(data))
+        data.update(mapping)
+        self.cache.set(key, data, None)
+        return added
+
+    def zrem(self, key, *members):
+        data = self._load(key)
+        removed = [member for member in members if data.pop(member, None) is not None]
+        self.cache.set(key, data, None)
+        return len(removed)
+
+    def zremrangebyscore(self, key, low, high):
+        data = self._load(key)
+        expired = [member for member, score in data.items() if float(low) <= score <= float(high)]
+        return self.zrem(key, *expired) if expired else 0
+
+    def zcard(self, key):
+        return len(self._load(key))
+
+    def zrange(self, key, start, end):
+        members = [member for member, _ in sorted(self._load(key).items(), key=lambda item: item[1])]
+        return members[start:] if end == -1 else members[start:end + 1]
+
+    def zrangebyscore(self, key, low, high, start=None, num=None):
+        members = [
+            member for member, score in sorted(self._load(key).items(), key=lambda item: item[1])
+            if float(low) <= score <= float(high)
+        ]
+        if start is not None:
+            members = members[start:start + num]
+        return members
+
+    def expire(self, key, seconds):
+        return self.cache.touch(key, seconds)
+
+    def delete(self, *keys):
+        self.cache.delete_many(keys)
+
+
+class _CachePipeline:
+    """Acumula los comandos y los ejecuta en orden en execute()."""
+
+    def __init__(self, target):
+        self._target = target
+        self._calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self._target, name)
+
+        def queue(*args, **kwargs):
+            self._calls.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
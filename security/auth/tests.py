@@ -4,10 +4,10 @@ Tests for Authentication Service (AS).
 Tests: TOTP 2FA, session management, account lockout, backup codes.
 """
 
-from django.test import TestCase
+from django.test import Client, TestCase
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from datetime import timedelta
 import time
 import base64
@@ -142,6 +142,7 @@ class SessionSecurityServiceTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user('sessionuser', 'session@test.com', 'password123')
         UserSecurityProfile.objects.get_or_create(user=self.user)
+        caches['session'].clear()
 
     def test_get_active_session_count_zero(self):
         """Should return 0 when no sessions exist."""
@@ -158,6 +159,154 @@ class SessionSecurityServiceTests(TestCase):
         count = SessionSecurityService.invalidate_all_sessions(self.user)
         self.assertEqual(count, 0)
 
+    def _login(self):
+        client = Client()
+        client.force_login(self.user)
+        return client
+
+    def test_registry_tracks_login_and_logout(self):
+        """Login and logout should update the per-user session registry."""
+        first, second = self._login(), self._login()
+        self.assertEqual(SessionSecurityService.get_active_session_count(self.user), 2)
+        first.logout()
+        self.assertEqual(SessionSecurityService.get_active_session_count(self.user), 1)
+        from security.auth import session_registry
+        self.assertEqual(session_registry.session_keys(self.user.id), [second.session.session_key])
+
+    def test_invalidate_all_sessions_deletes_sessions(self):
+        """Log out everywhere should delete every session of the user only."""
+        from importlib import import_module
+        from django.conf import settings
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        other = User.objects.create_user('othersession', 'other@test.com', 'password123')
+        clients = [self._login(), self._login()]
+        other_client = Client()
+        other_client.force_login(other)
+
+        self.assertEqual(SessionSecurityService.invalidate_all_sessions(self.user), 2)
+        for client in clients:
+            self.assertFalse(store.exists(client.session.session_key))
+        self.assertTrue(store.exists(other_client.session.session_key))
+        self.assertEqual(SessionSecurityService.get_active_session_count(self.user), 0)
+        self.assertEqual(SessionSecurityService.get_active_session_count(other), 1)
+
+    def test_invalidate_inactive_sessions_uses_activity_index(self):
+        """Only sessions idle for more than 15 minutes should be closed."""
+        from security.auth import session_registry
+        idle, active = self._login(), self._login()
+        session_registry.touch(self.user.id, idle.session.session_key, time.time() - 20 * 60)
+
+        self.assertEqual(SessionSecurityService.invalidate_inactive_sessions(), 1)
+        self.assertEqual(session_registry.session_keys(self.user.id), [active.session.session_key])
+
+
+class SessionActivityThrottleTests(TestCase):
+    """Tests for throttled activity tracking and cached lockout lookups."""
+
+    def setUp(self):
+        from importlib import import_module
+        from django.conf import settings
+        from django.test import RequestFactory
+        from security.auth import services
+        self.user = User.objects.create_user('activityuser', 'activity@test.com', 'password123')
+        self.store_class = import_module(settings.SESSION_ENGINE).SessionStore
+        self.factory = RequestFactory()
+        caches['session'].clear()
+        cache.clear()
+        services._recent_activity.clear()
+        services._lockout_memo.clear()
+
+    def _request(self, session=None):
+        request = self.factory.get('/', REMOTE_ADDR='10.0.0.7')
+        request.user = self.user
+        if session is None:
+            session = self.store_class()
+            session.create()
+            session.modified = False
+        request.session = session
+        return request
+
+    def test_activity_written_once_per_granularity(self):
+        """The session should only be modified when the mark is older than the granularity."""
+        request = self._request()
+        self.assertTrue(SessionSecurityService.update_last_activity(request))
+        request.session.save()
+
+        session = self.store_class(request.session.session_key)
+        self.assertFalse(SessionSecurityService.update_last_activity(self._request(session)))
+        self.assertFalse(session.modified)
+
+        with self.settings(SESSION_ACTIVITY_GRANULARITY=0):
+            self.assertTrue(SessionSecurityService.update_last_activity(self._request(session)))
+        self.assertTrue(session.modified)
+
+    def test_redis_mode_leaves_session_untouched(self):
+        """In 'redis' mode only the registry score is updated."""
+        from security.auth import session_registry
+        request = self._request()
+        with self.settings(SESSION_ACTIVITY_TRACKING='redis'):
+            self.assertTrue(SessionSecurityService.update_last_activity(request))
+            self.assertFalse(SessionSecurityService.update_last_activity(request))
+        self.assertFalse(request.session.modified)
+        self.assertEqual(session_registry.session_keys(self.user.id), [request.session.session_key])
+
+    def test_lockout_status_single_lookup_and_local_ttl(self):
+        """Lockout state should come from one get_many, then from the local memo."""
+        from unittest import mock
+        for _ in range(5):
+            AccountLockoutService.record_failed_attempt(self.user)
+
+        with mock.patch('security.auth.services.cache.get_many', wraps=cache.get_many) as get_many:
+            first = AccountLockoutService.lockout_status(self.user.pk, '10.0.0.7')
+            second = AccountLockoutService.lockout_status(self.user.pk, '10.0.0.7')
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual((first.user_locked, first.ip_locked, first.cached), (True, False, False))
+        self.assertTrue(second.cached)
+
+        # Desbloquear publica el cambio y descarta la memoria local
+        profile = UserSecurityProfile.objects.get(user=self.user)
+        profile.account_locked_until = None
+        profile.save(update_fields=['account_locked_until'])
+        self.assertFalse(AccountLockoutService.lockout_status(self.user.pk, '10.0.0.7').user_locked)
+
+    def test_warm_up_restores_lockouts_missing_from_cache(self):
+        """Lockouts set before the cache mirror existed should be copied by the warm-up command."""
+        from io import StringIO
+        from django.core.management import call_command
+        UserSecurityProfile.objects.filter(user=self.user).update(
+            account_locked_until=timezone.now() + timedelta(minutes=10)
+        )
+        other = User.objects.create_user('expireduser', 'expired@test.com', 'password123')
+        UserSecurityProfile.objects.filter(user=other).update(
+            account_locked_until=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertFalse(AccountLockoutService.lockout_status(self.user.pk).user_locked)
+
+        out = StringIO()
+        call_command('warm_lockout_cache', stdout=out)
+        self.assertIn('1 active lockouts', out.getvalue())
+        self.assertTrue(AccountLockoutService.lockout_status(self.user.pk).user_locked)
+        self.assertFalse(AccountLockoutService.lockout_status(other.pk).user_locked)
+
+    def test_middleware_blocks_locked_user_and_records_overhead(self):
+        """The middleware should reject locked users and account for its own time."""
+        from django.http import HttpResponse
+        from security.auth import session_metrics
+        from security.middleware import SessionSecurityMiddleware
+        for _ in range(5):
+            AccountLockoutService.record_failed_attempt(self.user)
+        middleware = SessionSecurityMiddleware(lambda request: HttpResponse('ok'))
+        before = session_metrics.snapshot()
+
+        with self.settings(DEBUG=True):
+            response = middleware(self._request())
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('X-Session-Security-Time', response)
+
+        after = session_metrics.snapshot()
+        for name in ('requests', 'blocked', 'activity_writes', 'lockout_lookups'):
+            self.assertEqual(after.get(name, 0) - before.get(name, 0), 1, name)
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Account Lockout Tests
@@ -0,0 +1,210 @@
+"""
+Perfil de autorización cacheado por usuario.
+
+En una misma petición los grupos del usuario se resolvían varias veces
+(context processor group_name, contexto RLS, vistas, RBACService). El
+perfil reúne en un solo objeto:
+
+  - group_names: nombres de los grupos, por pk (el primero es el grupo
+    "principal" que muestran las plantillas)
+  - role_names: roles activos no expirados (UserRoleAssignment)
+  - permissions: codenames de los roles (con herencia), grupos y permisos
+    directos, como RBACService.get_user_permissions
+  - rls_role: rol RLS derivado de roles y grupos (sin el caso superuser,
+    que se decide con user.is_superuser)
+
+Se calcula una vez y se guarda en la caché bajo
+'authz:perfil:<id>:<alta>:<versión global>.<versión del usuario>'. Las
+señales de security.signals suben la versión del usuario (grupos, permisos
+directos, asignaciones de roles) o la global (permisos de grupos y roles,
+jerarquía de roles), así que un cambio invalida el perfil sin borrar
+claves. Dentro de la petición el perfil se memoriza en la instancia del
+usuario y AuthProfileMiddleware lo expone como request.auth_profile.
+
+Configuración (settings, opcional):
+  - AUTH_PROFILE_CACHE_TTL: segundos de vida del perfil en caché (3600)
+"""
+
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KEY = 'authz:perfil:{}:{}:{}.{}'
+GLOBAL_VERSION_KEY = 'authz:perfil:v'
+USER_VERSION_KEY = 'authz:perfil:v:{}'
+MEMO_ATTR = '_auth_profile'
+
+# Mapeo de grupos de Django a roles RLS (en orden de prioridad)
+GROUP_RLS_ROLES = {
+    'administradores': 'admin',
+    'admin': 'admin',
+    'profesores': 'teacher',
+    'docentes': 'teacher',
+    'teacher': 'teacher',
+    'editores': 'editor',
+    'editor': 'editor',
+    'estudiantes': 'student',
+    'student': 'student',
+}
+
+
+@dataclass(frozen=True)
+class AuthProfile:
+    """Grupos, roles, permisos y rol RLS de un usuario."""
+
+    user_id: int
+    group_names: tuple = ()
+    role_names: tuple = ()
+    permissions: frozenset = frozenset()
+    rls_role: str = 'authenticated'
+    valid_until: float = None
+
+    @property
+    def primary_group(self):
+        """Nombre del primer grupo del usuario (None si no tiene)."""
+        return self.group_names[0] if self.group_names else None
+
+    def in_group(self, *names):
+        """True si el usuario pertenece a alguno de los grupos dados."""
+        return any(name in self.group_names for name in names)
+
+    def has_perm(self, codename):
+        return codename in self.permissions
+
+
+ANONYMOUS_PROFILE = AuthProfile(user_id=None, rls_role='anonymous')
+
+
+def get_auth_profile(user):
+    """
+    Perfil de autorización de `user` (memorizado en la instancia y cacheado
+    entre peticiones).
+
+    Args:
+        user: Usuario (o AnonymousUser)
+
+    Returns:
+        AuthProfile
+    """
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS_PROFILE
+
+    profile = user.__dict__.get(MEMO_ATTR)
+    if profile is not None and not _expired(profile):
+        return profile
+
+    key = _profile_key(user)
+    profile = cache.get(key)
+    if profile is None or _expired(profile):
+        profile = build_auth_profile(user)
+        cache.set(key, profile, getattr(settings, 'AUTH_PROFILE_CACHE_TTL', 3600))
+    user.__dict__[MEMO_ATTR] = profile
+    return profile
+
+
+def build_auth_profile(user):
+    """Calcula el perfil desde la base de datos (sin caché)."""
+    from django.contrib.auth.models import Group, Permission
+    from security.models import Role, UserRoleAssignment
+
+    now = timezone.now()
+    assignments = [
+        assignment
+        for assignment in UserRoleAssignment.objects.filter(user=user, is_active=True).select_related('role')
+        if assignment.expires_at is None or assignment.expires_at > now
+    ]
+    roles = [assignment.role for assignment in assignments]
+    group_names = tuple(
+        Group.objects.filter(user=user).order_by('pk').values_list('name', flat=True)
+    )
+
+    permissions = set(
+        Permission.objects.filter(group__user=user).values_list('codename', flat=True)
+    )
+    permissions.update(user.user_permissions.values_list('codename', flat=True))
+    if roles:
+        # Herencia de roles: se recorre la jerarquía con los padres en memoria
+        parents = dict(Role.objects.values_list('pk', 'parent_id'))
+        role_ids = set()
+        for role in roles:
+            role_id = role.pk
+            while role_id is not None and role_id not in role_ids:
+                role_ids.add(role_id)
+                role_id = parents.get(role_id)
+        permissions.update(
+            Permission.objects.filter(security_roles__in=role_ids).values_list('codename', flat=True)
+        )
+
+    if roles:
+        rls_role = roles[0].name.lower()
+    else:
+        lowered = {name.lower() for name in group_names}
+        rls_role = next(
+            (role for group, role in GROUP_RLS_ROLES.items() if group in lowered),
+            'authenticated',
+        )
+
+    expirations = [assignment.expires_at.timestamp() for assignment in assignments if assignment.expires_at]
+    return AuthProfile(
+        user_id=user.pk,
+        group_names=group_names,
+        role_names=tuple(role.name for role in roles),
+        permissions=frozenset(permissions),
+        rls_role=rls_role,
+        valid_until=min(expirations) if expirations else None,
+    )
+
+
+def attach(request):
+    """Expone el perfil del usuario como request.auth_profile (calculado al primer uso)."""
+    request.auth_profile = SimpleLazyObject(lambda: get_auth_profile(request.user))
+
+
+def invalidate_user(*user_ids, instance=None):
+    """
+    Sube la versión del perfil de los usuarios dados (ahora y al confirmar la
+    transacción, para que nadie cachee los datos anteriores con la versión
+    nueva) y descarta el perfil memorizado en `instance`.
+    """
+    if instance is not None:
+        instance.__dict__.pop(MEMO_ATTR, None)
+    keys = [USER_VERSION_KEY.format(user_id) for user_id in user_ids]
+    if keys:
+        _bump(keys)
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def invalidate_all():
+    """Sube la versión global: invalida el perfil de todos los usuarios."""
+    _bump([GLOBAL_VERSION_KEY])
+    transaction.on_commit(lambda: _bump([GLOBAL_VERSION_KEY]))
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.add(key, 0, None)
+            cache.incr(key)
+        except Exception as e:
+            logger.warning(f'No se pudo invalidar el perfil de autorización ({key}): {e}')
+
+
+def _profile_key(user):
+    user_version_key = USER_VERSION_KEY.format(user.pk)
+    versions = cache.get_many([GLOBAL_VERSION_KEY, user_version_key])
+    # La fecha de alta distingue a usuarios distintos que reutilicen un id
+    joined = int(user.date_joined.timestamp() * 1000) if getattr(user, 'date_joined', None) else 0
+    return PROFILE_KEY.format(
+        user.pk, joined, versions.get(GLOBAL_VERSION_KEY, 0), versions.get(user_version_key, 0)
+    )
+
+
+def _expired(profile):
+    return profile.valid_until is not None and timezone.now().timestamp() >= profile.valid_until
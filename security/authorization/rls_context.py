@@ -0,0 +1,173 @@
+"""
+Contexto RLS por transacción, compatible con PgBouncer en modo transaction.
+
+RowLevelSecurityService.set_rls_context() fija 'rls.user_id' y
+'rls.user_role' a nivel de sesión (set_config(..., false)): cuesta una ida
+y vuelta a la BD al empezar la petición y otra al limpiarlo, también en
+peticiones que nunca consultan la BD, y con PgBouncer en modo transaction
+el valor queda en la conexión del servidor y lo hereda otro cliente.
+
+Aquí el contexto se fija con set_config(..., true), que solo dura hasta el
+final de la transacción, y se aplica de forma perezosa: un execute_wrapper
+antepone
+
+    SELECT set_config('rls.user_id', ..., true), set_config('rls.user_role', ..., true);
+
+a la primera sentencia de cada transacción, en el mismo mensaje al
+servidor (psycopg2 envía las dos sentencias juntas y, en autocommit, se
+ejecutan en la misma transacción implícita). Así:
+
+  - una petición sin consultas no paga nada
+  - cada transacción lleva su propio contexto, sea cual sea la conexión
+    del servidor que le asigne PgBouncer
+  - no hace falta limpiarlo al terminar
+
+El inicio de transacción se detecta con el estado del cliente psycopg2
+(transaction_status IDLE): en autocommit cada sentencia es su propia
+transacción y todas llevan el prefijo. Tras un ROLLBACK TO SAVEPOINT el
+contexto se vuelve a aplicar en la sentencia siguiente, porque el rollback
+pudo deshacerlo.
+
+Los cursores con nombre (QuerySet.iterator() con cursores de servidor)
+no admiten varias sentencias: el contexto se fija antes con una sentencia
+aparte. Con PgBouncer en modo transaction Django exige además
+DISABLE_SERVER_SIDE_CURSORS = True, así que ese caso no se da en producción.
+"""
+
+import logging
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+SET_CONTEXT_SQL = (
+    "SELECT set_config('rls.user_id', {user_id}, {is_local}), "
+    "set_config('rls.user_role', {role}, {is_local})"
+)
+
+
+class RLSContextWrapper:
+    """
+    execute_wrapper que aplica el contexto RLS a la primera sentencia de
+    cada transacción de una conexión.
+
+    Args:
+        identity: LazyIdentity con el (user_id, role_name) del contexto
+    """
+
+    def __init__(self, identity):
+        self.identity = identity
+        self._pending = False
+        self.applied = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.identity.resolving or not self._needs_context(context['connection']):
+            return self._run(execute, sql, params, many, context)
+
+        user_id, role_name = self.identity()
+        self._pending = False
+        self.applied += 1
+        if getattr(context['cursor'].cursor, 'name', None):
+            self._set_separately(context['connection'], user_id, role_name)
+            return self._run(execute, sql, params, many, context)
+
+        values = [str(user_id), role_name]
+        named = isinstance(params[0] if many and params else params, dict)
+        if named:
+            prefix = SET_CONTEXT_SQL.format(
+                user_id='%(_rls_user_id)s', role='%(_rls_user_role)s', is_local='true'
+            )
+        else:
+            prefix = SET_CONTEXT_SQL.format(user_id='%s', role='%s', is_local='true')
+        if params is None:
+            # Sin parámetros psycopg2 no interpola: hay que escapar los '%'
+            sql, params = sql.replace('%', '%%'), values
+        elif many:
+            params = [_prepend(values, row) for row in params]
+        else:
+            params = _prepend(values, params)
+        return self._run(execute, f'{prefix}; {sql}', params, many, context)
+
+    def _run(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if sql.lstrip().upper().startswith('ROLLBACK TO SAVEPOINT'):
+            self._pending = True
+        return result
+
+    def _needs_context(self, connection):
+        if self._pending:
+            return True
+        raw = connection.connection
+        if raw is None:
+            # La conexión se abre con esta sentencia: aún no hay transacción
+            return True
+        from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+        return raw.info.transaction_status == TRANSACTION_STATUS_IDLE
+
+    @staticmethod
+    def _set_separately(connection, user_id, role_name):
+        """Contexto en sentencia aparte (cursores con nombre)."""
+        # En autocommit una sentencia aparte es otra transacción: solo
+        # sirve el valor de sesión
+        is_local = 'false' if connection.get_autocommit() else 'true'
+        with connection.connection.cursor() as cursor:
+            cursor.execute(
+                SET_CONTEXT_SQL.format(user_id='%s', role='%s', is_local=is_local),
+                [str(user_id), role_name],
+            )
+
+
+class LazyIdentity:
+    """
+    (user_id, role_name) resuelto con la primera consulta y compartido por
+    los wrappers de todas las conexiones. Mientras se resuelve, las consultas
+    que haga `resolve` (usuario de la sesión, perfil) pasan sin contexto.
+    """
+
+    def __init__(self, resolve):
+        self._resolve = resolve
+        self._value = None
+        self.resolving = False
+
+    def __call__(self):
+        if self._value is None:
+            self.resolving = True
+            try:
+                self._value = self._resolve()
+            finally:
+                self.resolving = False
+        return self._value
+
+
+def _prepend(values, params):
+    if isinstance(params, dict):
+        return {'_rls_user_id': values[0], '_rls_user_role': values[1], **params}
+    return [*values, *params]
+
+
+@contextmanager
+def rls_context(resolve, using=None):
+    """
+    Aplica el contexto RLS a las transacciones del bloque.
+
+    Args:
+        resolve: Función que devuelve (user_id, role_name); se llama con la
+            primera consulta del bloque
+        using: Alias de BD (por defecto todas las conexiones PostgreSQL)
+
+    Yields:
+        list[RLSContextWrapper]: Wrappers instalados (uno por conexión)
+    """
+    aliases = [using] if using else list(connections)
+    identity = LazyIdentity(resolve)
+    wrappers = []
+    with ExitStack() as stack:
+        for alias in aliases:
+            connection = connections[alias]
+            if connection.vendor != 'postgresql':
+                continue
+            wrapper = RLSContextWrapper(identity)
+            stack.enter_context(connection.execute_wrapper(wrapper))
+            wrappers.append(wrapper)
+        yield wrappers
@@ -21,6 +21,7 @@ from django.utils import timezone
 
 from django.db import connection
 
+from security import audit_sink
 from security.models import (
     Role, UserRoleAssignment, ObjectPermission, TimeBasedAccessPolicy,
     AuthorizationAuditLog, RowLevelSecurityPolicy,
@@ -162,7 +163,8 @@ class RBACService:
     @staticmethod
     def get_user_permissions(user: User) -> set:
         """
-        Obtiene todos los permisos de un usuario incluyendo herencia.
+        Obtiene todos los permisos de un usuario incluyendo herencia
+        (del perfil de autorización cacheado).
 
         Args:
             user: Usuario
@@ -170,26 +172,8 @@ class RBACService:
         Returns:
             set: Conjunto de codenames de permisos
         """
-        permissions = set()
-
-        # Obtener permisos de roles
-        roles = RBACService.get_user_roles(user)
-        for role in roles:
-            inherited_perms = role.get_inherited_permissions()
-            permissions.update(p.codename for p in inherited_perms)
-
-        # Obtener permisos de groups de Django
-        for group in user.groups.all():
-            permissions.update(
-                p.codename for p in group.permissions.all()
-            )
-
-        # Obtener permisos individuales del usuario
-        permissions.update(
-                p.codename for p in user.user_permissions.all()
-        )
-
-        return permissions
+        from security.authorization.auth_profile import get_auth_profile
+        return set(get_auth_profile(user).permissions)
 
     @staticmethod
     def check_permission(
@@ -460,7 +444,8 @@ class AuthorizationAuditService:
             reason: Razón de la decisión
             ip_address: Dirección IP
         """
-        AuthorizationAuditLog.objects.create(
+        audit_sink.record(
+            AuthorizationAuditLog,
             user=user,
             resource_type=resource_type,
             resource_id=resource_id,
@@ -473,7 +458,8 @@ class AuthorizationAuditService:
         # También registrar en SecurityAuditLog para eventos importantes
         if not granted:
             from security.models import SecurityAuditLog
-            SecurityAuditLog.objects.create(
+            audit_sink.record(
+                SecurityAuditLog,
                 event_type=SecurityAuditLog.EventTypes.AUTHORIZATION,
                 user=user,
                 action=f'access_denied_{action}',
@@ -504,51 +490,46 @@ class RowLevelSecurityService:
     @staticmethod
     def set_rls_context(user, role_name: str = None):
         """
-        Establece el contexto RLS para la conexión actual de base de datos.
+        Establece el contexto RLS para la conexión actual de base de datos
+        (a nivel de sesión).
 
-        Debe llamarse al inicio de cada request autenticado.
-        Si no se llama, las políticas RLS denegarán el acceso por defecto.
+        Para peticiones HTTP se usa request_context(), que lo fija por
+        transacción; esta variante queda para scripts y tareas sin
+        PgBouncer. Si no se llama, las políticas RLS denegarán el acceso por
+        defecto.
 
         Args:
             user: Usuario (puede ser None para usuarios anónimos)
             role_name: Nombre del rol (si es None, se determina automáticamente)
         """
+        user_id, resolved_role = RowLevelSecurityService.resolve_identity(user)
+        RowLevelSecurityService._set_rls_params(user_id, role_name or resolved_role)
+
+    @staticmethod
+    def resolve_identity(user) -> tuple:
+        """
+        (user_id, rol RLS) de un usuario: (0, 'anonymous') sin autenticar;
+        si no, 'superuser', el rol de mayor jerarquía o el mapeado desde sus
+        grupos (siempre en minúsculas).
+        """
         if user is None or not user.is_authenticated:
-            RowLevelSecurityService._set_rls_params(0, 'anonymous')
-            return
-
-        if role_name is None:
-            # Determinar el rol del usuario (siempre en minúsculas para RLS)
-            if user.is_superuser:
-                role_name = 'superuser'
-            else:
-                roles = RBACService.get_user_roles(user)
-                if roles:
-                    # Usar el rol de mayor jerarquía, normalizado a minúsculas
-                    role_name = roles[0].name.lower()
-                else:
-                    # Mapeo de grupos de Django a roles RLS
-                    group_role_map = {
-                        'administradores': 'admin',
-                        'admin': 'admin',
-                        'profesores': 'teacher',
-                        'docentes': 'teacher',
-                        'teacher': 'teacher',
-                        'editores': 'editor',
-                        'editor': 'editor',
-                        'estudiantes': 'student',
-                        'student': 'student',
-                    }
-                    user_group_names = [
-                        g.name.lower() for g in user.groups.all()
-                    ]
-                    role_name = 'authenticated'
-                    for group_name, mapped_role in group_role_map.items():
-                        if group_name in user_group_names:
-                            role_name = mapped_role
-                            break
-
-        RowLevelSecurityService._set_rls_params(user.id, role_name)
+            return 0, 'anonymous'
+        if user.is_superuser:
+            return user.id, 'superuser'
+        from security.authorization.auth_profile import get_auth_profile
+        return user.id, get_auth_profile(user).rls_role
+
+    @staticmethod
+    def request_context(request):
+        """
+        Contexto RLS por transacción para una petición (ver rls_context).
+
+        El usuario se resuelve con la primera consulta a la BD; una petición
+        sin consultas no paga nada. Compatible con PgBouncer en modo
+        transaction.
+        """
+        from security.authorization.rls_context import rls_context
+        return rls_context(lambda: RowLevelSecurityService.resolve_identity(request.user))
 
     @staticmethod
     def _set_rls_params(user_id: int, role_name: str):
@@ -13,6 +13,8 @@ from security.authorization.services import (
     RBACService, TimeBasedAccessService, ObjectPermissionService,
     AuthorizationAuditService, RowLevelSecurityService,
 )
+from security.authorization.auth_profile import get_auth_profile
+from security.authorization.rls_context import LazyIdentity, RLSContextWrapper
 from security.models import (
     Role, UserRoleAssignment, ObjectPermission,
     TimeBasedAccessPolicy, AuthorizationAuditLog, RowLevelSecurityPolicy,
@@ -294,3 +296,147 @@ class RowLevelSecurityServiceTests(TestCase):
         )
         self.assertEqual(policy.table_name, 'test_table')
         self.assertEqual(policy.policy_type, 'select')
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Cached Authorization Profile Tests
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class AuthProfileTests(TestCase):
+    """Tests for the versioned per-user authorization profile."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user('profileuser', 'profile@test.com', 'password123')
+        self.group, _ = Group.objects.get_or_create(name='Secretaría')
+
+    def _fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_profile_is_cached_between_requests(self):
+        """A second lookup (new user instance) should not hit the database."""
+        first = get_auth_profile(self._fresh_user())
+        user = self._fresh_user()
+        with self.assertNumQueries(0):
+            second = get_auth_profile(user)
+            get_auth_profile(user)
+        self.assertEqual(first, second)
+        self.assertIn('Estudiantes', second.group_names)
+
+    def test_group_change_invalidates_profile(self):
+        """Adding the user to a group should be visible on the next lookup."""
+        self.assertFalse(get_auth_profile(self._fresh_user()).in_group('Secretaría'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.group)
+        self.assertTrue(get_auth_profile(self._fresh_user()).in_group('Secretaría'))
+
+    def test_role_permission_change_invalidates_profile(self):
+        """Permissions granted to an assigned role should reach the profile."""
+        role = RBACService.create_role('reviewer')
+        RBACService.assign_role(self.user, role)
+        profile = get_auth_profile(self._fresh_user())
+        self.assertEqual(profile.role_names, ('reviewer',))
+        self.assertEqual(profile.rls_role, 'reviewer')
+
+        perm = Permission.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            role.permissions.add(perm)
+        self.assertTrue(get_auth_profile(self._fresh_user()).has_perm(perm.codename))
+        self.assertIn(perm.codename, RBACService.get_user_permissions(self._fresh_user()))
+
+    def test_context_processor_uses_profile(self):
+        """The group_name processor should resolve group_name and is_editor from the cached profile."""
+        from django.test import RequestFactory
+        from principal.context_processors import group_name
+
+        get_auth_profile(self._fresh_user())
+        request = RequestFactory().get('/')
+        request.user = self._fresh_user()
+        with self.assertNumQueries(0):
+            context = group_name(request)
+        self.assertEqual(context['group_name'], 'Estudiantes')
+        self.assertFalse(context['is_editor'])
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Transaction-scoped RLS Context Tests
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class RLSContextWrapperTests(TestCase):
+    """Tests for the lazy, transaction-local RLS execute_wrapper."""
+
+    IDLE, INTRANS = 0, 2
+
+    def setUp(self):
+        from types import SimpleNamespace
+        self.resolved = 0
+        self.raw = SimpleNamespace(info=SimpleNamespace(transaction_status=self.IDLE))
+        self.context = {
+            'connection': SimpleNamespace(connection=self.raw, get_autocommit=lambda: True),
+            'cursor': SimpleNamespace(cursor=SimpleNamespace(name=None)),
+        }
+        self.executed = []
+        self.wrapper = RLSContextWrapper(LazyIdentity(self._resolve))
+
+    def _resolve(self):
+        self.resolved += 1
+        return 7, 'teacher'
+
+    def _execute(self, sql, params, many, context):
+        self.executed.append((sql, params))
+        return 'ok'
+
+    def test_prefixes_first_statement_of_transaction(self):
+        """The first statement carries set_config(..., true) in the same round trip."""
+        result = self.wrapper(self._execute, 'SELECT * FROM t WHERE id = %s', [1], False, self.context)
+        self.assertEqual(result, 'ok')
+        sql, params = self.executed[0]
+        self.assertTrue(sql.startswith("SELECT set_config('rls.user_id', %s, true)"))
+        self.assertTrue(sql.endswith('; SELECT * FROM t WHERE id = %s'))
+        self.assertEqual(params, ['7', 'teacher', 1])
+
+    def test_skips_statements_inside_open_transaction(self):
+        """Once the transaction is open the context is not re-applied."""
+        self.wrapper(self._execute, 'SELECT 1', None, False, self.context)
+        self.raw.info.transaction_status = self.INTRANS
+        self.wrapper(self._execute, 'SELECT 2', None, False, self.context)
+        self.assertEqual(self.executed[1], ('SELECT 2', None))
+        self.assertEqual(self.wrapper.applied, 1)
+        self.assertEqual(self.resolved, 1)
+
+    def test_escapes_literal_percent_without_params(self):
+        """Statements without params get their '%' escaped once params are added."""
+        self.wrapper(self._execute, "SELECT 'a%b'", None, False, self.context)
+        sql, params = self.executed[0]
+        self.assertTrue(sql.endswith("; SELECT 'a%%b'"))
+        self.assertEqual(params, ['7', 'teacher'])
+
+    def test_reapplies_after_savepoint_rollback(self):
+        """A ROLLBACK TO SAVEPOINT may undo set_config, so the next statement re-applies it."""
+        self.raw.info.transaction_status = self.INTRANS
+        self.wrapper(self._execute, 'ROLLBACK TO SAVEPOINT "s1"', None, False, self.context)
+        self.wrapper(self._execute, 'SELECT 1', None, False, self.context)
+        self.assertEqual(self.executed[0][0], 'ROLLBACK TO SAVEPOINT "s1"')
+        self.assertIn('set_config', self.executed[1][0])
+
+    def test_named_params_and_executemany(self):
+        """Dict params and executemany rows get the context values prepended."""
+        self.wrapper(self._execute, 'INSERT INTO t VALUES (%(v)s)', [{'v': 1}, {'v': 2}], True, self.context)
+        sql, params = self.executed[0]
+        self.assertIn('%(_rls_user_role)s', sql)
+        self.assertEqual([row['v'] for row in params], [1, 2])
+        self.assertTrue(all(row['_rls_user_id'] == '7' for row in params))
+
+    def test_request_without_queries_resolves_nothing(self):
+        """The middleware costs nothing (no identity lookup) when the view does not query."""
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from security.middleware import RowLevelSecurityMiddleware
+
+        request = RequestFactory().get('/')
+        request.user = User(username='lazy')
+        middleware = RowLevelSecurityMiddleware(lambda request: HttpResponse('ok'))
+        with self.assertNumQueries(0):
+            response = middleware(request)
+        self.assertEqual(response.status_code, 200)
@@ -10,28 +10,38 @@ Implements:
 - Data protection audit logging
 """
 
+import atexit
 import base64
 import hashlib
 import json
 import logging
 import os
 import re
+import threading
+import time
+import uuid
 from typing import Any, Dict, List, Optional, Tuple, Union
 from io import BytesIO
 
 import magic
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 from django.http import HttpRequest
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
+from security import audit_sink
 from security.models import EncryptedDataKey, SecurityAuditLog
 
 logger = logging.getLogger(__name__)
 
+# Usos de las claves de datos pendientes de volcar (flush_encryption_usage)
+ENCRYPTION_USAGE_KEY = 'cifrado:usos:{}'
+ENCRYPTION_LAST_USED_KEY = 'cifrado:ultimo_uso:{}'
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Encryption Service
@@ -40,11 +50,31 @@ logger = logging.getLogger(__name__)
 class EncryptionService:
     """
     Servicio de encriptación AES-256-GCM con claves separadas por tipo de dato.
+
+    El material de las claves de datos se descifra una vez y se guarda en
+    una caché del proceso durante ENCRYPTION_KEY_CACHE_TTL segundos (300):
+    la clave activa de cada tipo y las claves por key_id. La clave activa
+    solo se cachea cuando su fila está confirmada (transaction.on_commit):
+    si la transacción que la creó se revierte, no se sigue cifrando con un
+    key_id que no existe. Rotar una clave en este proceso actualiza la caché
+    al confirmarse; los demás procesos pasan a la clave nueva al caducar su
+    entrada, y lo cifrado con la anterior se sigue descifrando con ella.
+
+    Los contadores de uso (usage_count, last_used) se acumulan en memoria,
+    pasan a la caché compartida al terminar cada petición o tarea
+    (drain_usage) y la tarea periódica security.tasks.flush_encryption_usage
+    los vuelca: un UPDATE y un evento 'encrypt' (con el número de valores en
+    details['count']) por clave.
     """
 
     # Master key for encrypting data keys (derived from Django SECRET_KEY)
     _master_key = None
 
+    _lock = threading.Lock()
+    _active_keys = {}   # key_type -> (key_id, pk, AESGCM, caduca)
+    _keys_by_id = {}    # key_id -> (pk, AESGCM, caduca)
+    _usage = {}         # pk -> [usos, último uso, key_type]
+
     @classmethod
     def _get_master_key(cls) -> bytes:
         """
@@ -64,6 +94,12 @@ class EncryptionService:
             cls._master_key = hkdf.derive(secret_key)
         return cls._master_key
 
+    @classmethod
+    def _unwrap(cls, data_key: EncryptedDataKey) -> bytes:
+        """Descifra el material de una clave de datos con la clave maestra."""
+        aesgcm = AESGCM(cls._get_master_key())
+        return aesgcm.decrypt(data_key.encrypted_key[:12], data_key.encrypted_key[12:], None)
+
     @classmethod
     def _get_or_create_data_key(cls, key_type: str) -> Tuple[EncryptedDataKey, bytes]:
         """
@@ -82,13 +118,7 @@ class EncryptionService:
         ).order_by('-key_version').first()
 
         if data_key:
-            # Descifrar el material de clave
-            master_key = cls._get_master_key()
-            aesgcm = AESGCM(master_key)
-            nonce = data_key.encrypted_key[:12]
-            ciphertext = data_key.encrypted_key[12:]
-            key_material = aesgcm.decrypt(nonce, ciphertext, None)
-            return data_key, key_material
+            return data_key, cls._unwrap(data_key)
 
         # Crear nueva clave
         return cls._rotate_key(key_type)
@@ -128,8 +158,200 @@ class EncryptionService:
             rotation_days=90,
         )
 
+        # La clave nueva pasa a ser la activa del tipo en este proceso en
+        # cuanto se confirme la fila (hasta entonces se lee de la BD)
+        with cls._lock:
+            cls._active_keys.pop(key_type, None)
+        cls._cache_on_commit(data_key, key_material, key_type)
         return data_key, key_material
 
+    @classmethod
+    def _cache_key(cls, data_key: EncryptedDataKey, key_material: bytes, key_type: str = None):
+        """Guarda el material descifrado en la caché del proceso."""
+        key_id = str(data_key.key_id)
+        entry = (data_key.pk, AESGCM(key_material), time.monotonic() + cls._key_cache_ttl())
+        with cls._lock:
+            cls._keys_by_id[key_id] = entry
+            if key_type is not None:
+                cls._active_keys[key_type] = (key_id, *entry)
+        return entry
+
+    @classmethod
+    def _cache_on_commit(cls, data_key: EncryptedDataKey, key_material: bytes, key_type: str):
+        """
+        Cachea la clave activa cuando se confirme la transacción en curso (al
+        momento fuera de una transacción). Si se revierte no se cachea nada.
+        """
+        transaction.on_commit(
+            lambda: cls._cache_key(data_key, key_material, key_type=key_type),
+            using=data_key._state.db,
+        )
+
+    @classmethod
+    def _active_key(cls, key_type: str) -> Tuple[str, int, AESGCM]:
+        """(key_id, pk, AESGCM) de la clave activa de `key_type`."""
+        entry = cls._active_keys.get(key_type)
+        if entry is None or entry[3] <= time.monotonic():
+            data_key, key_material = cls._get_or_create_data_key(key_type)
+            # La fila puede ser de una transacción aún abierta (creada o
+            # rotada en ella): solo se cachea al confirmarse
+            cls._cache_on_commit(data_key, key_material, key_type)
+            return str(data_key.key_id), data_key.pk, AESGCM(key_material)
+        return entry[:3]
+
+    @classmethod
+    def _keys_for_ids(cls, key_ids) -> Dict[str, Tuple[int, AESGCM]]:
+        """
+        (pk, AESGCM) por key_id, con una sola consulta para los que no están
+        en caché. Los key_id desconocidos no aparecen en el resultado.
+        """
+        now = time.monotonic()
+        found = {}
+        missing = set()
+        for key_id in key_ids:
+            entry = cls._keys_by_id.get(key_id)
+            if entry is not None and entry[2] > now:
+                found[key_id] = entry[:2]
+            else:
+                missing.add(key_id)
+        if missing:
+            valid = []
+            for key_id in missing:
+                try:
+                    valid.append(str(uuid.UUID(key_id)))
+                except ValueError:
+                    logger.error(f'Encryption key not found: {key_id}')
+            for data_key in EncryptedDataKey.objects.filter(key_id__in=valid):
+                entry = cls._cache_key(data_key, cls._unwrap(data_key))
+                found[str(data_key.key_id)] = entry[:2]
+        return found
+
+    @classmethod
+    def _key_cache_ttl(cls) -> int:
+        return getattr(settings, 'ENCRYPTION_KEY_CACHE_TTL', 300)
+
+    @classmethod
+    def clear_key_cache(cls):
+        """Olvida el material de claves cacheado en este proceso."""
+        with cls._lock:
+            cls._active_keys.clear()
+            cls._keys_by_id.clear()
+
+    @classmethod
+    def _record_usage(cls, pk: int, key_type: str, count: int = 1):
+        """Acumula `count` usos de la clave `pk` en memoria (ver drain_usage)."""
+        from django.utils import timezone
+
+        with cls._lock:
+            usage = cls._usage.setdefault(pk, [0, None, key_type])
+            usage[0] += count
+            usage[1] = timezone.now()
+
+    @classmethod
+    def drain_usage(cls, direct: bool = False) -> int:
+        """
+        Pasa los usos acumulados en el proceso a los contadores de la caché
+        compartida, que vuelca flush_usage. Con `direct`, o si la caché no
+        responde, se escriben directamente en la BD.
+
+        Returns:
+            int: Claves drenadas
+        """
+        from django.core.cache import cache
+
+        with cls._lock:
+            pending, cls._usage = cls._usage, {}
+        if not pending:
+            return 0
+        if not direct:
+            try:
+                for pk, (count, last_used, key_type) in pending.items():
+                    key = ENCRYPTION_USAGE_KEY.format(pk)
+                    cache.add(key, 0, None)
+                    cache.incr(key, count)
+                    cache.set(ENCRYPTION_LAST_USED_KEY.format(pk), last_used, None)
+                return len(pending)
+            except Exception as e:
+                logger.warning(f'Contadores de uso en caché no disponibles ({e}), se escriben en la BD')
+        cls._write_usage(pending)
+        return len(pending)
+
+    @classmethod
+    def flush_usage(cls) -> int:
+        """
+        Vuelca los usos de las claves acumulados en la caché (y los de este
+        proceso): un UPDATE y un evento de auditoría por clave.
+
+        Returns:
+            int: Claves actualizadas
+        """
+        from django.core.cache import cache
+
+        cls.drain_usage()
+        key_types = dict(EncryptedDataKey.objects.values_list('pk', 'key_type'))
+        usage_keys = {ENCRYPTION_USAGE_KEY.format(pk): pk for pk in key_types}
+        counts = cache.get_many(list(usage_keys))
+        last_used = cache.get_many([ENCRYPTION_LAST_USED_KEY.format(usage_keys[key]) for key in counts])
+
+        pending = {}
+        for key, count in counts.items():
+            if not count:
+                continue
+            pk = usage_keys[key]
+            # Se descuenta lo leído (no se borra) para no perder los usos que
+            # lleguen entre la lectura y el UPDATE
+            cache.decr(key, count)
+            pending[pk] = (count, last_used.get(ENCRYPTION_LAST_USED_KEY.format(pk)), key_types[pk])
+        cls._write_usage(pending)
+        return len(pending)
+
+    @classmethod
+    def _write_usage(cls, pending) -> None:
+        """UPDATE de usage_count/last_used y evento 'encrypt' por clave."""
+        from django.db.models import F
+        from django.utils import timezone
+
+        for pk, (count, last_used, key_type) in pending.items():
+            try:
+                EncryptedDataKey.objects.filter(pk=pk).update(
+                    usage_count=F('usage_count') + count,
+                    last_used=last_used or timezone.now(),
+                )
+                # Registrar evento de encriptación
+                audit_sink.record(
+                    SecurityAuditLog,
+                    event_type=SecurityAuditLog.EventTypes.DATA_ACCESS,
+                    action='encrypt',
+                    resource=f'encrypted_data/{key_type}',
+                    details={'key_type': key_type, 'count': count},
+                    success=True,
+                )
+            except Exception as e:
+                logger.warning(f'No se pudo volcar el uso de la clave {pk}: {e}')
+
+    @staticmethod
+    def _to_bytes(value: Any) -> bytes:
+        if isinstance(value, str):
+            return value.encode('utf-8')
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False).encode('utf-8')
+        return str(value).encode('utf-8')
+
+    @staticmethod
+    def _from_bytes(plaintext: bytes) -> Any:
+        # Intentar decodificar como JSON, si no, como string
+        try:
+            return json.loads(plaintext.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return plaintext.decode('utf-8')
+
+    @staticmethod
+    def _seal(key_id: str, aesgcm: AESGCM, plaintext: bytes) -> str:
+        nonce = os.urandom(12)
+        ciphertext = aesgcm.encrypt(nonce, plaintext, None)
+        # Formato: key_id|nonce|ciphertext
+        return f"{key_id}|{base64.b64encode(nonce).decode()}|{base64.b64encode(ciphertext).decode()}"
+
     @classmethod
     def encrypt(cls, value: Any, key_type: str = 'default') -> str:
         """
@@ -144,40 +366,35 @@ class EncryptionService:
         """
         if value is None:
             return None
+        return cls.encrypt_many([value], key_type=key_type)[0]
 
-        # Convertir a bytes
-        if isinstance(value, str):
-            plaintext = value.encode('utf-8')
-        elif isinstance(value, (dict, list)):
-            plaintext = json.dumps(value, ensure_ascii=False).encode('utf-8')
-        else:
-            plaintext = str(value).encode('utf-8')
-
-        data_key, key_material = cls._get_or_create_data_key(key_type)
-
-        # Encriptar
-        aesgcm = AESGCM(key_material)
-        nonce = os.urandom(12)
-        ciphertext = aesgcm.encrypt(nonce, plaintext, None)
+    @classmethod
+    def encrypt_many(cls, values: List[Any], key_type: str = 'default') -> List[Optional[str]]:
+        """
+        Encripta una lista de valores con la clave activa de `key_type`.
 
-        # Formato: key_id|nonce|ciphertext
-        result = f"{data_key.key_id}|{base64.b64encode(nonce).decode()}|{base64.b64encode(ciphertext).decode()}"
+        Una sola búsqueda de clave y una sola anotación de uso para todo el
+        lote.
 
-        # Actualizar contador de uso
-        data_key.usage_count += 1
-        data_key.last_used = __import__('django').utils.timezone.now()
-        data_key.save(update_fields=['usage_count', 'last_used'])
+        Args:
+            values: Valores a encriptar (los None se devuelven como None)
+            key_type: Tipo de clave
 
-        # Registrar evento de encriptación
-        SecurityAuditLog.objects.create(
-            event_type=SecurityAuditLog.EventTypes.DATA_ACCESS,
-            action='encrypt',
-            resource=f'encrypted_data/{key_type}',
-            details={'key_type': key_type},
-            success=True,
-        )
+        Returns:
+            List[Optional[str]]: Valores encriptados, en el mismo orden
+        """
+        values = list(values)
+        count = sum(1 for value in values if value is not None)
+        if not count:
+            return [None] * len(values)
 
-        return result
+        key_id, pk, aesgcm = cls._active_key(key_type)
+        results = [
+            None if value is None else cls._seal(key_id, aesgcm, cls._to_bytes(value))
+            for value in values
+        ]
+        cls._record_usage(pk, key_type, count)
+        return results
 
     @classmethod
     def decrypt(cls, encrypted_value: str, key_type: str = 'default') -> Any:
@@ -193,47 +410,63 @@ class EncryptionService:
         """
         if encrypted_value is None:
             return None
+        return cls.decrypt_many([encrypted_value], key_type=key_type)[0]
 
-        try:
+    @classmethod
+    def decrypt_many(cls, encrypted_values: List[str], key_type: str = 'default') -> List[Any]:
+        """
+        Descifra una lista de valores; las claves que no estén en caché se
+        cargan con una sola consulta.
+
+        Args:
+            encrypted_values: Valores en formato key_id|nonce|ciphertext
+            key_type: Tipo de clave (la clave real la indica cada valor)
+
+        Returns:
+            List[Any]: Valores descifrados en el mismo orden (None si el
+            valor es None o no se pudo descifrar)
+        """
+        parsed = []
+        for encrypted_value in encrypted_values:
+            if encrypted_value is None:
+                parsed.append(None)
+                continue
             # Parsear formato: key_id|nonce|ciphertext
             parts = encrypted_value.split('|')
             if len(parts) != 3:
-                logger.error(f'Invalid encrypted value format')
-                return None
+                logger.error('Invalid encrypted value format')
+                parsed.append(None)
+                continue
+            parsed.append(parts)
 
-            key_id = parts[0]
-            nonce = base64.b64decode(parts[1])
-            ciphertext = base64.b64decode(parts[2])
-
-            # Buscar la clave por key_id
+        try:
+            keys = cls._keys_for_ids({parts[0] for parts in parsed if parts})
+        except Exception as e:
+            logger.error(f'Decryption error: {str(e)}')
+            return [None] * len(parsed)
+
+        results = []
+        for parts in parsed:
+            if parts is None:
+                results.append(None)
+                continue
+            key = keys.get(parts[0])
+            if key is None:
+                logger.error(f'Encryption key not found: {parts[0]}')
+                results.append(None)
+                continue
             try:
-                data_key = EncryptedDataKey.objects.get(key_id=key_id)
-            except EncryptedDataKey.DoesNotExist:
-                logger.error(f'Encryption key not found: {key_id}')
-                return None
-
-            # Descifrar el material de clave
-            master_key = cls._get_master_key()
-            aesgcm_master = AESGCM(master_key)
-            key_material = aesgcm_master.decrypt(
-                data_key.encrypted_key[:12],
-                data_key.encrypted_key[12:],
-                None
-            )
+                plaintext = key[1].decrypt(base64.b64decode(parts[1]), base64.b64decode(parts[2]), None)
+            except Exception as e:
+                logger.error(f'Decryption error: {str(e)}')
+                results.append(None)
+                continue
+            results.append(cls._from_bytes(plaintext))
+        return results
 
-            # Descifrar el valor
-            aesgcm = AESGCM(key_material)
-            plaintext = aesgcm.decrypt(nonce, ciphertext, None)
 
-            # Intentar decodificar como JSON, si no, como string
-            try:
-                return json.loads(plaintext.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                return plaintext.decode('utf-8')
-
-        except Exception as e:
-            logger.error(f'Decryption error: {str(e)}')
-            return None
+# Los usos pendientes se escriben al terminar el proceso
+atexit.register(EncryptionService.drain_usage, direct=True)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -722,7 +955,8 @@ class DataProtectionAuditService:
             details: Detalles adicionales
             user: Usuario que realizó la operación
         """
-        SecurityAuditLog.objects.create(
+        audit_sink.record(
+            SecurityAuditLog,
             event_type=SecurityAuditLog.EventTypes.DATA_ACCESS,
             user=user,
             action=f'data_{operation}',
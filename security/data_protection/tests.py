@@ -5,7 +5,9 @@ Tests: AES-256-GCM encryption, input sanitization, file validation, data masking
 """
 
 from django.test import TestCase
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
 from io import BytesIO
 
 from security.data_protection.services import (
@@ -21,6 +23,13 @@ from security.data_protection.services import (
 class EncryptionServiceTests(TestCase):
     """Tests for AES-256-GCM encryption with key separation."""
 
+    def setUp(self):
+        # Keys cached by earlier tests (via captured on_commit callbacks)
+        # belong to rows TestCase has since rolled back
+        EncryptionService.clear_key_cache()
+        EncryptionService._usage.clear()
+        cache.clear()
+
     def test_encrypt_decrypt_string(self):
         """Should encrypt and decrypt string values."""
         original = 'Hello, World!'
@@ -73,6 +82,77 @@ class EncryptionServiceTests(TestCase):
         # Different key types should produce different ciphertexts
         self.assertNotEqual(enc_default, enc_pii)
 
+    def test_key_material_is_cached(self):
+        """After the first call, encrypt/decrypt should not touch the database."""
+        with self.captureOnCommitCallbacks(execute=True):
+            encrypted = EncryptionService.encrypt('cached')
+        with self.assertNumQueries(0):
+            again = EncryptionService.encrypt('cached again')
+            self.assertEqual(EncryptionService.decrypt(encrypted), 'cached')
+            self.assertEqual(EncryptionService.decrypt(again), 'cached again')
+
+    def test_encrypt_many_decrypt_many_round_trip(self):
+        """Batch APIs should preserve order and None values."""
+        values = ['uno', None, {'a': 1}, 'tres']
+        encrypted = EncryptionService.encrypt_many(values, key_type='pii')
+        self.assertIsNone(encrypted[1])
+        self.assertEqual(EncryptionService.decrypt_many(encrypted), values)
+
+    def test_decrypt_many_loads_keys_in_one_query(self):
+        """Uncached keys for a batch are loaded with a single query."""
+        encrypted = (
+            EncryptionService.encrypt_many(['a', 'b'], key_type='default')
+            + EncryptionService.encrypt_many(['c'], key_type='pii')
+        )
+        EncryptionService.clear_key_cache()
+        with self.assertNumQueries(1):
+            decrypted = EncryptionService.decrypt_many(encrypted + ['broken'])
+        self.assertEqual(decrypted, ['a', 'b', 'c', None])
+
+    def test_rotation_switches_active_key(self):
+        """A rotated key is used at once; old ciphertexts still decrypt."""
+        old = EncryptionService.encrypt('before')
+        EncryptionService._rotate_key('default')
+        new = EncryptionService.encrypt('after')
+        self.assertNotEqual(old.split('|')[0], new.split('|')[0])
+        self.assertEqual(EncryptionService.decrypt_many([old, new]), ['before', 'after'])
+
+    def test_rolled_back_key_is_not_cached(self):
+        """A key created in a transaction that rolls back is never used again."""
+        from security.models import EncryptedDataKey
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    EncryptionService._rotate_key('default')
+                    EncryptionService.encrypt('inside')
+                    raise RuntimeError
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            key_id = EncryptionService.encrypt('after').split('|')[0]
+        self.assertTrue(EncryptedDataKey.objects.filter(key_id=key_id, is_active=True).exists())
+        self.assertEqual(EncryptionService.encrypt('cached').split('|')[0], key_id)
+
+    def test_usage_counters_are_flushed_in_bulk(self):
+        """Usage and audit are accumulated and written once per key by the periodic task."""
+        from security.models import EncryptedDataKey, SecurityAuditLog
+        from security.tasks import flush_encryption_usage
+
+        EncryptionService.encrypt_many(['a', 'b', 'c'])
+        EncryptionService.drain_usage()
+        EncryptionService.encrypt('d')
+        data_key = EncryptedDataKey.objects.get(key_type='default', is_active=True)
+        self.assertEqual(data_key.usage_count, 0)
+        self.assertFalse(SecurityAuditLog.objects.filter(action='encrypt').exists())
+
+        self.assertEqual(flush_encryption_usage(), 1)
+        data_key.refresh_from_db()
+        self.assertEqual(data_key.usage_count, 4)
+        self.assertIsNotNone(data_key.last_used)
+        audit = SecurityAuditLog.objects.get(action='encrypt')
+        self.assertEqual(audit.details, {'key_type': 'default', 'count': 4})
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Input Sanitization Tests
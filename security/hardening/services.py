@@ -13,13 +13,20 @@ import hashlib
 import logging
 import os
 import re
+import threading
+import time
+import uuid
 from typing import List, Optional, Tuple
 from urllib.parse import urlparse
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
 from django.http import HttpRequest, HttpResponse
 from django.template.loader import render_to_string
+from django.utils import timezone
 
+from security import audit_sink
 from security.models import WAFRule, SecurityAuditLog
 
 logger = logging.getLogger(__name__)
@@ -29,6 +36,20 @@ logger = logging.getLogger(__name__)
 # WAF Service
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Sello de versión de las reglas en la caché compartida (Redis). Cada proceso
+# guarda sus reglas compiladas y solo las recarga de la BD cuando cambia.
+WAF_RULES_VERSION_KEY = 'waf:reglas:version'
+# Segundos entre comprobaciones del sello de versión (una lectura de caché).
+WAF_RULES_CHECK_INTERVAL = getattr(settings, 'WAF_RULES_CHECK_INTERVAL', 5)
+# Contadores de aciertos pendientes de volcar a WAFRule (flush_waf_hit_counters)
+WAF_HITS_KEY = 'waf:hits:{}'
+WAF_LAST_HIT_KEY = 'waf:last_hit:{}'
+
+# Referencias a grupos por número o nombre: cambian de significado al unir
+# el patrón con otros, así que esas reglas se evalúan por separado.
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
 class WAFResult:
     """Resultado de la evaluación WAF."""
 
@@ -47,6 +68,71 @@ class WAFResult:
         self.description = description
 
 
+class CompiledWAFRules:
+    """
+    Conjunto de reglas WAF compiladas una sola vez.
+
+    Todos los patrones se unen en una única alternancia (un solo recorrido
+    del valor por el motor de regex). Solo si esa alternancia coincide se
+    recorren las reglas en orden para saber cuál bloqueó, así que la regla
+    reportada es la misma que con la evaluación regla a regla.
+    """
+
+    def __init__(self, rules):
+        self.rules = []
+        combinable = []
+        self.standalone = []
+
+        for rule in rules:
+            pattern = rule.get('pattern') or ''
+            if not pattern:
+                continue
+            try:
+                compiled = re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                logger.warning(f"WAF: patrón inválido en la regla '{rule.get('name')}': {e}")
+                continue
+            self.rules.append((compiled, rule))
+            if self._is_combinable(pattern, compiled):
+                combinable.append(pattern)
+            else:
+                self.standalone.append(compiled)
+
+        self.combined = None
+        if combinable:
+            try:
+                self.combined = re.compile(
+                    '|'.join(f'(?:{pattern})' for pattern in combinable), re.IGNORECASE
+                )
+            except re.error as e:
+                logger.warning(f'WAF: no se pudieron combinar los patrones, se evalúan por separado: {e}')
+                self.standalone = [compiled for compiled, _ in self.rules]
+
+    @staticmethod
+    def _is_combinable(pattern: str, compiled) -> bool:
+        """Grupos con nombre, referencias y flags globales ((?i)...) no se pueden unir."""
+        if compiled.groupindex or _BACKREFERENCE.search(pattern):
+            return False
+        try:
+            re.compile(f'x|(?:{pattern})')
+        except re.error:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, value: str) -> Optional[dict]:
+        """Devuelve la primera regla (en orden) que coincide con `value`, o None."""
+        if not (self.combined is not None and self.combined.search(value)):
+            if not any(compiled.search(value) for compiled in self.standalone):
+                return None
+        for compiled, rule in self.rules:
+            if compiled.search(value):
+                return rule
+        return None
+
+
 class WAFService:
     """
     Web Application Firewall Service.
@@ -115,6 +201,12 @@ class WAFService:
     # Parámetros a verificar - solo los más peligrosos
     CHECK_PARAMETERS = ['cmd', 'command', 'exec', 'sh', 'bash', 'powershell', 'wget', 'curl']
 
+    # Reglas compiladas de este proceso (ver get_compiled_rules)
+    _compiled_rules: Optional[CompiledWAFRules] = None
+    _compiled_version: Optional[str] = None
+    _rules_checked_at = 0.0
+    _rules_lock = threading.Lock()
+
     @classmethod
     def initialize_default_rules(cls):
         """
@@ -192,40 +284,131 @@ class WAFService:
         if not value or not isinstance(value, str):
             return WAFResult(blocked=False)
 
-        # Obtener reglas activas de la base de datos
-        rules = WAFRule.objects.filter(is_active=True)
-
-        # Si no hay reglas en DB, usar las por defecto
-        if not rules.exists():
-            for rule_data in cls.DEFAULT_RULES:
-                if rule_data['pattern']:
-                    match = re.search(
-                        rule_data['pattern'], value, re.IGNORECASE
-                    )
-                    if match:
-                        return WAFResult(
-                            blocked=True,
-                            rule_name=rule_data['name'],
-                            category=rule_data['category'],
-                            severity=rule_data['severity'],
-                            description=rule_data['description'],
-                        )
+        rule = cls.get_compiled_rules().match(value)
+        if rule is None:
             return WAFResult(blocked=False)
+        return WAFResult(
+            blocked=True,
+            rule_name=rule['name'],
+            category=rule['category'],
+            severity=rule['severity'],
+            description=rule['description'],
+        )
 
-        # Usar reglas de la base de datos
-        for rule in rules:
-            if rule.pattern:
-                match = re.search(rule.pattern, value, re.IGNORECASE)
-                if match:
-                    return WAFResult(
-                        blocked=True,
-                        rule_name=rule.name,
-                        category=rule.category,
-                        severity=rule.severity,
-                        description=rule.description,
-                    )
+    @classmethod
+    def get_compiled_rules(cls) -> CompiledWAFRules:
+        """
+        Reglas activas compiladas, cacheadas en memoria del proceso.
 
-        return WAFResult(blocked=False)
+        Cada WAF_RULES_CHECK_INTERVAL segundos se compara el sello de versión
+        de la caché compartida; las reglas solo se vuelven a leer de la BD
+        cuando el sello cambió (invalidate_rules). Si no hay reglas activas
+        en la BD se usan DEFAULT_RULES.
+        """
+        now = time.monotonic()
+        compiled = cls._compiled_rules
+        if compiled is not None and now - cls._rules_checked_at < WAF_RULES_CHECK_INTERVAL:
+            return compiled
+
+        # El sello se lee antes que las reglas: si cambia mientras se cargan,
+        # la siguiente comprobación volverá a cargarlas.
+        version = cls._rules_version()
+        with cls._rules_lock:
+            stale = version is not None and version != cls._compiled_version
+            if cls._compiled_rules is None or stale:
+                cls._compiled_rules = cls._load_rules()
+                cls._compiled_version = version
+            cls._rules_checked_at = now
+            return cls._compiled_rules
+
+    @classmethod
+    def _load_rules(cls) -> CompiledWAFRules:
+        rules = list(
+            WAFRule.objects.filter(is_active=True).order_by('pk')
+            .values('name', 'category', 'pattern', 'severity', 'description')
+        )
+        compiled = CompiledWAFRules(rules or cls.DEFAULT_RULES)
+        logger.info(f'WAF: {len(compiled)} reglas compiladas ({"BD" if rules else "por defecto"})')
+        return compiled
+
+    @staticmethod
+    def _rules_version() -> Optional[str]:
+        """Sello de versión actual de las reglas; None si la caché no responde."""
+        try:
+            version = cache.get(WAF_RULES_VERSION_KEY)
+            if version is None:
+                cache.add(WAF_RULES_VERSION_KEY, uuid.uuid4().hex, None)
+                version = cache.get(WAF_RULES_VERSION_KEY)
+            return version
+        except Exception as e:
+            logger.warning(f'WAF: no se pudo leer la versión de las reglas: {e}')
+            return None
+
+    @classmethod
+    def invalidate_rules(cls):
+        """
+        Publica un nuevo sello de versión para que todos los procesos recarguen
+        las reglas, y descarta las compiladas en este. Se llama al guardar o
+        borrar un WAFRule (security.signals).
+        """
+        with cls._rules_lock:
+            cls._compiled_rules = None
+            cls._compiled_version = None
+        try:
+            cache.set(WAF_RULES_VERSION_KEY, uuid.uuid4().hex, None)
+        except Exception as e:
+            logger.warning(f'WAF: no se pudo publicar la versión de las reglas: {e}')
+
+    @classmethod
+    def _count_hit(cls, rule_name: str):
+        """
+        Suma el acierto en la caché; flush_hit_counters lo vuelca a WAFRule.
+        Si la caché no responde se actualiza la regla con un incremento atómico.
+        """
+        now = timezone.now()
+        try:
+            key = WAF_HITS_KEY.format(rule_name)
+            cache.add(key, 0, None)
+            cache.incr(key)
+            cache.set(WAF_LAST_HIT_KEY.format(rule_name), now, None)
+        except Exception as e:
+            logger.warning(f'WAF: contador en caché no disponible ({e}), se actualiza la regla')
+            WAFRule.objects.filter(name=rule_name).update(
+                hit_count=F('hit_count') + 1, last_hit=now
+            )
+
+    @classmethod
+    def flush_hit_counters(cls) -> int:
+        """
+        Vuelca a WAFRule.hit_count/last_hit los aciertos acumulados en la caché
+        con un UPDATE ... hit_count = hit_count + n por regla.
+
+        Returns:
+            int: Aciertos volcados
+        """
+        names = list(WAFRule.objects.values_list('name', flat=True))
+        hit_keys = {WAF_HITS_KEY.format(name): name for name in names}
+        pending = cache.get_many(list(hit_keys))
+        last_hits = cache.get_many([WAF_LAST_HIT_KEY.format(hit_keys[key]) for key in pending])
+
+        flushed = 0
+        for key, hits in pending.items():
+            if not hits:
+                continue
+            name = hit_keys[key]
+            # Se descuenta lo leído (no se borra) para no perder los aciertos
+            # que lleguen entre la lectura y el UPDATE.
+            cache.decr(key, hits)
+            try:
+                WAFRule.objects.filter(name=name).update(
+                    hit_count=F('hit_count') + hits,
+                    last_hit=last_hits.get(WAF_LAST_HIT_KEY.format(name)) or timezone.now(),
+                )
+            except Exception:
+                cache.incr(key, hits)
+                raise
+            flushed += hits
+        return flushed
 
     @classmethod
     def _log_waf_hit(cls, result: WAFResult, request: HttpRequest):
@@ -236,14 +419,7 @@ class WAFService:
             result: Resultado WAF
             request: HttpRequest
         """
-        # Actualizar contador de la regla
-        try:
-            rule = WAFRule.objects.get(name=result.rule_name)
-            rule.hit_count += 1
-            rule.last_hit = __import__('django').utils.timezone.now()
-            rule.save(update_fields=['hit_count', 'last_hit'])
-        except WAFRule.DoesNotExist:
-            pass
+        cls._count_hit(result.rule_name)
 
         # Determinar si es navegación normal
         path = request.path_info
@@ -264,7 +440,8 @@ class WAFService:
             return
 
         # Registrar en audit log solo si es amenaza real o test significativo
-        SecurityAuditLog.objects.create(
+        audit_sink.record(
+            SecurityAuditLog,
             event_type=SecurityAuditLog.EventTypes.API_REQUEST,
             action='waf_blocked',
             resource=f'waf/{result.category}',
@@ -7,8 +7,10 @@ Tests: WAF rules, security.txt, SRI hashes, security headers, exposed key detect
 from django.test import TestCase, RequestFactory
 from django.http import HttpResponse
 
+from django.core.cache import cache
+
 from security.hardening.services import (
-    WAFService, WAFResult, SecurityTxtService,
+    WAFService, WAFResult, CompiledWAFRules, SecurityTxtService,
     SRIHashService, SecurityHeadersService, ExposedKeyDetectionService,
 )
 from security.models import WAFRule
@@ -26,6 +28,8 @@ class WAFServiceTests(TestCase):
 
     def setUp(self):
         self.factory = RequestFactory()
+        cache.clear()
+        WAFService.invalidate_rules()
 
     def test_sql_injection_detected(self):
         """Should detect SQL injection patterns."""
@@ -83,6 +87,62 @@ class WAFServiceTests(TestCase):
         expected = {'sql_injection', 'xss', 'path_traversal', 'command_injection', 'csrf'}
         self.assertEqual(categories, expected)
 
+    def test_compiled_rules_no_queries(self):
+        """Once the rules are compiled, checking requests should not hit the DB."""
+        WAFService.initialize_default_rules()
+        WAFService.get_compiled_rules()
+        with self.assertNumQueries(0):
+            result = WAFService._check_value('ls && rm -rf /', 'cmd')
+            self.assertFalse(WAFService._check_value('normal value', 'cmd').blocked)
+        self.assertTrue(result.blocked)
+        self.assertEqual(result.category, 'command_injection')
+
+    def test_rules_reloaded_after_save(self):
+        """Saving a WAFRule should publish a new version and reload the rules."""
+        self.assertFalse(WAFService._check_value('evil-token', 'cmd').blocked)
+        with self.captureOnCommitCallbacks(execute=True):
+            WAFRule.objects.create(
+                name='Custom token', category=WAFRule.Categories.CUSTOM,
+                pattern=r'evil-token', severity='medium',
+            )
+        result = WAFService._check_value('evil-token', 'cmd')
+        self.assertTrue(result.blocked)
+        self.assertEqual(result.rule_name, 'Custom token')
+
+    def test_first_matching_rule_reported(self):
+        """The combined matcher should report the first rule in order."""
+        rules = CompiledWAFRules([
+            {'name': 'flag', 'category': 'custom', 'pattern': r'(?i)alpha',
+             'severity': 'low', 'description': ''},
+            {'name': 'backref', 'category': 'custom', 'pattern': r'(ab)\1',
+             'severity': 'low', 'description': ''},
+            {'name': 'broad', 'category': 'custom', 'pattern': r'a',
+             'severity': 'low', 'description': ''},
+            {'name': 'invalid', 'category': 'custom', 'pattern': r'(',
+             'severity': 'low', 'description': ''},
+        ])
+        self.assertEqual(len(rules), 3)
+        self.assertEqual(rules.match('xx ALPHA')['name'], 'flag')
+        self.assertEqual(rules.match('abab')['name'], 'backref')
+        self.assertEqual(rules.match('cat')['name'], 'broad')
+        self.assertIsNone(rules.match('xyz'))
+
+    def test_hit_counter_buffered_and_flushed(self):
+        """Hits are counted in the cache and flushed with an atomic increment."""
+        WAFService.initialize_default_rules()
+        request = self.factory.get('/tools/', {'cmd': 'ls && cat /etc/passwd'})
+        self.assertTrue(WAFService.check_request(request).blocked)
+        self.assertTrue(WAFService.check_request(request).blocked)
+
+        rule = WAFRule.objects.get(name='Command Injection - Dangerous patterns')
+        self.assertEqual(rule.hit_count, 0)
+
+        self.assertEqual(WAFService.flush_hit_counters(), 2)
+        rule.refresh_from_db()
+        self.assertEqual(rule.hit_count, 2)
+        self.assertIsNotNone(rule.last_hit)
+        self.assertEqual(WAFService.flush_hit_counters(), 0)
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Security.txt Tests
@@ -0,0 +1,43 @@
+"""
+Django management command to benchmark EncryptionService throughput.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from security.data_protection.services import EncryptionService
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure field operations per second for encrypt/decrypt one value '
+        'at a time and for encrypt_many/decrypt_many on a single core'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fields', type=int, default=10000, help='Values per run')
+        parser.add_argument('--key-type', default='default', help='Data key type')
+
+    def handle(self, *args, **options):
+        fields = options['fields']
+        key_type = options['key_type']
+        values = [f'valor-{index:08d}@example.org' for index in range(fields)]
+
+        # Calienta la caché de claves (y crea la clave si no existe)
+        EncryptionService.decrypt(EncryptionService.encrypt('warmup', key_type=key_type))
+
+        encrypted = self._run('encrypt', lambda: [EncryptionService.encrypt(v, key_type=key_type) for v in values], fields)
+        self._run('decrypt', lambda: [EncryptionService.decrypt(v) for v in encrypted], fields)
+        encrypted = self._run('encrypt_many', lambda: EncryptionService.encrypt_many(values, key_type=key_type), fields)
+        decrypted = self._run('decrypt_many', lambda: EncryptionService.decrypt_many(encrypted), fields)
+        if decrypted != values:
+            self.stderr.write(self.style.ERROR('Round trip mismatch'))
+        EncryptionService.flush_usage()
+
+    def _run(self, label, operation, fields):
+        started = time.perf_counter()
+        result = operation()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'  {label:<14} {fields / elapsed:>12,.0f} fields/s ({elapsed * 1000:.1f} ms)')
+        return result
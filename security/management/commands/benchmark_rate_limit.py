@@ -0,0 +1,99 @@
+"""
+Django management command to benchmark the shared rate limiter.
+"""
+
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from security.api_security import rate_limiter
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the GCRA rate limiter with parallel clients: per-request '
+        'overhead and accuracy (admitted requests vs. the configured limit), '
+        'compared with the previous get/set counter'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=16, help='Parallel clients (threads)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per client')
+        parser.add_argument('--limit', type=int, default=500, help='Requests allowed per window')
+        parser.add_argument('--window', type=int, default=60, help='Window in seconds')
+        parser.add_argument('--skip-legacy', action='store_true', help='Do not run the get/set baseline')
+
+    def handle(self, *args, **options):
+        config = {'requests': options['limit'], 'window': options['window'], 'block': 0}
+        engine = 'redis (Lua script)' if rate_limiter._redis_client() is not None else 'local cache + lock'
+        self.stdout.write(
+            f"Engine: {engine} | clients: {options['clients']} | "
+            f"requests/client: {options['requests']} | limit: {options['limit']}/{options['window']}s"
+        )
+
+        runs = [('gcra', self._gcra)]
+        if not options['skip_legacy']:
+            runs.append(('get/set', self._legacy))
+
+        for label, check in runs:
+            identifier = f'benchmark:{uuid.uuid4().hex[:8]}'
+            latencies, admitted, elapsed = self._run(check, identifier, config, options)
+            latencies.sort()
+            total = len(latencies)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+            self.stdout.write(
+                f'  {total} requests in {elapsed:.2f}s ({total / elapsed:,.0f} req/s)\n'
+                f'  latency median {statistics.median(latencies):.3f} ms | '
+                f'p95 {latencies[int(total * 0.95) - 1]:.3f} ms | '
+                f'p99 {latencies[int(total * 0.99) - 1]:.3f} ms'
+            )
+            expected = min(total, config['requests'])
+            style = self.style.SUCCESS if admitted == expected else self.style.ERROR
+            self.stdout.write(style(f'  admitted {admitted} (expected {expected}, error {admitted - expected:+d})'))
+            rate_limiter.reset('benchmark', identifier)
+            cache.delete(f'benchmark:legacy:{identifier}')
+
+    def _run(self, check, identifier, config, options):
+        latencies = []
+        admitted = 0
+        lock = threading.Lock()
+
+        def client(_):
+            nonlocal admitted
+            local_latencies = []
+            local_admitted = 0
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                allowed = check(identifier, config)
+                local_latencies.append((time.perf_counter() - start) * 1000)
+                local_admitted += allowed
+            with lock:
+                latencies.extend(local_latencies)
+                admitted += local_admitted
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['clients']) as pool:
+            list(pool.map(client, range(options['clients'])))
+        return latencies, admitted, time.perf_counter() - start
+
+    @staticmethod
+    def _gcra(identifier, config):
+        return rate_limiter.check('benchmark', identifier, config).allowed
+
+    @staticmethod
+    def _legacy(identifier, config):
+        """Replica of the previous counter: get -> mutate -> set (two round trips, racy)."""
+        key = f'benchmark:legacy:{identifier}'
+        now = int(time.time())
+        data = cache.get(key)
+        if data is None or now - data['window_start'] > config['window']:
+            cache.set(key, {'count': 1, 'window_start': now}, config['window'])
+            return True
+        data['count'] += 1
+        cache.set(key, data, config['window'])
+        return data['count'] <= config['requests']
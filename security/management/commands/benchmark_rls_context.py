@@ -0,0 +1,88 @@
+"""
+Django management command to benchmark the per-request RLS context.
+"""
+
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from security.authorization.services import RowLevelSecurityService
+from security.middleware import RowLevelSecurityMiddleware
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-request latency of the session-level RLS context '
+        '(rls_set_context at request start and again to clear it) with the '
+        'transaction-local context applied lazily by RowLevelSecurityMiddleware'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Timed requests per scenario')
+        parser.add_argument('--queries', type=int, default=3, help='Queries run by the synthetic view')
+        parser.add_argument('--username', help='Authenticated user (default: first active user)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('RLS context only applies to PostgreSQL')
+        if options['username']:
+            user = User.objects.get(username=options['username'])
+        else:
+            user = User.objects.filter(is_active=True, is_superuser=False).first()
+        if user is None:
+            raise CommandError('No user available for the authenticated scenarios')
+
+        self.stdout.write(
+            f"Requests: {options['requests']} | view queries: {options['queries']} | user: {user.username}"
+        )
+        for label, request_user in (('anonymous', AnonymousUser()), ('authenticated', user)):
+            for queries in (0, options['queries']):
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}, {queries} view queries'))
+                view = self._view(queries)
+                self._measure('session (legacy)', self._legacy(view), request_user, options['requests'])
+                self._measure('transaction-local', RowLevelSecurityMiddleware(view), request_user, options['requests'])
+
+    @staticmethod
+    def _view(queries):
+        def view(request):
+            with connection.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute('SELECT 1')
+            return HttpResponse('ok')
+        return view
+
+    @staticmethod
+    def _legacy(view):
+        """El middleware anterior: fija el contexto de sesión y lo limpia al responder."""
+        def middleware(request):
+            if request.user.is_authenticated:
+                RowLevelSecurityService.set_rls_context(request.user)
+            else:
+                RowLevelSecurityService.clear_rls_context()
+            response = view(request)
+            RowLevelSecurityService.clear_rls_context()
+            return response
+        return middleware
+
+    def _measure(self, label, middleware, user, iterations):
+        factory = RequestFactory()
+        latencies = []
+        with CaptureQueriesContext(connection) as captured:
+            for _ in range(iterations):
+                request = factory.get('/')
+                request.user = user
+                started = time.perf_counter()
+                middleware(request)
+                latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        self.stdout.write(
+            f'  {label:<18} median {statistics.median(latencies):.3f} ms | '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1]:.3f} ms | '
+            f'statements/request {len(captured) / iterations:.1f}'
+        )
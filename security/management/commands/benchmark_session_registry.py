@@ -0,0 +1,90 @@
+"""
+Django management command to benchmark the per-user session registry.
+"""
+
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from security.auth import session_registry
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the session registry with synthetic sessions in steps up to '
+        '--sessions and time the per-user operations (count, activity touch, '
+        'log out everywhere) at each size; latency should stay flat'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=50000, help='Total synthetic sessions')
+        parser.add_argument('--steps', type=int, default=3, help='Measurement points up to --sessions')
+        parser.add_argument('--per-user', type=int, default=3, help='Sessions per synthetic user')
+        parser.add_argument('--iterations', type=int, default=200, help='Timed calls per operation')
+
+    def handle(self, *args, **options):
+        engine = 'redis' if session_registry._redis_client() is not None else 'cache emulation'
+        self.stdout.write(
+            f"Engine: {engine} | sessions: {options['sessions']:,} | "
+            f"sessions/user: {options['per_user']} | iterations: {options['iterations']}"
+        )
+        run = uuid.uuid4().hex[:8]
+        users = []
+        sizes = [options['sessions'] * step // options['steps'] for step in range(1, options['steps'] + 1)]
+        filled = 0
+        try:
+            for size in sizes:
+                users.extend(self._fill(run, filled, size, options['per_user']))
+                filled = size
+                self._measure(size, users, options['iterations'], options['per_user'])
+        finally:
+            # Quita las entradas sintéticas (los índices de actividad incluidos)
+            for user_id in users:
+                session_registry.invalidate_user(user_id)
+
+    def _fill(self, run, start, end, per_user):
+        """Registra sesiones sintéticas [start, end) en un pipeline por lote."""
+        client = session_registry._client()
+        users = []
+        now = time.time()
+        pipe = client.pipeline(transaction=False)
+        for index in range(start, end):
+            user_id = f'bench-{run}-{index // per_user}'
+            if index % per_user == 0:
+                users.append(user_id)
+            session_key = f'{run}{index:024d}'
+            pipe.zadd(session_registry._key(session_registry.USER_KEY.format(user_id)), {session_key: now})
+            pipe.zadd(
+                session_registry._key(session_registry.ACTIVITY_KEY),
+                {session_registry._member(user_id, session_key): now},
+            )
+            if index % 1000 == 999:
+                pipe.execute()
+        pipe.execute()
+        return users
+
+    def _measure(self, size, users, iterations, per_user):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{size:,} sessions'))
+        targets = [users[i * len(users) // iterations] for i in range(iterations)]
+        operations = [
+            ('count', lambda user_id: session_registry.count(user_id)),
+            ('touch', lambda user_id: session_registry.touch(user_id, f'{user_id}-extra')),
+            ('log out everywhere', lambda user_id: session_registry.invalidate_user(user_id)),
+        ]
+        for label, operation in operations:
+            latencies = []
+            for user_id in targets:
+                started = time.perf_counter()
+                operation(user_id)
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+            self.stdout.write(
+                f'  {label:<20} median {statistics.median(latencies):.3f} ms | '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1]:.3f} ms'
+            )
+        # Los usuarios medidos pierden sus sesiones: se vuelven a registrar
+        for user_id in targets:
+            for n in range(per_user):
+                session_registry.touch(user_id, f'{user_id}-{n}')
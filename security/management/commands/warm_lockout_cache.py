@@ -0,0 +1,19 @@
+"""
+Django management command to copy active account lockouts into the cache.
+"""
+
+from django.core.management.base import BaseCommand
+
+from security.auth.services import AccountLockoutService
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy every active account lockout (UserSecurityProfile.account_locked_until) '
+        'into the shared cache read by SessionSecurityMiddleware. Run it after the '
+        'cache has been flushed or restarted.'
+    )
+
+    def handle(self, *args, **options):
+        count = AccountLockoutService.warm_user_locks()
+        self.stdout.write(self.style.SUCCESS(f'{count} active lockouts copied to the cache'))
@@ -9,12 +9,14 @@ Implements:
 
 import re
 import logging
+import time
 from django.http import HttpResponse, JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from django.utils import timezone
 from django.conf import settings
 
 from security.hardening.services import WAFService, SecurityHeadersService
+from security.auth import session_metrics
 from security.auth.services import SessionSecurityService, AccountLockoutService
 from security.models import SecurityAuditLog
 
@@ -131,20 +133,32 @@ class SessionSecurityMiddleware(MiddlewareMixin):
     """
     Middleware de seguridad de sesiones.
 
-    - Actualiza la marca de última actividad
-    - Verifica sesiones concurrentes
-    - Verifica bloqueo de cuenta
+    - Actualiza la marca de última actividad (con la granularidad de
+      SESSION_ACTIVITY_GRANULARITY)
+    - Verifica el bloqueo de la IP y de la cuenta con una sola lectura a la
+      caché, memorizada unos segundos en el proceso
+    - Mide su propio sobrecoste (security.auth.session_metrics)
     """
 
     def process_request(self, request):
         """Procesa cada request para seguridad de sesión."""
-        if request.user.is_authenticated:
+        if not request.user.is_authenticated:
+            return None
+
+        started = time.perf_counter()
+        counters = {}
+        try:
             # Actualizar última actividad
-            SessionSecurityService.update_last_activity(request)
+            written = SessionSecurityService.update_last_activity(request)
+            counters['activity_writes' if written else 'activity_skipped'] = 1
 
-            # Verificar bloqueo de cuenta por IP
             ip_address = request.META.get('REMOTE_ADDR', '')
-            if ip_address and AccountLockoutService.check_ip_locked(ip_address):
+            status = AccountLockoutService.lockout_status(request.user.pk, ip_address)
+            counters['lockout_local_hits' if status.cached else 'lockout_lookups'] = 1
+
+            # Verificar bloqueo de cuenta por IP
+            if status.ip_locked:
+                counters['blocked'] = 1
                 logger.warning(
                     f'Blocked request from locked IP: {ip_address}'
                 )
@@ -154,14 +168,26 @@ class SessionSecurityMiddleware(MiddlewareMixin):
                 )
 
             # Verificar si la cuenta del usuario está bloqueada
-            if AccountLockoutService.check_user_locked(request.user):
+            if status.user_locked:
+                counters['blocked'] = 1
                 return JsonResponse(
                     {'error': 'Account locked due to too many failed attempts. Try again later.'},
                     status=429,
                 )
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            request._session_security_ms = elapsed_ms
+            session_metrics.record(elapsed_ms, **counters)
 
         return None
 
+    def process_response(self, request, response):
+        """Expone el sobrecoste del middleware en modo DEBUG."""
+        elapsed_ms = getattr(request, '_session_security_ms', None)
+        if settings.DEBUG and elapsed_ms is not None:
+            response['X-Session-Security-Time'] = f'{elapsed_ms:.2f}ms'
+        return response
+
 
 class RateLimitMiddleware(MiddlewareMixin):
     """
@@ -204,34 +230,43 @@ class RateLimitMiddleware(MiddlewareMixin):
         return None
 
 
-class RowLevelSecurityMiddleware(MiddlewareMixin):
+class AuthProfileMiddleware(MiddlewareMixin):
     """
-    Middleware de Row-Level Security.
-
-    Establece el contexto RLS en la conexión de base de datos
-    para cada request autenticado, permitiendo que las políticas
-    RLS de PostgreSQL filtren datos a nivel de fila.
+    Expone el perfil de autorización del usuario como request.auth_profile.
 
-    Limpia el contexto al finalizar la respuesta para evitar
-    fuga de contexto entre requests.
+    El perfil (grupos, roles, permisos y rol RLS) se calcula al primer uso y
+    se reutiliza en el resto de la petición: context processors, vistas,
+    RBAC y contexto RLS. Debe ir después de AuthenticationMiddleware.
     """
 
     def process_request(self, request):
-        """Establece el contexto RLS al inicio de cada request."""
-        from security.authorization.services import RowLevelSecurityService
+        from security.authorization import auth_profile
+        auth_profile.attach(request)
+        return None
 
-        if request.user.is_authenticated:
-            RowLevelSecurityService.set_rls_context(request.user)
-        else:
-            RowLevelSecurityService.clear_rls_context()
 
-        return None
+class RowLevelSecurityMiddleware:
+    """
+    Middleware de Row-Level Security.
 
-    def process_response(self, request, response):
-        """Limpia el contexto RLS al finalizar la respuesta."""
+    Aplica el contexto RLS (usuario y rol) a cada transacción de base de
+    datos que abra la petición, con set_config(..., true) antepuesto a su
+    primera sentencia (RowLevelSecurityService.request_context). Las
+    políticas RLS de PostgreSQL filtran con ese contexto.
+
+    No añade idas y vueltas a la BD, una petición sin consultas no paga
+    nada y el contexto termina con cada transacción: no hay nada que
+    limpiar ni puede pasar a otro cliente con PgBouncer en modo transaction.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
         from security.authorization.services import RowLevelSecurityService
-        RowLevelSecurityService.clear_rls_context()
-        return response
+
+        with RowLevelSecurityService.request_context(request):
+            return self.get_response(request)
 
 
 class DataProtectionMiddleware(MiddlewareMixin):
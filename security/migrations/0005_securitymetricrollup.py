@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0004_alter_authorizationauditlog_timestamp_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecurityMetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hora'), ('day', 'Día')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('source', models.CharField(choices=[('security', 'Auditoría de Seguridad'), ('authorization', 'Auditoría de Autorización')], max_length=20)),
+                ('event_type', models.CharField(blank=True, default='', max_length=50)),
+                ('severity', models.CharField(blank=True, default='', max_length=20)),
+                ('category', models.CharField(blank=True, default='', max_length=100)),
+                ('outcome', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Métrica Agregada de Seguridad',
+                'verbose_name_plural': 'Métricas Agregadas de Seguridad',
+                'ordering': ['-bucket_start'],
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='security_se_granula_64011b_idx')],
+                'unique_together': {('granularity', 'bucket_start', 'source', 'event_type', 'severity', 'category', 'outcome')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-17 12:00
+
+from django.db import migrations
+
+
+def warm_user_lockout_cache(apps, schema_editor):
+    """
+    Publica en la caché los bloqueos de cuenta vigentes antes de que el
+    middleware deje de leerlos de UserSecurityProfile.
+    """
+    from django.utils import timezone
+    from security.auth.services import AccountLockoutService
+
+    UserSecurityProfile = apps.get_model('security', 'UserSecurityProfile')
+    locked = UserSecurityProfile.objects.using(schema_editor.connection.alias).filter(
+        account_locked_until__gt=timezone.now()
+    )
+    for profile in locked.iterator():
+        AccountLockoutService.sync_user_lock(profile)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0005_securitymetricrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(warm_user_lockout_cache, migrations.RunPython.noop),
+    ]
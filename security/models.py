@@ -124,7 +124,7 @@ class SecurityAuditLog(models.Model):
 
     event_id = models.UUIDField(default=uuid.uuid4, unique=True)
     event_type = models.CharField(max_length=50, choices=EventTypes.choices)
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
         null=True, blank=True
@@ -421,7 +421,7 @@ class TimeBasedAccessPolicy(models.Model):
 class AuthorizationAuditLog(models.Model):
     """Registro de auditoría de decisiones de autorización."""
 
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
         null=True, blank=True
@@ -661,3 +661,45 @@ class ComplianceCheck(models.Model):
 
     def __str__(self):
         return f'{self.get_regulation_display()} - {self.check_name}: {"✓" if self.passed else "✗"}'
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Modelo 10: SecurityMetricRollup
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SecurityMetricRollup(models.Model):
+    """
+    Conteos agregados de SecurityAuditLog y AuthorizationAuditLog por hora y
+    por día, mantenidos por security.rollups para el dashboard de seguridad.
+    """
+
+    class Granularities(models.TextChoices):
+        HOUR = 'hour', 'Hora'
+        DAY = 'day', 'Día'
+
+    class Sources(models.TextChoices):
+        SECURITY = 'security', 'Auditoría de Seguridad'
+        AUTHORIZATION = 'authorization', 'Auditoría de Autorización'
+
+    granularity = models.CharField(max_length=10, choices=Granularities.choices)
+    bucket_start = models.DateTimeField()
+    source = models.CharField(max_length=20, choices=Sources.choices)
+    event_type = models.CharField(max_length=50, blank=True, default='')
+    severity = models.CharField(max_length=20, blank=True, default='')
+    category = models.CharField(max_length=100, blank=True, default='')
+    outcome = models.CharField(max_length=20, blank=True, default='')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Métrica Agregada de Seguridad'
+        verbose_name_plural = 'Métricas Agregadas de Seguridad'
+        unique_together = [
+            'granularity', 'bucket_start', 'source', 'event_type', 'severity', 'category', 'outcome',
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+        ordering = ['-bucket_start']
+
+    def __str__(self):
+        return f'{self.get_granularity_display()} {self.bucket_start:%Y-%m-%d %H:%M} | {self.source} | {self.count}'
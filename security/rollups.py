@@ -0,0 +1,347 @@
+"""
+Métricas agregadas de auditoría para el dashboard de seguridad.
+
+SecurityMetricRollup guarda conteos de SecurityAuditLog y
+AuthorizationAuditLog por hora y por día (UTC), con las dimensiones:
+
+  - source: 'security' o 'authorization'
+  - event_type y severity (SecurityAuditLog)
+  - category: categoría WAF de los bloqueos ('waf_blocked') o resource_type
+    de las decisiones de autorización
+  - outcome: 'success'/'failure' (SecurityAuditLog) o el outcome de la
+    decisión ('granted'/'denied')
+
+La tarea periódica security.tasks.update_security_rollups consolida las
+horas cerradas (con SECURITY_ROLLUP_DELAY_SECONDS de margen para la
+auditoría diferida de security.audit_sink) y recalcula los días afectados
+a partir de las horas. El dashboard responde cualquier rango con collect():
+rollups diarios para los días completos, horarios para los extremos y una
+consulta sobre los registros crudos solo para lo que aún no se consolidó
+(la hora en curso) y las fracciones de hora del inicio del rango.
+
+La política de retención (purge_expired) borra los registros crudos ya
+consolidados cuando vencen y los rollups horarios antiguos; los diarios se
+conservan. El comando backfill_security_rollups reconstruye el histórico.
+
+Configuración (settings, opcional):
+  - SECURITY_ROLLUP_DELAY_SECONDS: margen antes de consolidar una hora (300)
+  - SECURITY_ROLLUP_MAX_HOURS: horas consolidadas por ejecución (168)
+  - SECURITY_ROLLUP_HOURLY_RETENTION_DAYS: vida de los rollups horarios (90)
+  - SECURITY_AUTHORIZATION_LOG_RETENTION_DAYS: vida de AuthorizationAuditLog (90)
+    (SecurityAuditLog usa el campo retention_days de cada fila)
+"""
+
+import logging
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Max, Min, Q, Sum, Value, When
+from django.db.models.fields.json import KT
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+from django.utils import timezone
+
+from security.models import AuthorizationAuditLog, SecurityAuditLog, SecurityMetricRollup
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+ROLLUP_DELAY = timedelta(seconds=getattr(settings, 'SECURITY_ROLLUP_DELAY_SECONDS', 300))
+MAX_HOURS_PER_RUN = getattr(settings, 'SECURITY_ROLLUP_MAX_HOURS', 24 * 7)
+HOURLY_RETENTION_DAYS = getattr(settings, 'SECURITY_ROLLUP_HOURLY_RETENTION_DAYS', 90)
+AUTHORIZATION_LOG_RETENTION_DAYS = getattr(settings, 'SECURITY_AUTHORIZATION_LOG_RETENTION_DAYS', 90)
+DELETE_BATCH_SIZE = 5000
+
+DIMENSIONS = ('source', 'event_type', 'severity', 'category', 'outcome')
+
+_HOUR = SecurityMetricRollup.Granularities.HOUR
+_DAY = SecurityMetricRollup.Granularities.DAY
+
+
+def floor_hour(value):
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(value):
+    floored = floor_hour(value)
+    return floored if floored == value else floored + HOUR
+
+
+def floor_day(value):
+    return floor_hour(value).replace(hour=0)
+
+
+def ceil_day(value):
+    floored = floor_day(value)
+    return floored if floored == value else floored + DAY
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Consolidación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def update(now=None):
+    """
+    Consolida las horas cerradas desde la última consolidada. La última hora
+    ya consolidada se recalcula para recoger auditoría que llegó tarde.
+
+    Returns:
+        int: Horas consolidadas
+    """
+    now = now or timezone.now()
+    until = floor_hour(now - ROLLUP_DELAY)
+    since = rebuildable_since(now)
+    watermark = get_watermark()
+    start = max(watermark - HOUR if watermark else since, since)
+
+    # Los tramos sin eventos se saltan: cada ejecución avanza hasta el
+    # siguiente registro pendiente aunque haya días enteros vacíos.
+    pending = _first_raw_hour(max(start, watermark or start))
+    if pending is None:
+        return 0
+    until = min(until, max(start, pending) + HOUR * MAX_HOURS_PER_RUN)
+    if start >= until:
+        return 0
+
+    _consolidate(start, until)
+    return int((until - start) / HOUR)
+
+
+def rebuild(start, end, now=None):
+    """
+    Recalcula los rollups de [start, end) día a día (backfill). El inicio se
+    limita a rebuildable_since() para no pisar horas cuyos registros crudos
+    ya se purgaron.
+
+    Returns:
+        tuple: (inicio efectivo, fin efectivo, horas consolidadas)
+    """
+    now = now or timezone.now()
+    start = max(floor_hour(start), rebuildable_since(now))
+    end = min(floor_hour(end), floor_hour(now - ROLLUP_DELAY))
+    hours = 0
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(floor_day(chunk_start) + DAY, end)
+        _consolidate(chunk_start, chunk_end)
+        hours += int((chunk_end - chunk_start) / HOUR)
+        chunk_start = chunk_end
+    return start, end, hours
+
+
+def rebuildable_since(now=None):
+    """
+    Primer día que se puede recalcular: antes, los registros crudos o los
+    rollups horarios pueden haberse purgado.
+    """
+    now = now or timezone.now()
+    retention_days = [HOURLY_RETENTION_DAYS, AUTHORIZATION_LOG_RETENTION_DAYS]
+    retention_days.extend(
+        SecurityAuditLog.objects.values_list('retention_days', flat=True).distinct().order_by()
+    )
+    return ceil_day(now - timedelta(days=max(1, min(retention_days))))
+
+
+def get_watermark():
+    """Fin de la última hora consolidada (None si no hay rollups)."""
+    last = SecurityMetricRollup.objects.filter(granularity=_HOUR).aggregate(last=Max('bucket_start'))['last']
+    return last + HOUR if last else None
+
+
+def _first_raw_hour(since):
+    """Hora del primer registro crudo desde `since` (None si no hay)."""
+    first = [
+        model.objects.filter(timestamp__gte=since).aggregate(first=Min('timestamp'))['first']
+        for model in (SecurityAuditLog, AuthorizationAuditLog)
+    ]
+    first = [value for value in first if value is not None]
+    return floor_hour(min(first)) if first else None
+
+
+def _consolidate(start, end):
+    """Reemplaza los rollups horarios de [start, end) y recalcula sus días."""
+    rows = _aggregate_raw([(start, end)])
+    first_day, last_day = floor_day(start), ceil_day(end)
+    with transaction.atomic():
+        SecurityMetricRollup.objects.filter(
+            granularity=_HOUR, bucket_start__gte=start, bucket_start__lt=end
+        ).delete()
+        SecurityMetricRollup.objects.bulk_create(
+            [SecurityMetricRollup(granularity=_HOUR, **row) for row in rows]
+        )
+
+        daily = (
+            SecurityMetricRollup.objects
+            .filter(granularity=_HOUR, bucket_start__gte=first_day, bucket_start__lt=last_day)
+            .annotate(day=TruncDay('bucket_start', tzinfo=dt_timezone.utc))
+            .values('day', *DIMENSIONS)
+            .annotate(total=Sum('count'))
+            .order_by()
+        )
+        daily = [
+            SecurityMetricRollup(
+                granularity=_DAY, bucket_start=row['day'], count=row['total'],
+                **{dimension: row[dimension] for dimension in DIMENSIONS}
+            )
+            for row in daily
+        ]
+        SecurityMetricRollup.objects.filter(
+            granularity=_DAY, bucket_start__gte=first_day, bucket_start__lt=last_day
+        ).delete()
+        SecurityMetricRollup.objects.bulk_create(daily)
+    logger.debug(f'Rollups de seguridad consolidados: {start:%Y-%m-%d %H:%M} - {end:%Y-%m-%d %H:%M}')
+
+
+def _aggregate_raw(ranges):
+    """
+    Conteos por hora (UTC) y dimensiones de los registros crudos en los
+    rangos [inicio, fin) dados: una consulta por modelo.
+    """
+    if not ranges:
+        return []
+    period = Q()
+    for start, end in ranges:
+        period |= Q(timestamp__gte=start, timestamp__lt=end)
+
+    security = (
+        SecurityAuditLog.objects
+        .filter(period)
+        .annotate(
+            bucket=TruncHour('timestamp', tzinfo=dt_timezone.utc),
+            waf_category=Case(
+                When(action='waf_blocked', then=Coalesce(KT('details__category'), Value('unknown'))),
+                default=Value(''),
+                output_field=CharField(),
+            ),
+        )
+        .values('bucket', 'event_type', 'severity', 'success', 'waf_category')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    rows = [
+        {
+            'bucket_start': row['bucket'],
+            'source': SecurityMetricRollup.Sources.SECURITY,
+            'event_type': row['event_type'][:50],
+            'severity': row['severity'] or '',
+            'category': row['waf_category'][:100],
+            'outcome': 'success' if row['success'] else 'failure',
+            'count': row['total'],
+        }
+        for row in security
+    ]
+
+    authorization = (
+        AuthorizationAuditLog.objects
+        .filter(period)
+        .annotate(bucket=TruncHour('timestamp', tzinfo=dt_timezone.utc))
+        .values('bucket', 'resource_type', 'outcome')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    rows.extend(
+        {
+            'bucket_start': row['bucket'],
+            'source': SecurityMetricRollup.Sources.AUTHORIZATION,
+            'event_type': '',
+            'severity': '',
+            'category': row['resource_type'][:100],
+            'outcome': row['outcome'],
+            'count': row['total'],
+        }
+        for row in authorization
+    )
+    return rows
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Consulta
+# ─────────────────────────────────────────────────────────────────────────────
+
+def collect(start, end):
+    """
+    Conteos de [start, end) por periodo y dimensiones.
+
+    Returns:
+        list: dicts con bucket_start (inicio de la hora o del día, UTC),
+        las DIMENSIONS y count
+    """
+    watermark = get_watermark()
+    raw_ranges = []
+    rollup_filter = Q(pk__in=[])
+
+    closed_end = min(end, watermark) if watermark else start
+    if start < closed_end:
+        first_hour = min(ceil_hour(start), closed_end)
+        last_hour = max(floor_hour(closed_end), first_hour)
+        if start < first_hour:
+            raw_ranges.append((start, first_hour))
+        if last_hour < closed_end:
+            raw_ranges.append((last_hour, closed_end))
+        if first_hour < last_hour:
+            first_day, last_day = ceil_day(first_hour), floor_day(last_hour)
+            if first_day < last_day:
+                rollup_filter = (
+                    Q(granularity=_HOUR, bucket_start__gte=first_hour, bucket_start__lt=first_day)
+                    | Q(granularity=_DAY, bucket_start__gte=first_day, bucket_start__lt=last_day)
+                    | Q(granularity=_HOUR, bucket_start__gte=last_day, bucket_start__lt=last_hour)
+                )
+            else:
+                rollup_filter = Q(granularity=_HOUR, bucket_start__gte=first_hour, bucket_start__lt=last_hour)
+    if max(start, closed_end) < end:
+        raw_ranges.append((max(start, closed_end), end))
+
+    rows = list(
+        SecurityMetricRollup.objects.filter(rollup_filter).values('bucket_start', 'count', *DIMENSIONS)
+    ) if start < closed_end else []
+    rows.extend(_aggregate_raw(raw_ranges))
+    return rows
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Retención
+# ─────────────────────────────────────────────────────────────────────────────
+
+def purge_expired(now=None, batch_size=DELETE_BATCH_SIZE):
+    """
+    Borra por lotes los registros crudos vencidos que ya están consolidados
+    y los rollups horarios más antiguos que la retención horaria.
+
+    Returns:
+        dict: Filas borradas por modelo
+    """
+    now = now or timezone.now()
+    deleted = {'security_audit': 0, 'authorization_audit': 0, 'hourly_rollups': 0}
+    watermark = get_watermark()
+
+    if watermark is not None:
+        retention_values = SecurityAuditLog.objects.values_list('retention_days', flat=True).distinct().order_by()
+        for retention_days in list(retention_values):
+            cutoff = min(now - timedelta(days=max(1, retention_days)), watermark)
+            deleted['security_audit'] += _delete_in_batches(
+                SecurityAuditLog.objects.filter(retention_days=retention_days, timestamp__lt=cutoff), batch_size
+            )
+        cutoff = min(now - timedelta(days=AUTHORIZATION_LOG_RETENTION_DAYS), watermark)
+        deleted['authorization_audit'] = _delete_in_batches(
+            AuthorizationAuditLog.objects.filter(timestamp__lt=cutoff), batch_size
+        )
+
+    deleted['hourly_rollups'] = _delete_in_batches(
+        SecurityMetricRollup.objects.filter(
+            granularity=_HOUR, bucket_start__lt=floor_day(now - timedelta(days=HOURLY_RETENTION_DAYS))
+        ),
+        batch_size,
+    )
+    return deleted
+
+
+def _delete_in_batches(queryset, batch_size):
+    total = 0
+    model = queryset.model
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += model.objects.filter(pk__in=ids).delete()[0]
@@ -2,10 +2,15 @@
 Signals for security app.
 
 Creates UserSecurityProfile automatically for new users.
-Logs authentication events (login/logout).
+Logs authentication events (login/logout) and keeps the per-user session
+registry up to date.
+Drains the buffered audit sink at the end of each request and Celery task.
 """
 
-from django.db.models.signals import post_save
+from celery.signals import task_postrun, worker_process_shutdown, worker_shutdown
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
@@ -30,6 +35,15 @@ def save_user_security_profile(sender, instance, **kwargs):
         pass
 
 
+@receiver(post_save, sender='security.UserSecurityProfile', dispatch_uid='security_sync_user_lock')
+def sync_user_lock(sender, instance, update_fields=None, **kwargs):
+    """Mantiene la copia en caché del bloqueo de cuenta que lee el middleware."""
+    if update_fields is not None and 'account_locked_until' not in update_fields:
+        return
+    from security.auth.services import AccountLockoutService
+    AccountLockoutService.sync_user_lock(instance)
+
+
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
     """Registra eventos de login exitoso en el log de auditoría."""
@@ -75,6 +89,24 @@ def log_user_logout(sender, request, user, **kwargs):
         )
 
 
+@receiver(user_logged_in, dispatch_uid='security_session_registry_login')
+def register_user_session(sender, request, user, **kwargs):
+    """Añade la nueva sesión al registro de sesiones del usuario."""
+    from security.auth import session_registry
+    session = getattr(request, 'session', None)
+    if session is not None:
+        session_registry.touch(user.pk, session.session_key)
+
+
+@receiver(user_logged_out, dispatch_uid='security_session_registry_logout')
+def unregister_user_session(sender, request, user, **kwargs):
+    """Quita la sesión cerrada del registro de sesiones del usuario."""
+    from security.auth import session_registry
+    session = getattr(request, 'session', None)
+    if user is not None and session is not None:
+        session_registry.unregister(user.pk, session.session_key)
+
+
 @receiver(user_login_failed)
 def log_user_login_failed(sender, credentials, request, **kwargs):
     """Registra intentos de login fallidos en el log de auditoría."""
@@ -95,3 +127,79 @@ def log_user_login_failed(sender, credentials, request, **kwargs):
             'ip_address': ip_address,
         }
     )
+
+
+@receiver([post_save, post_delete], sender='security.WAFRule')
+def invalidate_waf_rules(sender, update_fields=None, **kwargs):
+    """
+    Publica una nueva versión de las reglas WAF al confirmar la transacción
+    para que cada proceso recompile las suyas. Guardar solo los contadores
+    de aciertos no cambia las reglas.
+    """
+    if update_fields and set(update_fields) <= {'hit_count', 'last_hit'}:
+        return
+    from security.hardening.services import WAFService
+    transaction.on_commit(WAFService.invalidate_rules)
+
+
+@receiver(m2m_changed, sender=User.groups.through, dispatch_uid='security_auth_profile_groups')
+@receiver(m2m_changed, sender=User.user_permissions.through, dispatch_uid='security_auth_profile_user_perms')
+def invalidate_user_auth_profile(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Cambian los grupos o permisos directos de un usuario: invalida su perfil
+    de autorización (o el de los usuarios afectados si se cambió desde el
+    grupo o el permiso).
+    """
+    if not action.startswith('post_'):
+        return
+    from security.authorization import auth_profile
+    if not reverse:
+        auth_profile.invalidate_user(instance.pk, instance=instance)
+    elif pk_set:
+        auth_profile.invalidate_user(*pk_set)
+    else:
+        # post_clear desde el grupo/permiso: no se sabe a quién afectó
+        auth_profile.invalidate_all()
+
+
+@receiver(m2m_changed, sender='auth.Group_permissions', dispatch_uid='security_auth_profile_group_perms')
+@receiver(m2m_changed, sender='security.Role_permissions', dispatch_uid='security_auth_profile_role_perms')
+@receiver([post_save, post_delete], sender='auth.Group', dispatch_uid='security_auth_profile_group')
+@receiver([post_save, post_delete], sender='security.Role', dispatch_uid='security_auth_profile_role')
+def invalidate_all_auth_profiles(sender, action='post_', **kwargs):
+    """Cambian grupos, roles o sus permisos: invalida todos los perfiles."""
+    if not action.startswith('post_'):
+        return
+    from security.authorization import auth_profile
+    auth_profile.invalidate_all()
+
+
+@receiver([post_save, post_delete], sender='security.UserRoleAssignment', dispatch_uid='security_auth_profile_roles')
+def invalidate_role_assignment_profile(sender, instance, **kwargs):
+    """Cambia una asignación de rol: invalida el perfil de su usuario."""
+    from security.authorization import auth_profile
+    auth_profile.invalidate_user(instance.user_id)
+
+
+@receiver(request_finished, dispatch_uid='security_audit_sink_request')
+@task_postrun.connect(weak=False)
+def drain_audit_sink(sender=None, **kwargs):
+    """Envía a la cola la auditoría acumulada por la petición o la tarea."""
+    from security import audit_sink
+    audit_sink.drain()
+
+
+@receiver(request_finished, dispatch_uid='security_encryption_usage_request')
+@task_postrun.connect(weak=False)
+def drain_encryption_usage(sender=None, **kwargs):
+    """Pasa a la caché los usos de claves de cifrado de la petición o la tarea."""
+    from security.data_protection.services import EncryptionService
+    EncryptionService.drain_usage()
+
+
+@worker_process_shutdown.connect(weak=False)
+@worker_shutdown.connect(weak=False)
+def write_pending_audit(sender=None, **kwargs):
+    """Al apagarse un worker la auditoría pendiente se escribe en la BD."""
+    from security import audit_sink
+    audit_sink.drain(direct=True)
@@ -0,0 +1,73 @@
+"""
+Celery tasks for the security application.
+"""
+
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_waf_hit_counters():
+    """Vuelca a WAFRule los aciertos del WAF acumulados en la caché."""
+    from security.hardening.services import WAFService
+
+    flushed = WAFService.flush_hit_counters()
+    if flushed:
+        logger.info(f'WAF: {flushed} aciertos volcados a las reglas')
+    return flushed
+
+
+@shared_task
+def flush_audit_sink():
+    """Escribe en la BD la auditoría encolada por security.audit_sink."""
+    from security import audit_sink
+
+    written = audit_sink.flush()
+    if written:
+        logger.info(f'Auditoría: {written} registros escritos')
+    return written
+
+
+@shared_task
+def flush_encryption_usage():
+    """Vuelca a EncryptedDataKey los usos de las claves acumulados en la caché."""
+    from security.data_protection.services import EncryptionService
+
+    flushed = EncryptionService.flush_usage()
+    if flushed:
+        logger.info(f'Cifrado: uso de {flushed} claves volcado')
+    return flushed
+
+
+@shared_task
+def update_security_rollups():
+    """Consolida en SecurityMetricRollup las horas de auditoría ya cerradas."""
+    from security import rollups
+
+    hours = rollups.update()
+    if hours:
+        logger.info(f'Rollups de seguridad: {hours} horas consolidadas')
+    return hours
+
+
+@shared_task
+def purge_security_audit_logs():
+    """Aplica la política de retención a la auditoría cruda y a los rollups horarios."""
+    from security import rollups
+
+    deleted = rollups.purge_expired()
+    logger.info(f'Retención de auditoría: {deleted}')
+    return deleted
+
+
+@shared_task
+def sweep_inactive_sessions():
+    """Cierra las sesiones inactivas y las quita del registro de sesiones."""
+    from security.auth.services import SessionSecurityService
+
+    closed = SessionSecurityService.invalidate_inactive_sessions()
+    if closed:
+        logger.info(f'Sesiones: {closed} sesiones inactivas cerradas')
+    return closed
@@ -112,6 +112,11 @@ class TOTPPropertyTests(TestCase):
 class EncryptionPropertyTests(TestCase):
     """Property-based tests for AES-256-GCM encryption."""
 
+    def setUp(self):
+        from security.data_protection.services import EncryptionService
+        # Keys cached by earlier tests belong to rows TestCase has rolled back
+        EncryptionService.clear_key_cache()
+
     @given(
         plaintext=st.text(
             alphabet=string.printable,
@@ -177,6 +182,11 @@ class EncryptionPropertyTests(TestCase):
 class EncryptionKeySeparationPropertyTests(TestCase):
     """Property-based tests for encryption key separation."""
 
+    def setUp(self):
+        from security.data_protection.services import EncryptionService
+        # Keys cached by earlier tests belong to rows TestCase has rolled back
+        EncryptionService.clear_key_cache()
+
     @given(
         plaintext=st.text(
             alphabet=st.characters(blacklist_categories=('Cs',)),
@@ -4,9 +4,12 @@ Comprehensive security app tests.
 Tests models, signals, and basic functionality of all security modules.
 """
 
+from django.core.cache import cache
+from django.db import OperationalError
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.utils import timezone
+from collections import defaultdict
 from datetime import timedelta
 import time
 
@@ -291,3 +294,274 @@ class SecuritySignalTests(TestCase):
         self.assertTrue(
             UserSecurityProfile.objects.filter(user=user).exists()
         )
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Audit Sink Tests
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _FakeRedisQueue:
+    """Listas de Redis mínimas para la cola del audit sink."""
+
+    def __init__(self):
+        self.lists = defaultdict(list)
+
+    def push_script(self, keys, args):
+        limit, records = args[0], args[1:]
+        items = self.lists[keys[0]]
+        if len(items) + len(records) > limit:
+            return -1
+        items.extend(records)
+        return len(items)
+
+    def pipeline(self, transaction=True):
+        return _FakeRedisPipeline(self)
+
+    def lmove(self, source, destination, src, dest):
+        if not self.lists[source]:
+            return None
+        item = self.lists[source].pop(0)
+        self.lists[destination].append(item)
+        return item
+
+    def lrange(self, key, start, end):
+        return list(self.lists[key])
+
+    def delete(self, key):
+        self.lists.pop(key, None)
+
+    def llen(self, key):
+        return len(self.lists[key])
+
+
+class _FakeRedisPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def lmove(self, *args):
+        self.commands.append(args)
+
+    def execute(self):
+        return [self.client.lmove(*args) for args in self.commands]
+
+
+class AuditSinkTests(TestCase):
+    """Tests for the buffered audit sink (security.audit_sink)."""
+
+    def setUp(self):
+        from unittest import mock
+        from django.test import override_settings
+        from security import audit_sink
+
+        self.sink = audit_sink
+        self.user = User.objects.create_user('sinkuser', 'sink@test.com', 'password123')
+        settings_override = override_settings(AUDIT_SINK_MODE='buffer', AUDIT_SINK_BATCH_SIZE=10)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(audit_sink._buffer.clear)
+
+        self.queue = _FakeRedisQueue()
+        self.redis = None
+        patcher = mock.patch.object(audit_sink, '_redis_client', side_effect=lambda: self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(audit_sink, '_script', return_value=self.queue.push_script)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _record_denied(self):
+        from security.authorization.services import AuthorizationAuditService
+        AuthorizationAuditService.log_decision(self.user, 'blog.noticia', 'delete', granted=False)
+
+    def test_sync_mode_inserts_immediately(self):
+        from django.test import override_settings
+        with override_settings(AUDIT_SINK_MODE='sync'):
+            log = self.sink.record(SecurityAuditLog, event_type='auth', action='login', user=self.user)
+        self.assertIsNotNone(log.pk)
+        self.assertTrue(SecurityAuditLog.objects.filter(pk=log.pk).exists())
+
+    def test_buffer_is_written_when_request_finishes(self):
+        from django.core.signals import request_finished
+        recorded_at = timezone.now() - timedelta(minutes=5)
+        self.sink.record(SecurityAuditLog, event_type='auth', action='old', timestamp=recorded_at)
+        self._record_denied()
+
+        self.assertEqual(SecurityAuditLog.objects.count(), 0)
+        self.assertEqual(AuthorizationAuditLog.objects.count(), 0)
+
+        with self.assertNumQueries(6):  # un INSERT por modelo, cada uno en su savepoint
+            request_finished.send(sender=self.__class__)
+
+        self.assertEqual(AuthorizationAuditLog.objects.get().outcome, 'denied')
+        self.assertEqual(SecurityAuditLog.objects.get(action='old').timestamp, recorded_at)
+        self.assertEqual(SecurityAuditLog.objects.get(action='access_denied_delete').user, self.user)
+
+    def test_redis_queue_flushed_by_task(self):
+        from django.test import override_settings
+        from security.tasks import flush_audit_sink
+        self.redis = self.queue
+        with override_settings(AUDIT_SINK_BATCH_SIZE=3):
+            for i in range(4):
+                self.sink.record(SecurityAuditLog, event_type='api_request', action=f'hit-{i}')
+        # El lote de 3 se drenó a la cola al llenarse; el cuarto sigue en el buffer
+        self.assertEqual(self.sink.pending(), 3)
+        self.sink.drain()
+        self.assertEqual(SecurityAuditLog.objects.count(), 0)
+
+        self.assertEqual(flush_audit_sink.apply().get(), 4)
+        self.assertEqual(self.sink.pending(), 0)
+        self.assertEqual(
+            sorted(SecurityAuditLog.objects.values_list('action', flat=True)),
+            ['hit-0', 'hit-1', 'hit-2', 'hit-3'],
+        )
+
+    def test_failed_flush_keeps_records_until_written(self):
+        from unittest import mock
+        self.redis = self.queue
+        for i in range(3):
+            self.sink.record(SecurityAuditLog, event_type='api_request', action=f'hit-{i}')
+        self.sink.drain()
+
+        caida = OperationalError('conexión perdida')
+        with mock.patch.object(SecurityAuditLog.objects, 'bulk_create', side_effect=caida), \
+                mock.patch.object(SecurityAuditLog, 'save', side_effect=caida):
+            with self.assertRaises(OperationalError):
+                self.sink.flush()
+        # Sin confirmar: siguen en Redis, en la lista de procesamiento
+        self.assertEqual(self.queue.llen(cache.make_key(self.sink.PROCESSING_KEY)), 3)
+        self.assertEqual(self.sink.pending(), 3)
+        self.assertEqual(SecurityAuditLog.objects.count(), 0)
+
+        self.assertEqual(self.sink.flush(), 3)
+        self.assertEqual(self.sink.pending(), 0)
+        self.assertEqual(SecurityAuditLog.objects.count(), 3)
+
+    def test_direct_write_keeps_buffer_when_database_is_down(self):
+        from unittest import mock
+        self.sink.record(SecurityAuditLog, event_type='api_request', action='pending')
+        caida = OperationalError('conexión perdida')
+        with mock.patch.object(SecurityAuditLog.objects, 'bulk_create', side_effect=caida):
+            self.assertEqual(self.sink.drain(direct=True), 0)
+        self.assertEqual(len(self.sink._buffer), 1)
+
+        self.assertEqual(self.sink.drain(direct=True), 1)
+        self.assertTrue(SecurityAuditLog.objects.filter(action='pending').exists())
+
+    def test_full_queue_applies_back_pressure(self):
+        from unittest import mock
+        from django.test import override_settings
+        self.redis = self.queue
+        with override_settings(AUDIT_SINK_MAX_PENDING=1), \
+                mock.patch.object(self.sink, '_request_flush') as request_flush:
+            self.sink.record(SecurityAuditLog, event_type='api_request', action='a')
+            self.sink.record(SecurityAuditLog, event_type='api_request', action='b')
+            self.sink.drain()
+        # La cola llena no acepta el lote: se escribe directamente, sin perder nada
+        self.assertEqual(self.sink.pending(), 0)
+        self.assertEqual(SecurityAuditLog.objects.count(), 2)
+        request_flush.assert_called()
+
+    def test_worker_shutdown_writes_pending_records(self):
+        from celery.signals import worker_process_shutdown
+        self.redis = self.queue
+        self.sink.record(SecurityAuditLog, event_type='api_request', action='pending')
+        worker_process_shutdown.send(sender=None)
+        self.assertEqual(self.sink.pending(), 0)
+        self.assertTrue(SecurityAuditLog.objects.filter(action='pending').exists())
+
+
+class SecurityRollupTests(TestCase):
+    """Tests de los rollups del dashboard de seguridad (security.rollups)."""
+
+    def setUp(self):
+        from security import rollups
+        self.rollups = rollups
+        self.now = rollups.floor_hour(timezone.now()) + timedelta(minutes=30)
+        offsets = [
+            timedelta(days=3, minutes=10), timedelta(days=2), timedelta(days=2),
+            timedelta(hours=5), timedelta(minutes=20),
+        ]
+        for i, offset in enumerate(offsets):
+            self._log(offset, event_type='auth', action='login', severity='critical' if i % 2 else 'info',
+                      success=bool(i % 3))
+        self._log(timedelta(days=1), event_type='api_request', action='waf_blocked', severity='warning',
+                  success=False, details={'category': 'xss', 'path': '/buscar'})
+        self._log(timedelta(hours=3), event_type='api_request', action='waf_blocked', severity='warning',
+                  success=False, details={'path': '/login'})
+        for offset, outcome in ((timedelta(days=2), 'granted'), (timedelta(hours=2), 'denied'),
+                                (timedelta(minutes=5), 'granted')):
+            AuthorizationAuditLog.objects.create(
+                resource_type='blog.noticia', action='view', outcome=outcome, timestamp=self.now - offset
+            )
+
+    def _log(self, offset, **fields):
+        return SecurityAuditLog.objects.create(timestamp=self.now - offset, **fields)
+
+    def _totals(self, rows):
+        totals = {}
+        for row in rows:
+            key = tuple(row[d] for d in self.rollups.DIMENSIONS)
+            totals[key] = totals.get(key, 0) + row['count']
+        return totals
+
+    def test_collect_matches_raw_counts(self):
+        from security.models import SecurityMetricRollup
+        self.assertEqual(self.rollups.update(now=self.now) > 0, True)
+        self.assertTrue(SecurityMetricRollup.objects.filter(granularity='day').exists())
+
+        for start in (self.now - timedelta(days=4, minutes=7), self.now - timedelta(hours=6),
+                      self.now - timedelta(days=2, minutes=1)):
+            raw = self._totals(self.rollups._aggregate_raw([(start, self.now)]))
+            self.assertEqual(self._totals(self.rollups.collect(start, self.now)), raw)
+
+        self.assertIn(('security', 'api_request', 'warning', 'xss', 'failure'), raw)
+        self.assertIn(('security', 'api_request', 'warning', 'unknown', 'failure'), raw)
+
+    def test_dashboard_metrics_from_rollups(self):
+        from security.views_dashboard import get_audit_metrics, get_auth_metrics, get_waf_attack_types
+        self.rollups.update(now=self.now)
+        start = self.now - timedelta(days=7)
+
+        audit = get_audit_metrics(start, self.now)
+        self.assertEqual(audit['total_events'], 7)
+        self.assertEqual(audit['critical_events'], 2)
+        self.assertEqual(audit['top_event_types'][0], {'event_type': 'auth', 'count': 5})
+
+        auth = get_auth_metrics(start, self.now)
+        self.assertEqual((auth['auth_allowed'], auth['auth_denied'], auth['auth_decisions_total']), (2, 1, 3))
+
+        waf = get_waf_attack_types(start, self.now)
+        self.assertEqual(dict(zip(waf['labels'], waf['data'])), {'xss': 1, 'unknown': 1})
+
+    def test_backfill_is_idempotent(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from security.models import SecurityMetricRollup
+
+        call_command('backfill_security_rollups', '--days', '5', stdout=StringIO())
+        first = sorted(SecurityMetricRollup.objects.values_list(
+            'granularity', 'bucket_start', 'source', 'event_type', 'category', 'outcome', 'count'))
+        call_command('backfill_security_rollups', '--days', '5', stdout=StringIO())
+        self.rollups.update()
+        second = sorted(SecurityMetricRollup.objects.values_list(
+            'granularity', 'bucket_start', 'source', 'event_type', 'category', 'outcome', 'count'))
+        self.assertEqual(first, second)
+        self.assertEqual(
+            sum(c for g, *_, c in first if g == 'day'),
+            sum(c for g, *_, c in first if g == 'hour'),
+        )
+
+    def test_purge_keeps_unconsolidated_and_recent_rows(self):
+        self._log(timedelta(days=40), event_type='auth', action='old', retention_days=30)
+        self._log(timedelta(days=20), event_type='auth', action='kept', retention_days=30)
+
+        # Sin rollups no se borra nada crudo
+        self.assertEqual(self.rollups.purge_expired(now=self.now)['security_audit'], 0)
+
+        self.rollups.update(now=self.now)
+        deleted = self.rollups.purge_expired(now=self.now)
+        self.assertEqual(deleted['security_audit'], 1)
+        self.assertFalse(SecurityAuditLog.objects.filter(action='old').exists())
+        self.assertTrue(SecurityAuditLog.objects.filter(action='kept').exists())
+        self.assertEqual(SecurityAuditLog.objects.filter(timestamp__gte=self.now - timedelta(days=7)).count(), 7)
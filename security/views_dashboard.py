@@ -15,8 +15,9 @@ from django.utils import timezone
 from django.http import JsonResponse
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
+from security import rollups
 from security.models import (
-    SecurityAuditLog, AuthorizationAuditLog, WAFRule,
+    SecurityAuditLog, SecurityMetricRollup, WAFRule,
     SecurityReport, ComplianceCheck, UserSecurityProfile,
     APIKey, JWTSession
 )
@@ -132,27 +133,47 @@ def security_dashboard_data(request):
 # Data Collection Functions
 # =============================================================================
 
+def _security_rows(start_date, end_date):
+    """Conteos agregados de SecurityAuditLog (rollups + registros sin consolidar)."""
+    return [
+        row for row in rollups.collect(start_date, end_date)
+        if row['source'] == SecurityMetricRollup.Sources.SECURITY
+    ]
+
+
+def _authorization_rows(start_date, end_date):
+    """Conteos agregados de AuthorizationAuditLog (rollups + registros sin consolidar)."""
+    return [
+        row for row in rollups.collect(start_date, end_date)
+        if row['source'] == SecurityMetricRollup.Sources.AUTHORIZATION
+    ]
+
+
+def _is_waf_block(row):
+    # Los bloqueos del WAF llevan su categoría; 'waf_block' es el tipo heredado
+    return bool(row['category']) or row['event_type'] == 'waf_block'
+
+
 def get_audit_metrics(start_date, end_date):
     """Get security audit metrics for the dashboard."""
-    logs = SecurityAuditLog.objects.filter(
-        timestamp__range=[start_date, end_date]
-    )
-    
-    total_events = logs.count()
-    failed_events = logs.filter(success=False).count()
-    critical_events = logs.filter(severity='critical').count()
-    
+    rows = _security_rows(start_date, end_date)
+
+    total_events = sum(row['count'] for row in rows)
+    failed_events = sum(row['count'] for row in rows if row['outcome'] == 'failure')
+    critical_events = sum(row['count'] for row in rows if row['severity'] == 'critical')
+
     # Group by event type
-    event_types = logs.values('event_type').annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
-    
+    event_types = defaultdict(int)
+    for row in rows:
+        event_types[row['event_type']] += row['count']
+    top_event_types = sorted(event_types.items(), key=lambda item: item[1], reverse=True)[:5]
+
     return {
         'total_events': total_events,
         'failed_events': failed_events,
         'critical_events': critical_events,
         'success_rate': ((total_events - failed_events) / total_events * 100) if total_events > 0 else 100,
-        'top_event_types': list(event_types),
+        'top_event_types': [{'event_type': event_type, 'count': count} for event_type, count in top_event_types],
     }
 
 
@@ -160,25 +181,22 @@ def get_waf_statistics(start_date, end_date):
     """Get WAF statistics and attack patterns."""
     # Get active rules with hits
     active_rules = WAFRule.objects.filter(is_active=True)
-    
-    # Get recent WAF blocks from audit logs
-    waf_blocks = SecurityAuditLog.objects.filter(
-        event_type='waf_block',
-        timestamp__range=[start_date, end_date]
-    )
-    
-    total_blocks = waf_blocks.count()
-    
+
+    total_blocks = sum(row['count'] for row in _security_rows(start_date, end_date) if _is_waf_block(row))
+
     # Get attack categories
     attack_categories = defaultdict(int)
     for rule in active_rules:
         attack_categories[rule.category] += rule.hit_count
-    
-    # Top attacked paths (from WAF blocks)
-    top_paths = waf_blocks.values('details__path').annotate(
+
+    # Top attacked paths (from WAF blocks); la ruta no se consolida
+    top_paths = SecurityAuditLog.objects.filter(
+        action='waf_blocked',
+        timestamp__range=[start_date, end_date]
+    ).values('details__path').annotate(
         count=Count('id')
     ).order_by('-count')[:5]
-    
+
     return {
         'total_blocks': total_blocks,
         'active_rules': active_rules.count(),
@@ -190,47 +208,35 @@ def get_waf_statistics(start_date, end_date):
 
 def get_auth_metrics(start_date, end_date):
     """Get authentication and authorization metrics."""
-    # Authentication events
-    auth_logs = SecurityAuditLog.objects.filter(
-        event_type__in=['login', 'logout', '2fa_verification'],
-        timestamp__range=[start_date, end_date]
-    )
-    
-    # Failed logins
-    failed_logins = SecurityAuditLog.objects.filter(
-        event_type='login_failed',
-        timestamp__range=[start_date, end_date]
-    ).count()
-    
-    # Account lockouts - count from audit logs
-    lockouts = SecurityAuditLog.objects.filter(
-        event_type='account_lockout',
-        timestamp__range=[start_date, end_date]
-    ).count()
-    
+    rows = _security_rows(start_date, end_date)
+    by_event_type = defaultdict(int)
+    for row in rows:
+        by_event_type[row['event_type']] += row['count']
+
     # 2FA status
     users_with_2fa = UserSecurityProfile.objects.filter(
         two_factor_enabled=True
     ).count()
     total_users = UserSecurityProfile.objects.count()
-    
+
     # Authorization decisions
-    auth_decisions = AuthorizationAuditLog.objects.filter(
-        timestamp__range=[start_date, end_date]
-    )
-    allowed_decisions = auth_decisions.filter(outcome='allowed').count()
-    denied_decisions = auth_decisions.filter(outcome='denied').count()
-    
+    decisions = defaultdict(int)
+    for row in _authorization_rows(start_date, end_date):
+        decisions[row['outcome']] += row['count']
+    auth_decisions_total = sum(decisions.values())
+    allowed_decisions = decisions['granted']
+    denied_decisions = decisions['denied']
+
     return {
-        'total_auth_events': auth_logs.count(),
-        'failed_logins': failed_logins,
-        'account_lockouts': lockouts,
+        'total_auth_events': sum(by_event_type[t] for t in ('login', 'logout', '2fa_verification')),
+        'failed_logins': by_event_type['login_failed'],
+        'account_lockouts': by_event_type['account_lockout'],
         'users_with_2fa': users_with_2fa,
         'total_users': total_users,
-        'auth_decisions_total': auth_decisions.count(),
+        'auth_decisions_total': auth_decisions_total,
         'auth_allowed': allowed_decisions,
         'auth_denied': denied_decisions,
-        'auth_denial_rate': (denied_decisions / auth_decisions.count() * 100) if auth_decisions.count() > 0 else 0,
+        'auth_denial_rate': (denied_decisions / auth_decisions_total * 100) if auth_decisions_total > 0 else 0,
     }
 
 
@@ -239,7 +245,7 @@ def get_compliance_status():
     # Get latest compliance checks
     compliance_checks = ComplianceCheck.objects.filter(
         checked_at__gte=timezone.now() - timedelta(days=7)
-    )
+    ).only('regulation', 'passed')
     
     # Group by regulation
     regulations = {}
@@ -255,16 +261,13 @@ def get_compliance_status():
     for reg, data in regulations.items():
         data['percentage'] = (data['passed'] / data['total'] * 100) if data['total'] > 0 else 0
     
-    # Get OWASP compliance specifically
-    owasp_checks = compliance_checks.filter(regulation='owasp')
-    owasp_passed = owasp_checks.filter(passed=True).count()
-    owasp_total = owasp_checks.count()
-    
+    owasp = regulations.get('owasp', {'total': 0, 'passed': 0})
+
     return {
         'regulations': regulations,
-        'owasp_score': (owasp_passed / owasp_total * 100) if owasp_total > 0 else 0,
-        'total_checks': compliance_checks.count(),
-        'passed_checks': compliance_checks.filter(passed=True).count(),
+        'owasp_score': (owasp['passed'] / owasp['total'] * 100) if owasp['total'] > 0 else 0,
+        'total_checks': sum(data['total'] for data in regulations.values()),
+        'passed_checks': sum(data['passed'] for data in regulations.values()),
     }
 
 
@@ -514,10 +517,8 @@ def get_audit_timeline(start_date, end_date):
     Get timeline data for audit events chart.
     Genera SIEMPRE los últimos 7 días en el eje X, incluso si no hay datos.
     """
-    # Obtener TODOS los logs sin filtrar
-    logs = SecurityAuditLog.objects.filter(
-        timestamp__range=[start_date, end_date]
-    )
+    # Obtener TODOS los conteos sin filtrar
+    rows = _security_rows(start_date, end_date)
     
     # Generar todos los días en el rango (últimos 7 días)
     timeline = {}
@@ -531,13 +532,12 @@ def get_audit_timeline(start_date, end_date):
         current_date -= timedelta(days=1)
     
     # Llenar con datos reales si existen
-    for log in logs:
-        date_str = log.timestamp.strftime('%Y-%m-%d')
+    for row in rows:
+        date_str = row['bucket_start'].strftime('%Y-%m-%d')
         if date_str in timeline:
-            timeline[date_str]['total'] += 1
-            # Check severity usando el campo directo
-            if hasattr(log, 'severity') and log.severity == 'critical':
-                timeline[date_str]['critical'] += 1
+            timeline[date_str]['total'] += row['count']
+            if row['severity'] == 'critical':
+                timeline[date_str]['critical'] += row['count']
     
     # Ordenar las fechas cronológicamente (más antiguo a más reciente)
     dates = sorted(timeline.keys())
@@ -560,18 +560,11 @@ def get_audit_timeline(start_date, end_date):
 
 def get_waf_attack_types(start_date, end_date):
     """Get WAF attack types distribution."""
-    # Obtener todos los eventos WAF en el rango de fechas
-    waf_blocks = SecurityAuditLog.objects.filter(
-        event_type='waf_block',
-        timestamp__range=[start_date, end_date]
-    )
-    
-    # Contar por categoría desde los details de los logs
+    # Contar por categoría los bloqueos WAF del rango de fechas
     categories = defaultdict(int)
-    for block in waf_blocks:
-        if block.details and isinstance(block.details, dict):
-            category = block.details.get('category', 'unknown')
-            categories[category] += 1
+    for row in _security_rows(start_date, end_date):
+        if _is_waf_block(row):
+            categories[row['category'] or 'unknown'] += row['count']
     
     # Si no hay datos de logs, obtener de las reglas WAF activas
     if not categories:
@@ -599,10 +592,7 @@ def get_auth_events_timeline(start_date, end_date):
     Get authentication events timeline.
     Genera SIEMPRE los últimos 7 días en el eje X, incluso si no hay datos.
     """
-    auth_logs = SecurityAuditLog.objects.filter(
-        event_type__in=['login', 'login_failed', 'logout'],
-        timestamp__range=[start_date, end_date]
-    )
+    rows = _security_rows(start_date, end_date)
     
     # Generar todos los días en el rango (últimos 7 días)
     timeline = {}
@@ -616,15 +606,15 @@ def get_auth_events_timeline(start_date, end_date):
         current_date -= timedelta(days=1)
     
     # Llenar con datos reales si existen
-    for log in auth_logs:
-        date_str = log.timestamp.strftime('%Y-%m-%d')
+    for row in rows:
+        date_str = row['bucket_start'].strftime('%Y-%m-%d')
         if date_str in timeline:
-            if log.event_type == 'login':
-                timeline[date_str]['login'] += 1
-            elif log.event_type == 'login_failed':
-                timeline[date_str]['failed'] += 1
-            elif log.event_type == 'logout':
-                timeline[date_str]['logout'] += 1
+            if row['event_type'] == 'login':
+                timeline[date_str]['login'] += row['count']
+            elif row['event_type'] == 'login_failed':
+                timeline[date_str]['failed'] += row['count']
+            elif row['event_type'] == 'logout':
+                timeline[date_str]['logout'] += row['count']
     
     # Ordenar las fechas cronológicamente
     dates = sorted(timeline.keys())
@@ -678,10 +668,8 @@ def get_severity_distribution(start_date, end_date):
     Get severity distribution of security events.
     NO FILTRA eventos - muestra todos para estadísticas.
     """
-    # Obtener TODOS los logs sin filtrar
-    logs = SecurityAuditLog.objects.filter(
-        timestamp__range=[start_date, end_date]
-    )
+    # Obtener TODOS los conteos sin filtrar
+    rows = _security_rows(start_date, end_date)
     
     # Contar por severidad directamente
     severities = {
@@ -691,10 +679,10 @@ def get_severity_distribution(start_date, end_date):
         'info': 0
     }
     
-    for log in logs:
-        severity_value = str(log.severity).lower()
+    for row in rows:
+        severity_value = str(row['severity']).lower()
         if severity_value in severities:
-            severities[severity_value] += 1
+            severities[severity_value] += row['count']
     
     result = {
         'labels': ['Crítico', 'Error', 'Advertencia', 'Info'],